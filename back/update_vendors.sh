@@ -20,6 +20,9 @@ echo "---------------------------------------------------------"
 
 DL_DIR=/usr/share/arp-scan
 
+# NetAlertX install folder, this script is in <install folder>/back
+INSTALL_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
+
 # ----------------------------------------------------------------------
 echo Updating... $DL_DIR
 cd $DL_DIR || { echo "could not enter $DL_DIR directory"; exit 1; }
@@ -40,3 +43,5 @@ sort ieee-oui_all.txt > ieee-oui_all_sort.txt
 awk '{$1=$1; print}' ieee-oui_all_sort.txt | sort -u > ieee-oui_all_filtered.txt
 
 
+# Rebuild the compiled vendors index used for MAC vendor lookups
+python3 "$INSTALL_DIR/server/vendor_index.py"
@@ -107,11 +107,11 @@ fi
 # Create an empty log files
 # Create the execution_queue.log and app_front.log files if they don't exist
 touch "${INSTALL_DIR}"/front/log/{app.log,execution_queue.log,app_front.log,app.php_errors.log,stderr.log,stdout.log,db_is_locked.log}
-touch "${INSTALL_DIR}"/front/api/user_notifications.json
+touch "${INSTALL_DIR}"/front/api/user_notifications.{jsonl,idx,lock}
 
 echo "[INSTALL] Fixing permissions after copied starter config & DB"
 chown -R nginx:www-data "${INSTALL_DIR}"/{config,front/log,db,front/api}
-chown -R nginx:www-data "${INSTALL_DIR}"/front/api/user_notifications.json
+chown -R nginx:www-data "${INSTALL_DIR}"/front/api/user_notifications.{jsonl,idx,lock}
 
 chmod 750 "${INSTALL_DIR}"/{config,front/log,db}
 find "${INSTALL_DIR}"/{config,front/log,db} -type f -exec chmod 640 {} \;
@@ -231,17 +231,30 @@ function displayMessage($message, $logAlert = FALSE, $logConsole = TRUE, $logFil
 
 
 // ----------------------------------------------------------------------------------------
-// Adds an action to perform into the execution_queue.log file
+// Sends an action to the server over the command socket (see server/command_socket.py),
+// falls back to the execution_queue.log file if the server doesn't accept it
 function addToExecutionQueue($action)
 {
     global $logFolderPath, $timestamp;
 
+    $line = "[" . $timestamp . "]|" . $action;
+
+    // the devices page waits for API updates, the reply is sent once they are written
+    $waitForDone = strpos($action, '|update_api|') !== false;
+
+    $reply = sendToCommandSocket($line, $waitForDone);
+
+    if ($reply !== null && $reply['status'] !== 'rejected') {
+        displayMessage('Action "'.$action.'" sent to the server.', false, true, true, true);
+        return;
+    }
+
     $logFile = 'execution_queue.log';
     $fullPath = $logFolderPath . $logFile;
 
     // Open the file or skip if it can't be opened
     if ($file = fopen($fullPath, 'a')) {
-        fwrite($file, "[" . $timestamp . "]|" . $action . PHP_EOL);
+        fwrite($file, $line . PHP_EOL);
         fclose($file);
         displayMessage('Action "'.$action.'" added to the execution queue.', false, true, true, true);
     } else {
@@ -249,6 +262,50 @@ function addToExecutionQueue($action)
     }
 }
 
+// ----------------------------------------------------------------------------------------
+// Writes a command to the server command socket, returns the last reply or null if the
+// server isn't listening
+function sendToCommandSocket($line, $waitForDone = false, $timeout = 5)
+{
+    global $logFolderPath;
+
+    $socketPath = $logFolderPath . 'command.sock';
+
+    if (!file_exists($socketPath)) {
+        return null;
+    }
+
+    $socket = @stream_socket_client('unix://' . $socketPath, $errno, $errstr, 1);
+
+    if ($socket === false) {
+        return null;
+    }
+
+    stream_set_timeout($socket, $timeout);
+    fwrite($socket, $line . "\n");
+
+    $reply = null;
+
+    // {"status": "queued"}, then {"status": "done"} once executed
+    while (($response = fgets($socket)) !== false) {
+        $decoded = json_decode($response, true);
+
+        if ($decoded === null) {
+            break;
+        }
+
+        $reply = $decoded;
+
+        if ($reply['status'] !== 'queued' || !$waitForDone) {
+            break;
+        }
+    }
+
+    fclose($socket);
+
+    return $reply;
+}
+
 
 
 // ----------------------------------------------------------------------------------------
@@ -46,6 +46,12 @@ if (isset($_GET['action'])) {
             // Call the get_unread_notifications function
             get_unread_notifications();
             break;
+        case 'get_notifications':
+            // Call the get_notifications function with optional offset and limit parameters
+            $offset = isset($_GET['offset']) ? intval($_GET['offset']) : 0;
+            $limit = isset($_GET['limit']) ? intval($_GET['limit']) : null;
+            get_notifications($offset, $limit);
+            break;
     }
 }
 
@@ -61,10 +67,120 @@ function generate_guid() {
         mt_rand(0, 65535), mt_rand(0, 65535));
   }
 
+// ----------------------------------------------------------------------------------------
+// Notifications store, shared with server/user_notifications.py
+//
+// user_notifications.jsonl : one JSON notification per line, oldest first
+// user_notifications.idx   : uint64 little endian byte offset of every line
+// user_notifications.lock  : flock() held while reading / writing the two files
+define('NOTIFICATION_LOG_FILE', '/app/front/api/user_notifications.jsonl');
+define('NOTIFICATION_INDEX_FILE', '/app/front/api/user_notifications.idx');
+define('NOTIFICATION_LOCK_FILE', '/app/front/api/user_notifications.lock');
+
+// ----------------------------------------------------------------------------------------
+// Runs $callback while holding the store lock
+function with_notifications_lock($callback, $exclusive = true) {
+
+    $lock = fopen(NOTIFICATION_LOCK_FILE, 'a');
+
+    if ($lock === false) {
+        echo "Failed to open notification lock file.";
+        return null;
+    }
+
+    flock($lock, $exclusive ? LOCK_EX : LOCK_SH);
+
+    try {
+        return $callback();
+    } finally {
+        flock($lock, LOCK_UN);
+        fclose($lock);
+    }
+}
+
+// ----------------------------------------------------------------------------------------
+// Number of notifications in the store, lock has to be held
+function count_notifications() {
+
+    clearstatcache(true, NOTIFICATION_INDEX_FILE);
+
+    return file_exists(NOTIFICATION_INDEX_FILE) ? intdiv(filesize(NOTIFICATION_INDEX_FILE), 8) : 0;
+}
+
+// ----------------------------------------------------------------------------------------
+// Returns the notifications $start..$stop-1 (oldest first), lock has to be held
+function read_notifications($start, $stop) {
+
+    if ($stop <= $start) {
+        return array();
+    }
+
+    $index = fopen(NOTIFICATION_INDEX_FILE, 'rb');
+    fseek($index, $start * 8);
+    $offsets = unpack('P*', fread($index, ($stop - $start) * 8));
+    fclose($index);
+
+    $notifications = array();
+    $log = fopen(NOTIFICATION_LOG_FILE, 'rb');
+
+    foreach ($offsets as $offset) {
+        fseek($log, $offset);
+        $notification = json_decode(fgets($log), true);
+
+        if ($notification !== null) {
+            $notifications[] = $notification;
+        }
+    }
+
+    fclose($log);
+
+    return $notifications;
+}
+
+// ----------------------------------------------------------------------------------------
+// Appends notifications to the log and their offsets to the index, lock has to be held
+function append_notifications($notifications) {
+
+    $log = fopen(NOTIFICATION_LOG_FILE, 'ab');
+    fseek($log, 0, SEEK_END);
+    $offset = ftell($log);
+    $offsets = '';
+
+    foreach ($notifications as $notification) {
+        $line = json_encode($notification) . "\n";
+        fwrite($log, $line);
+        $offsets .= pack('P', $offset);
+        $offset += strlen($line);
+    }
+
+    fclose($log);
+
+    // the index is written last, readers only see complete lines
+    file_put_contents(NOTIFICATION_INDEX_FILE, $offsets, FILE_APPEND);
+}
+
+// ----------------------------------------------------------------------------------------
+// Rewrites the store with the given notifications, lock has to be held
+function replace_notifications($notifications) {
+
+    // truncated and rewritten in place, the files keep their owner and mode
+    file_put_contents(NOTIFICATION_INDEX_FILE, '');
+    file_put_contents(NOTIFICATION_LOG_FILE, '');
+
+    append_notifications($notifications);
+}
+
+// ----------------------------------------------------------------------------------------
+// Rewrites the store with $change(notifications)
+function update_notifications($change) {
+    with_notifications_lock(function() use ($change) {
+        replace_notifications(array_values($change(read_notifications(0, count_notifications()))));
+    });
+}
+
 // ----------------------------------------------------------------------------------------
 // Logs a notification in in-app notification system
 function write_notification($content, $level = "interrupt") {
-    $NOTIFICATION_API_FILE = '/app/front/api/user_notifications.json';
 
     // Generate GUID
     $guid = generate_guid();
@@ -84,85 +200,54 @@ function write_notification($content, $level = "interrupt") {
         'content' => $escaped_content,
     );
 
-    // Read existing notifications
-    $notifications = json_decode(file_get_contents($NOTIFICATION_API_FILE), true);
-
-    // Add new notification
-    $notifications[] = $notification;
-
-    // Write notifications to file
-    file_put_contents($NOTIFICATION_API_FILE, json_encode($notifications));
+    // Append the notification, the backend compacts the store
+    with_notifications_lock(function() use ($notification) {
+        append_notifications(array($notification));
+    });
 }
 
 // ----------------------------------------------------------------------------------------
 // Removes a notification based on GUID
 function remove_notification($guid) {
-    $NOTIFICATION_API_FILE = '/app/front/api/user_notifications.json';
-
-    // Read existing notifications
-    $notifications = json_decode(file_get_contents($NOTIFICATION_API_FILE), true);
 
     // Filter out the notification with the specified GUID
-    $filtered_notifications = array_filter($notifications, function($notification) use ($guid) {
-        return $notification['guid'] !== $guid;
+    update_notifications(function($notifications) use ($guid) {
+        return array_filter($notifications, function($notification) use ($guid) {
+            return $notification['guid'] !== $guid;
+        });
     });
-
-    // Write filtered notifications back to file
-    file_put_contents($NOTIFICATION_API_FILE, json_encode(array_values($filtered_notifications)));
 }
 
 // ----------------------------------------------------------------------------------------
 // Deletes all notifications
 function notifications_clear() {
-    $NOTIFICATION_API_FILE = '/app/front/api/user_notifications.json';
 
-    // Clear notifications by writing an empty array to the file
-    file_put_contents($NOTIFICATION_API_FILE, json_encode(array()));
+    // Clear notifications by truncating the log and the index
+    with_notifications_lock(function() {
+        file_put_contents(NOTIFICATION_INDEX_FILE, '');
+        file_put_contents(NOTIFICATION_LOG_FILE, '');
+    });
 }
 
 // ----------------------------------------------------------------------------------------
 // Mark a notification read based on GUID
 function mark_notification_as_read($guid) {
-    $NOTIFICATION_API_FILE = '/app/front/api/user_notifications.json';
-    $max_attempts = 3;
-    $attempts = 0;
-
-    do {
-        // Check if the file exists and is readable
-        if (file_exists($NOTIFICATION_API_FILE) && is_readable($NOTIFICATION_API_FILE)) {
-            // Attempt to read existing notifications
-            $notifications = json_decode(file_get_contents($NOTIFICATION_API_FILE), true);
-
-            // Check if reading was successful
-            if ($notifications !== null) {
-                // Iterate over notifications to find the one with the specified GUID
-                foreach ($notifications as &$notification) {
-                    if ($notification['guid'] === $guid) {
-                        // Mark the notification as read
-                        $notification['read'] = 1;
-                        break;
-                    } elseif ($guid == null) // no guid given, mark all read
-                    {
-                        $notification['read'] = 1;
-                    }
-                }
-
-                // Write updated notifications back to file
-                file_put_contents($NOTIFICATION_API_FILE, json_encode($notifications));
-                return; // Exit the function after successful operation
+
+    update_notifications(function($notifications) use ($guid) {
+        // Iterate over notifications to find the one with the specified GUID
+        foreach ($notifications as &$notification) {
+            if ($notification['guid'] === $guid) {
+                // Mark the notification as read
+                $notification['read'] = 1;
+                break;
+            } elseif ($guid == null) // no guid given, mark all read
+            {
+                $notification['read'] = 1;
             }
         }
 
-        // Increment the attempt count
-        $attempts++;
-
-        // Sleep for a short duration before retrying
-        usleep(500000); // Sleep for 0.5 seconds (500,000 microseconds) before retrying
-
-    } while ($attempts < $max_attempts);
-
-    // If maximum attempts reached or file reading failed, handle the error
-    echo "Failed to read notification file after $max_attempts attempts.";
+        return $notifications;
+    });
 }
 
 // ----------------------------------------------------------------------------------------
@@ -172,27 +257,35 @@ function notifications_mark_all_read() {
 
 // ----------------------------------------------------------------------------------------
 function get_unread_notifications() {
-    $NOTIFICATION_API_FILE = '/app/front/api/user_notifications.json';
 
     // Read existing notifications
-    if (file_exists($NOTIFICATION_API_FILE) && is_readable($NOTIFICATION_API_FILE)) {
-        $notifications = json_decode(file_get_contents($NOTIFICATION_API_FILE), true);
-
-        if ($notifications !== null) {
-            // Filter unread notifications
-            $unread_notifications = array_filter($notifications, function($notification) {
-                return $notification['read'] === 0;
-            });
-
-            // Return unread notifications as JSON
-            header('Content-Type: application/json');
-            echo json_encode(array_values($unread_notifications));
-        } else {
-            echo json_encode([]);
-        }
-    } else {
-        echo json_encode([]);
-    }
+    $notifications = with_notifications_lock(function() {
+        return read_notifications(0, count_notifications());
+    }, false);
+
+    // Filter unread notifications
+    $unread_notifications = array_filter($notifications ?? array(), function($notification) {
+        return $notification['read'] === 0;
+    });
+
+    // Return unread notifications as JSON
+    header('Content-Type: application/json');
+    echo json_encode(array_values($unread_notifications));
+}
+
+// ----------------------------------------------------------------------------------------
+// Returns a page of notifications, newest first, skipping the $offset newest ones
+function get_notifications($offset = 0, $limit = null) {
+
+    $notifications = with_notifications_lock(function() use ($offset, $limit) {
+        $stop = max(0, count_notifications() - max(0, $offset));
+        $start = $limit === null ? 0 : max(0, $stop - $limit);
+
+        return read_notifications($start, $stop);
+    }, false);
+
+    header('Content-Type: application/json');
+    echo json_encode(array_reverse($notifications ?? array()));
 }
 
 
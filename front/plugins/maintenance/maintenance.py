@@ -9,7 +9,6 @@ import csv
 import sqlite3
 from io import StringIO
 from datetime import datetime
-from collections import deque
 
 # Register NetAlertX directories
 INSTALL_PATH="/app"
@@ -45,17 +44,13 @@ def main():
 
         logFile = logPath + "/app.log"
 
-        # Using a deque to efficiently keep the last N lines
-        lines_to_keep = deque(maxlen=MAINT_LOG_LENGTH)
+        # app.log is also rotated by size by the app (LOG_MAX_SIZE), only the
+        # tail is read here instead of the whole file
+        offset = find_tail_offset(logFile, MAINT_LOG_LENGTH)
 
-        with open(logFile, 'r') as file:
-            # Read lines from the file and store the last N lines
-            for line in file:
-                lines_to_keep.append(line)
-
-        with open(logFile, 'w') as file:
-            # Write the last N lines back to the file
-            file.writelines(lines_to_keep)
+        if offset > 0:
+            # trimmed in place, app.log keeps the owner and mode set up for the web server
+            trim_file_start(logFile, offset)
             
         mylog('verbose', [f'[{pluginName}] Cleanup finished'])      
 
@@ -63,6 +58,60 @@ def main():
 
     return 0
 
+#-------------------------------------------------------------------------------
+def trim_file_start(filePath, offset, blockSize = 65536):
+    """ Drops the first offset bytes of the file, moving the rest to the start of the same file """
+
+    with open(filePath, 'r+b') as file:
+        position = 0
+
+        # the copy stays behind the read position, lines appended meanwhile are moved as well
+        while True:
+            file.seek(offset + position)
+            block = file.read(blockSize)
+
+            if not block:
+                break
+
+            file.seek(position)
+            file.write(block)
+            position += len(block)
+
+        file.truncate(position)
+
+#-------------------------------------------------------------------------------
+def find_tail_offset(filePath, lineCount, blockSize = 65536):
+    """ Returns the offset where the last lineCount lines start, 0 if the file is shorter """
+
+    with open(filePath, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        position = file.tell()
+        newLines = 0
+
+        # a trailing new line ends the last line, it doesn't start a new one
+        if position > 0:
+            file.seek(position - 1)
+            if file.read(1) == b'\n':
+                position -= 1
+
+        while position > 0:
+            readSize = min(blockSize, position)
+            position -= readSize
+            file.seek(position)
+            block = file.read(readSize)
+
+            index = len(block)
+            while True:
+                index = block.rfind(b'\n', 0, index)
+                if index == -1:
+                    break
+
+                newLines += 1
+                if newLines == lineCount:
+                    return position + index + 1
+
+    return 0
+
 
 #===============================================================================
 # BEGIN
@@ -6,8 +6,10 @@ import argparse
 import sys
 import re
 import base64
+import math
 import subprocess
 from time import strftime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Register NetAlertX directories
 INSTALL_PATH="/app"
@@ -93,6 +95,7 @@ def performNmapScan(deviceIPs, deviceMACs, timeoutSec, args):
     """
     run nmap scan on a list of devices
     discovers open ports and keeps track existing and new open ports
+    devices are scanned concurrently, max NMAP_PARALLEL nmap processes at the same time
     """
 
     # collect ports / new Nmap Entries
@@ -102,75 +105,114 @@ def performNmapScan(deviceIPs, deviceMACs, timeoutSec, args):
     if len(deviceIPs) > 0:        
 
         devTotal = len(deviceIPs)
-        
+        parallel = get_parallel_scans(devTotal)
+
+        mylog('verbose', ['[NMAP Scan] Scan: Nmap for max ', str(timeoutSec), 's ('+ str(round(int(timeoutSec) / 60, 1)) +'min) per device, ', parallel, ' devices at a time'])  
+        mylog('verbose', ["[NMAP Scan] Estimated max delay: ", (math.ceil(devTotal / parallel) * int(timeoutSec)), 's ', '(', round((math.ceil(devTotal / parallel) * int(timeoutSec))/60,1) , 'min)' ])
+
+        devDone = 0
+
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+
+            futures = {executor.submit(scanDevice, ip, timeoutSec, args): devIndex for devIndex, ip in enumerate(deviceIPs)}
+
+            # results are handled in the main thread in the order the scans finish
+            for future in as_completed(futures):
+                devIndex = futures[future]
+                ip       = deviceIPs[devIndex]
+                devDone += 1
+
+                progress = ' (' + str(devDone) + '/' + str(devTotal) + ')'
+
+                output, error, timedOut = future.result()
+
+                if timedOut:
+                    mylog('verbose', ['[NMAP Scan] Nmap TIMEOUT - the process forcefully terminated as timeout reached for ', ip, progress]) 
+
+                if error != "":
+                    mylog('none', ["[NMAP Scan] " , error])
+                    mylog('none', ["[NMAP Scan] ⚠ ERROR - Nmap Scan - check logs", progress])
+
+                if output == "": # check if the subprocess failed                    
+                    mylog('minimal', ['[NMAP Scan] Nmap FAIL for ', ip, progress ,' check logs for details']) 
+                else: 
+                    mylog('verbose', ['[NMAP Scan] Nmap SUCCESS for ', ip, progress])
+
+                #  check the last run output        
+                newLines = output.split('\n')
+
+                # regular logging
+                for line in newLines:
+                    append_line_to_file (logPath + '/app_nmap.log', line +'\n')     
+
+                newEntries = parseNmapOutput(ip, deviceMACs[devIndex], newLines)
+                newEntriesTmp += newEntries
+
+                mylog('verbose', [f'[NMAP Scan] {len(newEntries)} ports found on {deviceMACs[devIndex]}'])
 
-        mylog('verbose', ['[NMAP Scan] Scan: Nmap for max ', str(timeoutSec), 's ('+ str(round(int(timeoutSec) / 60, 1)) +'min) per device'])  
-        mylog('verbose', ["[NMAP Scan] Estimated max delay: ", (devTotal * int(timeoutSec)), 's ', '(', round((devTotal * int(timeoutSec))/60,1) , 'min)' ])
-
-
-        devIndex = 0
-        for ip in deviceIPs:
-            # Execute command
-            output = ""
-            # prepare arguments from user supplied ones
-            nmapArgs = ['nmap'] + args.split() + [ip]
-
-            progress = ' (' + str(devIndex+1) + '/' + str(devTotal) + ')'
-
-            try:
-                # try runnning a subprocess with a forced (timeout)  in case the subprocess hangs
-                output = subprocess.check_output (nmapArgs, universal_newlines=True,  stderr=subprocess.STDOUT, timeout=(float(timeoutSec)))
-            except subprocess.CalledProcessError as e:
-                # An error occured, handle it
-                mylog('none', ["[NMAP Scan] " ,e.output])
-                mylog('none', ["[NMAP Scan] ⚠ ERROR - Nmap Scan - check logs", progress])            
-            except subprocess.TimeoutExpired as timeErr:
-                mylog('verbose', ['[NMAP Scan] Nmap TIMEOUT - the process forcefully terminated as timeout reached for ', ip, progress]) 
-
-            if output == "": # check if the subprocess failed                    
-                mylog('minimal', ['[NMAP Scan] Nmap FAIL for ', ip, progress ,' check logs for details']) 
-            else: 
-                mylog('verbose', ['[NMAP Scan] Nmap SUCCESS for ', ip, progress])
-
-            
-            
-            #  check the last run output        
-            newLines = output.split('\n')
-
-            # regular logging
-            for line in newLines:
-                append_line_to_file (logPath + '/app_nmap.log', line +'\n')     
-
-
-            index = 0
-            startCollecting = False
-            duration = "" 
-            newPortsPerDevice = 0
-            for line in newLines:            
-                if 'Starting Nmap' in line:
-                    if len(newLines) > index+1 and 'Note: Host seems down' in newLines[index+1]:
-                        break # this entry is empty
-                elif 'PORT' in line and 'STATE' in line and 'SERVICE' in line:
-                    startCollecting = True
-                elif 'PORT' in line and 'STATE' in line and 'SERVICE' in line:    
-                    startCollecting = False # end reached
-                elif startCollecting and len(line.split()) == 3:                                    
-                    newEntriesTmp.append(nmap_entry(ip, deviceMACs[devIndex], timeNowTZ(), line.split()[0], line.split()[1], line.split()[2]))
-                    newPortsPerDevice += 1
-                elif 'Nmap done' in line:
-                    duration = line.split('scanned in ')[1]            
-            
-            mylog('verbose', [f'[NMAP Scan] {newPortsPerDevice} ports found on {deviceMACs[devIndex]}'])
-
-            index += 1
-            devIndex += 1
-
-            
-            
         #end for loop       
 
         return newEntriesTmp
 
+#-------------------------------------------------------------------------------
+def get_parallel_scans(devTotal):
+    """ Number of concurrent nmap processes, from the NMAP_PARALLEL setting """
+
+    try:
+        parallel = int(get_setting_value('NMAP_PARALLEL'))
+    except (TypeError, ValueError):
+        parallel = 8
+
+    return max(1, min(parallel, devTotal))
+
+#-------------------------------------------------------------------------------
+def scanDevice(ip, timeoutSec, args):
+    """ Runs nmap for a single device, executed in a worker thread. Returns (output, error, timedOut) """
+
+    output   = ""
+    error    = ""
+    timedOut = False
+
+    # prepare arguments from user supplied ones
+    nmapArgs = ['nmap'] + args.split() + [ip]
+
+    try:
+        # try runnning a subprocess with a forced (timeout)  in case the subprocess hangs
+        output = subprocess.check_output (nmapArgs, universal_newlines=True,  stderr=subprocess.STDOUT, timeout=(float(timeoutSec)))
+    except subprocess.CalledProcessError as e:
+        # An error occured, handle it
+        error = e.output
+    except subprocess.TimeoutExpired as timeErr:
+        timedOut = True
+
+    return output, error, timedOut
+
+#-------------------------------------------------------------------------------
+def parseNmapOutput(ip, mac, newLines):
+    """ Returns the nmap_entry list of the ports found in the nmap output of a single device """
+
+    entries = []
+
+    index = 0
+    startCollecting = False
+    duration = "" 
+    for line in newLines:            
+        if 'Starting Nmap' in line:
+            if len(newLines) > index+1 and 'Note: Host seems down' in newLines[index+1]:
+                break # this entry is empty
+        elif 'PORT' in line and 'STATE' in line and 'SERVICE' in line:
+            startCollecting = True
+        elif 'PORT' in line and 'STATE' in line and 'SERVICE' in line:    
+            startCollecting = False # end reached
+        elif startCollecting and len(line.split()) == 3:                                    
+            entries.append(nmap_entry(ip, mac, timeNowTZ(), line.split()[0], line.split()[1], line.split()[2]))
+        elif 'Nmap done' in line:
+            duration = line.split('scanned in ')[1]            
+
+        index += 1
+
+    return entries
+
 #===============================================================================
 # BEGIN
 #===============================================================================
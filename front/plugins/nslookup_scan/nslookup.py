@@ -24,6 +24,7 @@ from helper import timeNowTZ, get_setting_value
 from const import logPath, applicationPath, fullDbPath
 from database import DB
 from device import Device_obj
+from dns_resolver import resolve_ptr_batch
 import conf
 from pytz import timezone
 
@@ -41,7 +42,7 @@ def main():
     mylog('verbose', [f'[{pluginName}] In script'])     
 
 
-    timeout = get_setting_value('NSLOOKUP_RUN_TIMEOUT')
+    timeout = int(get_setting_value('NSLOOKUP_RUN_TIMEOUT'))
 
     # Create a database connection
     db = DB()  # instance of class DB
@@ -58,10 +59,15 @@ def main():
 
     mylog('verbose', [f'[{pluginName}] Unknown devices count: {len(unknown_devices)}'])   
 
+    # Resolve all unknown devices concurrently
+    results = resolve_ptr_batch([device['dev_LastIP'] for device in unknown_devices], timeout = timeout)
+
     for device in unknown_devices:
-        domain_name, dns_server = execute_nslookup(device['dev_LastIP'], timeout)
+        domain_name, dns_server = results[device['dev_LastIP']]
 
         if domain_name != '':
+            mylog('verbose', [f'[{pluginName}] Domain Name: {domain_name}, DNS Server: {dns_server}'])
+
             plugin_objects.add_object(
             # "MAC", "IP", "Server", "Name"
             primaryId   = device['dev_MAC'],
@@ -80,69 +86,6 @@ def main():
     
     return 0
 
-#===============================================================================
-# Execute scan
-#===============================================================================
-def execute_nslookup (ip, timeout):
-    """
-    Execute the NSLOOKUP command on IP.
-    """
-    
-    nslookup_args = ['nslookup', ip]
-
-    # Execute command
-    output = ""
-
-    try:
-        # try runnning a subprocess with a forced (timeout)  in case the subprocess hangs
-        output = subprocess.check_output (nslookup_args, universal_newlines=True,  stderr=subprocess.STDOUT, timeout=(timeout), text=True)
-
-        domain_name = ''
-        dns_server = ''
-
-        # mylog('verbose', [f'[{pluginName}] DEBUG OUTPUT : {output}'])
-
-        # Parse output using case-insensitive regular expressions
-        domain_pattern = re.compile(r'name\s*=\s*([^\s]+)', re.IGNORECASE)
-        server_pattern = re.compile(r'Server:\s+(.+)', re.IGNORECASE)
-
-
-        domain_match = domain_pattern.search(output)        
-        server_match = server_pattern.search(output)
-
-        if domain_match:
-            domain_name = domain_match.group(1)
-            mylog('verbose', [f'[{pluginName}] Domain Name: {domain_name}'])
-
-        if server_match:
-            dns_server = server_match.group(1)
-            mylog('verbose', [f'[{pluginName}] DNS Server: {dns_server}'])
-
-        return domain_name, dns_server
-
-    except subprocess.CalledProcessError as e:
-        # An error occurred, handle it
-        if "NXDOMAIN" in e.output:
-            mylog('verbose', [f'[{pluginName}]', f"No PTR record found for IP: {ip}"])
-        else:
-            mylog('verbose', [f'[{pluginName}]', e.output])
-            # Handle other errors here
-        # mylog('verbose', [f'[{pluginName}] ⚠ ERROR - check logs'])            
-        
-    except subprocess.TimeoutExpired as timeErr:
-        mylog('verbose', [f'[{pluginName}] TIMEOUT - the process forcefully terminated as timeout reached']) 
-
-    if output == "": # check if the subprocess failed      
-        tmp = 1   # can't have empty            
-        # mylog('verbose', [f'[{pluginName}] Scan: FAIL - check logs']) 
-    else: 
-        mylog('verbose', [f'[{pluginName}] Scan: SUCCESS'])
-
-    return '', ''   
-          
-    
-    
-
 #===============================================================================
 # BEGIN
 #===============================================================================
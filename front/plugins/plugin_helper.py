@@ -1,7 +1,9 @@
 from time import strftime
 import pytz
+import os
 import sys
 import re
+import json
 import base64
 from datetime import datetime
 
@@ -11,7 +13,7 @@ sys.path.append(f"{INSTALL_PATH}/front/plugins")
 sys.path.append(f'{INSTALL_PATH}/server') 
 
 from logger import mylog
-from const import confFileName
+from const import confFileName, pluginResultFormat, pluginResultVersion
 
 #-------------------------------------------------------------------------------
 def read_config_file():
@@ -193,6 +195,46 @@ class Plugin_Object:
         )
         return line
 
+    def write_tsv(self):
+        """ 
+        Write the object details as tab separated values, tabs, new lines
+        and backslashes are escaped so values can contain any character.
+        """
+        values = [
+            self.primaryId,
+            self.secondaryId,
+            self.created,
+            self.watched1,
+            self.watched2,
+            self.watched3,
+            self.watched4,
+            self.extra,
+            self.foreignKey,
+            self.helpVal1,
+            self.helpVal2,
+            self.helpVal3,
+            self.helpVal4
+        ]
+        return "\t".join(escape_result_value(value) for value in values) + "\n"
+
+# -------------------------------------------------------------------
+# Value of a tab separated result file, None is written as null like in the pipe format
+def escape_result_value(value):
+    if value is None:
+        return "null"
+
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+# -------------------------------------------------------------------
+# Result file format of the plugin writing result_file, "pipe" (default) or 
+# "tsv" from the "result_format" property in the plugin's config.json
+def get_result_format(result_file):
+    try:
+        with open(os.path.join(os.path.dirname(result_file), 'config.json'), 'r') as file:
+            return json.load(file).get('result_format', 'pipe')
+    except (OSError, ValueError):
+        return 'pipe'
+
 class Plugin_Objects:
     """
     Plugin_Objects is the class that manages and holds all the objects created by the plugin.
@@ -200,8 +242,9 @@ class Plugin_Objects:
     And can write the required result file.
     """
 
-    def __init__(self, result_file):
+    def __init__(self, result_file, result_format=None):
         self.result_file = result_file
+        self.result_format = result_format or get_result_format(result_file)
         self.objects = []
 
     def add_object(
@@ -238,14 +281,21 @@ class Plugin_Objects:
 
     def write_result_file(self):
         with open(self.result_file, mode="w") as fp:
-            for obj in self.objects:
-                fp.write(obj.write())
+            if self.result_format == 'tsv':
+                # versioned header, the server reads files without it as pipe separated
+                fp.write(json.dumps({"format": pluginResultFormat, "version": pluginResultVersion}) + "\n")
+
+                for obj in self.objects:
+                    fp.write(obj.write_tsv())
+            else:
+                for obj in self.objects:
+                    fp.write(obj.write())
 
     def __add__(self, other):
         if isinstance(other, Plugin_Objects):
             new_objects = self.objects + other.objects
             new_result_file = self.result_file  # You might want to adjust this
-            new_instance = Plugin_Objects(new_result_file)
+            new_instance = Plugin_Objects(new_result_file, self.result_format)
             new_instance.objects = new_objects
             return new_instance
         else:
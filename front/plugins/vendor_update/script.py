@@ -19,7 +19,7 @@ from plugin_helper import Plugin_Object, Plugin_Objects, decodeBase64, handleEmp
 from logger import mylog, append_line_to_file
 from helper import timeNowTZ, get_setting_value 
 from const import logPath, applicationPath, fullDbPath
-from device import query_MAC_vendor
+from device import query_MAC_vendors
 import conf
 from pytz import timezone
 
@@ -100,10 +100,12 @@ def update_vendors (dbPath, plugin_objects):
     # Close the database connection
     conn.close()  
 
+    # Search vendors in HW Vendors DB in one batch
+    vendors = query_MAC_vendors ([device[0] for device in devices])
+
     # All devices loop
     for device in devices:
-        # Search vendor in HW Vendors DB
-        vendor = query_MAC_vendor (device[0])
+        vendor = vendors[device[0]]
         if vendor == -1 :
             notFound += 1
         elif vendor == -2 :
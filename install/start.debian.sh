@@ -100,7 +100,7 @@ fi
 
 # Create the execution_queue.log file if it doesn't exist
 touch "${INSTALL_DIR}"/front/log/{app.log,execution_queue.log,app_front.log,app.php_errors.log,stderr.log,stdout.log,db_is_locked.log}
-touch "${INSTALL_DIR}"/api/{user_notifications.json}
+touch "${INSTALL_DIR}"/api/user_notifications.{jsonl,idx,lock}
 
 
 # Fixing file permissions
@@ -31,8 +31,13 @@ from initialise import importConfigs
 from database import DB
 from reporting import get_notifications
 from notification import Notification_obj
-from plugin import run_plugin_scripts, check_and_run_user_event 
+from user_notifications import compact_notifications
+from appevent import flush_app_events
+from plugin import run_plugin_scripts, check_and_run_user_event, get_plugin_workers_metrics
 from device import update_devices_names
+from watcher import file_watcher_class
+from command_socket import command_socket_class
+from plugin_process import reap_orphan_plugin_processes
 
 
 #===============================================================================
@@ -66,6 +71,9 @@ def main ():
     # check file permissions and fix if required
     filePermissions()
 
+    # kill plugin runs (and the tools they started) left behind if the server was killed
+    reap_orphan_plugin_processes()
+
     # Open DB once and keep open
     # Opening / closing DB frequently actually casues more issues
     db = DB()  # instance of class DB
@@ -75,6 +83,9 @@ def main ():
     # Upgrade DB if needed
     db.upgradeDB()
 
+    # Move the old user_notifications.json into the append-only store and enforce the retention cap
+    compact_notifications()
+
     #===============================================================================
     # This is the main loop of NetAlertX 
     #===============================================================================
@@ -86,10 +97,19 @@ def main ():
 
     all_plugins = None
 
+    # Wake up on config changes, UI actions (execution queue) and DB changes made by the UI or plugins
+    watcher = file_watcher_class([fullConfPath, executionQueuePath, fullDbPath, fullDbPath + '-wal'])
+
+    # Commands sent by the front end, dispatched as soon as the loop is idle
+    commandSocket = command_socket_class(commandSocketPath)
+    watcher.add_reader(commandSocket.fileno(), commandSocketPath)
+    changedFiles = None  # first loop, check everything
+
     while True:
 
         # re-load user configuration and plugins   
-        all_plugins = importConfigs(db, all_plugins)
+        if changedFiles is None or fullConfPath in changedFiles or all_plugins is None:
+            all_plugins = importConfigs(db, all_plugins)
 
         # update time started
         conf.loop_start_time = timeNowTZ()       
@@ -102,16 +122,19 @@ def main ():
             conf.plugins_once_run = True
 
         # check if there is a front end initiated event which needs to be executed
-        pluginsState = check_and_run_user_event(db, all_plugins, pluginsState)
+        if changedFiles is None or executionQueuePath in changedFiles or commandSocketPath in changedFiles:
+            pluginsState = check_and_run_user_event(db, all_plugins, pluginsState, commandSocket)
+
+        # AppEvents of changes made by the UI or plugins since the last loop
+        flush_app_events(db)
 
-        # Update API endpoints              
+        # Update API endpoints, only re-exported if the DB changed
         update_api(db, all_plugins)
         
-        # proceed if 1 minute passed
-        if conf.last_scan_run + datetime.timedelta(minutes=1) < conf.loop_start_time :
+        # proceed if 1 minute passed or a scheduled plugin is due
+        minutePassed = conf.last_scan_run + datetime.timedelta(minutes=1) < conf.loop_start_time
 
-             # last time any scan or maintenance/upkeep was run
-            conf.last_scan_run = loop_start_time            
+        if minutePassed or conf.scheduler.seconds_until_next(loop_start_time) == 0:
 
             # Header
             updateState("Process: Start")      
@@ -123,76 +146,90 @@ def main ():
             # Check if any plugins need to run on schedule
             pluginsState = run_plugin_scripts(db, all_plugins, 'schedule', pluginsState) 
 
-            # determine run/scan type based on passed time
-            # --------------------------------------------
+            # woken up by a due schedule only, the rest runs once a minute or if the scheduled plugins found devices
+            if minutePassed or pluginsState.processScan == True:
+
+                # last time any scan or maintenance/upkeep was run
+                conf.last_scan_run = loop_start_time            
+
+                # determine run/scan type based on passed time
+                # --------------------------------------------
            
-            # Runs plugin scripts which are set to run every timne after a scans finished            
-            pluginsState = run_plugin_scripts(db, all_plugins, 'always_after_scan', pluginsState)
+                # Runs plugin scripts which are set to run every timne after a scans finished            
+                pluginsState = run_plugin_scripts(db, all_plugins, 'always_after_scan', pluginsState)
 
             
-            # process all the scanned data into new devices
-            mylog('debug', [f'[MAIN] processScan: {pluginsState.processScan}'])
+                # process all the scanned data into new devices
+                mylog('debug', [f'[MAIN] processScan: {pluginsState.processScan}'])
             
-            if pluginsState.processScan == True:   
-                mylog('debug', "[MAIN] start processig scan results")  
-                pluginsState.processScan = False
-                process_scan(db)
+                if pluginsState.processScan == True:   
+                    mylog('debug', "[MAIN] start processig scan results")  
+                    pluginsState.processScan = False
+                    process_scan(db)
                           
-            # --------
-            # Reporting   
-            # run plugins before notification processing (e.g. Plugins to discover device names)
-            pluginsState = run_plugin_scripts(db, all_plugins, 'before_name_updates', pluginsState)
-
-            # Resolve devices names
-            mylog('debug','[Main] Resolve devices names')
-            update_devices_names(db)             
+                # --------
+                # Reporting   
+                # run plugins before notification processing (e.g. Plugins to discover device names)
+                pluginsState = run_plugin_scripts(db, all_plugins, 'before_name_updates', pluginsState)
+
+                # Resolve devices names
+                mylog('debug','[Main] Resolve devices names')
+                update_devices_names(db)             
             
-            # Check if new devices found
-            sql.execute (sql_new_devices)
-            newDevices = sql.fetchall()
-            db.commitDB()
+                # Check if new devices found
+                sql.execute (sql_new_devices)
+                newDevices = sql.fetchall()
+                db.commitDB()
             
-            #  new devices were found
-            if len(newDevices) > 0:
-                #  run all plugins registered to be run when new devices are found                    
-                pluginsState = run_plugin_scripts(db, all_plugins, 'on_new_device', pluginsState)                
+                #  new devices were found
+                if len(newDevices) > 0:
+                    #  run all plugins registered to be run when new devices are found                    
+                    pluginsState = run_plugin_scripts(db, all_plugins, 'on_new_device', pluginsState)                
 
-            # Notification handling
-            # ----------------------------------------
+                # Notification handling
+                # ----------------------------------------
 
-            # send all configured notifications
-            final_json = get_notifications(db)
+                # send all configured notifications
+                final_json = get_notifications(db)
 
-            # Write the notifications into the DB
-            notification    = Notification_obj(db)
-            notificationObj = notification.create(final_json, "")
+                # Write the notifications into the DB
+                notification    = Notification_obj(db)
+                notificationObj = notification.create(final_json, "")
 
-            # run all enabled publisher gateways 
-            if notificationObj.HasNotifications:                
+                # run all enabled publisher gateways 
+                if notificationObj.HasNotifications:                
                 
-                pluginsState = run_plugin_scripts(db, all_plugins, 'on_notification', pluginsState) 
-                notification.setAllProcessed()
-                notification.clearPendingEmailFlag()
+                    pluginsState = run_plugin_scripts(db, all_plugins, 'on_notification', pluginsState) 
+                    notification.setAllProcessed()
+                    notification.clearPendingEmailFlag()
                 
 
                 
-            else:
-                mylog('verbose', ['[Notification] No changes to report'])
+                else:
+                    mylog('verbose', ['[Notification] No changes to report'])
 
-            # Commit SQL
-            db.commitDB()          
+                # Commit SQL
+                db.commitDB()          
             
+            # Scheduler and plugin worker metrics, built only at the verbose level
+            mylog('verbose', lambda: [f'[MAIN] Scheduler metrics: {conf.scheduler.get_metrics()}'])
+            mylog('verbose', lambda: [f'[MAIN] Plugin worker metrics: {get_plugin_workers_metrics()}'])
+
             # Footer
             updateState("Process: Wait")
             mylog('verbose', ['[MAIN] Process: Wait'])            
-        else:
-            # do something  
-            # mylog('verbose', ['[MAIN] Waiting to start next loop'])
-            dummyVariable = 1          
-            
 
-        #loop     
-        time.sleep(5) # wait for N seconds      
+        #loop, sleep until the next scan or scheduled plugin is due or a watched file changes
+        nextScan = conf.last_scan_run + datetime.timedelta(minutes=1)
+        timeout  = (nextScan - timeNowTZ()).total_seconds() + 1
+
+        # +1s as the loop start time is truncated to seconds
+        nextScheduled = conf.scheduler.seconds_until_next()
+        if nextScheduled is not None:
+            timeout = min(timeout, nextScheduled + 1)
+
+        mylog('debug', [f'[MAIN] Waiting up to {max(0, timeout):.0f}s for changes, next scheduled run: {conf.scheduler.next_due_time()}'])
+        changedFiles = watcher.wait(timeout)
 
 
 
@@ -1,4 +1,5 @@
 import json
+import os
 
 
 # Register NetAlertX modules 
@@ -7,7 +8,10 @@ from const import (apiPath, sql_appevents, sql_devices_all, sql_events_pending_a
 from logger import mylog
 from helper import write_file
 
-apiEndpoints = []
+apiEndpoints = {}
+
+# hash of the last written plugins.json
+pluginsHash = None
 
 #===============================================================================
 # API
@@ -16,10 +20,17 @@ def update_api(db, all_plugins, isNotification = False, updateOnlyDataSources =
     mylog('debug', ['[API] Update API starting'])
     # return
 
+    global pluginsHash
+
     folder = apiPath 
 
-    # Save plugins    
-    write_file(folder + 'plugins.json'  , json.dumps({"data" : all_plugins}))  
+    # Save plugins if they changed since the last write
+    pluginsJson = json.dumps({"data" : all_plugins})
+    newHash = hash(pluginsJson)
+
+    if newHash != pluginsHash or not os.path.exists(folder + 'plugins.json'):
+        write_file(folder + 'plugins.json', pluginsJson)
+        pluginsHash = newHash
 
     #  prepare database tables we want to expose 
     dataSourcesSQLs = [
@@ -36,12 +47,23 @@ def update_api(db, all_plugins, isNotification = False, updateOnlyDataSources =
         ["custom_endpoint", conf.API_CUSTOM_SQL],
     ]
 
+    # Only re-query endpoints if the database changed since they were exported
+    dataVersion = db.get_data_version()
+
     # Save selected database tables
     for dsSQL in dataSourcesSQLs:
 
         if updateOnlyDataSources == [] or dsSQL[0] in updateOnlyDataSources:
 
-            api_endpoint_class(db, dsSQL[1], folder + 'table_' + dsSQL[0] + '.json')
+            path = folder + 'table_' + dsSQL[0] + '.json'
+
+            endpoint = apiEndpoints.get(path)
+
+            if endpoint is None:
+                endpoint = api_endpoint_class(db, dsSQL[1], path)
+                apiEndpoints[path] = endpoint
+
+            endpoint.update(dsSQL[1], dataVersion)
 
 
 #-------------------------------------------------------------------------------
@@ -50,44 +72,40 @@ def update_api(db, all_plugins, isNotification = False, updateOnlyDataSources =
 class api_endpoint_class:
     def __init__(self, db, query, path):        
 
-        global apiEndpoints
         self.db = db
         self.query = query
-        self.jsonData = db.get_table_as_json(self.query).json
         self.path = path
         self.fileName = path.split('/')[-1]
-        self.hash = hash(json.dumps(self.jsonData))
-
-        # check if the endpoint needs to be updated
-        found = False
-        changed = False
-        changedIndex = -1
-        index = 0
-        
-        # search previous endpoint states to check if API needs updating
-        for endpoint in apiEndpoints:
-            # match sql and API endpoint path 
-            if endpoint.query == self.query and endpoint.path == self.path:
-                found = True 
-                if endpoint.hash != self.hash:                    
-                    changed = True
-                    changedIndex = index
-
-            index = index + 1
-        
+        self.hash = None
+        self.dataVersion = None
+
+    #-------------------------------------------------------------------------------
+    def is_dirty(self, query, dataVersion):
+        # unknown database state, the query changed (custom endpoint) or the file was removed
+        if dataVersion is None or query != self.query or not os.path.exists(self.path):
+            return True
+
+        return dataVersion != self.dataVersion
+
+    #-------------------------------------------------------------------------------
+    def update(self, query, dataVersion):
+
+        if not self.is_dirty(query, dataVersion):
+            return
+
+        self.query = query
+        self.dataVersion = dataVersion
+
+        # serialize once, the same string is hashed and written
+        jsonString = json.dumps(self.db.get_table_as_json(self.query).json)
+        newHash = hash(jsonString)
+
         # check if API endpoints have changed or if it's a new one
-        if not found or changed:
+        if newHash != self.hash or not os.path.exists(self.path):
 
             mylog('verbose', [f'[API] Updating {self.fileName} file in /front/api'])
 
-            write_file(self.path, json.dumps(self.jsonData)) 
-            
-            if not found:
-                apiEndpoints.append(self)
-
-            elif changed and changedIndex != -1 and changedIndex < len(apiEndpoints):
-                # update hash
-                apiEndpoints[changedIndex].hash = self.hash
-            else:
-                mylog('minimal', [f'[API] ⚠ ERROR Updating {self.fileName}'])
-            
+            write_file(self.path, jsonString)
+
+            self.hash = newHash
+
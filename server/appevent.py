@@ -18,16 +18,6 @@ class AppEvent_obj:
         # drop table 
         self.db.sql.execute("""DROP TABLE IF EXISTS "AppEvents" """)
 
-        # Drop all triggers
-        self.db.sql.execute('DROP TRIGGER IF EXISTS trg_create_device;')
-        self.db.sql.execute('DROP TRIGGER IF EXISTS trg_read_device;')
-        self.db.sql.execute('DROP TRIGGER IF EXISTS trg_update_device;')
-        self.db.sql.execute('DROP TRIGGER IF EXISTS trg_delete_device;')
-
-        self.db.sql.execute('DROP TRIGGER IF EXISTS trg_delete_plugin_object;')
-        self.db.sql.execute('DROP TRIGGER IF EXISTS trg_create_plugin_object;')
-        self.db.sql.execute('DROP TRIGGER IF EXISTS trg_update_plugin_object;')
-
         # Create AppEvent table if missing
         self.db.sql.execute("""CREATE TABLE IF NOT EXISTS "AppEvents" (
             "Index"                 INTEGER,
@@ -53,186 +43,8 @@ class AppEvent_obj:
         );
         """)
 
-        # -------------
-        # Device events
-
-        sql_devices_mappedColumns = '''
-                    "GUID",
-                    "DateTimeCreated",
-                    "ObjectType",
-                    "ObjectPrimaryID",
-                    "ObjectSecondaryID",
-                    "ObjectStatus",
-                    "ObjectStatusColumn",
-                    "ObjectIsNew",
-                    "ObjectIsArchived",
-                    "ObjectForeignKey",
-                    "AppEventType"
-        '''
-
-        # Trigger for create event
-        self.db.sql.execute(f'''
-            CREATE TRIGGER IF NOT EXISTS "trg_create_device"
-            AFTER INSERT ON "Devices"
-            BEGIN
-                INSERT INTO "AppEvents" (
-                    {sql_devices_mappedColumns}
-                )
-                VALUES (                    
-                    {sql_generateGuid},
-                    DATETIME('now'),
-                    'Devices',
-                    NEW.dev_MAC,
-                    NEW.dev_LastIP,
-                    CASE WHEN NEW.dev_PresentLastScan = 1 THEN 'online' ELSE 'offline' END,
-                    'dev_PresentLastScan',
-                    NEW.dev_NewDevice,
-                    NEW.dev_Archived,
-                    NEW.dev_MAC,
-                    'create'
-                );
-            END;
-        ''')
-
-        # 🔴 This would generate too many events, disabled for now
-        # # Trigger for read event
-        # self.db.sql.execute('''
-        #     TODO
-        # ''')
-
-        # Trigger for update event
-        self.db.sql.execute(f'''
-            CREATE TRIGGER IF NOT EXISTS "trg_update_device"
-            AFTER UPDATE ON "Devices"
-            BEGIN
-                INSERT INTO "AppEvents" (
-                    {sql_devices_mappedColumns}
-                )
-                VALUES (                    
-                    {sql_generateGuid},
-                    DATETIME('now'),
-                    'Devices',
-                    NEW.dev_MAC,
-                    NEW.dev_LastIP,
-                    CASE WHEN NEW.dev_PresentLastScan = 1 THEN 'online' ELSE 'offline' END,
-                    'dev_PresentLastScan',
-                    NEW.dev_NewDevice,
-                    NEW.dev_Archived,
-                    NEW.dev_MAC,
-                    'update'
-                );
-            END;
-        ''')
-
-        # Trigger for delete event
-        self.db.sql.execute(f'''
-            CREATE TRIGGER IF NOT EXISTS "trg_delete_device"
-            AFTER DELETE ON "Devices"
-            BEGIN
-                INSERT INTO "AppEvents" (
-                    {sql_devices_mappedColumns}
-                )
-                VALUES (                    
-                    {sql_generateGuid},
-                    DATETIME('now'),
-                    'Devices',
-                    OLD.dev_MAC,
-                    OLD.dev_LastIP,
-                    CASE WHEN OLD.dev_PresentLastScan = 1 THEN 'online' ELSE 'offline' END,
-                    'dev_PresentLastScan',
-                    OLD.dev_NewDevice,
-                    OLD.dev_Archived,
-                    OLD.dev_MAC,
-                    'delete'
-                );
-            END;
-        ''')
-
-
-        # -------------
-        # Plugins_Objects events
-
-        sql_plugins_objects_mappedColumns = '''
-                    "GUID",
-                    "DateTimeCreated",
-                    "ObjectType",                    
-                    "ObjectPlugin",
-                    "ObjectPrimaryID",
-                    "ObjectSecondaryID",
-                    "ObjectForeignKey",
-                    "ObjectStatusColumn",
-                    "ObjectStatus",
-                    "AppEventType"
-        '''
-
-        # Create trigger for update event on Plugins_Objects
-        self.db.sql.execute(f'''
-            CREATE TRIGGER IF NOT EXISTS trg_update_plugin_object
-            AFTER UPDATE ON Plugins_Objects
-            BEGIN
-                INSERT INTO AppEvents (
-                   {sql_plugins_objects_mappedColumns}
-                )
-                VALUES (
-                    {sql_generateGuid},
-                    DATETIME('now'),
-                    'Plugins_Objects',                    
-                    NEW.Plugin,
-                    NEW.Object_PrimaryID,
-                    NEW.Object_SecondaryID,
-                    NEW.ForeignKey,
-                    'Status',
-                    NEW.Status,
-                    'update'
-                );
-            END;
-        ''')
-
-        # Create trigger for CREATE event on Plugins_Objects
-        self.db.sql.execute(f'''
-            CREATE TRIGGER IF NOT EXISTS trg_create_plugin_object
-            AFTER INSERT ON Plugins_Objects
-            BEGIN
-                INSERT INTO AppEvents (
-                {sql_plugins_objects_mappedColumns}
-                )
-                VALUES (
-                    {sql_generateGuid},
-                    DATETIME('now'),
-                    'Plugins_Objects',
-                    NEW.Plugin,
-                    NEW.Object_PrimaryID,
-                    NEW.Object_SecondaryID,
-                    NEW.ForeignKey,
-                    'Status',
-                    NEW.Status,
-                    'create'
-                );
-            END;
-        ''')
-
-        # Create trigger for DELETE event on Plugins_Objects
-        self.db.sql.execute(f'''
-            CREATE TRIGGER IF NOT EXISTS trg_delete_plugin_object
-            AFTER DELETE ON Plugins_Objects
-            BEGIN
-                INSERT INTO AppEvents (
-                {sql_plugins_objects_mappedColumns}
-                )
-                VALUES (
-                    {sql_generateGuid},
-                    DATETIME('now'),
-                    'Plugins_Objects',
-                    OLD.Plugin,
-                    OLD.Object_PrimaryID,
-                    OLD.Object_SecondaryID,
-                    OLD.ForeignKey,
-                    'Status',
-                    OLD.Status,
-                    'delete'
-                );
-            END;
-        ''')
+        # Triggers collecting the Devices and Plugins_Objects changes
+        create_app_events_triggers(self.db)
 
         self.save()
 
@@ -319,6 +131,274 @@ class AppEvent_obj:
         self.db.commitDB()
 
 
+#-------------------------------------------------------------------------------
+# AppEvents triggers
+#-------------------------------------------------------------------------------
+#
+# Updates only emit an event if one of the columns shown in the event changed,
+# e.g. the scan refreshing dev_LastConnection of every device doesn't. Skipped
+# updates of the scan merge and the plugin objects are counted in
+# AppEvents_Stats.Suppressed once per statement (count_suppressed_app_events),
+# not by a trigger, so an unchanged row costs no write.
+#
+# Events don't go to AppEvents directly, they are collected in AppEvents_Pending,
+# one row per object (ObjectKey). Further changes of the same object update that row
+# (AppEvents_Stats.Coalesced) until flush_app_events moves them to AppEvents at the
+# end of a scan / loop.
+
+# tracked columns, the ones copied into the event
+sql_devices_changed = """
+    OLD.dev_MAC IS NOT NEW.dev_MAC
+    OR OLD.dev_LastIP IS NOT NEW.dev_LastIP
+    OR OLD.dev_PresentLastScan IS NOT NEW.dev_PresentLastScan
+    OR OLD.dev_NewDevice IS NOT NEW.dev_NewDevice
+    OR OLD.dev_Archived IS NOT NEW.dev_Archived
+"""
+
+sql_plugins_objects_changed = """
+    OLD.Plugin IS NOT NEW.Plugin
+    OR OLD.Object_PrimaryID IS NOT NEW.Object_PrimaryID
+    OR OLD.Object_SecondaryID IS NOT NEW.Object_SecondaryID
+    OR OLD.ForeignKey IS NOT NEW.ForeignKey
+    OR OLD.Status IS NOT NEW.Status
+"""
+
+#-------------------------------------------------------------------------------
+def sql_pending_app_event(objectType, values, appEventType):
+    """ Upserts the event into AppEvents_Pending. A create followed by updates stays a
+        create, anything followed by a delete is a delete, a delete followed by a create
+        is an update """
+
+    return f"""
+        INSERT INTO AppEvents_Pending (
+            "ObjectKey",
+            "DateTimeCreated",
+            "ObjectType",
+            "ObjectPlugin",
+            "ObjectPrimaryID",
+            "ObjectSecondaryID",
+            "ObjectForeignKey",
+            "ObjectStatusColumn",
+            "ObjectStatus",
+            "ObjectIsNew",
+            "ObjectIsArchived",
+            "AppEventType"
+        )
+        VALUES (
+            {values['ObjectKey']},
+            DATETIME('now'),
+            '{objectType}',
+            {values['ObjectPlugin']},
+            {values['ObjectPrimaryID']},
+            {values['ObjectSecondaryID']},
+            {values['ObjectForeignKey']},
+            {values['ObjectStatusColumn']},
+            {values['ObjectStatus']},
+            {values['ObjectIsNew']},
+            {values['ObjectIsArchived']},
+            '{appEventType}'
+        )
+        ON CONFLICT("ObjectKey") DO UPDATE SET
+            "ObjectPlugin"       = excluded."ObjectPlugin",
+            "ObjectPrimaryID"    = excluded."ObjectPrimaryID",
+            "ObjectSecondaryID"  = excluded."ObjectSecondaryID",
+            "ObjectForeignKey"   = excluded."ObjectForeignKey",
+            "ObjectStatusColumn" = excluded."ObjectStatusColumn",
+            "ObjectStatus"       = excluded."ObjectStatus",
+            "ObjectIsNew"        = excluded."ObjectIsNew",
+            "ObjectIsArchived"   = excluded."ObjectIsArchived",
+            "AppEventType"       = CASE
+                                    WHEN excluded."AppEventType" = 'delete' THEN 'delete'
+                                    WHEN "AppEventType" = 'create' THEN 'create'
+                                    WHEN "AppEventType" = 'delete' THEN 'update'
+                                    ELSE excluded."AppEventType"
+                                   END,
+            "Coalesced"          = "Coalesced" + 1;
+    """
+
+#-------------------------------------------------------------------------------
+def count_pending_app_events(db, objectType):
+    """ Changes collected so far for the object type, pending rows plus the changes coalesced into them """
+
+    return db.sql.execute("""SELECT COUNT(*) + COALESCE(SUM("Coalesced"), 0) FROM AppEvents_Pending WHERE "ObjectType" = ?""", (objectType,)).fetchone()[0]
+
+#-------------------------------------------------------------------------------
+def count_suppressed_app_events(db, objectType, updated, pendingBefore):
+    """ Counts the rows of an UPDATE (cursor.rowcount) that didn't emit an event, pendingBefore
+        is count_pending_app_events before the statement """
+
+    suppressed = updated - (count_pending_app_events(db, objectType) - pendingBefore)
+
+    if suppressed > 0:
+        db.sql.execute("""
+            INSERT INTO AppEvents_Stats ("ObjectType", "Suppressed") VALUES (?, ?)
+            ON CONFLICT("ObjectType") DO UPDATE SET "Suppressed" = "Suppressed" + excluded."Suppressed"
+        """, (objectType, suppressed))
+
+#-------------------------------------------------------------------------------
+def device_event_values(row):
+    return {
+        'ObjectKey':          f"'Devices|' || {row}.dev_MAC",
+        'ObjectPlugin':       'NULL',
+        'ObjectPrimaryID':    f'{row}.dev_MAC',
+        'ObjectSecondaryID':  f'{row}.dev_LastIP',
+        'ObjectForeignKey':   f'{row}.dev_MAC',
+        'ObjectStatusColumn': "'dev_PresentLastScan'",
+        'ObjectStatus':       f"CASE WHEN {row}.dev_PresentLastScan = 1 THEN 'online' ELSE 'offline' END",
+        'ObjectIsNew':        f'{row}.dev_NewDevice',
+        'ObjectIsArchived':   f'{row}.dev_Archived'
+    }
+
+#-------------------------------------------------------------------------------
+def plugin_object_event_values(row):
+    return {
+        'ObjectKey':          f"'Plugins_Objects|' || {row}.Plugin || '|' || {row}.Object_PrimaryID || '|' || {row}.Object_SecondaryID",
+        'ObjectPlugin':       f'{row}.Plugin',
+        'ObjectPrimaryID':    f'{row}.Object_PrimaryID',
+        'ObjectSecondaryID':  f'{row}.Object_SecondaryID',
+        'ObjectForeignKey':   f'{row}.ForeignKey',
+        'ObjectStatusColumn': "'Status'",
+        'ObjectStatus':       f'{row}.Status',
+        'ObjectIsNew':        'NULL',
+        'ObjectIsArchived':   'NULL'
+    }
+
+#-------------------------------------------------------------------------------
+def create_app_events_triggers(db):
+    """ (Re-)creates the AppEvents triggers and the tables they write to """
+
+    db.sql.execute("""CREATE TABLE IF NOT EXISTS "AppEvents_Pending" (
+        "ObjectKey"             TEXT PRIMARY KEY,
+        "DateTimeCreated"       TEXT,
+        "ObjectType"            TEXT,
+        "ObjectPlugin"          TEXT,
+        "ObjectPrimaryID"       TEXT,
+        "ObjectSecondaryID"     TEXT,
+        "ObjectForeignKey"      TEXT,
+        "ObjectStatusColumn"    TEXT,
+        "ObjectStatus"          TEXT,
+        "ObjectIsNew"           BOOLEAN,
+        "ObjectIsArchived"      BOOLEAN,
+        "AppEventType"          TEXT,
+        "Coalesced"             INTEGER NOT NULL DEFAULT 0
+    );
+    """)
+
+    db.sql.execute("""CREATE TABLE IF NOT EXISTS "AppEvents_Stats" (
+        "ObjectType"            TEXT PRIMARY KEY,
+        "Emitted"               INTEGER NOT NULL DEFAULT 0,
+        "Coalesced"             INTEGER NOT NULL DEFAULT 0,
+        "Suppressed"            INTEGER NOT NULL DEFAULT 0
+    );
+    """)
+
+    # Drop all triggers, incl. the *_unchanged ones of older versions
+    for trigger in ['trg_create_device', 'trg_read_device', 'trg_update_device', 'trg_update_device_unchanged', 'trg_delete_device',
+                    'trg_create_plugin_object', 'trg_update_plugin_object', 'trg_update_plugin_object_unchanged', 'trg_delete_plugin_object']:
+        db.sql.execute(f'DROP TRIGGER IF EXISTS {trigger};')
+
+    # -------------
+    # Device events
+
+    db.sql.execute(f'''
+        CREATE TRIGGER "trg_create_device" AFTER INSERT ON "Devices"
+        BEGIN {sql_pending_app_event('Devices', device_event_values('NEW'), 'create')} END;
+    ''')
+
+    # 🔴 Read events would generate too many events, disabled for now
+
+    db.sql.execute(f'''
+        CREATE TRIGGER "trg_update_device" AFTER UPDATE ON "Devices"
+        WHEN {sql_devices_changed}
+        BEGIN {sql_pending_app_event('Devices', device_event_values('NEW'), 'update')} END;
+    ''')
+
+    db.sql.execute(f'''
+        CREATE TRIGGER "trg_delete_device" AFTER DELETE ON "Devices"
+        BEGIN {sql_pending_app_event('Devices', device_event_values('OLD'), 'delete')} END;
+    ''')
+
+    # -------------
+    # Plugins_Objects events
+
+    db.sql.execute(f'''
+        CREATE TRIGGER "trg_create_plugin_object" AFTER INSERT ON "Plugins_Objects"
+        BEGIN {sql_pending_app_event('Plugins_Objects', plugin_object_event_values('NEW'), 'create')} END;
+    ''')
+
+    db.sql.execute(f'''
+        CREATE TRIGGER "trg_update_plugin_object" AFTER UPDATE ON "Plugins_Objects"
+        WHEN {sql_plugins_objects_changed}
+        BEGIN {sql_pending_app_event('Plugins_Objects', plugin_object_event_values('NEW'), 'update')} END;
+    ''')
+
+    db.sql.execute(f'''
+        CREATE TRIGGER "trg_delete_plugin_object" AFTER DELETE ON "Plugins_Objects"
+        BEGIN {sql_pending_app_event('Plugins_Objects', plugin_object_event_values('OLD'), 'delete')} END;
+    ''')
+
+#-------------------------------------------------------------------------------
+def flush_app_events(db):
+    """ Moves the collected events to AppEvents, one per changed object. Returns the number of events """
+
+    pending = db.sql.execute("""SELECT "ObjectType", COUNT(*), SUM("Coalesced") FROM AppEvents_Pending GROUP BY "ObjectType" """).fetchall()
+
+    if len(pending) == 0:
+        return 0
+
+    db.sql.execute(f"""
+        INSERT INTO AppEvents (
+            "GUID",
+            "DateTimeCreated",
+            "ObjectType",
+            "ObjectPlugin",
+            "ObjectPrimaryID",
+            "ObjectSecondaryID",
+            "ObjectForeignKey",
+            "ObjectStatusColumn",
+            "ObjectStatus",
+            "ObjectIsNew",
+            "ObjectIsArchived",
+            "AppEventType"
+        )
+        SELECT
+            {sql_generateGuid},
+            "DateTimeCreated",
+            "ObjectType",
+            "ObjectPlugin",
+            "ObjectPrimaryID",
+            "ObjectSecondaryID",
+            "ObjectForeignKey",
+            "ObjectStatusColumn",
+            "ObjectStatus",
+            "ObjectIsNew",
+            "ObjectIsArchived",
+            "AppEventType"
+        FROM AppEvents_Pending
+        ORDER BY rowid
+    """)
+
+    db.sql.execute("DELETE FROM AppEvents_Pending")
+
+    db.sql.executemany("""
+        INSERT INTO AppEvents_Stats ("ObjectType", "Emitted", "Coalesced") VALUES (?, ?, ?)
+        ON CONFLICT("ObjectType") DO UPDATE SET "Emitted" = "Emitted" + excluded."Emitted", "Coalesced" = "Coalesced" + excluded."Coalesced"
+    """, [(objectType, count, coalesced) for objectType, count, coalesced in pending])
+
+    db.commitDB()
+
+    emitted = sum(row[1] for row in pending)
+
+    mylog('verbose', [f'[AppEvents] Emitted {emitted} events (', ', '.join([f'{objectType}: {count}, {coalesced} coalesced' for objectType, count, coalesced in pending]), ')'])
+
+    return emitted
+
+#-------------------------------------------------------------------------------
+def get_app_events_stats(db):
+    return {row[0]: {"emitted": row[1], "coalesced": row[2], "suppressed": row[3]}
+            for row in db.sql.execute('SELECT "ObjectType", "Emitted", "Coalesced", "Suppressed" FROM AppEvents_Stats')}
+
+
 def getPluginObject(**kwargs):
 
     # Check if nothing, end
@@ -0,0 +1,224 @@
+""" UNIX domain socket the front end uses to send commands (run / test / update_api) to the server """
+
+import os
+import json
+import time
+import socket
+import threading
+
+from logger import mylog
+
+#===============================================================================
+# Command socket
+#===============================================================================
+#
+# One command per connection, in the execution_queue.log line format:
+#
+#   [timestamp]|guid|event|param\n
+#
+# The server replies with one JSON line per state change:
+#
+#   {"status": "queued", "depth": 1}          accepted, executed by the main loop
+#   {"status": "done", "wait": 0.2}           executed (if the client is still connected)
+#   {"status": "rejected", "error": "..."}    unknown event or full queue, the client
+#                                             falls back to execution_queue.log
+#
+# "status\n" returns the queue metrics.
+
+USER_EVENTS        = ['run', 'test', 'update_api']
+COMMAND_QUEUE_SIZE = 100
+CLIENT_TIMEOUT     = 5
+MAX_LINE_LENGTH    = 4096
+
+#-------------------------------------------------------------------------------
+class socket_command_class:
+    def __init__(self, line, connection):
+        self.line       = line
+        self.connection = connection
+        self.received   = time.monotonic()
+
+        # same columns as check_and_run_user_event reads from the execution queue
+        columns = line.strip().split('|')[2:4]
+
+        self.event, self.param = columns if len(columns) == 2 else ("", "")
+
+    def reply(self, message):
+        try:
+            self.connection.sendall((json.dumps(message) + '\n').encode('utf-8'))
+        except OSError:
+            # the client doesn't wait for the result
+            pass
+
+    def close(self):
+        try:
+            self.connection.close()
+        except OSError:
+            pass
+
+#-------------------------------------------------------------------------------
+class command_socket_class:
+    def __init__(self, path):
+        self.path     = path
+        self.server   = None
+        self.lock     = threading.Lock()
+        self.commands = []
+
+        # metrics
+        self.received  = 0
+        self.rejected  = 0
+        self.executed  = 0
+        self.max_depth = 0
+        self.last_wait = 0   # seconds between receiving and executing a command
+        self.max_wait  = 0
+
+        # written by the listener thread, watched by the main loop
+        self.wakeRead, self.wakeWrite = os.pipe()
+        os.set_blocking(self.wakeRead, False)
+        os.set_blocking(self.wakeWrite, False)
+
+        try:
+            self.start()
+        except OSError as e:
+            mylog('none', [f'[Command socket] ⚠ ERROR: Could not listen on {path}, only the execution queue file is used: {e}'])
+            self.server = None
+
+    #-------------------------------------------------------------------------------
+    def start(self):
+        # socket left behind by a previous run
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        # the web server user sends the commands, access is limited by the log folder permissions
+        os.chmod(self.path, 0o666)
+        server.listen(16)
+
+        self.server = server
+
+        thread = threading.Thread(target=self.listen, name='command_socket', daemon=True)
+        thread.start()
+
+        mylog('verbose', [f'[Command socket] Listening on {self.path}'])
+
+    #-------------------------------------------------------------------------------
+    def listen(self):
+        # close() clears self.server while this thread waits
+        server = self.server
+
+        while True:
+            try:
+                connection, _ = server.accept()
+            except OSError:
+                # socket closed
+                return
+
+            try:
+                self.handle(connection)
+            except Exception as e:
+                mylog('none', [f'[Command socket] ⚠ ERROR: {e}'])
+                connection.close()
+
+    #-------------------------------------------------------------------------------
+    def handle(self, connection):
+        connection.settimeout(CLIENT_TIMEOUT)
+
+        data = b''
+        while b'\n' not in data and len(data) < MAX_LINE_LENGTH:
+            chunk = connection.recv(MAX_LINE_LENGTH)
+            if not chunk:
+                break
+            data += chunk
+
+        command = socket_command_class(data.split(b'\n')[0].decode('utf-8', errors='replace'), connection)
+
+        if command.line.strip() == 'status':
+            command.reply(self.get_metrics())
+            command.close()
+            return
+
+        with self.lock:
+            if command.event not in USER_EVENTS:
+                error = f'Unknown event "{command.event}"'
+            elif len(self.commands) >= COMMAND_QUEUE_SIZE:
+                error = 'Queue full'
+            else:
+                error = None
+                self.received += 1
+                self.commands.append(command)
+                self.max_depth = max(self.max_depth, len(self.commands))
+                depth = len(self.commands)
+
+            if error is not None:
+                self.rejected += 1
+
+        if error is not None:
+            command.reply({"status": "rejected", "error": error})
+            command.close()
+            return
+
+        command.reply({"status": "queued", "depth": depth})
+
+        try:
+            os.write(self.wakeWrite, b'1')
+        except BlockingIOError:
+            # a wake up is already pending
+            pass
+
+    #-------------------------------------------------------------------------------
+    def fileno(self):
+        """ Readable when commands are waiting """
+        return self.wakeRead
+
+    #-------------------------------------------------------------------------------
+    def pop_commands(self):
+        """ Returns the waiting commands, oldest first """
+
+        try:
+            while os.read(self.wakeRead, 1024):
+                pass
+        except BlockingIOError:
+            pass
+
+        with self.lock:
+            commands, self.commands = self.commands, []
+
+        return commands
+
+    #-------------------------------------------------------------------------------
+    def complete(self, command):
+        """ Reports the command as executed to the client and updates the metrics """
+
+        wait = time.monotonic() - command.received
+
+        with self.lock:
+            self.executed += 1
+            self.last_wait = wait
+            self.max_wait = max(self.max_wait, wait)
+
+        mylog('verbose', [f'[Command socket] Executed {command.event} {command.param} {wait:.1f}s after it was received'])
+
+        command.reply({"status": "done", "wait": round(wait, 3)})
+        command.close()
+
+    #-------------------------------------------------------------------------------
+    def get_metrics(self):
+        with self.lock:
+            return {
+                "depth": len(self.commands),
+                "max_depth": self.max_depth,
+                "received": self.received,
+                "rejected": self.rejected,
+                "executed": self.executed,
+                "last_wait": round(self.last_wait, 3),
+                "max_wait": round(self.max_wait, 3)
+            }
+
+    #-------------------------------------------------------------------------------
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -9,6 +9,7 @@ mySettingsSQLsafe = []
 cycle = 1
 userSubnets = []
 mySchedules = [] # bad solution for global - TO-DO
+scheduler = None # scheduler_class with the schedules of plugins set to run on schedule
 tz = ''
 
 # modified time of the most recently imported config file
@@ -30,6 +31,7 @@ arpscan_devices = []
 # -------------------------------------------
 SCAN_SUBNETS    = ['192.168.1.0/24 --interface=eth1', '192.168.1.0/24 --interface=eth0']   
 LOG_LEVEL       = 'verbose' 
+LOG_MAX_SIZE    = 0 # MB, set by the app config, plugin processes append without rotating
 TIMEZONE        = 'Europe/Berlin'
 UI_LANG         = 'English' 
 UI_PRESENCE       = ['online', 'offline', 'archived']  
@@ -37,6 +39,13 @@ UI_MY_DEVICES     = ['online', 'offline', 'archived', 'new', 'down']
 UI_NOT_RANDOM_MAC = []
 DAYS_TO_KEEP_EVENTS     = 90 
 REPORT_DASHBOARD_URL    = 'http://netalertx/' 
+PLUGINS_MAX_PARALLEL    = 4
+PLUGINS_WARM_WORKERS    = True
+PLUGINS_NICE            = 0
+PLUGINS_CPU_LIMIT       = 0
+PLUGINS_MEMORY_LIMIT    = 0
+PLUGINS_ADAPTIVE_TIMEOUT = True
+SCHEDULE_JITTER         = 0
 
 # -------------------------------------------
 # Misc
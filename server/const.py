@@ -18,8 +18,15 @@ reportTemplatesPath = applicationPath + '/front/report_templates/'
 fullConfFolder      = applicationPath + '/config'
 fullConfPath        = applicationPath + confPath
 fullDbPath          = applicationPath + dbPath
+executionQueuePath  = logPath + '/execution_queue.log'
+commandSocketPath   = logPath + '/command.sock'
 vendorsPath         = '/usr/share/arp-scan/ieee-oui.txt'
 vendorsPathNewest   = '/usr/share/arp-scan/ieee-oui_all_filtered.txt'
+vendorsIndexPath    = '/usr/share/arp-scan/ieee-oui.idx'
+
+# Header of the tab separated plugin result files, see plugin_helper.Plugin_Objects
+pluginResultFormat  = 'netalertx-result'
+pluginResultVersion = 1
 
        
 
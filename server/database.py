@@ -3,13 +3,33 @@
 import sqlite3
 import base64
 import json
+import time
+import contextlib
 
 # Register NetAlertX modules 
 from const import fullDbPath, sql_devices_stats, sql_devices_all, sql_generateGuid
 
 from logger import mylog
 from helper import json_obj, initOrSetParam, row_to_json, timeNowTZ#, split_string #, updateState
-from appevent import AppEvent_obj
+from appevent import AppEvent_obj, create_app_events_triggers
+from plugin_runs import create_plugin_runs_table, add_plugin_runs_units
+
+#-------------------------------------------------------------------------------
+# Indexes created by schema migration 1 (see schema_migrations below).
+# Chosen with EXPLAIN QUERY PLAN on the scan (networkscan.py, device.py), name resolution 
+# (helper.py), plugin (plugin.py, db_cleanup) and reporting (reporting.py) queries.
+# Indexes added later go into a new migration.
+sql_indexes = [
+    # plugin objects are looked up by plugin and object IDs (process_plugin_events, name resolution, de-duplication)
+    """CREATE INDEX IF NOT EXISTS IDX_plo_Plugin_PrimaryID_SecondaryID ON Plugins_Objects (Plugin, Object_PrimaryID, Object_SecondaryID)""",
+    # history is trimmed and displayed per plugin ordered by change date (db_cleanup, API)
+    """CREATE INDEX IF NOT EXISTS IDX_plh_Plugin_DateTimeChanged ON Plugins_History (Plugin, DateTimeChanged)""",
+    # latest event per device, session pairing and ghost disconnections
+    """CREATE INDEX IF NOT EXISTS IDX_eve_MAC_DateTime ON Events (eve_MAC, eve_DateTime)""",
+    # only a handful of events wait for a notification, keep them in a small partial index (reporting)
+    """CREATE INDEX IF NOT EXISTS IDX_eve_PendingAlert_MAC_DateTime ON Events (eve_MAC, eve_DateTime) WHERE eve_PendingAlertEmail = 1""",
+    """CREATE INDEX IF NOT EXISTS IDX_eve_PendingAlert_EventType_DateTime ON Events (eve_EventType, eve_DateTime) WHERE eve_PendingAlertEmail = 1""",
+]
 
 class DB():
     """
@@ -21,6 +41,17 @@ class DB():
         self.sql = None
         self.sql_connection = None
 
+        # see transaction()
+        self.transactionDepth = 0
+        self.transactionStart = None
+
+        # commit metrics
+        self.commits = 0
+        self.commitTime = 0          # seconds spent in COMMIT
+        self.maxCommitTime = 0
+        self.deferredCommits = 0     # commitDB() calls inside a transaction
+        self.rollbacks = 0
+
     #-------------------------------------------------------------------------------
     def open (self):
         # Check if DB is open
@@ -46,10 +77,97 @@ class DB():
             mylog('debug','commitDB: database is not open')
             return False
 
+        # Committed when the outermost transaction() scope ends
+        if self.transactionDepth > 0:
+            self.deferredCommits += 1
+            return True
+
         # Commit changes to DB
         self.sql_connection.commit()
         return True
 
+    #-------------------------------------------------------------------------------
+    @contextlib.contextmanager
+    def transaction(self, name = 'transaction'):
+        """ Runs the enclosed statements as one unit of work.
+            The outermost scope is a write transaction (BEGIN IMMEDIATE ... COMMIT), nested
+            scopes are savepoints, so a failing inner step can be rolled back on its own.
+            commitDB() calls inside the scope are deferred to its end. On an exception the
+            scope is rolled back and the exception re-raised """
+
+        depth = self.transactionDepth
+        savepoint = f'sp_{depth}'
+
+        if depth == 0:
+            # with isolation_level=None every statement would otherwise commit on its own
+            self.sql_connection.execute('BEGIN IMMEDIATE')
+            self.transactionStart = time.monotonic()
+        else:
+            self.sql_connection.execute(f'SAVEPOINT {savepoint}')
+
+        self.transactionDepth += 1
+
+        try:
+            yield self
+        except BaseException:
+            self.transactionDepth -= 1
+            self.rollbacks += 1
+
+            # some errors (e.g. SQLITE_FULL) already rolled the transaction back
+            if not self.sql_connection.in_transaction:
+                pass
+            elif depth == 0:
+                self.sql_connection.execute('ROLLBACK')
+                mylog('verbose', [f'[Database] Rolled back {name}'])
+            else:
+                self.sql_connection.execute(f'ROLLBACK TO {savepoint}')
+                self.sql_connection.execute(f'RELEASE {savepoint}')
+            raise
+
+        self.transactionDepth -= 1
+
+        if depth > 0:
+            self.sql_connection.execute(f'RELEASE {savepoint}')
+            return
+
+        commitStart = time.monotonic()
+        self.sql_connection.execute('COMMIT')
+        commitEnd = time.monotonic()
+
+        self.commits += 1
+        self.commitTime += commitEnd - commitStart
+        self.maxCommitTime = max(self.maxCommitTime, commitEnd - commitStart)
+
+        mylog('debug', [f'[Database] Committed {name} in {(commitEnd - self.transactionStart) * 1000:.0f}ms (COMMIT {(commitEnd - commitStart) * 1000:.1f}ms)'])
+
+    #-------------------------------------------------------------------------------
+    def get_commit_metrics(self):
+        return {
+            "commits": self.commits,
+            "commit_time": round(self.commitTime, 3),
+            "max_commit_time": round(self.maxCommitTime, 3),
+            "deferred_commits": self.deferredCommits,
+            "rollbacks": self.rollbacks
+        }
+
+    #-------------------------------------------------------------------------------
+    def get_data_version(self):
+        """ Returns a value that changes whenever the database content changes.
+            PRAGMA data_version covers commits made by other connections (e.g. plugins
+            or the front end), total_changes covers the ones made by this connection """
+
+        if self.sql_connection == None :
+            mylog('debug','get_data_version: database is not open')
+            return None
+
+        try:
+            dataVersion = self.sql_connection.execute('PRAGMA data_version').fetchone()[0]
+        except sqlite3.Error as e:
+            mylog('none',[ '[Database] - SQL ERROR: ', e])
+            return None
+
+        return (dataVersion, self.sql_connection.total_changes)
+
     #-------------------------------------------------------------------------------
     def rollbackDB(self):
         if self.sql_connection:
@@ -79,555 +197,55 @@ class DB():
     #-------------------------------------------------------------------------------
     def upgradeDB(self):
         """
-        Check the current tables in the DB and upgrade them if neccessary
+        Apply the schema migrations newer than the version stored in the DB and clear
+        the tables only valid for the running process
         """
-        
-        # indicates, if Online_History table is available
-        onlineHistoryAvailable = self.sql.execute("""
-            SELECT name FROM sqlite_master WHERE type='table'
-                AND name='Online_History';
-        """).fetchall() != []
-
-        # Check if it is incompatible (Check if table has all required columns)
-        isIncompatible = False
-
-        if onlineHistoryAvailable :
-          isIncompatible = self.sql.execute ("""
-                SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Online_History') WHERE name='Archived_Devices'
-            """).fetchone()[0] == 0
-
-        # Drop table if available, but incompatible
-        if onlineHistoryAvailable and isIncompatible:
-          mylog('none','[upgradeDB] Table is incompatible, Dropping the Online_History table')
-          self.sql.execute("DROP TABLE Online_History;")
-          onlineHistoryAvailable = False
-          
-        if onlineHistoryAvailable == False :
-          self.sql.execute("""
-          CREATE TABLE "Online_History" (
-            "Index"	INTEGER,
-            "Scan_Date"	TEXT,
-            "Online_Devices"	INTEGER,
-            "Down_Devices"	INTEGER,
-            "All_Devices"	INTEGER,
-            "Archived_Devices" INTEGER,
-            PRIMARY KEY("Index" AUTOINCREMENT)
-          );
-          """)
-
-        # Offline_Devices column
-        Offline_Devices_missing = self.sql.execute ("""
-            SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Online_History') WHERE name='Offline_Devices'
-          """).fetchone()[0] == 0
-
-        if Offline_Devices_missing :
-          mylog('verbose', ["[upgradeDB] Adding Offline_Devices to the Online_History table"])
-          self.sql.execute("""
-            ALTER TABLE "Online_History" ADD "Offline_Devices" INTEGER
-          """)
-
-
-        # -------------------------------------------------------------------------
-        # Alter Devices table       
-        # -------------------------------------------------------------------------
-        # dev_Network_Node_MAC_ADDR column
-        dev_Network_Node_MAC_ADDR_missing = self.sql.execute ("""
-            SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Devices') WHERE name='dev_Network_Node_MAC_ADDR'
-          """).fetchone()[0] == 0
-
-        if dev_Network_Node_MAC_ADDR_missing :
-          mylog('verbose', ["[upgradeDB] Adding dev_Network_Node_MAC_ADDR to the Devices table"])
-          self.sql.execute("""
-            ALTER TABLE "Devices" ADD "dev_Network_Node_MAC_ADDR" TEXT
-          """)
-
-        # dev_Network_Node_port column
-        dev_Network_Node_port_missing = self.sql.execute ("""
-            SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Devices') WHERE name='dev_Network_Node_port'
-          """).fetchone()[0] == 0
-
-        if dev_Network_Node_port_missing :
-          mylog('verbose', ["[upgradeDB] Adding dev_Network_Node_port to the Devices table"])
-          self.sql.execute("""
-            ALTER TABLE "Devices" ADD "dev_Network_Node_port" INTEGER
-          """)
-
-        # dev_Icon column
-        dev_Icon_missing = self.sql.execute ("""
-            SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Devices') WHERE name='dev_Icon'
-          """).fetchone()[0] == 0
-
-        if dev_Icon_missing :
-          mylog('verbose', ["[upgradeDB] Adding dev_Icon to the Devices table"])
-          self.sql.execute("""
-            ALTER TABLE "Devices" ADD "dev_Icon" TEXT
-          """)
-
-        # dev_GUID column
-        dev_GUID_missing = self.sql.execute ("""
-            SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Devices') WHERE name='dev_GUID'
-          """).fetchone()[0] == 0
-
-        if dev_GUID_missing :
-          mylog('verbose', ["[upgradeDB] Adding dev_GUID to the Devices table"])
-          self.sql.execute("""
-            ALTER TABLE "Devices" ADD "dev_GUID" TEXT
-          """)
-
-        # dev_NetworkSite column
-        dev_NetworkSite_missing = self.sql.execute ("""
-            SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Devices') WHERE name='dev_NetworkSite'
-          """).fetchone()[0] == 0
-
-        if dev_NetworkSite_missing :
-          mylog('verbose', ["[upgradeDB] Adding dev_NetworkSite to the Devices table"])
-          self.sql.execute("""
-            ALTER TABLE "Devices" ADD "dev_NetworkSite" TEXT
-          """)
-
-        # dev_SSID column
-        dev_SSID_missing = self.sql.execute ("""
-            SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Devices') WHERE name='dev_SSID'
-          """).fetchone()[0] == 0
-
-        if dev_SSID_missing :
-          mylog('verbose', ["[upgradeDB] Adding dev_SSID to the Devices table"])
-          self.sql.execute("""
-            ALTER TABLE "Devices" ADD "dev_SSID" TEXT
-          """)
-
-        # SQL query to update missing dev_GUID
-        self.sql.execute(f'''
-            UPDATE Devices
-            SET dev_GUID = {sql_generateGuid}
-            WHERE dev_GUID IS NULL
-        ''')
-
-        # dev_SyncHubNodeName column
-        dev_SyncHubNodeName_missing = self.sql.execute ("""
-            SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Devices') WHERE name='dev_SyncHubNodeName'
-          """).fetchone()[0] == 0
-
-        if dev_SyncHubNodeName_missing :
-          mylog('verbose', ["[upgradeDB] Adding dev_SyncHubNodeName to the Devices table"])
-          self.sql.execute("""
-            ALTER TABLE "Devices" ADD "dev_SyncHubNodeName" TEXT
-          """)
-          
-        # dev_SourcePlugin column
-        dev_SourcePlugin_missing = self.sql.execute ("""
-            SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Devices') WHERE name='dev_SourcePlugin'
-          """).fetchone()[0] == 0
-
-        if dev_SourcePlugin_missing :
-          mylog('verbose', ["[upgradeDB] Adding dev_SourcePlugin to the Devices table"])
-          self.sql.execute("""
-            ALTER TABLE "Devices" ADD "dev_SourcePlugin" TEXT
-          """)
-
-        # -------------------------------------------------------------------------
-        # Settings table setup
-        # -------------------------------------------------------------------------
-
-        
-        # Re-creating Settings table
-        mylog('verbose', ["[upgradeDB] Re-creating Settings table"])
-
-        self.sql.execute(""" DROP TABLE IF EXISTS Settings;""")
-        self.sql.execute("""
-            CREATE TABLE "Settings" (
-            "Code_Name"	      TEXT,
-            "Display_Name"	  TEXT,
-            "Description"	    TEXT,
-            "Type"            TEXT,
-            "Options"         TEXT,
-            "RegEx"           TEXT,
-            "Group"	          TEXT,
-            "Value"	          TEXT,
-            "Events"	        TEXT,
-            "OverriddenByEnv" INTEGER
-            );
-            """)
-
-
-        # -------------------------------------------------------------------------
-        # Pholus_Scan table setup
-        # -------------------------------------------------------------------------
-
-        # Create Pholus_Scan table if missing
-        mylog('verbose', ["[upgradeDB] Re-creating Pholus_Scan table"])
-        self.sql.execute("""CREATE TABLE IF NOT EXISTS "Pholus_Scan" (
-            "Index"	          INTEGER,
-            "Info"	          TEXT,
-            "Time"	          TEXT,
-            "MAC"	          TEXT,
-            "IP_v4_or_v6"	  TEXT,
-            "Record_Type"	  TEXT,
-            "Value"           TEXT,
-            "Extra"           TEXT,
-            PRIMARY KEY("Index" AUTOINCREMENT)
-        );
-        """)
 
+        currentVersion = self.sql.execute("PRAGMA user_version").fetchone()[0]
+        latestVersion = schema_migrations[-1][0]
+        applied = False
 
-        # -------------------------------------------------------------------------
-        # Parameters table setup
-        # -------------------------------------------------------------------------
+        if currentVersion > latestVersion:
+            mylog('none', [f'[upgradeDB] ⚠ WARNING: Database version {currentVersion} is newer than this app ({latestVersion})'])
 
-        # Re-creating Parameters table
-        mylog('verbose', ["[upgradeDB] Re-creating Parameters table"])
-        self.sql.execute("DROP TABLE Parameters;")
+        for version, steps in schema_migrations:
+            if version <= currentVersion:
+                continue
 
-        self.sql.execute("""
-          CREATE TABLE "Parameters" (
-            "par_ID" TEXT PRIMARY KEY,
-            "par_Value"	TEXT
-          );
-          """)        
+            mylog('none', [f'[upgradeDB] Migrating the database to version {version}'])
 
-        # -------------------------------------------------------------------------
-        # Nmap_Scan table setup DEPRECATED after 9/9/2024
-        # -------------------------------------------------------------------------
+            # a failed migration is rolled back as a whole and retried on the next start
+            with self.transaction(f'migration {version}'):
+                for step in steps:
+                    step(self)
 
-        # indicates, if Nmap_Scan table is available
-        nmapScanMissing = self.sql.execute("""
-        SELECT name FROM sqlite_master WHERE type='table'
-        AND name='Nmap_Scan';
-        """).fetchone() == None
-
-        if nmapScanMissing == False:
-            # move data into the PLugins_Objects table
-            self.sql.execute("""INSERT INTO Plugins_Objects (
-                                    Plugin,
-                                    Object_PrimaryID,
-                                    Object_SecondaryID,
-                                    DateTimeCreated,
-                                    DateTimeChanged,
-                                    Watched_Value1,
-                                    Watched_Value2,
-                                    Watched_Value3,
-                                    Watched_Value4,
-                                    Status,
-                                    Extra,
-                                    UserData,
-                                    ForeignKey
-                                )
-                                SELECT
-                                    'NMAP' AS Plugin,
-                                    MAC AS Object_PrimaryID,
-                                    Port AS Object_SecondaryID,
-                                    Time AS DateTimeCreated,
-                                    DATETIME('now') AS DateTimeChanged,
-                                    State AS Watched_Value1,
-                                    Service AS Watched_Value2,
-                                    '' AS Watched_Value3,
-                                    '' AS Watched_Value4,
-                                    'watched-not-changed' AS Status,
-                                    Extra AS Extra,
-                                    Extra AS UserData,
-                                    MAC AS ForeignKey
-                                FROM Nmap_Scan;""")
-
-            # Delete the Nmap_Scan table
-            self.sql.execute("DROP TABLE Nmap_Scan;")
-            nmapScanMissing = True
-
-        # -------------------------------------------------------------------------
-        # Nmap_Scan table setup DEPRECATED after 9/9/2024 cleanup above
-        # -------------------------------------------------------------------------
-
-        # -------------------------------------------------------------------------
-        # Icon format migration table setup DEPRECATED after 9/9/2024 cleanup below
-        # -------------------------------------------------------------------------
-
-        sql_Icons = """ UPDATE Devices SET dev_Icon = '<i class="fa fa-' || dev_Icon || '"></i>'
-                WHERE dev_Icon NOT LIKE '<i class="fa fa-%'
-                AND dev_Icon NOT LIKE '<svg%' 
-                AND dev_Icon NOT LIKE 'PGkg%' 
-                AND dev_Icon NOT LIKE 'PHN%' 
-                AND dev_Icon NOT IN ('', 'null')
-                 """
-        self.sql.execute(sql_Icons)
-        self.commitDB()      
-
-        # Base64 conversion
-
-        self.sql.execute("SELECT dev_MAC, dev_Icon FROM Devices WHERE dev_Icon like '<%' ")
-        icons = self.sql.fetchall()
-
-
-        # Loop through the icons, encode them, and update the database
-        for icon_tuple in icons:
-            icon = icon_tuple[1]
-            
-            # Encode the icon as base64
-            encoded_icon = base64.b64encode(icon.encode('utf-8')).decode('ascii')
-            # Update the database with the encoded icon
-            sql_update = f"""
-                UPDATE Devices
-                SET dev_Icon = '{encoded_icon}'
-                WHERE dev_MAC = '{icon_tuple[0]}'
-            """
-
-            self.sql.execute(sql_update)
-
-        # -------------------------------------------------------------------------
-        # Icon format migration table setup DEPRECATED after 9/9/2024 cleanup above
-        # -------------------------------------------------------------------------
-
-        # -------------------------------------------------------------------------
-        # Plugins tables setup
-        # -------------------------------------------------------------------------
-
-        # Plugin state
-        sql_Plugins_Objects = """ CREATE TABLE IF NOT EXISTS Plugins_Objects(
-                                    "Index"	          INTEGER,
-                                    Plugin TEXT NOT NULL,
-                                    Object_PrimaryID TEXT NOT NULL,
-                                    Object_SecondaryID TEXT NOT NULL,
-                                    DateTimeCreated TEXT NOT NULL,
-                                    DateTimeChanged TEXT NOT NULL,
-                                    Watched_Value1 TEXT NOT NULL,
-                                    Watched_Value2 TEXT NOT NULL,
-                                    Watched_Value3 TEXT NOT NULL,
-                                    Watched_Value4 TEXT NOT NULL,
-                                    Status TEXT NOT NULL,
-                                    Extra TEXT NOT NULL,
-                                    UserData TEXT NOT NULL,
-                                    ForeignKey TEXT NOT NULL,
-                                    PRIMARY KEY("Index" AUTOINCREMENT)
-                        ); """
-        self.sql.execute(sql_Plugins_Objects)
-
-        # syncHubNodeName column
-        plug_SyncHubNodeName_missing = self.sql.execute ("""
-            SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Plugins_Objects') WHERE name='SyncHubNodeName'
-          """).fetchone()[0] == 0
-
-        if plug_SyncHubNodeName_missing :
-          mylog('verbose', ["[upgradeDB] Adding SyncHubNodeName to the Plugins_Objects table"])
-          self.sql.execute("""
-            ALTER TABLE "Plugins_Objects" ADD "SyncHubNodeName" TEXT
-          """)
-          
-        # helper columns HelpVal1-4
-        plug_HelpValues_missing = self.sql.execute ("""
-            SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Plugins_Objects') WHERE name='HelpVal1'
-          """).fetchone()[0] == 0
-
-        if plug_HelpValues_missing :
-          mylog('verbose', ["[upgradeDB] Adding HelpVal1-4 to the Plugins_Objects table"])
-          self.sql.execute('ALTER TABLE "Plugins_Objects" ADD COLUMN "HelpVal1" TEXT')
-          self.sql.execute('ALTER TABLE "Plugins_Objects" ADD COLUMN "HelpVal2" TEXT')
-          self.sql.execute('ALTER TABLE "Plugins_Objects" ADD COLUMN "HelpVal3" TEXT')
-          self.sql.execute('ALTER TABLE "Plugins_Objects" ADD COLUMN "HelpVal4" TEXT')
-
-        # Plugin execution results
-        sql_Plugins_Events = """ CREATE TABLE IF NOT EXISTS Plugins_Events(
-                                    "Index"	          INTEGER,
-                                    Plugin TEXT NOT NULL,
-                                    Object_PrimaryID TEXT NOT NULL,
-                                    Object_SecondaryID TEXT NOT NULL,
-                                    DateTimeCreated TEXT NOT NULL,
-                                    DateTimeChanged TEXT NOT NULL,
-                                    Watched_Value1 TEXT NOT NULL,
-                                    Watched_Value2 TEXT NOT NULL,
-                                    Watched_Value3 TEXT NOT NULL,
-                                    Watched_Value4 TEXT NOT NULL,
-                                    Status TEXT NOT NULL,
-                                    Extra TEXT NOT NULL,
-                                    UserData TEXT NOT NULL,
-                                    ForeignKey TEXT NOT NULL,
-                                    PRIMARY KEY("Index" AUTOINCREMENT)
-                        ); """
-        self.sql.execute(sql_Plugins_Events)
-
-        # syncHubNodeName column
-        plug_SyncHubNodeName_missing = self.sql.execute ("""
-            SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Plugins_Events') WHERE name='SyncHubNodeName'
-          """).fetchone()[0] == 0
-
-        if plug_SyncHubNodeName_missing :
-          mylog('verbose', ["[upgradeDB] Adding SyncHubNodeName to the Plugins_Events table"])
-          self.sql.execute("""
-            ALTER TABLE "Plugins_Events" ADD "SyncHubNodeName" TEXT
-          """)
-          
-        # helper columns HelpVal1-4
-        plug_HelpValues_missing = self.sql.execute ("""
-            SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Plugins_Events') WHERE name='HelpVal1'
-          """).fetchone()[0] == 0
-
-        if plug_HelpValues_missing :
-          mylog('verbose', ["[upgradeDB] Adding HelpVal1-4 to the Plugins_Events table"])
-          self.sql.execute('ALTER TABLE "Plugins_Events" ADD COLUMN "HelpVal1" TEXT')
-          self.sql.execute('ALTER TABLE "Plugins_Events" ADD COLUMN "HelpVal2" TEXT')
-          self.sql.execute('ALTER TABLE "Plugins_Events" ADD COLUMN "HelpVal3" TEXT')
-          self.sql.execute('ALTER TABLE "Plugins_Events" ADD COLUMN "HelpVal4" TEXT')
-
-
-        # Plugin execution history
-        sql_Plugins_History = """ CREATE TABLE IF NOT EXISTS Plugins_History(
-                                    "Index"	          INTEGER,
-                                    Plugin TEXT NOT NULL,
-                                    Object_PrimaryID TEXT NOT NULL,
-                                    Object_SecondaryID TEXT NOT NULL,
-                                    DateTimeCreated TEXT NOT NULL,
-                                    DateTimeChanged TEXT NOT NULL,
-                                    Watched_Value1 TEXT NOT NULL,
-                                    Watched_Value2 TEXT NOT NULL,
-                                    Watched_Value3 TEXT NOT NULL,
-                                    Watched_Value4 TEXT NOT NULL,
-                                    Status TEXT NOT NULL,
-                                    Extra TEXT NOT NULL,
-                                    UserData TEXT NOT NULL,
-                                    ForeignKey TEXT NOT NULL,
-                                    PRIMARY KEY("Index" AUTOINCREMENT)
-                        ); """
-        self.sql.execute(sql_Plugins_History)
-
-        # syncHubNodeName column
-        plug_SyncHubNodeName_missing = self.sql.execute ("""
-            SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Plugins_History') WHERE name='SyncHubNodeName'
-          """).fetchone()[0] == 0
-
-        if plug_SyncHubNodeName_missing :
-          mylog('verbose', ["[upgradeDB] Adding SyncHubNodeName to the Plugins_History table"])
-          self.sql.execute("""
-            ALTER TABLE "Plugins_History" ADD "SyncHubNodeName" TEXT
-          """)
-          
-        # helper columns HelpVal1-4
-        plug_HelpValues_missing = self.sql.execute ("""
-            SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Plugins_History') WHERE name='HelpVal1'
-          """).fetchone()[0] == 0
-
-        if plug_HelpValues_missing :
-          mylog('verbose', ["[upgradeDB] Adding HelpVal1-4 to the Plugins_History table"])
-          self.sql.execute('ALTER TABLE "Plugins_History" ADD COLUMN "HelpVal1" TEXT')
-          self.sql.execute('ALTER TABLE "Plugins_History" ADD COLUMN "HelpVal2" TEXT')
-          self.sql.execute('ALTER TABLE "Plugins_History" ADD COLUMN "HelpVal3" TEXT')
-          self.sql.execute('ALTER TABLE "Plugins_History" ADD COLUMN "HelpVal4" TEXT')
-
-
-        # -------------------------------------------------------------------------
-        # Plugins_Language_Strings table setup
-        # -------------------------------------------------------------------------
-
-        # Dynamically generated language strings
-        self.sql.execute("DROP TABLE IF EXISTS Plugins_Language_Strings;")
-        self.sql.execute(""" CREATE TABLE IF NOT EXISTS Plugins_Language_Strings(
-                                "Index"	          INTEGER,
-                                Language_Code TEXT NOT NULL,
-                                String_Key TEXT NOT NULL,
-                                String_Value TEXT NOT NULL,
-                                Extra TEXT NOT NULL,
-                                PRIMARY KEY("Index" AUTOINCREMENT)
-                        ); """)
+                # PRAGMA doesn't support parameters, version is an int from the list below
+                self.sql.execute(f"PRAGMA user_version = {int(version)}")
 
-        self.commitDB()        
-
- 
-
-        # -------------------------------------------------------------------------
-        # CurrentScan table setup
-        # -------------------------------------------------------------------------
-
-        # indicates, if CurrentScan table is available
-        # 🐛 CurrentScan DEBUG: comment out below when debugging to keep the CurrentScan table after restarts/scan finishes
-        self.sql.execute("DROP TABLE IF EXISTS CurrentScan;")
-        self.sql.execute(""" CREATE TABLE IF NOT EXISTS CurrentScan (                                
-                                cur_MAC STRING(50) NOT NULL COLLATE NOCASE,
-                                cur_IP STRING(50) NOT NULL COLLATE NOCASE,
-                                cur_Vendor STRING(250),
-                                cur_ScanMethod STRING(10),
-                                cur_Name STRING(250),
-                                cur_LastQuery STRING(250),
-                                cur_DateTime STRING(250),
-                                cur_SyncHubNodeName STRING(50),
-                                cur_NetworkSite STRING(250),
-                                cur_SSID STRING(250),
-                                cur_NetworkNodeMAC STRING(250),
-                                cur_PORT STRING(250),
-                                cur_Type STRING(250),
-                                UNIQUE(cur_MAC)
-                            );
-                        """)
+            applied = True
 
-        self.commitDB()        
+        if applied:
+            # gather statistics for new indexes so the query planner uses them
+            self.sql.execute("PRAGMA optimize")
 
-        # -------------------------------------------------------------------------
-        # Create the LatestEventsPerMAC view
-        # -------------------------------------------------------------------------
+        with self.transaction('upgradeDB'):
+            # Settings and Plugins_Language_Strings are rewritten by importConfigs
+            self.sql.execute("DELETE FROM Parameters")
 
-        # Dynamically generated language strings
-        self.sql.execute(""" CREATE VIEW IF NOT EXISTS LatestEventsPerMAC AS
-                                WITH RankedEvents AS (
-                                    SELECT 
-                                        e.*,
-                                        ROW_NUMBER() OVER (PARTITION BY e.eve_MAC ORDER BY e.eve_DateTime DESC) AS row_num
-                                    FROM Events AS e
-                                )
-                                SELECT 
-                                    e.*, 
-                                    d.*, 
-                                    c.*
-                                FROM RankedEvents AS e
-                                LEFT JOIN Devices AS d ON e.eve_MAC = d.dev_MAC
-                                INNER JOIN CurrentScan AS c ON e.eve_MAC = c.cur_MAC
-                                WHERE e.row_num = 1;
-                            """)
-
-        # handling the Convert_Events_to_Sessions / Sessions screens         
-        self.sql.execute("""DROP VIEW IF EXISTS Convert_Events_to_Sessions;""")
-        self.sql.execute("""CREATE VIEW Convert_Events_to_Sessions AS  SELECT EVE1.eve_MAC,
-                                      EVE1.eve_IP,
-                                      EVE1.eve_EventType AS eve_EventTypeConnection,
-                                      EVE1.eve_DateTime AS eve_DateTimeConnection,
-                                      CASE WHEN EVE2.eve_EventType IN ('Disconnected', 'Device Down') OR
-                                                EVE2.eve_EventType IS NULL THEN EVE2.eve_EventType ELSE '<missing event>' END AS eve_EventTypeDisconnection,
-                                      CASE WHEN EVE2.eve_EventType IN ('Disconnected', 'Device Down') THEN EVE2.eve_DateTime ELSE NULL END AS eve_DateTimeDisconnection,
-                                      CASE WHEN EVE2.eve_EventType IS NULL THEN 1 ELSE 0 END AS eve_StillConnected,
-                                      EVE1.eve_AdditionalInfo
-                                  FROM Events AS EVE1
-                                      LEFT JOIN
-                                      Events AS EVE2 ON EVE1.eve_PairEventRowID = EVE2.RowID
-                                WHERE EVE1.eve_EventType IN ('New Device', 'Connected','Down Reconnected')
-                            UNION
-                                SELECT eve_MAC,
-                                      eve_IP,
-                                      '<missing event>' AS eve_EventTypeConnection,
-                                      NULL AS eve_DateTimeConnection,
-                                      eve_EventType AS eve_EventTypeDisconnection,
-                                      eve_DateTime AS eve_DateTimeDisconnection,
-                                      0 AS eve_StillConnected,
-                                      eve_AdditionalInfo
-                                  FROM Events AS EVE1
-                                WHERE (eve_EventType = 'Device Down' OR
-                                        eve_EventType = 'Disconnected') AND
-                                      EVE1.eve_PairEventRowID IS NULL;
-                          """)
-
-        self.commitDB()     
-        
-        # Init the AppEvent database table
-        AppEvent_obj(self)
-
-        # -------------------------------------------------------------------------
-        #  DELETING OBSOLETE TABLES - to remove with updated db file after 9/9/2024
-        # -------------------------------------------------------------------------        
-
-        # Deletes obsolete ScanCycles
-        self.sql.execute(""" DROP TABLE IF EXISTS ScanCycles;""")
-        self.sql.execute(""" DROP TABLE IF EXISTS DHCP_Leases;""")
-        self.sql.execute(""" DROP TABLE IF EXISTS PiHole_Network;""")
-
-        self.commitDB()
-
-        # -------------------------------------------------------------------------
-        #  DELETING OBSOLETE TABLES - to remove with updated db file after 9/9/2024
-        # -------------------------------------------------------------------------
+            # 🐛 CurrentScan DEBUG: comment out below when debugging to keep the CurrentScan table after restarts/scan finishes
+            self.sql.execute("DELETE FROM CurrentScan")
+
+            # SQL query to update missing dev_GUID
+            self.sql.execute(f'''
+                UPDATE Devices
+                SET dev_GUID = {sql_generateGuid}
+                WHERE dev_GUID IS NULL
+            ''')
 
+            # after the updates above, they aren't changes of the running process
+            self.sql.execute("DELETE FROM AppEvents")
+            self.sql.execute("DELETE FROM AppEvents_Pending")
+            self.sql.execute("DELETE FROM AppEvents_Stats")
 
     #-------------------------------------------------------------------------------
     def get_table_as_json(self, sqlQuery):
@@ -687,6 +305,625 @@ class DB():
 
 
 
+#===============================================================================
+# Schema migrations
+#===============================================================================
+#
+# Applied in order by DB.upgradeDB, each in one transaction together with the new
+# PRAGMA user_version, so a start with an up-to-date database only reads the version.
+# Databases created before the migrations start at version 0 and replay version 1,
+# so its steps check before they change anything. Never edit an applied version,
+# add a new one instead.
+
+#-------------------------------------------------------------------------------
+def migrate_legacy_schema(db):
+    """ Everything upgradeDB used to check and re-create on every start """
+
+    # indicates, if Online_History table is available
+    onlineHistoryAvailable = db.sql.execute("""
+        SELECT name FROM sqlite_master WHERE type='table'
+            AND name='Online_History';
+    """).fetchall() != []
+
+    # Check if it is incompatible (Check if table has all required columns)
+    isIncompatible = False
+
+    if onlineHistoryAvailable :
+      isIncompatible = db.sql.execute ("""
+            SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Online_History') WHERE name='Archived_Devices'
+        """).fetchone()[0] == 0
+
+    # Drop table if available, but incompatible
+    if onlineHistoryAvailable and isIncompatible:
+      mylog('none','[upgradeDB] Table is incompatible, Dropping the Online_History table')
+      db.sql.execute("DROP TABLE Online_History;")
+      onlineHistoryAvailable = False
+
+    if onlineHistoryAvailable == False :
+      db.sql.execute("""
+      CREATE TABLE "Online_History" (
+        "Index"	INTEGER,
+        "Scan_Date"	TEXT,
+        "Online_Devices"	INTEGER,
+        "Down_Devices"	INTEGER,
+        "All_Devices"	INTEGER,
+        "Archived_Devices" INTEGER,
+        PRIMARY KEY("Index" AUTOINCREMENT)
+      );
+      """)
+
+    # Offline_Devices column
+    Offline_Devices_missing = db.sql.execute ("""
+        SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Online_History') WHERE name='Offline_Devices'
+      """).fetchone()[0] == 0
+
+    if Offline_Devices_missing :
+      mylog('verbose', ["[upgradeDB] Adding Offline_Devices to the Online_History table"])
+      db.sql.execute("""
+        ALTER TABLE "Online_History" ADD "Offline_Devices" INTEGER
+      """)
+
+
+    # -------------------------------------------------------------------------
+    # Alter Devices table       
+    # -------------------------------------------------------------------------
+    # dev_Network_Node_MAC_ADDR column
+    dev_Network_Node_MAC_ADDR_missing = db.sql.execute ("""
+        SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Devices') WHERE name='dev_Network_Node_MAC_ADDR'
+      """).fetchone()[0] == 0
+
+    if dev_Network_Node_MAC_ADDR_missing :
+      mylog('verbose', ["[upgradeDB] Adding dev_Network_Node_MAC_ADDR to the Devices table"])
+      db.sql.execute("""
+        ALTER TABLE "Devices" ADD "dev_Network_Node_MAC_ADDR" TEXT
+      """)
+
+    # dev_Network_Node_port column
+    dev_Network_Node_port_missing = db.sql.execute ("""
+        SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Devices') WHERE name='dev_Network_Node_port'
+      """).fetchone()[0] == 0
+
+    if dev_Network_Node_port_missing :
+      mylog('verbose', ["[upgradeDB] Adding dev_Network_Node_port to the Devices table"])
+      db.sql.execute("""
+        ALTER TABLE "Devices" ADD "dev_Network_Node_port" INTEGER
+      """)
+
+    # dev_Icon column
+    dev_Icon_missing = db.sql.execute ("""
+        SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Devices') WHERE name='dev_Icon'
+      """).fetchone()[0] == 0
+
+    if dev_Icon_missing :
+      mylog('verbose', ["[upgradeDB] Adding dev_Icon to the Devices table"])
+      db.sql.execute("""
+        ALTER TABLE "Devices" ADD "dev_Icon" TEXT
+      """)
+
+    # dev_GUID column
+    dev_GUID_missing = db.sql.execute ("""
+        SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Devices') WHERE name='dev_GUID'
+      """).fetchone()[0] == 0
+
+    if dev_GUID_missing :
+      mylog('verbose', ["[upgradeDB] Adding dev_GUID to the Devices table"])
+      db.sql.execute("""
+        ALTER TABLE "Devices" ADD "dev_GUID" TEXT
+      """)
+
+    # dev_NetworkSite column
+    dev_NetworkSite_missing = db.sql.execute ("""
+        SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Devices') WHERE name='dev_NetworkSite'
+      """).fetchone()[0] == 0
+
+    if dev_NetworkSite_missing :
+      mylog('verbose', ["[upgradeDB] Adding dev_NetworkSite to the Devices table"])
+      db.sql.execute("""
+        ALTER TABLE "Devices" ADD "dev_NetworkSite" TEXT
+      """)
+
+    # dev_SSID column
+    dev_SSID_missing = db.sql.execute ("""
+        SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Devices') WHERE name='dev_SSID'
+      """).fetchone()[0] == 0
+
+    if dev_SSID_missing :
+      mylog('verbose', ["[upgradeDB] Adding dev_SSID to the Devices table"])
+      db.sql.execute("""
+        ALTER TABLE "Devices" ADD "dev_SSID" TEXT
+      """)
+
+    # dev_SyncHubNodeName column
+    dev_SyncHubNodeName_missing = db.sql.execute ("""
+        SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Devices') WHERE name='dev_SyncHubNodeName'
+      """).fetchone()[0] == 0
+
+    if dev_SyncHubNodeName_missing :
+      mylog('verbose', ["[upgradeDB] Adding dev_SyncHubNodeName to the Devices table"])
+      db.sql.execute("""
+        ALTER TABLE "Devices" ADD "dev_SyncHubNodeName" TEXT
+      """)
+
+    # dev_SourcePlugin column
+    dev_SourcePlugin_missing = db.sql.execute ("""
+        SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Devices') WHERE name='dev_SourcePlugin'
+      """).fetchone()[0] == 0
+
+    if dev_SourcePlugin_missing :
+      mylog('verbose', ["[upgradeDB] Adding dev_SourcePlugin to the Devices table"])
+      db.sql.execute("""
+        ALTER TABLE "Devices" ADD "dev_SourcePlugin" TEXT
+      """)
+
+    # -------------------------------------------------------------------------
+    # Settings table setup
+    # -------------------------------------------------------------------------
+
+
+    # Re-creating Settings table
+    mylog('verbose', ["[upgradeDB] Re-creating Settings table"])
+
+    db.sql.execute(""" DROP TABLE IF EXISTS Settings;""")
+    db.sql.execute("""
+        CREATE TABLE "Settings" (
+        "Code_Name"	      TEXT,
+        "Display_Name"	  TEXT,
+        "Description"	    TEXT,
+        "Type"            TEXT,
+        "Options"         TEXT,
+        "RegEx"           TEXT,
+        "Group"	          TEXT,
+        "Value"	          TEXT,
+        "Events"	        TEXT,
+        "OverriddenByEnv" INTEGER
+        );
+        """)
+
+
+    # -------------------------------------------------------------------------
+    # Pholus_Scan table setup
+    # -------------------------------------------------------------------------
+
+    # Create Pholus_Scan table if missing
+    mylog('verbose', ["[upgradeDB] Re-creating Pholus_Scan table"])
+    db.sql.execute("""CREATE TABLE IF NOT EXISTS "Pholus_Scan" (
+        "Index"	          INTEGER,
+        "Info"	          TEXT,
+        "Time"	          TEXT,
+        "MAC"	          TEXT,
+        "IP_v4_or_v6"	  TEXT,
+        "Record_Type"	  TEXT,
+        "Value"           TEXT,
+        "Extra"           TEXT,
+        PRIMARY KEY("Index" AUTOINCREMENT)
+    );
+    """)
+
+
+    # -------------------------------------------------------------------------
+    # Parameters table setup
+    # -------------------------------------------------------------------------
+
+    # Re-creating Parameters table
+    mylog('verbose', ["[upgradeDB] Re-creating Parameters table"])
+    db.sql.execute("DROP TABLE Parameters;")
+
+    db.sql.execute("""
+      CREATE TABLE "Parameters" (
+        "par_ID" TEXT PRIMARY KEY,
+        "par_Value"	TEXT
+      );
+      """)        
+
+    # -------------------------------------------------------------------------
+    # Nmap_Scan table setup DEPRECATED after 9/9/2024
+    # -------------------------------------------------------------------------
+
+    # indicates, if Nmap_Scan table is available
+    nmapScanMissing = db.sql.execute("""
+    SELECT name FROM sqlite_master WHERE type='table'
+    AND name='Nmap_Scan';
+    """).fetchone() == None
+
+    if nmapScanMissing == False:
+        # move data into the PLugins_Objects table
+        db.sql.execute("""INSERT INTO Plugins_Objects (
+                                Plugin,
+                                Object_PrimaryID,
+                                Object_SecondaryID,
+                                DateTimeCreated,
+                                DateTimeChanged,
+                                Watched_Value1,
+                                Watched_Value2,
+                                Watched_Value3,
+                                Watched_Value4,
+                                Status,
+                                Extra,
+                                UserData,
+                                ForeignKey
+                            )
+                            SELECT
+                                'NMAP' AS Plugin,
+                                MAC AS Object_PrimaryID,
+                                Port AS Object_SecondaryID,
+                                Time AS DateTimeCreated,
+                                DATETIME('now') AS DateTimeChanged,
+                                State AS Watched_Value1,
+                                Service AS Watched_Value2,
+                                '' AS Watched_Value3,
+                                '' AS Watched_Value4,
+                                'watched-not-changed' AS Status,
+                                Extra AS Extra,
+                                Extra AS UserData,
+                                MAC AS ForeignKey
+                            FROM Nmap_Scan;""")
+
+        # Delete the Nmap_Scan table
+        db.sql.execute("DROP TABLE Nmap_Scan;")
+        nmapScanMissing = True
+
+    # -------------------------------------------------------------------------
+    # Nmap_Scan table setup DEPRECATED after 9/9/2024 cleanup above
+    # -------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------
+    # Icon format migration table setup DEPRECATED after 9/9/2024 cleanup below
+    # -------------------------------------------------------------------------
+
+    sql_Icons = """ UPDATE Devices SET dev_Icon = '<i class="fa fa-' || dev_Icon || '"></i>'
+            WHERE dev_Icon NOT LIKE '<i class="fa fa-%'
+            AND dev_Icon NOT LIKE '<svg%' 
+            AND dev_Icon NOT LIKE 'PGkg%' 
+            AND dev_Icon NOT LIKE 'PHN%' 
+            AND dev_Icon NOT IN ('', 'null')
+             """
+    db.sql.execute(sql_Icons)
+    db.commitDB()      
+
+    # Base64 conversion
+
+    db.sql.execute("SELECT dev_MAC, dev_Icon FROM Devices WHERE dev_Icon like '<%' ")
+    icons = db.sql.fetchall()
+
+
+    # Loop through the icons, encode them, and update the database
+    for icon_tuple in icons:
+        icon = icon_tuple[1]
+
+        # Encode the icon as base64
+        encoded_icon = base64.b64encode(icon.encode('utf-8')).decode('ascii')
+        # Update the database with the encoded icon
+        sql_update = f"""
+            UPDATE Devices
+            SET dev_Icon = '{encoded_icon}'
+            WHERE dev_MAC = '{icon_tuple[0]}'
+        """
+
+        db.sql.execute(sql_update)
+
+    # -------------------------------------------------------------------------
+    # Icon format migration table setup DEPRECATED after 9/9/2024 cleanup above
+    # -------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------
+    # Plugins tables setup
+    # -------------------------------------------------------------------------
+
+    # Plugin state
+    sql_Plugins_Objects = """ CREATE TABLE IF NOT EXISTS Plugins_Objects(
+                                "Index"	          INTEGER,
+                                Plugin TEXT NOT NULL,
+                                Object_PrimaryID TEXT NOT NULL,
+                                Object_SecondaryID TEXT NOT NULL,
+                                DateTimeCreated TEXT NOT NULL,
+                                DateTimeChanged TEXT NOT NULL,
+                                Watched_Value1 TEXT NOT NULL,
+                                Watched_Value2 TEXT NOT NULL,
+                                Watched_Value3 TEXT NOT NULL,
+                                Watched_Value4 TEXT NOT NULL,
+                                Status TEXT NOT NULL,
+                                Extra TEXT NOT NULL,
+                                UserData TEXT NOT NULL,
+                                ForeignKey TEXT NOT NULL,
+                                PRIMARY KEY("Index" AUTOINCREMENT)
+                    ); """
+    db.sql.execute(sql_Plugins_Objects)
+
+    # syncHubNodeName column
+    plug_SyncHubNodeName_missing = db.sql.execute ("""
+        SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Plugins_Objects') WHERE name='SyncHubNodeName'
+      """).fetchone()[0] == 0
+
+    if plug_SyncHubNodeName_missing :
+      mylog('verbose', ["[upgradeDB] Adding SyncHubNodeName to the Plugins_Objects table"])
+      db.sql.execute("""
+        ALTER TABLE "Plugins_Objects" ADD "SyncHubNodeName" TEXT
+      """)
+
+    # helper columns HelpVal1-4
+    plug_HelpValues_missing = db.sql.execute ("""
+        SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Plugins_Objects') WHERE name='HelpVal1'
+      """).fetchone()[0] == 0
+
+    if plug_HelpValues_missing :
+      mylog('verbose', ["[upgradeDB] Adding HelpVal1-4 to the Plugins_Objects table"])
+      db.sql.execute('ALTER TABLE "Plugins_Objects" ADD COLUMN "HelpVal1" TEXT')
+      db.sql.execute('ALTER TABLE "Plugins_Objects" ADD COLUMN "HelpVal2" TEXT')
+      db.sql.execute('ALTER TABLE "Plugins_Objects" ADD COLUMN "HelpVal3" TEXT')
+      db.sql.execute('ALTER TABLE "Plugins_Objects" ADD COLUMN "HelpVal4" TEXT')
+
+    # Plugin execution results
+    sql_Plugins_Events = """ CREATE TABLE IF NOT EXISTS Plugins_Events(
+                                "Index"	          INTEGER,
+                                Plugin TEXT NOT NULL,
+                                Object_PrimaryID TEXT NOT NULL,
+                                Object_SecondaryID TEXT NOT NULL,
+                                DateTimeCreated TEXT NOT NULL,
+                                DateTimeChanged TEXT NOT NULL,
+                                Watched_Value1 TEXT NOT NULL,
+                                Watched_Value2 TEXT NOT NULL,
+                                Watched_Value3 TEXT NOT NULL,
+                                Watched_Value4 TEXT NOT NULL,
+                                Status TEXT NOT NULL,
+                                Extra TEXT NOT NULL,
+                                UserData TEXT NOT NULL,
+                                ForeignKey TEXT NOT NULL,
+                                PRIMARY KEY("Index" AUTOINCREMENT)
+                    ); """
+    db.sql.execute(sql_Plugins_Events)
+
+    # syncHubNodeName column
+    plug_SyncHubNodeName_missing = db.sql.execute ("""
+        SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Plugins_Events') WHERE name='SyncHubNodeName'
+      """).fetchone()[0] == 0
+
+    if plug_SyncHubNodeName_missing :
+      mylog('verbose', ["[upgradeDB] Adding SyncHubNodeName to the Plugins_Events table"])
+      db.sql.execute("""
+        ALTER TABLE "Plugins_Events" ADD "SyncHubNodeName" TEXT
+      """)
+
+    # helper columns HelpVal1-4
+    plug_HelpValues_missing = db.sql.execute ("""
+        SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Plugins_Events') WHERE name='HelpVal1'
+      """).fetchone()[0] == 0
+
+    if plug_HelpValues_missing :
+      mylog('verbose', ["[upgradeDB] Adding HelpVal1-4 to the Plugins_Events table"])
+      db.sql.execute('ALTER TABLE "Plugins_Events" ADD COLUMN "HelpVal1" TEXT')
+      db.sql.execute('ALTER TABLE "Plugins_Events" ADD COLUMN "HelpVal2" TEXT')
+      db.sql.execute('ALTER TABLE "Plugins_Events" ADD COLUMN "HelpVal3" TEXT')
+      db.sql.execute('ALTER TABLE "Plugins_Events" ADD COLUMN "HelpVal4" TEXT')
+
+
+    # Plugin execution history
+    sql_Plugins_History = """ CREATE TABLE IF NOT EXISTS Plugins_History(
+                                "Index"	          INTEGER,
+                                Plugin TEXT NOT NULL,
+                                Object_PrimaryID TEXT NOT NULL,
+                                Object_SecondaryID TEXT NOT NULL,
+                                DateTimeCreated TEXT NOT NULL,
+                                DateTimeChanged TEXT NOT NULL,
+                                Watched_Value1 TEXT NOT NULL,
+                                Watched_Value2 TEXT NOT NULL,
+                                Watched_Value3 TEXT NOT NULL,
+                                Watched_Value4 TEXT NOT NULL,
+                                Status TEXT NOT NULL,
+                                Extra TEXT NOT NULL,
+                                UserData TEXT NOT NULL,
+                                ForeignKey TEXT NOT NULL,
+                                PRIMARY KEY("Index" AUTOINCREMENT)
+                    ); """
+    db.sql.execute(sql_Plugins_History)
+
+    # syncHubNodeName column
+    plug_SyncHubNodeName_missing = db.sql.execute ("""
+        SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Plugins_History') WHERE name='SyncHubNodeName'
+      """).fetchone()[0] == 0
+
+    if plug_SyncHubNodeName_missing :
+      mylog('verbose', ["[upgradeDB] Adding SyncHubNodeName to the Plugins_History table"])
+      db.sql.execute("""
+        ALTER TABLE "Plugins_History" ADD "SyncHubNodeName" TEXT
+      """)
+
+    # helper columns HelpVal1-4
+    plug_HelpValues_missing = db.sql.execute ("""
+        SELECT COUNT(*) AS CNTREC FROM pragma_table_info('Plugins_History') WHERE name='HelpVal1'
+      """).fetchone()[0] == 0
+
+    if plug_HelpValues_missing :
+      mylog('verbose', ["[upgradeDB] Adding HelpVal1-4 to the Plugins_History table"])
+      db.sql.execute('ALTER TABLE "Plugins_History" ADD COLUMN "HelpVal1" TEXT')
+      db.sql.execute('ALTER TABLE "Plugins_History" ADD COLUMN "HelpVal2" TEXT')
+      db.sql.execute('ALTER TABLE "Plugins_History" ADD COLUMN "HelpVal3" TEXT')
+      db.sql.execute('ALTER TABLE "Plugins_History" ADD COLUMN "HelpVal4" TEXT')
+
+
+    # -------------------------------------------------------------------------
+    # Plugins_Language_Strings table setup
+    # -------------------------------------------------------------------------
+
+    # Dynamically generated language strings
+    db.sql.execute("DROP TABLE IF EXISTS Plugins_Language_Strings;")
+    db.sql.execute(""" CREATE TABLE IF NOT EXISTS Plugins_Language_Strings(
+                            "Index"	          INTEGER,
+                            Language_Code TEXT NOT NULL,
+                            String_Key TEXT NOT NULL,
+                            String_Value TEXT NOT NULL,
+                            Extra TEXT NOT NULL,
+                            PRIMARY KEY("Index" AUTOINCREMENT)
+                    ); """)
+
+    db.commitDB()        
+
+
+
+    # -------------------------------------------------------------------------
+    # CurrentScan table setup
+    # -------------------------------------------------------------------------
+
+    # indicates, if CurrentScan table is available
+    # 🐛 CurrentScan DEBUG: comment out below when debugging to keep the CurrentScan table after restarts/scan finishes
+    db.sql.execute("DROP TABLE IF EXISTS CurrentScan;")
+    db.sql.execute(""" CREATE TABLE IF NOT EXISTS CurrentScan (                                
+                            cur_MAC STRING(50) NOT NULL COLLATE NOCASE,
+                            cur_IP STRING(50) NOT NULL COLLATE NOCASE,
+                            cur_Vendor STRING(250),
+                            cur_ScanMethod STRING(10),
+                            cur_Name STRING(250),
+                            cur_LastQuery STRING(250),
+                            cur_DateTime STRING(250),
+                            cur_SyncHubNodeName STRING(50),
+                            cur_NetworkSite STRING(250),
+                            cur_SSID STRING(250),
+                            cur_NetworkNodeMAC STRING(250),
+                            cur_PORT STRING(250),
+                            cur_Type STRING(250),
+                            UNIQUE(cur_MAC)
+                        );
+                    """)
+
+    db.commitDB()        
+
+    # -------------------------------------------------------------------------
+    # Create the LatestEventsPerMAC view
+    # -------------------------------------------------------------------------
+
+    # Dynamically generated language strings
+    db.sql.execute(""" CREATE VIEW IF NOT EXISTS LatestEventsPerMAC AS
+                            WITH RankedEvents AS (
+                                SELECT 
+                                    e.*,
+                                    ROW_NUMBER() OVER (PARTITION BY e.eve_MAC ORDER BY e.eve_DateTime DESC) AS row_num
+                                FROM Events AS e
+                            )
+                            SELECT 
+                                e.*, 
+                                d.*, 
+                                c.*
+                            FROM RankedEvents AS e
+                            LEFT JOIN Devices AS d ON e.eve_MAC = d.dev_MAC
+                            INNER JOIN CurrentScan AS c ON e.eve_MAC = c.cur_MAC
+                            WHERE e.row_num = 1;
+                        """)
+
+    # handling the Convert_Events_to_Sessions / Sessions screens         
+    db.sql.execute("""DROP VIEW IF EXISTS Convert_Events_to_Sessions;""")
+    db.sql.execute("""CREATE VIEW Convert_Events_to_Sessions AS  SELECT EVE1.eve_MAC,
+                                  EVE1.eve_IP,
+                                  EVE1.eve_EventType AS eve_EventTypeConnection,
+                                  EVE1.eve_DateTime AS eve_DateTimeConnection,
+                                  CASE WHEN EVE2.eve_EventType IN ('Disconnected', 'Device Down') OR
+                                            EVE2.eve_EventType IS NULL THEN EVE2.eve_EventType ELSE '<missing event>' END AS eve_EventTypeDisconnection,
+                                  CASE WHEN EVE2.eve_EventType IN ('Disconnected', 'Device Down') THEN EVE2.eve_DateTime ELSE NULL END AS eve_DateTimeDisconnection,
+                                  CASE WHEN EVE2.eve_EventType IS NULL THEN 1 ELSE 0 END AS eve_StillConnected,
+                                  EVE1.eve_AdditionalInfo
+                              FROM Events AS EVE1
+                                  LEFT JOIN
+                                  Events AS EVE2 ON EVE1.eve_PairEventRowID = EVE2.RowID
+                            WHERE EVE1.eve_EventType IN ('New Device', 'Connected','Down Reconnected')
+                        UNION
+                            SELECT eve_MAC,
+                                  eve_IP,
+                                  '<missing event>' AS eve_EventTypeConnection,
+                                  NULL AS eve_DateTimeConnection,
+                                  eve_EventType AS eve_EventTypeDisconnection,
+                                  eve_DateTime AS eve_DateTimeDisconnection,
+                                  0 AS eve_StillConnected,
+                                  eve_AdditionalInfo
+                              FROM Events AS EVE1
+                            WHERE (eve_EventType = 'Device Down' OR
+                                    eve_EventType = 'Disconnected') AND
+                                  EVE1.eve_PairEventRowID IS NULL;
+                      """)
+
+    db.commitDB()
+
+    # Init the AppEvent database table
+    AppEvent_obj(db)
+
+    # -------------------------------------------------------------------------
+    #  DELETING OBSOLETE TABLES - to remove with updated db file after 9/9/2024
+    # -------------------------------------------------------------------------        
+
+    # Deletes obsolete ScanCycles
+    db.sql.execute(""" DROP TABLE IF EXISTS ScanCycles;""")
+    db.sql.execute(""" DROP TABLE IF EXISTS DHCP_Leases;""")
+    db.sql.execute(""" DROP TABLE IF EXISTS PiHole_Network;""")
+
+    db.commitDB()
+
+    # -------------------------------------------------------------------------
+    #  DELETING OBSOLETE TABLES - to remove with updated db file after 9/9/2024
+    # -------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+def create_indexes(db):
+    for statement in sql_indexes:
+        db.sql.execute(statement)
+
+#-------------------------------------------------------------------------------
+def create_sessions_pending(db):
+
+    # -------------------------------------------------------------------------
+    # Sessions_Pending - Events changes not yet applied to the Sessions snapshot
+    # -------------------------------------------------------------------------
+
+    # Every insert / update / delete on Events records the MAC and the earliest
+    # eve_DateTime whose session rows may have changed. This includes events
+    # pointing at the changed row via eve_PairEventRowid, as their session row
+    # shows the disconnection of the changed row. Changes made by the UI or
+    # plugins (e.g. db_cleanup) are tracked the same way as the ones from a scan.
+    db.sql.execute(""" CREATE TABLE IF NOT EXISTS Sessions_Pending (
+                            pen_MAC STRING(50) NOT NULL COLLATE NOCASE PRIMARY KEY,
+                            pen_DateTime DATETIME NOT NULL
+                        ); """)
+
+    sql_pending_upsert = "ON CONFLICT(pen_MAC) DO UPDATE SET pen_DateTime = MIN(pen_DateTime, excluded.pen_DateTime)"
+
+    def sql_pending_event(row):
+        return f"""
+            INSERT INTO Sessions_Pending (pen_MAC, pen_DateTime)
+                VALUES ({row}.eve_MAC, {row}.eve_DateTime) {sql_pending_upsert};
+            INSERT INTO Sessions_Pending (pen_MAC, pen_DateTime)
+                SELECT eve_MAC, MIN(eve_DateTime) FROM Events
+                WHERE eve_PairEventRowid = {row}.RowID
+                GROUP BY eve_MAC {sql_pending_upsert};
+        """
+
+    db.sql.execute('DROP TRIGGER IF EXISTS trg_sessions_insert_event;')
+    db.sql.execute('DROP TRIGGER IF EXISTS trg_sessions_update_event;')
+    db.sql.execute('DROP TRIGGER IF EXISTS trg_sessions_delete_event;')
+
+    db.sql.execute(f""" CREATE TRIGGER trg_sessions_insert_event AFTER INSERT ON Events
+                          BEGIN {sql_pending_event('NEW')} END; """)
+    # skip updates not affecting sessions, e.g. eve_PendingAlertEmail or re-pairing with the same value
+    db.sql.execute(f""" CREATE TRIGGER trg_sessions_update_event AFTER UPDATE ON Events
+                          WHEN OLD.eve_MAC IS NOT NEW.eve_MAC
+                            OR OLD.eve_IP IS NOT NEW.eve_IP
+                            OR OLD.eve_DateTime IS NOT NEW.eve_DateTime
+                            OR OLD.eve_EventType IS NOT NEW.eve_EventType
+                            OR OLD.eve_AdditionalInfo IS NOT NEW.eve_AdditionalInfo
+                            OR OLD.eve_PairEventRowid IS NOT NEW.eve_PairEventRowid
+                          BEGIN {sql_pending_event('OLD')} {sql_pending_event('NEW')} END; """)
+    db.sql.execute(f""" CREATE TRIGGER trg_sessions_delete_event AFTER DELETE ON Events
+                          BEGIN {sql_pending_event('OLD')} END; """)
+
+    db.commitDB()
+
+#-------------------------------------------------------------------------------
+schema_migrations = [
+    (1, [migrate_legacy_schema, create_indexes]),
+    (2, [create_sessions_pending]),
+    # conditional AppEvents triggers collecting the events in AppEvents_Pending
+    (3, [create_app_events_triggers]),
+    # run history of the script plugins for the adaptive timeouts
+    (4, [create_plugin_runs_table]),
+    # units (timeout multiplier) of the plugin runs
+    (5, [add_plugin_runs_units]),
+]
+
 #-------------------------------------------------------------------------------
 def get_device_stats(db):
     # columns = ["online","down","all","archived","new","unknown"]
@@ -1,12 +1,15 @@
 
 import subprocess
+import sqlite3
 
 import conf
 import os
 import re
-from helper import timeNowTZ, get_setting, get_setting_value, list_to_where, resolve_device_name_dig, resolve_device_name_pholus, get_device_name_nbtlookup, get_device_name_nslookup, get_device_name_mdns, check_IP_format, sanitize_SQL_input
+from helper import timeNowTZ, get_setting, get_setting_value, list_to_where, resolve_device_names_dns, resolve_device_name_pholus, index_pholus_results, load_device_name_sources, get_device_name_from_source, check_IP_format, sanitize_SQL_input
 from logger import mylog, print_log
-from const import vendorsPath, vendorsPathNewest, sql_generateGuid
+from const import sql_generateGuid
+from vendor_index import lookup_vendors
+from appevent import count_pending_app_events, count_suppressed_app_events
 
 #-------------------------------------------------------------------------------
 # Device object handling (WIP)
@@ -290,199 +293,116 @@ def create_new_devices (db):
     db.commitDB()
 
 
+#-------------------------------------------------------------------------------
+# Devices <- CurrentScan merge
+#-------------------------------------------------------------------------------
+
+def sql_is_empty(column):
+    return f"({column} IS NULL OR {column} IN ('', 'null'))"
+
+# Column -> new value, evaluated against the device's CurrentScan row. All rules are
+# applied in one pass over the scanned devices.
+sql_merge_rules = [
+    # Last Connection, only when the device comes back
+    ('dev_LastConnection',        "CASE WHEN dev_PresentLastScan = 0 THEN ? ELSE dev_LastConnection END"),
+    ('dev_PresentLastScan',       "1"),
+    # cur_IP -> dev_LastIP (always updated)
+    ('dev_LastIP',                "cur_IP"),
+    # cur_Vendor -> (if empty) dev_Vendor
+    ('dev_Vendor',                f"CASE WHEN {sql_is_empty('dev_Vendor')} THEN cur_Vendor ELSE dev_Vendor END"),
+    # (if not empty) cur_Port -> dev_Network_Node_port
+    ('dev_Network_Node_port',     f"CASE WHEN NOT {sql_is_empty('cur_Port')} THEN cur_Port ELSE dev_Network_Node_port END"),
+    # (if not empty) cur_NetworkNodeMAC -> dev_Network_Node_MAC_ADDR
+    ('dev_Network_Node_MAC_ADDR', f"CASE WHEN NOT {sql_is_empty('cur_NetworkNodeMAC')} THEN cur_NetworkNodeMAC ELSE dev_Network_Node_MAC_ADDR END"),
+    # (if not empty) cur_NetworkSite -> (if empty) dev_NetworkSite
+    ('dev_NetworkSite',           f"CASE WHEN {sql_is_empty('dev_NetworkSite')} AND NOT {sql_is_empty('cur_NetworkSite')} THEN cur_NetworkSite ELSE dev_NetworkSite END"),
+    # (if not empty) cur_SSID -> (if empty) dev_SSID
+    ('dev_SSID',                  f"CASE WHEN {sql_is_empty('dev_SSID')} AND NOT {sql_is_empty('cur_SSID')} THEN cur_SSID ELSE dev_SSID END"),
+    # (if not empty) cur_Type -> (if empty) dev_DeviceType
+    ('dev_DeviceType',            f"CASE WHEN {sql_is_empty('dev_DeviceType')} AND NOT {sql_is_empty('cur_Type')} THEN cur_Type ELSE dev_DeviceType END"),
+    # (if not empty) cur_Name -> (if unknown) dev_Name
+    ('dev_Name',                  """CASE WHEN (dev_Name IN ('(unknown)', '(name not found)', '') OR dev_Name IS NULL)
+                                           AND NOT {0} THEN cur_Name ELSE dev_Name END""".format(sql_is_empty('cur_Name'))),
+]
+
+#-------------------------------------------------------------------------------
+def sql_merge_scan_into_devices(sqliteVersion = sqlite3.sqlite_version_info):
+    """ Single statement applying sql_merge_rules, UPDATE ... FROM needs SQLite 3.33 """
+
+    if sqliteVersion >= (3, 33, 0):
+        assignments = ',\n                '.join([f'{column} = {value}' for column, value in sql_merge_rules])
+
+        return f"""UPDATE Devices SET
+                {assignments}
+            FROM CurrentScan
+            WHERE dev_MAC = cur_MAC"""
+
+    # older SQLite: one correlated lookup per device assigning all columns at once (row values, 3.15)
+    columns = ', '.join([column for column, value in sql_merge_rules])
+    values  = ',\n                    '.join([value for column, value in sql_merge_rules])
+
+    return f"""UPDATE Devices SET ({columns}) = (
+                SELECT
+                    {values}
+                FROM CurrentScan WHERE dev_MAC = cur_MAC)
+            WHERE dev_MAC IN (SELECT cur_MAC FROM CurrentScan)"""
+
 #-------------------------------------------------------------------------------
 def update_devices_data_from_scan (db):
     sql = db.sql #TO-DO    
     startTime = timeNowTZ().strftime('%Y-%m-%d %H:%M:%S')
 
-    # Update Last Connection
-    mylog('debug', '[Update Devices] 1 Last Connection')
-    sql.execute(f"""UPDATE Devices SET dev_LastConnection = '{startTime}',
-                        dev_PresentLastScan = 1
-                    WHERE dev_PresentLastScan = 0
-                      AND EXISTS (SELECT 1 FROM CurrentScan 
-                                  WHERE dev_MAC = cur_MAC) """)
-
     # Clean no active devices
-    mylog('debug', '[Update Devices] 2 Clean no active devices')
+    mylog('debug', '[Update Devices] 1 Clean no active devices')
     sql.execute("""UPDATE Devices SET dev_PresentLastScan = 0
-                    WHERE NOT EXISTS (SELECT 1 FROM CurrentScan 
+                    WHERE dev_PresentLastScan IS NOT 0
+                      AND NOT EXISTS (SELECT 1 FROM CurrentScan 
                                       WHERE dev_MAC = cur_MAC) """)
 
-    # Update IP 
-    mylog('debug', '[Update Devices] - cur_IP -> dev_LastIP (always updated)')
-    sql.execute("""UPDATE Devices
-                    SET dev_LastIP = (SELECT cur_IP FROM CurrentScan
-                                      WHERE dev_MAC = cur_MAC)
-                    WHERE EXISTS (SELECT 1 FROM CurrentScan
-                                  WHERE dev_MAC = cur_MAC) """)
-
-    # Update only devices with empty or NULL vendors
-    mylog('debug', '[Update Devices] - cur_Vendor -> (if empty) dev_Vendor')
-    sql.execute("""UPDATE Devices
-                    SET dev_Vendor = (
-                        SELECT cur_Vendor
-                        FROM CurrentScan
-                        WHERE Devices.dev_MAC = CurrentScan.cur_MAC
-                    )
-                    WHERE 
-                        (dev_Vendor IS NULL OR dev_Vendor IN ("", "null"))
-                        AND EXISTS (
-                            SELECT 1
-                            FROM CurrentScan
-                            WHERE Devices.dev_MAC = CurrentScan.cur_MAC
-                        )""")
-
-    # Update only devices with empty or NULL dev_Network_Node_port 
-    mylog('debug', '[Update Devices] - (if not empty) cur_Port -> dev_Network_Node_port')
-    sql.execute("""UPDATE Devices
-                    SET dev_Network_Node_port = (
-                    SELECT cur_Port
-                    FROM CurrentScan        
-                    WHERE Devices.dev_MAC = CurrentScan.cur_MAC          
-                )
-                WHERE EXISTS (
-                    SELECT 1
-                    FROM CurrentScan
-                    WHERE Devices.dev_MAC = CurrentScan.cur_MAC
-                      AND CurrentScan.cur_Port IS NOT NULL AND CurrentScan.cur_Port NOT IN ("", "null")
-                )""")
-
-    # Update only devices with empty or NULL dev_Network_Node_MAC_ADDR 
-    mylog('debug', '[Update Devices] - (if not empty) cur_NetworkNodeMAC -> dev_Network_Node_MAC_ADDR')
-    sql.execute("""UPDATE Devices
-                    SET dev_Network_Node_MAC_ADDR = (
-                    SELECT cur_NetworkNodeMAC
-                    FROM CurrentScan
-                    WHERE Devices.dev_MAC = CurrentScan.cur_MAC
-                )
-                WHERE EXISTS (
-                    SELECT 1
-                    FROM CurrentScan
-                    WHERE Devices.dev_MAC = CurrentScan.cur_MAC
-                        AND CurrentScan.cur_NetworkNodeMAC IS NOT NULL AND CurrentScan.cur_NetworkNodeMAC NOT IN ("", "null")
-                )""")
-
-    # Update only devices with empty or NULL dev_NetworkSite 
-    mylog('debug', '[Update Devices] - (if not empty) cur_NetworkSite -> (if empty) dev_NetworkSite')
-    sql.execute("""UPDATE Devices
-                    SET dev_NetworkSite = (
-                        SELECT cur_NetworkSite
-                        FROM CurrentScan
-                        WHERE Devices.dev_MAC = CurrentScan.cur_MAC
-                    )
-                    WHERE 
-                        (dev_NetworkSite IS NULL OR dev_NetworkSite IN ("", "null"))
-                        AND EXISTS (
-                            SELECT 1
-                            FROM CurrentScan
-                            WHERE Devices.dev_MAC = CurrentScan.cur_MAC
-                                AND CurrentScan.cur_NetworkSite IS NOT NULL AND CurrentScan.cur_NetworkSite NOT IN ("", "null")
-                )""")
-
-    # Update only devices with empty or NULL dev_SSID 
-    mylog('debug', '[Update Devices] - (if not empty) cur_SSID -> (if empty) dev_SSID')
-    sql.execute("""UPDATE Devices
-                    SET dev_SSID = (
-                        SELECT cur_SSID
-                        FROM CurrentScan
-                        WHERE Devices.dev_MAC = CurrentScan.cur_MAC
-                    )
-                    WHERE 
-                        (dev_SSID IS NULL OR dev_SSID IN ("", "null"))
-                        AND EXISTS (
-                            SELECT 1
-                            FROM CurrentScan
-                            WHERE Devices.dev_MAC = CurrentScan.cur_MAC
-                                AND CurrentScan.cur_SSID IS NOT NULL AND CurrentScan.cur_SSID NOT IN ("", "null")
-                        )""")
-
-    # Update only devices with empty or NULL dev_DeviceType
-    mylog('debug', '[Update Devices] - (if not empty) cur_Type -> (if empty) dev_DeviceType')
-    sql.execute("""UPDATE Devices
-                    SET dev_DeviceType = (
-                        SELECT cur_Type
-                        FROM CurrentScan
-                        WHERE Devices.dev_MAC = CurrentScan.cur_MAC
-                    )
-                    WHERE 
-                        (dev_DeviceType IS NULL OR dev_DeviceType IN ("", "null"))
-                        AND EXISTS (
-                            SELECT 1
-                            FROM CurrentScan
-                            WHERE Devices.dev_MAC = CurrentScan.cur_MAC
-                                AND CurrentScan.cur_Type IS NOT NULL AND CurrentScan.cur_Type NOT IN ("", "null")
-                        )""")
-
-    # Update (unknown) or (name not found) Names if available
-    mylog('debug','[Update Devices] - (if not empty) cur_Name -> (if empty) dev_NAME')
-    sql.execute ("""    UPDATE Devices
-                        SET dev_NAME = COALESCE((
-                            SELECT cur_Name 
-                            FROM CurrentScan
-                            WHERE cur_MAC = dev_MAC
-                            AND cur_Name IS NOT NULL
-                            AND cur_Name <> 'null'
-                            AND cur_Name <> ''
-                        ), dev_NAME)
-                        WHERE (dev_NAME IN ('(unknown)', '(name not found)', '') 
-                            OR dev_NAME IS NULL)
-                        AND EXISTS (
-                            SELECT 1 
-                            FROM CurrentScan
-                            WHERE cur_MAC = dev_MAC
-                            AND cur_Name IS NOT NULL
-                            AND cur_Name <> 'null'
-                            AND cur_Name <> ''
-                        ) """)
-
-    # Update VENDORS
-    recordsToUpdate = []
-    query = """SELECT * FROM Devices
-               WHERE dev_Vendor = '(unknown)' OR dev_Vendor =''
-                  OR dev_Vendor IS NULL"""
-
-    for device in sql.execute (query) :
-        vendor = query_MAC_vendor (device['dev_MAC'])
-        if vendor != -1 and vendor != -2 :
-            recordsToUpdate.append ([vendor, device['dev_MAC']])
+    # Merge the scanned devices, see sql_merge_rules
+    mylog('debug', '[Update Devices] 2 Merge CurrentScan into Devices')
+    pendingBefore = count_pending_app_events(db, 'Devices')
+    sql.execute(sql_merge_scan_into_devices(), (startTime,))
+    count_suppressed_app_events(db, 'Devices', sql.rowcount, pendingBefore)
 
-    if len(recordsToUpdate) > 0: 
-        sql.executemany ("UPDATE Devices SET dev_Vendor = ? WHERE dev_MAC = ? ", recordsToUpdate )
-    
-    # Guess ICONS
-    recordsToUpdate = []
-    query = """SELECT * FROM Devices
-               WHERE dev_Icon in ('', 'null')
-                  OR dev_Icon IS NULL"""
+    # Vendors, icons and types in one pass
+    mylog('debug', '[Update Devices] 3 Vendors, icons and types')
     default_icon = get_setting_value('NEWDEV_dev_Icon')
-    
-    for device in sql.execute (query) :
-        # Conditional logic for dev_Icon guessing       
-        dev_Icon = guess_icon(device['dev_Vendor'], device['dev_MAC'], device['dev_LastIP'], device['dev_Name'], default_icon)
+    default_type = get_setting_value('NEWDEV_dev_DeviceType')
 
-        recordsToUpdate.append ([dev_Icon, device['dev_MAC']])
-    
-    if len(recordsToUpdate) > 0:        
-        sql.executemany ("UPDATE Devices SET dev_Icon = ? WHERE dev_MAC = ? ", recordsToUpdate )
+    devices = sql.execute("""SELECT dev_MAC, dev_Vendor, dev_Icon, dev_DeviceType, dev_LastIP, dev_Name FROM Devices
+                             WHERE dev_Vendor = '(unknown)' OR dev_Vendor = '' OR dev_Vendor IS NULL
+                                OR dev_Icon IN ('', 'null') OR dev_Icon IS NULL
+                                OR dev_DeviceType IN ('', 'null') OR dev_DeviceType IS NULL""").fetchall()
+
+    vendors = query_MAC_vendors([device['dev_MAC'] for device in devices
+                                 if device['dev_Vendor'] in ('(unknown)', '', None)])
 
-    # Guess Type
     recordsToUpdate = []
-    query = """SELECT * FROM Devices
-               WHERE dev_DeviceType in ('', 'null')
-                  OR dev_DeviceType IS NULL"""
-    default_type = get_setting_value('NEWDEV_dev_DeviceType')
-    
-    for device in sql.execute (query) :
-        # Conditional logic for dev_Icon guessing        
-        dev_DeviceType = guess_type(device['dev_Vendor'], device['dev_MAC'], device['dev_LastIP'], device['dev_Name'], default_type)
 
-        recordsToUpdate.append ([dev_DeviceType, device['dev_MAC']])
-    
-    if len(recordsToUpdate) > 0:        
-        sql.executemany ("UPDATE Devices SET dev_DeviceType = ? WHERE dev_MAC = ? ", recordsToUpdate )
-    
-    
+    for device in devices:
+        vendor, icon, deviceType = device['dev_Vendor'], device['dev_Icon'], device['dev_DeviceType']
+
+        # Update VENDORS
+        if vendors.get(device['dev_MAC'], -1) not in (-1, -2):
+            vendor = vendors[device['dev_MAC']]
+
+        # Guess ICONS, with the vendor found above
+        if icon in ('', 'null', None):
+            icon = guess_icon(vendor, device['dev_MAC'], device['dev_LastIP'], device['dev_Name'], default_icon)
+
+        # Guess Type
+        if deviceType in ('', 'null', None):
+            deviceType = guess_type(vendor, device['dev_MAC'], device['dev_LastIP'], device['dev_Name'], default_type)
+
+        if (vendor, icon, deviceType) != (device['dev_Vendor'], device['dev_Icon'], device['dev_DeviceType']):
+            recordsToUpdate.append([vendor, icon, deviceType, device['dev_MAC']])
+
+    if len(recordsToUpdate) > 0:
+        pendingBefore = count_pending_app_events(db, 'Devices')
+        sql.executemany ("UPDATE Devices SET dev_Vendor = ?, dev_Icon = ?, dev_DeviceType = ? WHERE dev_MAC = ? ", recordsToUpdate )
+        count_suppressed_app_events(db, 'Devices', sql.rowcount, pendingBefore)
+
     mylog('debug','[Update Devices] Update devices end')
 
 #-------------------------------------------------------------------------------
@@ -506,7 +426,6 @@ def update_devices_names (db):
     # Gen unknown devices
     sql.execute ("SELECT * FROM Devices WHERE dev_Name IN ('(unknown)','', '(name not found)') AND dev_LastIP <> '-'")
     unknownDevices = sql.fetchall() 
-    db.commitDB()
 
     # skip checks if no unknown devices
     if len(unknownDevices) == 0:
@@ -518,17 +437,25 @@ def update_devices_names (db):
     # get names from Pholus scan 
     sql.execute ('SELECT * FROM Pholus_Scan where "Record_Type"="Answer"')    
     pholusResults = list(sql.fetchall())        
-    db.commitDB()
+
+    # index Pholus entries by MAC and IP
+    pholusIndex = index_pholus_results(pholusResults)
+
+    # get names reported by the AVAHISCAN, NSLOOKUP and NBTSCAN plugins at once
+    nameSources = load_device_name_sources(db)
 
     # Number of entries from previous Pholus scans
     mylog('verbose', ['[Update Device Name] Pholus entries from prev scans: ', len(pholusResults)])
 
 
+    # Reverse DNS lookups for all unknown devices at once
+    dnsNames = resolve_device_names_dns ([device['dev_LastIP'] for device in unknownDevices])
+
     for device in unknownDevices:
         newName = nameNotFound
         
-        # Resolve device name with DiG
-        newName = resolve_device_name_dig (device['dev_MAC'], device['dev_LastIP'])
+        # Resolve device name with reverse DNS
+        newName = dnsNames[device['dev_LastIP']]
         
         # count
         if newName != nameNotFound:
@@ -536,21 +463,21 @@ def update_devices_names (db):
             
         # Resolve device name with AVAHISCAN plugin data
         if newName == nameNotFound:
-            newName = get_device_name_mdns(db, device['dev_MAC'], device['dev_LastIP'])
+            newName = get_device_name_from_source(nameSources, 'AVAHISCAN', device['dev_MAC'], device['dev_LastIP'])
 
             if newName != nameNotFound:
                foundmDNSLookup += 1
 
         # Resolve device name with NSLOOKUP plugin data
         if newName == nameNotFound:
-            newName = get_device_name_nslookup(db, device['dev_MAC'], device['dev_LastIP'])
+            newName = get_device_name_from_source(nameSources, 'NSLOOKUP', device['dev_MAC'], device['dev_LastIP'])
 
             if newName != nameNotFound:
                foundNsLookup += 1
                
-        # Resolve device name with NSLOOKUP plugin data
+        # Resolve device name with NBTSCAN plugin data
         if newName == nameNotFound:
-            newName = get_device_name_nbtlookup(db, device['dev_MAC'], device['dev_LastIP'])
+            newName = get_device_name_from_source(nameSources, 'NBTSCAN', device['dev_MAC'], device['dev_LastIP'])
 
             if newName != nameNotFound:
                foundNbtLookup += 1
@@ -560,10 +487,10 @@ def update_devices_names (db):
         if newName == nameNotFound:
 
             # Try MAC matching
-            newName =  resolve_device_name_pholus (device['dev_MAC'], device['dev_LastIP'], pholusResults, nameNotFound, False)
+            newName =  resolve_device_name_pholus (device['dev_MAC'], device['dev_LastIP'], pholusIndex, nameNotFound, False)
             # Try IP matching 
             if newName == nameNotFound:
-                newName =  resolve_device_name_pholus (device['dev_MAC'], device['dev_LastIP'], pholusResults, nameNotFound, True)
+                newName =  resolve_device_name_pholus (device['dev_MAC'], device['dev_LastIP'], pholusIndex, nameNotFound, True)
 
             # count
             if newName != nameNotFound:
@@ -586,11 +513,12 @@ def update_devices_names (db):
     mylog('verbose', [f'[Update Device Name] Names Found (DiG/mDNS/NSLOOKUP/NBTSCAN/Pholus): {len(recordsToUpdate)} ({foundDig}/{foundmDNSLookup}/{foundNsLookup}/{foundNbtLookup}/{foundPholus})'] )                 
     mylog('verbose', [f'[Update Device Name] Names Not Found         : {notFound}'] )    
      
-    # update not found devices with (name not found) 
-    sql.executemany ("UPDATE Devices SET dev_Name = ? WHERE dev_MAC = ? ", recordsNotFound )
-    # update names of devices which we were bale to resolve
-    sql.executemany ("UPDATE Devices SET dev_Name = ? WHERE dev_MAC = ? ", recordsToUpdate )
-    db.commitDB()
+    # both updates in one commit, the lookups above run outside of the write transaction
+    with db.transaction('update_devices_names'):
+        # update not found devices with (name not found) 
+        sql.executemany ("UPDATE Devices SET dev_Name = ? WHERE dev_MAC = ? ", recordsNotFound )
+        # update names of devices which we were bale to resolve
+        sql.executemany ("UPDATE Devices SET dev_Name = ? WHERE dev_MAC = ? ", recordsToUpdate )
 
 #-------------------------------------------------------------------------------
 # Check if the variable contains a valid MAC address or "Internet"
@@ -613,41 +541,23 @@ def check_mac_or_internet(input_str):
 #-------------------------------------------------------------------------------
 def query_MAC_vendor (pMAC):
 
-    pMACstr = str(pMAC)
+    # Search vendor in the compiled HW Vendors index
+    vendor = lookup_vendors([pMAC])[pMAC]
 
-    filePath = vendorsPath
-    
-    if os.path.isfile(vendorsPathNewest):
-        filePath = vendorsPathNewest
-    
-    # Check MAC parameter
-    mac = pMACstr.replace (':','').lower()
-    if len(pMACstr) != 17 or len(mac) != 12 :
+    if vendor == -2:
         return -2 # return -2 if ignored MAC
 
-    # Search vendor in HW Vendors DB
-    mac_start_string6 = mac[0:6]    
-    mac_start_string9 = mac[0:9]    
-
-    try:
-        with open(filePath, 'r') as f:
-            for line in f:
-                line_lower = line.lower()  # Convert line to lowercase for case-insensitive matching
-                if line_lower.startswith(mac_start_string6):                 
-                    parts = line.split(' ', 1)
-                    if len(parts) > 1:
-                        vendor = parts[1].strip()
-                        mylog('debug', [f"[Vendor Check] Found '{vendor}' for '{pMAC}' in {vendorsPath}"])
-                        return vendor
-                    else:
-                        mylog('debug', [f'[Vendor Check] ⚠ ERROR: Match found, but line could not be processed: "{line_lower}"'])
-                        return -1
-
-
-        return -1  # MAC address not found in the database
-    except FileNotFoundError:
-        mylog('none', [f"[Vendor Check] ⚠ ERROR: Vendors file {vendorsPath} not found."])
-        return -1
+    if vendor == -1:
+        mylog('debug', [f"[Vendor Check] No vendor found for '{pMAC}'"])
+    else:
+        mylog('debug', [f"[Vendor Check] Found '{vendor}' for '{pMAC}'"])
+
+    return vendor
+
+#-------------------------------------------------------------------------------
+def query_MAC_vendors (macs):
+    # Batched version of query_MAC_vendor, returns {mac: vendor | -1 | -2}
+    return lookup_vendors(macs)
 
 
 #===============================================================================
@@ -0,0 +1,143 @@
+""" Asynchronous, batched reverse DNS (PTR) lookups used for device naming """
+
+import time
+import asyncio
+
+import dns.asyncresolver
+import dns.resolver
+import dns.reversename
+import dns.exception
+import dns.rdatatype
+
+from logger import mylog
+
+#===============================================================================
+# Reverse DNS
+#===============================================================================
+
+# Used when a negative answer doesn't contain a SOA record with a TTL
+NEGATIVE_TTL = 300
+
+# Max number of PTR queries in flight at the same time
+MAX_IN_FLIGHT = 32
+
+#-------------------------------------------------------------------------------
+# {ip: (name, server, expires)}, name is '' for NXDOMAIN / no answer
+PTR_CACHE = {}
+
+#-------------------------------------------------------------------------------
+def clear_ptr_cache():
+    PTR_CACHE.clear()
+
+#-------------------------------------------------------------------------------
+def get_cached_ptr(ip, now):
+
+    entry = PTR_CACHE.get(ip)
+
+    if entry is None:
+        return None
+
+    if entry[2] <= now:
+        del PTR_CACHE[ip]
+        return None
+
+    return entry[0], entry[1]
+
+#-------------------------------------------------------------------------------
+def get_negative_ttl(error):
+    """ Returns the TTL of a negative answer, the SOA minimum from the authority section if present """
+
+    try:
+        responses = error.responses().values() if isinstance(error, dns.resolver.NXDOMAIN) else [error.response()]
+    except Exception:
+        return NEGATIVE_TTL
+
+    for response in responses:
+        if response is None:
+            continue
+        for rrset in response.authority:
+            if rrset.rdtype == dns.rdatatype.SOA:
+                return min(rrset.ttl, rrset[0].minimum)
+
+    return NEGATIVE_TTL
+
+#-------------------------------------------------------------------------------
+async def resolve_ptr(resolver, ip, semaphore, timeout):
+    """ Returns (ip, name, server, ttl), ttl is None if the result should not be cached """
+
+    async with semaphore:
+        try:
+            answer = await resolver.resolve(dns.reversename.from_address(ip), 'PTR', lifetime=timeout)
+
+            return ip, answer[0].target.to_text(), str(answer.nameserver), answer.rrset.ttl
+
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+            return ip, '', '', get_negative_ttl(e)
+
+        # any other DNS error (timeout, no nameservers, YXDOMAIN, ...) or an invalid IP only fails this IP
+        except (dns.exception.DNSException, ValueError) as e:
+            mylog('debug', [f'[DNS Resolver] Lookup failed for {ip}: {e}'])
+            return ip, '', '', None
+
+#-------------------------------------------------------------------------------
+async def resolve_ptr_all(ips, timeout, maxInFlight, nameservers, port):
+
+    resolver = dns.asyncresolver.Resolver(configure = nameservers is None)
+
+    if nameservers is not None:
+        resolver.nameservers = nameservers
+
+    resolver.port = port
+
+    semaphore = asyncio.Semaphore(maxInFlight)
+
+    return await asyncio.gather(*[resolve_ptr(resolver, ip, semaphore, timeout) for ip in ips])
+
+#-------------------------------------------------------------------------------
+def resolve_ptr_batch(ips, timeout = 5, maxInFlight = MAX_IN_FLIGHT, nameservers = None, port = 53):
+    """ Resolves the PTR records of all IPs concurrently.
+        Returns {ip: (name, server)}, name is '' if no name was found """
+
+    results = {}
+    toResolve = []
+    seen = set()
+    now = time.monotonic()
+
+    for ip in ips:
+        if ip in seen:
+            continue
+
+        seen.add(ip)
+
+        # e.g. devices without dev_LastIP
+        if not ip:
+            results[ip] = ('', '')
+            continue
+
+        cached = get_cached_ptr(ip, now)
+
+        if cached is not None:
+            results[ip] = cached
+        else:
+            toResolve.append(ip)
+
+    mylog('debug', [f'[DNS Resolver] Resolving {len(toResolve)} IPs, {len(results)} cached'])
+
+    if len(toResolve) == 0:
+        return results
+
+    try:
+        answers = asyncio.run(resolve_ptr_all(toResolve, timeout, maxInFlight, nameservers, port))
+    except dns.resolver.NoResolverConfiguration as e:
+        mylog('none', [f'[DNS Resolver] ⚠ ERROR: No nameservers configured: {e}'])
+        answers = [(ip, '', '', None) for ip in toResolve]
+
+    now = time.monotonic()
+
+    for ip, name, server, ttl in answers:
+        results[ip] = (name, server)
+
+        if ttl is not None:
+            PTR_CACHE[ip] = (name, server, now + ttl)
+
+    return results
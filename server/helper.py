@@ -5,6 +5,7 @@ import sys
 import datetime
 import os
 import re
+import copy
 import unicodedata
 import subprocess
 import pytz
@@ -15,11 +16,14 @@ from pathlib import Path
 import requests
 import base64
 import hashlib
+import atexit
+import threading
 
 
 import conf
 from const import *
 from logger import mylog, logResult
+from dns_resolver import resolve_ptr_batch
 
 # Register NetAlertX directories
 INSTALL_PATH="/app"
@@ -53,84 +57,178 @@ def get_timezone_offset():
 #-------------------------------------------------------------------------------
 # App state
 #-------------------------------------------------------------------------------
+
+# app_state.json is written at most this often (seconds), the UI polls it every second
+STATE_FLUSH_INTERVAL = 0.5
+
+# check for a new release at most this often (seconds), and give up after VERSION_CHECK_TIMEOUT
+VERSION_CHECK_INTERVAL = 3600
+VERSION_CHECK_TIMEOUT  = 10
+
 # A class to manage the application state and to provide a frontend accessible API point
+# Only one instance per process, updated in memory and flushed to app_state.json by updateState
 class app_state_class:
-    def __init__(self, currentState, settingsSaved=None, settingsImported=None, showSpinner=False):
+    def __init__(self):
         # json file containing the state to communicate with the frontend
-        stateFile = apiPath + '/app_state.json'
-        previousState = ""
+        self.currentState           = ""
+        self.lastUpdated            = ""
+        self.settingsSaved          = 0
+        self.settingsImported       = 0
+        self.showSpinner            = False
+        self.isNewVersion           = False
+        self.isNewVersionChecked    = 0
 
-        # if currentState == 'Initializing':
-        #     checkNewVersion(False)
+        stateFile = apiPath + '/app_state.json'
 
-        # Update self
-        self.currentState = currentState
-        self.lastUpdated = str(timeNowTZ())
-        
+        # keep values from the previous run, e.g. the version check result
         if os.path.exists(stateFile):
             try:            
                 with open(stateFile, 'r') as json_file:
-                    previousState            = json.load(json_file)
-            except json.decoder.JSONDecodeError as e:
+                    previousState = json.load(json_file)
+
+                self.settingsSaved          = previousState.get("settingsSaved", 0)
+                self.settingsImported       = previousState.get("settingsImported", 0)
+                self.showSpinner            = previousState.get("showSpinner", False)
+                self.isNewVersion           = previousState.get("isNewVersion", False)
+                self.isNewVersionChecked    = previousState.get("isNewVersionChecked", 0)
+            except (json.decoder.JSONDecodeError, OSError, AttributeError) as e:
                 mylog('none', [f'[app_state_class] Failed to handle app_state.json: {e}'])
-                 
-
-        # Check if the file exists and init values
-        if previousState != "":            
-            self.settingsSaved          = previousState.get("settingsSaved", 0)
-            self.settingsImported       = previousState.get("settingsImported", 0)
-            self.showSpinner            = previousState.get("showSpinner", False)
-            self.isNewVersion           = previousState.get("isNewVersion", False)
-            self.isNewVersionChecked    = previousState.get("isNewVersionChecked", 0)
-        else:
-            self.settingsSaved          = 0
-            self.settingsImported       = 0
-            self.showSpinner            = False
-            self.isNewVersion           = checkNewVersion()
-            self.isNewVersionChecked    = int(timeNow().timestamp())
+         
+    def isSet(self):  
 
-        # Overwrite with provided parameters if supplied
-        if settingsSaved is not None:
-            self.settingsSaved = settingsSaved
-        if settingsImported is not None:
-            self.settingsImported = settingsImported
-        if showSpinner is not None:
-            self.showSpinner = showSpinner
+        result = False       
 
-        # check for new version every hour and if currently not running new version
-        if self.isNewVersion is False and self.isNewVersionChecked + 3600 < int(timeNow().timestamp()):
-            self.isNewVersion           = checkNewVersion()
-            self.isNewVersionChecked    = int(timeNow().timestamp())
+        if self.currentState != "":
+            result = True
+
+        return result
+
+    def to_json(self):
+        return json.dumps(self, cls=AppStateEncoder, indent=4)
+
+
+# Process-wide state and its writer
+APP_STATE        = None
+appStateLock     = threading.Lock()
+appStateDirty    = False
+appStateFlushed  = 0         # time.monotonic() of the last write
+appStateTimer    = None      # pending delayed flush
+versionCheckThread = None
+
+#-------------------------------------------------------------------------------
+def get_app_state():
+
+    global APP_STATE
+
+    with appStateLock:
+        if APP_STATE is None:
+            APP_STATE = app_state_class()
+
+    return APP_STATE
+
+#-------------------------------------------------------------------------------
+def flush_app_state():
+    """ Writes app_state.json if the state changed since the last write """
+
+    global appStateDirty, appStateFlushed, appStateTimer
+
+    with appStateLock:
+        appStateTimer = None
+
+        if not appStateDirty or APP_STATE is None:
+            return
 
-        # Update .json file
-        # with open(stateFile, 'w') as json_file:
-        #     json.dump(self, json_file, cls=AppStateEncoder, indent=4)
-            
-        # Sanity check before saving the .json file
         try:
-            json_data = json.dumps(self, cls=AppStateEncoder, indent=4)
-            with open(stateFile, 'w') as json_file:
-                json_file.write(json_data)
+            json_data = APP_STATE.to_json()
         except (TypeError, ValueError) as e:
             mylog('none', [f'[app_state_class] Failed to serialize object to JSON: {e}'])
+            return
 
+        appStateDirty   = False
+        appStateFlushed = time.monotonic()
 
-         
-    def isSet(self):  
+        write_file(apiPath + '/app_state.json', json_data)
 
-        result = False       
+#-------------------------------------------------------------------------------
+def schedule_app_state_flush():
+    """ Flushes now if the last write is old enough, otherwise once the interval passed """
 
-        if self.currentState != "":
-            result = True
+    global appStateTimer
 
-        return result
+    with appStateLock:
+        wait = appStateFlushed + STATE_FLUSH_INTERVAL - time.monotonic()
 
+        if wait > 0:
+            if appStateTimer is None:
+                appStateTimer = threading.Timer(wait, flush_app_state)
+                appStateTimer.daemon = True
+                appStateTimer.start()
+            return
+
+    flush_app_state()
+
+#-------------------------------------------------------------------------------
+def run_version_check():
+
+    global appStateDirty
+
+    isNewVersion = checkNewVersion()
+
+    state = get_app_state()
+
+    with appStateLock:
+        state.isNewVersion        = isNewVersion
+        state.isNewVersionChecked = int(timeNow().timestamp())
+        appStateDirty = True
+
+    schedule_app_state_flush()
+
+#-------------------------------------------------------------------------------
+def start_version_check(state):
+    """ Checks for a new release in the background, every hour while not running the latest version is known """
+
+    global versionCheckThread
+
+    if state.isNewVersion is not False or state.isNewVersionChecked + VERSION_CHECK_INTERVAL >= int(timeNow().timestamp()):
+        return
+
+    if versionCheckThread is not None and versionCheckThread.is_alive():
+        return
+
+    versionCheckThread = threading.Thread(target=run_version_check, name='version_check', daemon=True)
+    versionCheckThread.start()
 
 #-------------------------------------------------------------------------------
 # method to update the state
 def updateState(newState, settingsSaved = None, settingsImported = None, showSpinner = False):
 
-    state = app_state_class(newState, settingsSaved, settingsImported, showSpinner)
+    global appStateDirty
+
+    state = get_app_state()
+
+    with appStateLock:
+        # Update self
+        state.currentState = newState
+        state.lastUpdated  = str(timeNowTZ())
+
+        # Overwrite with provided parameters if supplied
+        if settingsSaved is not None:
+            state.settingsSaved = settingsSaved
+        if settingsImported is not None:
+            state.settingsImported = settingsImported
+        if showSpinner is not None:
+            state.showSpinner = showSpinner
+
+        appStateDirty = True
+
+    start_version_check(state)
+
+    schedule_app_state_flush()
+
+    return state
+
+# write the last state when the app stops
+atexit.register(flush_app_state)
 
 
 #-------------------------------------------------------------------------------
@@ -263,40 +361,89 @@ def write_file(pPath, pText):
             file.write(pText.decode('unicode_escape'))
             file.close()
         else:
-            file = open(pPath, 'w', encoding='utf-8')
             if pText is None:
                 pText = ""
+
+            # Write to a temp file and rename it so readers (e.g. the front end) never see a partial file
+            tmpPath = pPath + '.tmp'
+            file = open(tmpPath, 'w', encoding='utf-8')
             file.write(pText)
             file.close()
 
+            os.replace(tmpPath, pPath)
+
 #-------------------------------------------------------------------------------
 # Setting methods
 #-------------------------------------------------------------------------------
 #-------------------------------------------------------------------------------
-#  Return whole setting touple
-def get_setting(key):
+# Settings cache
+# The settings are loaded once from table_settings.json (written by importConfigs) and kept 
+# in memory keyed by Code_Name. The cache is keyed by the file modified time, it's reloaded 
+# when the file changes (this also covers plugin subprocesses reading the same file) or after 
+# invalidate_settings_cache() cleared it.
+SETTINGS_CACHE = {}             # Code_Name -> setting row
+SETTINGS_VALUES_CACHE = {}      # Code_Name -> value converted to the python type
+SETTINGS_LASTCACHEDATE = 0      # modified time of the cached table_settings.json
+
+#-------------------------------------------------------------------------------
+def invalidate_settings_cache():
+    global SETTINGS_CACHE, SETTINGS_VALUES_CACHE, SETTINGS_LASTCACHEDATE
+
+    SETTINGS_CACHE = {}
+    SETTINGS_VALUES_CACHE = {}
+    SETTINGS_LASTCACHEDATE = 0
+
+#-------------------------------------------------------------------------------
+def load_settings_cache():
+    global SETTINGS_CACHE, SETTINGS_VALUES_CACHE, SETTINGS_LASTCACHEDATE
 
     settingsFile = apiPath + 'table_settings.json'
 
     try:
+        fileModifiedTime = os.path.getmtime(settingsFile)
+
+        # cache still valid
+        if SETTINGS_CACHE and fileModifiedTime == SETTINGS_LASTCACHEDATE:
+            return True
+
         with open(settingsFile, 'r') as json_file:
 
             data = json.load(json_file)
 
+            SETTINGS_CACHE = {}
+            SETTINGS_VALUES_CACHE = {}
+
             for item in data.get("data",[]):
-                if item.get("Code_Name") == key:
-                    return item
+                SETTINGS_CACHE[item.get("Code_Name")] = item
 
-            mylog('debug', [f'[Settings] ⚠ ERROR - setting_missing - Setting not found for key: {key} in file {settingsFile}'])  
+            SETTINGS_LASTCACHEDATE = fileModifiedTime
 
-            return None
+            mylog('debug', [f'[Settings] Settings cache loaded with {len(SETTINGS_CACHE)} entries from {settingsFile}'])
+
+            return True
 
     except (FileNotFoundError, json.JSONDecodeError, ValueError) as e:
         # Handle the case when the file is not found, JSON decoding fails, or data is not in the expected format
         mylog('none', [f'[Settings] ⚠ ERROR - JSONDecodeError or FileNotFoundError for file {settingsFile}'])                
 
+        invalidate_settings_cache()
+
+        return False
+
+#-------------------------------------------------------------------------------
+#  Return whole setting touple
+def get_setting(key):
+
+    if not load_settings_cache():
         return None
 
+    item = SETTINGS_CACHE.get(key)
+
+    if item is None:
+        mylog('debug', [f'[Settings] ⚠ ERROR - setting_missing - Setting not found for key: {key} in file {apiPath}table_settings.json'])  
+
+    return item
+
 
 
 #-------------------------------------------------------------------------------
@@ -304,7 +451,7 @@ def get_setting(key):
 #-------------------------------------------------------------------------------
 
 #-------------------------------------------------------------------------------
-#  Return setting value
+#  Return setting value, lists and dicts are copies of the cached value the caller can change
 def get_setting_value(key):
 
     # Returns empty string if not set
@@ -312,6 +459,10 @@ def get_setting_value(key):
     
     setting = get_setting(key)
 
+    # return the already converted value if the cache wasn't invalidated since
+    if setting is not None and key in SETTINGS_VALUES_CACHE:
+        return copy_setting_value(SETTINGS_VALUES_CACHE[key])
+
     if setting is not None:
 
         # mylog('none', [f'[SETTINGS] setting json:{json.dumps(setting)}'])        
@@ -324,7 +475,13 @@ def get_setting_value(key):
 
         value = setting_value_to_python_type(set_type, set_value)
 
-    return value
+        SETTINGS_VALUES_CACHE[key] = value
+
+    return copy_setting_value(value)
+
+#-------------------------------------------------------------------------------
+def copy_setting_value(value):
+    return copy.deepcopy(value) if isinstance(value, (list, dict)) else value
 
 #-------------------------------------------------------------------------------
 #  Convert the setting value to the corresponding python type
@@ -515,213 +672,122 @@ def check_IP_format (pIP):
     return IP.group(0)
 
 #-------------------------------------------------------------------------------
-def get_device_name_mdns(db, pMAC, pIP):
-    
-    nameNotFound = "(name not found)"
-
-    sql = db.sql
-
-    name = nameNotFound
-    
-    #  get names from the AVAHISCAN plugin entries vased on MAC
-    sql.execute(
-        f"""
-         SELECT Watched_Value2 FROM Plugins_Objects 
-         WHERE 
-            Plugin = 'AVAHISCAN' AND 
-            Object_PrimaryID = '{pMAC}'
-         """
-    )         
-    nameEntry = sql.fetchall() 
-    db.commitDB()
-
-    if len(nameEntry) != 0:
-        name = cleanDeviceName(nameEntry[0][0], False)
-
-        return name
-
-    #  get names from the AVAHISCAN plugin entries based on IP
-    sql.execute(
-        f"""
-         SELECT Watched_Value2 FROM Plugins_Objects 
-         WHERE 
-            Plugin = 'AVAHISCAN' AND             
-            Object_SecondaryID = '{pIP}'
-         """
-    )         
-    nameEntry = sql.fetchall() 
-    db.commitDB()
-
-    if len(nameEntry) != 0:
-        name = cleanDeviceName(nameEntry[0][0], True)
-
-        return name
-
-    return name
+# Plugins providing device names in Watched_Value2, in order of priority
+NAME_SOURCE_PLUGINS = ['AVAHISCAN', 'NSLOOKUP', 'NBTSCAN']
 
 #-------------------------------------------------------------------------------
-def get_device_name_nslookup(db, pMAC, pIP):
-    
-    nameNotFound = "(name not found)"
-
-    sql = db.sql
-
-    name = nameNotFound
-    
-    #  get names from the NSLOOKUP plugin entries vased on MAC
-    sql.execute(
-        f"""
-         SELECT Watched_Value2 FROM Plugins_Objects 
-         WHERE 
-            Plugin = 'NSLOOKUP' AND 
-            Object_PrimaryID = '{pMAC}'
-         """
-    )         
-    nameEntry = sql.fetchall() 
-    db.commitDB()
-
-    if len(nameEntry) != 0:
-        name = cleanDeviceName(nameEntry[0][0], False)
+# Loads the names reported by the NAME_SOURCE_PLUGINS with a single query. 
+# Returns {plugin: (byMAC, byIP)}, the first entry per MAC / IP is kept
+def load_device_name_sources(db):
 
-        return name
+    sources = {plugin: ({}, {}) for plugin in NAME_SOURCE_PLUGINS}
 
-    #  get names from the NSLOOKUP plugin entries based on IP
-    sql.execute(
+    rows = db.sql.execute(
         f"""
-         SELECT Watched_Value2 FROM Plugins_Objects 
+         SELECT Plugin, Object_PrimaryID, Object_SecondaryID, Watched_Value2 FROM Plugins_Objects 
          WHERE 
-            Plugin = 'NSLOOKUP' AND             
-            Object_SecondaryID = '{pIP}'
-         """
-    )         
-    nameEntry = sql.fetchall() 
-    db.commitDB()
+            Plugin IN ({', '.join(['?'] * len(NAME_SOURCE_PLUGINS))})
+         """, NAME_SOURCE_PLUGINS
+    ).fetchall()
 
-    if len(nameEntry) != 0:
-        name = cleanDeviceName(nameEntry[0][0], True)
+    for row in rows:
+        byMAC, byIP = sources[row[0]]
 
-        return name
+        byMAC.setdefault(row[1], row[3])
+        byIP.setdefault(row[2], row[3])
 
-    return name
+    return sources
 
 #-------------------------------------------------------------------------------
-def get_device_name_nbtlookup(db, pMAC, pIP):
-    
-    nameNotFound = "(name not found)"
-
-    sql = db.sql
+def get_device_name_from_source(sources, plugin, pMAC, pIP):
 
-    name = nameNotFound
-    
-    #  get names from the NBTSCAN plugin entries vased on MAC
-    sql.execute(
-        f"""
-         SELECT Watched_Value2 FROM Plugins_Objects 
-         WHERE 
-            Plugin = 'NBTSCAN' AND 
-            Object_PrimaryID = '{pMAC}'
-         """
-    )         
-    nameEntry = sql.fetchall() 
-    db.commitDB()
-
-    if len(nameEntry) != 0:
-        name = cleanDeviceName(nameEntry[0][0], False)
-
-        return name
-
-    #  get names from the NSLOOKUP plugin entries based on IP
-    sql.execute(
-        f"""
-         SELECT Watched_Value2 FROM Plugins_Objects 
-         WHERE 
-            Plugin = 'NBTSCAN' AND             
-            Object_SecondaryID = '{pIP}'
-         """
-    )         
-    nameEntry = sql.fetchall() 
-    db.commitDB()
+    nameNotFound = "(name not found)"
 
-    if len(nameEntry) != 0:
-        name = cleanDeviceName(nameEntry[0][0], True)
+    byMAC, byIP = sources[plugin]
 
-        return name
+    #  get names from the plugin entries based on MAC
+    if pMAC in byMAC:
+        return cleanDeviceName(byMAC[pMAC], False)
 
-    return name
+    #  get names from the plugin entries based on IP
+    if pIP in byIP:
+        return cleanDeviceName(byIP[pIP], True)
 
+    return nameNotFound
 
 #-------------------------------------------------------------------------------
-def resolve_device_name_dig (pMAC, pIP):
-    
-    nameNotFound = "(name not found)"
+# Reverse DNS lookup of all IPs at once, returns {ip: name or "(name not found)"}
+def resolve_device_names_dns (ips):
 
-    dig_args = ['dig', '+short', '-x', pIP]
+    nameNotFound = "(name not found)"
 
-    # Execute command
-    try:
-        # try runnning a subprocess
-        newName = subprocess.check_output (dig_args, universal_newlines=True)
+    results = {}
 
-        # Check returns
-        newName = newName.strip()
+    for ip, (newName, server) in resolve_ptr_batch(ips).items():
 
         if len(newName) == 0 :
-            return nameNotFound
-            
+            results[ip] = nameNotFound
+            continue
+
         # Cleanup
         newName = cleanDeviceName(newName, True)
 
-        if newName == "" or  len(newName) == 0 or newName == '-1' or newName == -1 or "communications error" in newName or 'malformed message packet' in newName : 
-            return nameNotFound
+        if newName == "" or  len(newName) == 0 or newName == '-1' : 
+            results[ip] = nameNotFound
+            continue
 
         # all checks passed
-        mylog('debug', [f'[resolve_device_name_dig] Found a new name: "{newName}"'])  
+        mylog('debug', [f'[resolve_device_names_dns] Found a new name: "{newName}"'])  
 
-        return newName
+        results[ip] = newName
 
-    except subprocess.CalledProcessError as e:
-        # An error occured, handle it
-        mylog('none', ['[resolve_device_name_dig] ⚠ ERROR: ', e.output])            
-        # newName = "Error - check logs"
-        return nameNotFound
+    return results
 
 
 #-------------------------------------------------------------------------------
 # DNS record (Pholus/Name resolution) cleanup methods
 #-------------------------------------------------------------------------------
 
+#-------------------------------------------------------------------------------
+def index_pholus_results (allRes):
+    """ Returns (byMAC, byIP) lists of usable Pholus answers, keeping their original order """
+
+    byMAC = {}
+    byIP  = {}
+
+    for index, result in enumerate(allRes):
+        if result["Record_Type"] == "Answer" and '._googlezone' not in result["Value"]:
+            byMAC.setdefault(result["MAC"], []).append((index, result))
+            byIP.setdefault(result["IP_v4_or_v6"], []).append((index, result))
+
+    return byMAC, byIP
+
 #-------------------------------------------------------------------------------
 # Disclaimer - I'm interfacing with a script I didn't write (pholus3.py) so it's possible I'm missing types of answers
 # it's also possible the pholus3.py script can be adjusted to provide a better output to interface with it
 # Hit me with a PR if you know how! :)
-def resolve_device_name_pholus (pMAC, pIP, allRes, nameNotFound, match_IP = False):
+def resolve_device_name_pholus (pMAC, pIP, pholusIndex, nameNotFound, match_IP = False):
     
-    pholusMatchesIndexes = []
+    byMAC, byIP = pholusIndex
 
-    result = nameNotFound
+    # Collect all Pholus entries with matching MAC (and IP) in their original order
+    matches = byMAC.get(pMAC, [])
 
-    # Collect all Pholus entries  with matching MAC and of type Answer
-    index = 0
-    for result in allRes:
-        #  limiting entries used for name resolution to the ones containing the current IP (v4 only)
-        if ((match_IP and result["IP_v4_or_v6"] == pIP ) or ( result["MAC"] == pMAC )) and result["Record_Type"] == "Answer" and '._googlezone' not in result["Value"]:
-            # found entries with a matching MAC address, let's collect indexes             
-            pholusMatchesIndexes.append(index)
-
-        index += 1
+    if match_IP:
+        matches = sorted(dict(matches + byIP.get(pIP, [])).items(), key = lambda match: match[0])
 
     # return if nothing found
-    if len(pholusMatchesIndexes) == 0:
+    if len(matches) == 0:
         return nameNotFound   
 
     # we have some entries let's try to select the most useful one
     # Do I need to pre-order allRes to have the most valuable onse on the top?
 
-    for i in pholusMatchesIndexes:
-        if not checkIPV4(allRes[i]['IP_v4_or_v6']):
+    for index, result in matches:
+        if not checkIPV4(result['IP_v4_or_v6']):
             continue
 
-        value = allRes[i]["Value"]
+        value = result["Value"]
 
         # airplay matches contain a lot of information
         # Matches for example:
@@ -982,7 +1048,7 @@ def checkNewVersion():
         buildTimestamp = int(f.read().strip())
 
     try:
-        response = requests.get("https://api.github.com/repos/jokob-sk/NetAlertX/releases")
+        response = requests.get("https://api.github.com/repos/jokob-sk/NetAlertX/releases", timeout=VERSION_CHECK_TIMEOUT)
         response.raise_for_status()  # Raise an exception for HTTP errors
         text = response.text
     except requests.exceptions.RequestException as e:
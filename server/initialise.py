@@ -12,10 +12,10 @@ import re
 
 import conf 
 from const import fullConfPath, applicationPath, fullConfFolder
-from helper import collect_lang_strings, updateSubnets, initOrSetParam, isJsonObject, updateState, setting_value_to_python_type, timeNowTZ, get_setting_value
+from helper import collect_lang_strings, updateSubnets, initOrSetParam, isJsonObject, updateState, setting_value_to_python_type, timeNowTZ, get_setting_value, invalidate_settings_cache
 from logger import mylog
 from api import update_api
-from scheduler import schedule_class
+from scheduler import schedule_class, scheduler_class, get_schedule_jitter
 from plugin import print_plugin_info, run_plugin_scripts
 from plugin_utils import get_plugins_configs, get_plugin_setting_obj
 from notification import write_notification
@@ -103,9 +103,6 @@ def importConfigs (db, all_plugins):
     # Only import file if the file was modifed since last import.
     # this avoids time zone issues as we just compare the previous timestamp to the current time stamp
 
-    # rename settings that have changed names due to code cleanup and migration to plugins
-    renameSettings(config_file)
-
     fileModifiedTime = os.path.getmtime(config_file)
 
     mylog('debug', ['[Import Config] checking config file '])
@@ -117,6 +114,10 @@ def importConfigs (db, all_plugins):
         mylog('debug', ['[Import Config] skipping config file import'])
         return all_plugins
 
+    # rename settings that have changed names due to code cleanup and migration to plugins
+    # only needed when the file changed, a rename updates the modified time again
+    renameSettings(config_file)
+
     # Header
     updateState("Import config", showSpinner = True)  
 
@@ -141,9 +142,17 @@ def importConfigs (db, all_plugins):
     conf.LOADED_PLUGINS = ccd('LOADED_PLUGINS', [] , c_d, 'Loaded plugins', '{"dataType":"array", "elements": [{"elementType" : "select", "elementOptions" : [{"multiple":"true", "ordeable": "true"}] ,"transformers": []}]}', '[]', 'General')
     conf.SCAN_SUBNETS = ccd('SCAN_SUBNETS', ['192.168.1.0/24 --interface=eth1', '192.168.1.0/24 --interface=eth0'] , c_d, 'Subnets to scan', '{"dataType": "array","elements": [{"elementType": "input","elementOptions": [{"placeholder": "192.168.1.0/24 --interface=eth1"},{"suffix": "_in"},{"cssClasses": "col-sm-10"},{"prefillValue": "null"}],"transformers": []},{"elementType": "button","elementOptions": [{"sourceSuffixes": ["_in"]},{"separator": ""},{"cssClasses": "col-xs-12"},{"onClick": "addList(this, false)"},{"getStringKey": "Gen_Add"}],"transformers": []},{"elementType": "select","elementHasInputValue": 1,"elementOptions": [{"multiple": "true"},{"readonly": "true"},{"editable": "true"}],"transformers": []},{"elementType": "button","elementOptions": [{"sourceSuffixes": []},{"separator": ""},{"cssClasses": "col-xs-6"},{"onClick": "removeAllOptions(this)"},{"getStringKey": "Gen_Remove_All"}],"transformers": []},{"elementType": "button","elementOptions": [{"sourceSuffixes": []},{"separator": ""},{"cssClasses": "col-xs-6"},{"onClick": "removeFromList(this)"},{"getStringKey": "Gen_Remove_Last"}],"transformers": []}]}', '[]', 'General')    
     conf.LOG_LEVEL = ccd('LOG_LEVEL', 'verbose' , c_d, 'Log verboseness', '{"dataType":"string", "elements": [{"elementType" : "select", "elementOptions" : [] ,"transformers": []}]}', "['none', 'minimal', 'verbose', 'debug', 'trace']", 'General')
+    conf.LOG_MAX_SIZE = ccd('LOG_MAX_SIZE', 10 , c_d, 'Max log size', '{"dataType":"integer", "elements": [{"elementType" : "input", "elementOptions" : [{"type": "number"}] ,"transformers": []}]}', '[]', 'General')
     conf.TIMEZONE = ccd('TIMEZONE', 'Europe/Berlin' , c_d, 'Time zone', '{"dataType":"string", "elements": [{"elementType" : "input", "elementOptions" : [] ,"transformers": []}]}', '[]', 'General')    
     conf.PLUGINS_KEEP_HIST = ccd('PLUGINS_KEEP_HIST', 250 , c_d, 'Keep history entries', '{"dataType":"integer", "elements": [{"elementType" : "input", "elementOptions" : [{"type": "number"}] ,"transformers": []}]}', '[]', 'General') 
     conf.REPORT_DASHBOARD_URL = ccd('REPORT_DASHBOARD_URL', 'http://netalertx/' , c_d, 'NetAlertX URL', '{"dataType":"string", "elements": [{"elementType" : "input", "elementOptions" : [] ,"transformers": []}]}', '[]', 'General')
+    conf.PLUGINS_MAX_PARALLEL = ccd('PLUGINS_MAX_PARALLEL', 4 , c_d, 'Parallel plugins', '{"dataType":"integer", "elements": [{"elementType" : "input", "elementOptions" : [{"type": "number"}] ,"transformers": []}]}', '[]', 'General') 
+    conf.PLUGINS_WARM_WORKERS = ccd('PLUGINS_WARM_WORKERS', True , c_d, 'Warm plugin workers', '{"dataType":"boolean", "elements": [{"elementType" : "input", "elementOptions" : [{"type": "checkbox"}] ,"transformers": []}]}', '[]', 'General') 
+    conf.PLUGINS_NICE = ccd('PLUGINS_NICE', 0 , c_d, 'Plugin priority', '{"dataType":"integer", "elements": [{"elementType" : "input", "elementOptions" : [{"type": "number"}] ,"transformers": []}]}', '[]', 'General') 
+    conf.PLUGINS_CPU_LIMIT = ccd('PLUGINS_CPU_LIMIT', 0 , c_d, 'Plugin CPU limit', '{"dataType":"integer", "elements": [{"elementType" : "input", "elementOptions" : [{"type": "number"}] ,"transformers": []}]}', '[]', 'General') 
+    conf.PLUGINS_MEMORY_LIMIT = ccd('PLUGINS_MEMORY_LIMIT', 0 , c_d, 'Plugin memory limit', '{"dataType":"integer", "elements": [{"elementType" : "input", "elementOptions" : [{"type": "number"}] ,"transformers": []}]}', '[]', 'General') 
+    conf.PLUGINS_ADAPTIVE_TIMEOUT = ccd('PLUGINS_ADAPTIVE_TIMEOUT', True , c_d, 'Adaptive plugin timeouts', '{"dataType":"boolean", "elements": [{"elementType" : "input", "elementOptions" : [{"type": "checkbox"}] ,"transformers": []}]}', '[]', 'General') 
+    conf.SCHEDULE_JITTER = ccd('SCHEDULE_JITTER', 0 , c_d, 'Schedule jitter', '{"dataType":"integer", "elements": [{"elementType" : "input", "elementOptions" : [{"type": "number"}] ,"transformers": []}]}', '[]', 'General') 
     conf.DAYS_TO_KEEP_EVENTS = ccd('DAYS_TO_KEEP_EVENTS', 90 , c_d, 'Delete events days', '{"dataType":"integer", "elements": [{"elementType" : "input", "elementOptions" : [{"type": "number"}] ,"transformers": []}]}', '[]', 'General')
     conf.HRS_TO_KEEP_NEWDEV = ccd('HRS_TO_KEEP_NEWDEV', 0 , c_d, 'Keep new devices for', '{"dataType":"integer", "elements": [{"elementType" : "input", "elementOptions" : [{"type": "number"}] ,"transformers": []}]}', "[]", 'General')        
     conf.HRS_TO_KEEP_OFFDEV = ccd('HRS_TO_KEEP_OFFDEV', 0 , c_d, 'Keep offline devices for', '{"dataType":"integer", "elements": [{"elementType" : "input", "elementOptions" : [{"type": "number"}] ,"transformers": []}]}', "[]", 'General')        
@@ -253,7 +262,7 @@ def importConfigs (db, all_plugins):
                 # Setup schedules
                 if setFunction == 'RUN_SCHD':
                     newSchedule = Cron(v).schedule(start_date=datetime.datetime.now(conf.tz))
-                    conf.mySchedules.append(schedule_class(pref, newSchedule, newSchedule.next(), False))
+                    conf.mySchedules.append(schedule_class(pref, newSchedule, newSchedule.next(), False, jitter = get_schedule_jitter(pref, conf.SCHEDULE_JITTER)))
 
                 # Collect settings related language strings
                 # Creates an entry with key, for example ARPSCAN_CMD_name
@@ -289,6 +298,10 @@ def importConfigs (db, all_plugins):
     for plugin in all_plugins:
         pref = plugin["unique_prefix"]  
         loaded_plugins_prefixes.append(pref)
+
+    # only plugins set to run on schedule are queued in the scheduler
+    scheduledPlugins = [plugin["unique_prefix"] for plugin in all_plugins if (get_plugin_setting_obj(plugin, "RUN") or {}).get("value") == 'schedule']
+    conf.scheduler = scheduler_class([schd for schd in conf.mySchedules if schd.service in scheduledPlugins])
         
     # save the newly discovered plugins as options and default values
     conf.LOADED_PLUGINS = ccd('LOADED_PLUGINS', loaded_plugins_prefixes , c_d, '_KEEP_', '_KEEP_', str(sorted(all_plugins_prefixes)), 'General')
@@ -362,6 +375,9 @@ def importConfigs (db, all_plugins):
 
     #  update only the settings datasource
     update_api(db, all_plugins, False, ["settings"])  
+
+    # settings changed, make sure get_setting_value() doesn't return stale cached values
+    invalidate_settings_cache()
     
     # run plugins that are modifying the config   
     run_plugin_scripts(db, all_plugins, 'before_config_save' )
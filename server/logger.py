@@ -1,6 +1,10 @@
 """ Colection of functions to support all logging for NetAlertX """
 import sys
 import io
+import os
+import shutil
+import queue
+import atexit
 import datetime
 import threading
 import time
@@ -25,22 +29,30 @@ debugLevels =   [
                     ('none', 0), ('minimal', 1), ('verbose', 2), ('debug', 3), ('trace', 4)
                 ]
 
+levelWeights = dict(debugLevels)
+
+# threshold of conf.LOG_LEVEL, recomputed only when the setting changes
 currentLevel = 0
+currentLevelName = None
 
 def mylog(requestedDebugLevel, n):
+    """ Logs n if requestedDebugLevel is enabled. n is a list of values concatenated
+        with str(), a string, or a callable returning one of them, evaluated only
+        if the level is enabled, e.g. mylog('debug', lambda: ['[Plugin] ', json.dumps(data)]) """
+
+    global currentLevel, currentLevelName
+
+    if conf.LOG_LEVEL is not currentLevelName:
+        currentLevelName = conf.LOG_LEVEL
+        currentLevel = levelWeights.get(currentLevelName, 0)
 
-    setLvl = 0  
-    reqLvl = 0  
+    if levelWeights.get(requestedDebugLevel, 0) > currentLevel:
+        return
 
-    #  Get debug urgency/relative weight
-    for lvl in debugLevels:
-        if conf.LOG_LEVEL == lvl[0]:
-            setLvl = lvl[1]
-        if requestedDebugLevel == lvl[0]:
-            reqLvl = lvl[1]
+    if callable(n):
+        n = n()
 
-    if reqLvl <= setLvl:
-        file_print (*n)        
+    file_print (*n)
 
 #-------------------------------------------------------------------------------
 def file_print (*args):
@@ -69,23 +81,156 @@ def append_to_file(file_path, data):
         print(f"Error appending to file: {e}")
 
 #-------------------------------------------------------------------------------
-# Function to append to the file with a timeout
+# Log writer
+#-------------------------------------------------------------------------------
+
+# Lines waiting to be written, bounded so a stuck disk can't grow memory forever
+LOG_QUEUE_SIZE = 10000
+
+# Keep one rotated app.log.1 backup
+LOG_BACKUPS = 1
+
+#-------------------------------------------------------------------------------
+class log_writer_class:
+    """ Single background thread appending queued lines through persistent file handles.
+        Rotates files bigger than conf.LOG_MAX_SIZE MB (0 = never, e.g. in plugin processes) """
+
+    def __init__(self):
+        self.queue  = queue.Queue(maxsize = LOG_QUEUE_SIZE)
+        self.files  = {}   # path -> open file
+        self.thread = None
+        self.lock   = threading.Lock()
+
+    #-------------------------------------------------------------------------------
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='log_writer', daemon=True)
+                self.thread.start()
+
+    #-------------------------------------------------------------------------------
+    def write(self, file_path, data, timeout):
+        if self.thread is None or not self.thread.is_alive():
+            self.start()
+
+        try:
+            self.queue.put((file_path, data), timeout = timeout)
+        except queue.Full:
+            print("Appending to file timed out")
+
+    #-------------------------------------------------------------------------------
+    def flush(self, timeout = 5):
+        """ Waits until the queued lines are written """
+
+        if self.thread is None or not self.thread.is_alive():
+            return
+
+        done = threading.Event()
+
+        try:
+            self.queue.put((None, done), timeout = timeout)
+        except queue.Full:
+            return
+
+        done.wait(timeout)
+
+    #-------------------------------------------------------------------------------
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+
+            # drain whatever else is waiting, one write per file
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            pending = {}
+            flushEvents = []
+
+            for file_path, data in batch:
+                if file_path is None:
+                    flushEvents.append(data)
+                else:
+                    pending.setdefault(file_path, []).append(data)
+
+            for file_path, lines in pending.items():
+                self.append(file_path, ''.join(lines))
+
+            for event in flushEvents:
+                event.set()
+
+    #-------------------------------------------------------------------------------
+    def get_file(self, file_path):
+        file = self.files.get(file_path)
+
+        # reopen if the file was deleted, replaced or rotated by someone else
+        if file is not None:
+            try:
+                if os.stat(file_path).st_ino != os.fstat(file.fileno()).st_ino:
+                    file.close()
+                    file = None
+            except OSError:
+                file.close()
+                file = None
+
+        if file is None:
+            file = open(file_path, "a")
+            self.files[file_path] = file
+
+        return file
+
+    #-------------------------------------------------------------------------------
+    def append(self, file_path, data):
+        try:
+            file = self.get_file(file_path)
+            file.write(data)
+            file.flush()
+
+            maxSize = int(getattr(conf, 'LOG_MAX_SIZE', 0) or 0) * 1024 * 1024
+
+            if maxSize > 0 and file.tell() > maxSize:
+                self.rotate(file_path)
+
+        except Exception as e:
+            self.files.pop(file_path, None)
+            print(f"Error appending to file: {e}")
+
+    #-------------------------------------------------------------------------------
+    def rotate(self, file_path):
+        file = self.files[file_path]
+
+        for i in range(LOG_BACKUPS - 1, 0, -1):
+            if os.path.exists(f"{file_path}.{i}"):
+                os.replace(f"{file_path}.{i}", f"{file_path}.{i + 1}")
+
+        # copied and truncated in place, the log keeps the owner and mode set up for
+        # the web server (the UI truncates it too) and the other writers keep their handle
+        shutil.copyfile(file_path, f"{file_path}.1")
+
+        file.seek(0)
+        file.truncate()
+
+    #-------------------------------------------------------------------------------
+    def reset(self):
+        """ A forked child only inherits this thread's state, not the thread """
+        self.queue  = queue.Queue(maxsize = LOG_QUEUE_SIZE)
+        self.files  = {}
+        self.thread = None
+        self.lock   = threading.Lock()
+
+logWriter = log_writer_class()
+
+os.register_at_fork(after_in_child = logWriter.reset)
+
+# write what's still queued when the process ends
+atexit.register(logWriter.flush)
+
+#-------------------------------------------------------------------------------
+# Function to append to the file with a timeout, written by the log writer thread
 def append_to_file_with_timeout(file_path, data, timeout):
-    # Create a thread for appending to the file
-    append_thread = threading.Thread(target=append_to_file, args=(file_path, data))
-    
-    # Start the thread
-    append_thread.start()
-    
-    # Wait for the thread to complete or timeout
-    append_thread.join(timeout)
-    
-    # If the thread is still running, it has exceeded the timeout
-    if append_thread.is_alive():
-        append_thread.join()  # Optionally, you can force it to terminate
-        
-        # Handle the timeout here, e.g., log an error
-        print("Appending to file timed out")
+    logWriter.write(file_path, data, timeout)
 
 
 
@@ -7,6 +7,7 @@ from device import create_new_devices, print_scan_stats, save_scanned_devices, u
 from helper import timeNowTZ
 from logger import mylog
 from reporting import skip_repeated_notifications
+from appevent import flush_app_events, get_app_events_stats
 
 
 
@@ -16,60 +17,64 @@ from reporting import skip_repeated_notifications
 
 def process_scan (db):
 
-    # Apply exclusions
-    mylog('verbose','[Process Scan]  Exclude ignored devices')     
-    exclude_ignored_devices (db)    
+    # One write transaction for the whole scan: a single commit (fsync) instead of one per
+    # statement, and the UI never reads half-applied scan results
+    with db.transaction('process_scan'):
+        # Apply exclusions
+        mylog('verbose','[Process Scan]  Exclude ignored devices')     
+        exclude_ignored_devices (db)    
 
-    # Load current scan data
-    mylog('verbose','[Process Scan]  Processing scan results')     
-    save_scanned_devices (db)    
-
-    db.commitDB()
+        # Load current scan data
+        mylog('verbose','[Process Scan]  Processing scan results')     
+        save_scanned_devices (db)    
     
-    # Print stats
-    mylog('none','[Process Scan] Print Stats')
-    print_scan_stats(db)
-    mylog('none','[Process Scan] Stats end')
-
-    # Create Events    
-    mylog('verbose','[Process Scan] Sessions Events (connect / disconnect)')
-    insert_events(db)
-
-    # Create New Devices
-    # after create events -> avoid 'connection' event
-    mylog('verbose','[Process Scan] Creating new devices')
-    create_new_devices (db)
-
-    # Update devices info
-    mylog('verbose','[Process Scan] Updating Devices Info')
-    update_devices_data_from_scan (db)
-
-    # Void false connection - disconnections
-    mylog('verbose','[Process Scan] Voiding false (ghost) disconnections')    
-    void_ghost_disconnections (db)
-
-    # Pair session events (Connection / Disconnection)
-    mylog('verbose','[Process Scan] Pairing session events (connection / disconnection) ')
-    pair_sessions_events(db)  
+        # Print stats
+        mylog('none','[Process Scan] Print Stats')
+        print_scan_stats(db)
+        mylog('none','[Process Scan] Stats end')
+
+        # Create Events    
+        mylog('verbose','[Process Scan] Sessions Events (connect / disconnect)')
+        insert_events(db)
+
+        # Create New Devices
+        # after create events -> avoid 'connection' event
+        mylog('verbose','[Process Scan] Creating new devices')
+        create_new_devices (db)
+
+        # Update devices info
+        mylog('verbose','[Process Scan] Updating Devices Info')
+        update_devices_data_from_scan (db)
+
+        # Void false connection - disconnections
+        mylog('verbose','[Process Scan] Voiding false (ghost) disconnections')    
+        void_ghost_disconnections (db)
+
+        # Pair session events (Connection / Disconnection)
+        mylog('verbose','[Process Scan] Pairing session events (connection / disconnection) ')
+        pair_sessions_events(db)  
   
-    # Sessions snapshot
-    mylog('verbose','[Process Scan] Creating sessions snapshot')
-    create_sessions_snapshot (db)
+        # Sessions snapshot
+        mylog('verbose','[Process Scan] Creating sessions snapshot')
+        create_sessions_snapshot (db)
 
-    # Sessions snapshot
-    mylog('verbose','[Process Scan] Inserting scan results into Online_History')
-    insertOnlineHistory(db)
+        # Sessions snapshot
+        mylog('verbose','[Process Scan] Inserting scan results into Online_History')
+        insertOnlineHistory(db)
   
-    # Skip repeated notifications
-    mylog('verbose','[Process Scan] Skipping repeated notifications')
-    skip_repeated_notifications (db)
+        # Skip repeated notifications
+        mylog('verbose','[Process Scan] Skipping repeated notifications')
+        skip_repeated_notifications (db)
 
-    # Clear current scan as processed 
-    # 🐛 CurrentScan DEBUG: comment out below when debugging to keep the CurrentScan table after restarts/scan finishes
-    db.sql.execute ("DELETE FROM CurrentScan") 
-  
-    # Commit changes    
-    db.commitDB()
+        # Clear current scan as processed 
+        # 🐛 CurrentScan DEBUG: comment out below when debugging to keep the CurrentScan table after restarts/scan finishes
+        db.sql.execute ("DELETE FROM CurrentScan") 
+
+        # One AppEvent per device changed by the scan
+        flush_app_events(db)
+
+    mylog('verbose', [f'[Process Scan] Commit metrics: {db.get_commit_metrics()}'])
+    mylog('verbose', [f'[Process Scan] AppEvents: {get_app_events_stats(db)}'])
 
 #-------------------------------------------------------------------------------
 def void_ghost_disconnections (db):
@@ -159,8 +164,82 @@ def pair_sessions_events (db):
 
     db.commitDB()
 
+#-------------------------------------------------------------------------------
+# Sessions snapshot
+#-------------------------------------------------------------------------------
+
+# Set after the first full rebuild of the current process, changes made while
+# the app was stopped (or by an older version without the triggers) are not tracked
+sessionsSnapshotReady = False
+
+# Sessions rows of a MAC are keyed by the date of their first event (EVE1 in
+# Convert_Events_to_Sessions): the connection, or the disconnection of a session
+# with a <missing event> connection
+sql_sessions_pending_rows = """SELECT Sessions.RowID FROM Sessions_Pending
+                                  CROSS JOIN Sessions ON ses_MAC = pen_MAC
+                               WHERE COALESCE(ses_DateTimeConnection, ses_DateTimeDisconnection) >= pen_DateTime"""
+
+# Same rows as the Convert_Events_to_Sessions view, limited to the pending MACs and
+# dates. SQLite doesn't push the filters into the view, so the two arms are repeated
+# here to use the IDX_eve_MAC_DateTime index. Keep both in sync.
+# CROSS JOIN makes SQLite loop over the (few) pending MACs first.
+sql_sessions_pending_events = """SELECT EVE1.eve_MAC,
+                                      EVE1.eve_IP,
+                                      EVE1.eve_EventType AS eve_EventTypeConnection,
+                                      EVE1.eve_DateTime AS eve_DateTimeConnection,
+                                      CASE WHEN EVE2.eve_EventType IN ('Disconnected', 'Device Down') OR
+                                                EVE2.eve_EventType IS NULL THEN EVE2.eve_EventType ELSE '<missing event>' END AS eve_EventTypeDisconnection,
+                                      CASE WHEN EVE2.eve_EventType IN ('Disconnected', 'Device Down') THEN EVE2.eve_DateTime ELSE NULL END AS eve_DateTimeDisconnection,
+                                      CASE WHEN EVE2.eve_EventType IS NULL THEN 1 ELSE 0 END AS eve_StillConnected,
+                                      EVE1.eve_AdditionalInfo
+                                  FROM Sessions_Pending
+                                      CROSS JOIN Events AS EVE1 ON EVE1.eve_MAC = pen_MAC AND EVE1.eve_DateTime >= pen_DateTime
+                                      LEFT JOIN Events AS EVE2 ON EVE1.eve_PairEventRowID = EVE2.RowID
+                                WHERE EVE1.eve_EventType IN ('New Device', 'Connected','Down Reconnected')
+                            UNION
+                                SELECT EVE1.eve_MAC,
+                                      EVE1.eve_IP,
+                                      '<missing event>' AS eve_EventTypeConnection,
+                                      NULL AS eve_DateTimeConnection,
+                                      EVE1.eve_EventType AS eve_EventTypeDisconnection,
+                                      EVE1.eve_DateTime AS eve_DateTimeDisconnection,
+                                      0 AS eve_StillConnected,
+                                      EVE1.eve_AdditionalInfo
+                                  FROM Sessions_Pending
+                                      CROSS JOIN Events AS EVE1 ON EVE1.eve_MAC = pen_MAC AND EVE1.eve_DateTime >= pen_DateTime
+                                WHERE (EVE1.eve_EventType = 'Device Down' OR
+                                        EVE1.eve_EventType = 'Disconnected') AND
+                                      EVE1.eve_PairEventRowID IS NULL"""
+
 #-------------------------------------------------------------------------------
 def create_sessions_snapshot (db):
+    global sessionsSnapshotReady
+
+    sql = db.sql #TO-DO
+
+    if not sessionsSnapshotReady:
+        rebuild_sessions_snapshot(db)
+        sessionsSnapshotReady = True
+        return
+
+    # Only the MACs with changed events since the last snapshot, from their earliest changed event on
+    pending = sql.execute("SELECT COUNT(*) FROM Sessions_Pending").fetchone()[0]
+
+    mylog('debug',f'[Sessions Snapshot] - 1 Updating sessions of {pending} devices')
+
+    if pending > 0:
+        sql.execute (f"DELETE FROM Sessions WHERE RowID IN ({sql_sessions_pending_rows})")
+        sql.execute (f"INSERT INTO Sessions {sql_sessions_pending_events}")
+        sql.execute ("DELETE FROM Sessions_Pending")
+
+    if conf.LOG_LEVEL == 'trace':
+        check_sessions_consistency(db)
+
+    mylog('debug','[Sessions Snapshot] Sessions end')
+    db.commitDB()
+
+#-------------------------------------------------------------------------------
+def rebuild_sessions_snapshot (db):
     sql = db.sql #TO-DO
 
     # Clean sessions snapshot
@@ -172,9 +251,34 @@ def create_sessions_snapshot (db):
     sql.execute ("""INSERT INTO Sessions
                     SELECT * FROM Convert_Events_to_Sessions""" )
 
-    mylog('debug','[Sessions Snapshot] Sessions end')
+    sql.execute ("DELETE FROM Sessions_Pending")
+
+    mylog('debug','[Sessions Snapshot] Sessions rebuilt')
     db.commitDB()
 
+#-------------------------------------------------------------------------------
+def check_sessions_consistency (db):
+    """ Compares the Sessions snapshot with the Convert_Events_to_Sessions view,
+        rebuilds the snapshot if they differ. Returns the number of differing rows """
+
+    sql = db.sql #TO-DO
+
+    missing = sql.execute ("""SELECT COUNT(*) FROM (SELECT * FROM Convert_Events_to_Sessions
+                                                    EXCEPT SELECT * FROM Sessions)""").fetchone()[0]
+    extra   = sql.execute ("""SELECT COUNT(*) FROM (SELECT * FROM Sessions
+                                                    EXCEPT SELECT * FROM Convert_Events_to_Sessions)""").fetchone()[0]
+    # EXCEPT ignores duplicates
+    counts  = sql.execute ("""SELECT (SELECT COUNT(*) FROM Sessions),
+                                     (SELECT COUNT(*) FROM Convert_Events_to_Sessions)""").fetchone()
+
+    differences = missing + extra + abs(counts[0] - counts[1])
+
+    if differences > 0:
+        mylog('none',[f'[Sessions Snapshot] ⚠ ERROR: Sessions out of sync ({missing} missing, {extra} extra, {counts[0]} vs {counts[1]} rows), rebuilding'])
+        rebuild_sessions_snapshot(db)
+
+    return differences
+
 
 #-------------------------------------------------------------------------------
 def insert_events (db):
@@ -12,6 +12,7 @@ from json2table import convert
 import conf
 from const import applicationPath, logPath, apiPath, confFileName, reportTemplatesPath
 from logger import logResult, mylog, print_log
+from user_notifications import append_notification
 from helper import generate_mac_links, removeDuplicateNewLines, timeNowTZ, get_file_content, write_file, get_setting_value, get_timezone_offset
 
 #-------------------------------------------------------------------------------
@@ -283,7 +284,6 @@ class Notification_obj:
 
 # Handle Frontend User Notifications
 def write_notification(content, level, timestamp):
-        NOTIFICATION_API_FILE = apiPath + 'user_notifications.json'
 
         # Generate GUID
         guid = str(uuid.uuid4())
@@ -297,29 +297,8 @@ def write_notification(content, level, timestamp):
             'content': content
         }
 
-        # If file exists, load existing data, otherwise initialize as empty list
-        if os.path.exists(NOTIFICATION_API_FILE):
-            with open(NOTIFICATION_API_FILE, 'r') as file:
-                # Check if the file object is of type _io.TextIOWrapper
-                if isinstance(file, _io.TextIOWrapper):
-                    file_contents = file.read()  # Read file contents
-                    if file_contents == '':
-                        file_contents = '[]'  # If file is empty, initialize as empty list
-
-                    # mylog('debug', ['[Notification] User Notifications file: ', file_contents])
-                    notifications = json.loads(file_contents)  # Parse JSON data
-                else:
-                    mylog('error', 'File is not of type _io.TextIOWrapper')
-                    notifications = []
-        else:
-            notifications = []
-
-        # Append new notification
-        notifications.append(notification)
-
-        # Write updated data back to file
-        with open(NOTIFICATION_API_FILE, 'w') as file:
-            json.dump(notifications, file, indent=4)
+        # O(1) append to user_notifications.jsonl, see user_notifications.py
+        append_notification(notification)
 
 #-------------------------------------------------------------------------------
 def construct_notifications(JSON, section):
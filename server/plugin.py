@@ -1,20 +1,28 @@
 import os
+import re
 import sqlite3
 import json
-import subprocess
 import datetime
 import base64
+import threading
+import itertools
 
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 # Register NetAlertX modules
 import conf
-from const import pluginsPath, logPath, applicationPath, reportTemplatesPath
+from const import pluginsPath, logPath, applicationPath, reportTemplatesPath, executionQueuePath, fullConfPath, pluginResultFormat, pluginResultVersion
 from logger import mylog
 from helper import timeNowTZ,  updateState, get_file_content, write_file, get_setting, get_setting_value
 from api import update_api
-from plugin_utils import logEventStatusCounts, get_plugin_string, get_plugin_setting_obj, print_plugin_info, list_to_csv, combine_plugin_objects, resolve_wildcards_arr, handle_empty, custom_plugin_decoder, decode_and_rename_files
+from plugin_utils import get_plugin_string, get_plugin_setting_obj, print_plugin_info, list_to_csv, combine_plugin_objects, get_layer, resolve_wildcards_arr, handle_empty, custom_plugin_decoder, decode_and_rename_files
 from notification import Notification_obj, write_notification
+from command_socket import USER_EVENTS
+from appevent import flush_app_events, count_pending_app_events, count_suppressed_app_events
+from plugin_worker import plugin_worker_pool_class, get_worker_script
+from plugin_process import plugin_limits, run_plugin_process
+from plugin_runs import record_plugin_run, get_plugin_runs, get_run_outcome, get_adaptive_timeout, count_timeouts_in_a_row, get_backoff_skip
 
 
 #-------------------------------------------------------------------------------
@@ -110,6 +118,13 @@ def run_plugin_scripts(db, all_plugins, runType, pluginsState = plugins_state())
 
     mylog('debug', ['[Plugins] Check if any plugins need to be executed on run type: ', runType])
 
+    pluginsToRun = []
+
+    # services due in the scheduler, their next run is scheduled when they are taken
+    dueServices = []
+    if runType == "schedule" and conf.scheduler is not None:
+        dueServices = conf.scheduler.pop_due()
+
     for plugin in all_plugins:
 
         shouldRun = False        
@@ -121,47 +136,146 @@ def run_plugin_scripts(db, all_plugins, runType, pluginsState = plugins_state())
                 shouldRun = True
             elif  runType == "schedule":
                 # run if overdue scheduled time   
-                # check schedules if any contains a unique plugin prefix matching the current plugin
-                for schd in conf.mySchedules:
-                    if schd.service == prefix:          
-                        # Check if schedule overdue
-                        shouldRun = schd.runScheduleCheck()  
-
-        if shouldRun:            
-            # Header
-            updateState(f"Plugin: {prefix}")
-                        
-            print_plugin_info(plugin, ['display_name'])
-            mylog('debug', ['[Plugins] CMD: ', get_plugin_setting_obj(plugin, "CMD")["value"]])
-            pluginsState = execute_plugin(db, all_plugins, plugin, pluginsState) 
-            #  update last run time
-            if runType == "schedule":
-                for schd in conf.mySchedules:
-                    if schd.service == prefix:          
-                        # note the last time the scheduled plugin run was executed
-                        schd.last_run = timeNowTZ()
+                shouldRun = prefix in dueServices
+
+        if shouldRun:
+            pluginsToRun.append(plugin)
+
+    # all_plugins is sorted by execution_order, each layer has to finish before the next one starts
+    for layer in group_plugins_by_layer(pluginsToRun):
+
+        pluginsState = execute_plugins_layer(db, all_plugins, layer, pluginsState)
+
+        #  update last run time
+        if runType == "schedule":
+            for plugin in layer:
+                schd = conf.scheduler.schedules.get(plugin["unique_prefix"])
+                if schd is not None:
+                    # note the last time the scheduled plugin run was executed
+                    schd.last_run = timeNowTZ()
 
     return pluginsState
 
+#-------------------------------------------------------------------------------
+# Splits an execution_order sorted plugin list into layers of plugins that can run concurrently.
+# Plugins writing app.db themselves ("writes_db": true) get a layer of their own, so they
+# never run next to the ingestion of another plugin holding the write lock.
+def group_plugins_by_layer(plugins):
 
+    layers = []
+    lastLayer = None
+    lastWritesDb = False
 
+    for plugin in plugins:
+        layer = get_layer(plugin)
+        writesDb = plugin.get("writes_db", False) == True
+
+        if layers == [] or layer != lastLayer or writesDb or lastWritesDb:
+            layers.append([])
+            lastLayer = layer
+
+        layers[-1].append(plugin)
+        lastWritesDb = writesDb
+
+    return layers
+
+#-------------------------------------------------------------------------------
+# Runs the plugins of one execution_order layer. 
+# Settings, params and the DB are only touched on the main thread, the plugin scripts 
+# run in a worker pool (capped by PLUGINS_MAX_PARALLEL) and their results are 
+# ingested one after another on the main DB connection, each as soon as its script 
+# finished while the other scripts of the layer are still running.
+def execute_plugins_layer(db, all_plugins, layer, pluginsState):
+
+    # prepare commands
+    runs = []
+    for plugin in layer:
+        print_plugin_info(plugin, ['display_name'])
+
+        run = prepare_plugin_run(db, plugin)
+
+        if run != None:
+            runs.append(run)
+
+    scriptRuns = [run for run in runs if run.plugin['data_source'] == 'script']
+
+    maxParallel = max(1, int(conf.PLUGINS_MAX_PARALLEL))
+
+    executor = None
+    pending  = {}
+
+    # execute scripts
+    if len(scriptRuns) > 1 and maxParallel > 1:
+        updateState(f"Plugins: {', '.join([run.prefix for run in scriptRuns])}")
+
+        mylog('verbose', [f'[Plugins] Running {len(scriptRuns)} plugins in parallel (max {maxParallel})'])
+
+        executor = ThreadPoolExecutor(max_workers=min(maxParallel, len(scriptRuns)))
+
+        for run in scriptRuns:
+            pending[run] = executor.submit(run_plugin_command, run)
+
+    else:
+        for run in scriptRuns:
+            updateState(f"Plugin: {run.prefix}")
+            run_plugin_command(run)
+
+    # ingest results, in plugin order
+    try:
+        for run in runs:
+            if run in pending:
+                pending[run].result()
+
+            updateState(f"Plugin: {run.prefix}")
+            pluginsState = ingest_plugin_run(db, all_plugins, run, pluginsState)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return pluginsState
+
+
+#-------------------------------------------------------------------------------
+class plugin_run:
+    def __init__(self, plugin, set_CMD, set_RUN_TIMEOUT, command, timeoutUnits = 1):
+        self.plugin             = plugin
+        self.prefix             = plugin["unique_prefix"]
+        self.set_CMD            = set_CMD
+        self.set_RUN_TIMEOUT    = set_RUN_TIMEOUT
+        self.command            = command
+        # effective timeout, adaptive timeouts are at most set_RUN_TIMEOUT
+        self.timeout            = set_RUN_TIMEOUT
+        # how many times set_RUN_TIMEOUT was multiplied by the params (e.g. number of devices to scan)
+        self.timeoutUnits       = timeoutUnits
+        # plugin_process_result of the script
+        self.result             = None
 
 #-------------------------------------------------------------------------------
 # Executes the plugin command specified in the setting with the function specified as CMD 
 def execute_plugin(db, all_plugins, plugin, pluginsState = plugins_state() ):
-    sql = db.sql  
 
+    run = prepare_plugin_run(db, plugin)
 
-    if pluginsState is None:
-        mylog('debug', ['[Plugins] pluginsState is None'])   
-        pluginsState = plugins_state()
+    if run == None:
+        return pluginsState
+
+    if plugin['data_source'] == 'script':
+        run_plugin_command(run)
+
+    return ingest_plugin_run(db, all_plugins, run, pluginsState)
+
+#-------------------------------------------------------------------------------
+# Resolves the plugin settings and params, needs the DB so it has to run on the main thread
+def prepare_plugin_run(db, plugin):
 
     # ------- necessary settings check  --------
     set = get_plugin_setting_obj(plugin, "CMD")
 
     #  handle missing "function":"CMD" setting
     if set == None:                
-        return pluginsState
+        return None
+
+    mylog('debug', ['[Plugins] CMD: ', set["value"]])
 
     set_CMD = set["value"]
 
@@ -175,6 +289,7 @@ def execute_plugin(db, all_plugins, plugin, pluginsState = plugins_state() ):
 
     #  Prepare custom params    
     params = []
+    timeoutUnits = 1
 
     if "params" in plugin:
         for param in plugin["params"]:     
@@ -191,117 +306,160 @@ def execute_plugin(db, all_plugins, plugin, pluginsState = plugins_state() ):
                 if tempParam.multiplyTimeout:
                     
                     set_RUN_TIMEOUT = set_RUN_TIMEOUT*tempParam.paramValuesCount
+                    timeoutUnits    = timeoutUnits*tempParam.paramValuesCount
 
                     mylog('debug', [f'[Plugins] The parameter "name":"{param["name"]}" will multiply the timeout {tempParam.paramValuesCount} times. Total timeout: {set_RUN_TIMEOUT}s'])
     
     mylog('debug', ['[Plugins] Timeout: ', set_RUN_TIMEOUT]) 
-    
-    # build SQL query parameters to insert into the DB
-    sqlParams = []
 
-    # script 
+    # ------- prepare params --------
+    # prepare command from plugin settings, custom parameters  
+    command = None
     if plugin['data_source'] == 'script':
-        # ------- prepare params --------
-        # prepare command from plugin settings, custom parameters  
         command = resolve_wildcards_arr(set_CMD.split(), params)        
 
-        # Execute command
-        mylog('verbose', ['[Plugins] Executing: ', set_CMD])
-        mylog('debug',   ['[Plugins] Resolved : ', command])        
+    run = plugin_run(plugin, set_CMD, set_RUN_TIMEOUT, command, timeoutUnits)
 
-        try:
-            # try running a subprocess with a forced timeout in case the subprocess hangs
-            output = subprocess.check_output(command, universal_newlines=True, stderr=subprocess.STDOUT, timeout=(set_RUN_TIMEOUT))
-        except subprocess.CalledProcessError as e:
-            # An error occurred, handle it
-            mylog('none', [e.output])
-            mylog('none', ['[Plugins] ⚠ ERROR - enable LOG_LEVEL=debug and check logs'])            
-        except subprocess.TimeoutExpired as timeErr:
-            mylog('none', [f'[Plugins] ⚠ ERROR - TIMEOUT - the plugin {plugin["unique_prefix"]} forcefully terminated as timeout reached. Increase TIMEOUT setting and scan interval.']) 
+    # learned from the last runs, RUN_TIMEOUT is the ceiling
+    if command is not None and conf.PLUGINS_ADAPTIVE_TIMEOUT:
+        run.timeout = get_adaptive_timeout(get_plugin_runs(db, run.prefix), set_RUN_TIMEOUT, timeoutUnits)
 
-        # Initialize newLines
-        newLines = []
+        if run.timeout < set_RUN_TIMEOUT:
+            mylog('debug', [f'[Plugins] Adaptive timeout: {run.timeout}s (RUN_TIMEOUT {set_RUN_TIMEOUT}s)'])
 
-        # Create the file path
-        file_dir = os.path.join(pluginsPath, plugin["code_name"])
-        file_prefix = 'last_result'
+    return run
 
-        # Decode files, rename them, and get the list of files, this will return all files starting with the prefix, even if they are not encoded
-        files_to_process = decode_and_rename_files(file_dir, file_prefix)
+#-------------------------------------------------------------------------------
+# Runs the plugin script, doesn't touch the DB so it can be executed in a worker thread
+def run_plugin_command(run):
 
-        for filename in files_to_process:
+    # Execute command
+    mylog('verbose', ['[Plugins] Executing: ', run.set_CMD])
+    mylog('debug',   ['[Plugins] Resolved : ', run.command])        
 
-            full_path = os.path.join(file_dir, filename)
-            
-            mylog('debug', [f'[Plugins] Processing file "{full_path}"'])
+    limits = get_plugin_limits()
 
-            # Open the decrypted file and process its contents
-            with open(full_path, 'r') as f:
-                newLines = f.read().split('\n')
+    result = run_in_plugin_worker(run, limits)
 
-                # if the script produced some output, clean it up to ensure it's the correct format        
-                # cleanup - select only lines containing a separator to filter out unnecessary data
-                newLines = list(filter(lambda x: '|' in x, newLines))    
+    if result is not None:
+        mylog('debug', [f'[Plugins] {run.prefix} ran in a warm worker in {result.duration}s'])
+    else:
+        # run in its own process group with a forced timeout in case the plugin or a tool it started hangs
+        result = run_plugin_process(run.command, run.timeout, limits, run.prefix)
 
-                # Store e.g. Node_1 from last_result.encoded.Node_1.1.log
-                tmp_SyncHubNodeName = ''
-                if len(filename.split('.')) > 3:
-                    tmp_SyncHubNodeName = filename.split('.')[2]   
-            
-                for line in newLines:
-                    columns = line.split("|")
-                    # There have to be 9 or 13 columns 
-                    if len(columns) not in [9, 13]:
-                        mylog('none', [f'[Plugins] Wrong number of input values, must be 9 or 13, got {len(columns)} from: {line}'])
-                        continue  # Skip lines with incorrect number of columns
-                    
-                    # Common part of the SQL parameters
-                    base_params = [
-                        0,                          # "Index" placeholder
-                        plugin["unique_prefix"],    # "Plugin" column value from the plugin dictionary
-                        columns[0],                 # "Object_PrimaryID" value from columns list
-                        columns[1],                 # "Object_SecondaryID" value from columns list
-                        'null',                     # Placeholder for "DateTimeCreated" column
-                        columns[2],                 # "DateTimeChanged" value from columns list
-                        columns[3],                 # "Watched_Value1" value from columns list
-                        columns[4],                 # "Watched_Value2" value from columns list
-                        columns[5],                 # "Watched_Value3" value from columns list
-                        columns[6],                 # "Watched_Value4" value from columns list
-                        'not-processed',            # "Status" column (placeholder)
-                        columns[7],                 # "Extra" value from columns list
-                        'null',                     # Placeholder for "UserData" column
-                        columns[8],                 # "ForeignKey" value from columns list
-                        tmp_SyncHubNodeName         # Sync Hub Node name
-                    ]
-                    
-                    # Extend the common part with the additional values if there are 13 columns
-                    if len(columns) == 13:
-                        base_params.extend([
-                            columns[9],                 # "HelpVal1" value from columns list
-                            columns[10],                # "HelpVal2" value from columns list
-                            columns[11],                # "HelpVal3" value from columns list
-                            columns[12]                 # "HelpVal4" value from columns list
-                        ])
-                    elif len(columns) == 9:                                        
-                        # add padding
-                        base_params.extend([
-                            'null',   # "HelpVal1"
-                            'null',   # "HelpVal2"
-                            'null',   # "HelpVal3"
-                            'null'    # "HelpVal4"
-                        ])
-                        
-                    # Create a tuple containing values to be inserted into the database.
-                    # Each value corresponds to a column in the table in the order of the columns.
-                    # must match the Plugins_Objects and Plugins_Events database tables and can be used as input for the plugin_object_class.
-                    
-                    # Append the final parameters to sqlParams
-                    sqlParams.append(tuple(base_params))     
-            
-            # keep current instance log file, delete all from other nodes
-            if filename != 'last_result.log' and os.path.exists(full_path):
-                os.remove(full_path)
-                mylog('verbose', [f'[Plugins] Processed and deleted file: {full_path} '])   
+    run.result = result
+
+    if result.timedOut and run.timeout < run.set_RUN_TIMEOUT:
+        mylog('none', [f'[Plugins] ⚠ ERROR - TIMEOUT - the plugin {run.prefix} took longer than usual and was terminated after the adaptive timeout of {run.timeout}s, the next run uses the full TIMEOUT setting ({run.set_RUN_TIMEOUT}s).']) 
+    elif result.timedOut:
+        mylog('none', [f'[Plugins] ⚠ ERROR - TIMEOUT - the plugin {run.prefix} forcefully terminated as timeout reached. Increase TIMEOUT setting and scan interval.']) 
+    elif result.returncode != 0:
+        # An error occurred, handle it
+        mylog('none', [result.output])
+        mylog('none', ['[Plugins] ⚠ ERROR - enable LOG_LEVEL=debug and check logs'])            
+
+#-------------------------------------------------------------------------------
+# Resource limits of the plugin runs, 0 = not limited
+def get_plugin_limits():
+    return plugin_limits(conf.PLUGINS_NICE, conf.PLUGINS_CPU_LIMIT, conf.PLUGINS_MEMORY_LIMIT)
+
+#-------------------------------------------------------------------------------
+# Warm plugin workers, python scripts run in a process forked from a worker with the 
+# shared modules already imported instead of a new interpreter (see plugin_worker.py)
+pluginWorkers     = None
+pluginWorkersLock = threading.Lock()
+
+def get_plugin_workers():
+    global pluginWorkers
+
+    size = max(1, int(conf.PLUGINS_MAX_PARALLEL)) if conf.PLUGINS_WARM_WORKERS else 0
+
+    # called by the threads of a layer running in parallel
+    with pluginWorkersLock:
+        if pluginWorkers is not None and pluginWorkers.size != size:
+            pluginWorkers.stop()
+            pluginWorkers = None
+
+        if pluginWorkers is None and size > 0:
+            mylog('verbose', [f'[Plugins] Starting {size} warm plugin workers'])
+            pluginWorkers = plugin_worker_pool_class(size, pluginsPath, fullConfPath)
+
+        return pluginWorkers
+
+#-------------------------------------------------------------------------------
+# Metrics of the warm plugin workers, None if none were started
+def get_plugin_workers_metrics():
+
+    with pluginWorkersLock:
+        return pluginWorkers.get_metrics() if pluginWorkers is not None else None
+
+#-------------------------------------------------------------------------------
+# Returns the result of the run or None if the plugin has to run in its own process
+def run_in_plugin_worker(run, limits = None):
+
+    # plugins can opt out with "warm_worker": false in config.json
+    if run.plugin.get('warm_worker', True) == False:
+        return None
+
+    script = get_worker_script(run.command)
+
+    if script is None:
+        return None
+
+    workers = get_plugin_workers()
+
+    if workers is None:
+        return None
+
+    result = workers.run(script[0], script[1], run.timeout, limits, run.prefix)
+
+    if result is None:
+        mylog('verbose', [f'[Plugins] No warm worker available, starting {run.prefix} in a new process'])
+
+    return result
+
+#-------------------------------------------------------------------------------
+# Stores the duration and outcome of the script run, backs off the schedule of 
+# plugins timing out again and again
+def record_plugin_run_result(db, run):
+
+    outcome = get_run_outcome(run.result)
+
+    record_plugin_run(db, run.prefix, run.result.duration, run.timeout, outcome, run.timeoutUnits)
+
+    schd = conf.scheduler.schedules.get(run.prefix) if conf.scheduler is not None else None
+
+    if schd is None or not conf.PLUGINS_ADAPTIVE_TIMEOUT:
+        return
+
+    timeoutsInARow = count_timeouts_in_a_row(get_plugin_runs(db, run.prefix))
+    schd.backoff   = get_backoff_skip(timeoutsInARow)
+
+    if schd.backoff > 0:
+        mylog('none', [f'[Plugins] {run.prefix} timed out {timeoutsInARow} times in a row, skipping the next {schd.backoff} scheduled run(s)'])
+
+#-------------------------------------------------------------------------------
+# Collects the plugin output and stores it in the DB, has to run on the main thread
+def ingest_plugin_run(db, all_plugins, run, pluginsState):
+    sql = db.sql  
+
+    if run.result is not None:
+        record_plugin_run_result(db, run)
+
+    plugin  = run.plugin
+    set_CMD = run.set_CMD
+
+    if pluginsState is None:
+        mylog('debug', ['[Plugins] pluginsState is None'])   
+        pluginsState = plugins_state()
+
+    # build SQL query parameters to insert into the DB
+    sqlParams = []
+
+    # script 
+    if plugin['data_source'] == 'script':
+        # read while the events are processed, see read_plugin_result_files
+        sqlParams = read_plugin_result_files(plugin)
 
     
     # app-db-query
@@ -440,333 +598,609 @@ def execute_plugin(db, all_plugins, plugin, pluginsState = plugins_state() ):
 
     
     # check if the subprocess / SQL query failed / there was no valid output
-    if len(sqlParams) == 0: 
+    sqlParams = iter(sqlParams)
+    firstRow  = next(sqlParams, None)
+
+    if firstRow is None: 
         mylog('none', [f'[Plugins] No output received from the plugin "{plugin["unique_prefix"]}"'])
         return pluginsState 
-    else: 
-        mylog('verbose', ['[Plugins] SUCCESS, received ', len(sqlParams), ' entries'])  
-        mylog('debug',   ['[Plugins] sqlParam entries: ', sqlParams])
 
     # process results if any
-    if len(sqlParams) > 0:               
+    # create objects
+    pluginsState = process_plugin_events(db, plugin, pluginsState, itertools.chain([firstRow], sqlParams))
 
-        # create objects
-        pluginsState = process_plugin_events(db, plugin, pluginsState, sqlParams)
+    # one AppEvent per plugin object changed by this run
+    flush_app_events(db)
 
-        # update API endpoints
-        update_api(db, all_plugins, False, ["plugins_events","plugins_objects", "plugins_history", "appevents"])  
+    # update API endpoints
+    update_api(db, all_plugins, False, ["plugins_events","plugins_objects", "plugins_history", "appevents"])  
     
     return pluginsState
 
 
 #-------------------------------------------------------------------------------
-# Check if watched values changed for the given plugin
-def process_plugin_events(db, plugin, pluginsState, plugEventsArr):    
-      
-    sql = db.sql
+# Lines of a last_result.log, validated and converted to the Plugins_Events columns one 
+# line at a time, so the output of a plugin is never held in memory as a whole.
+# Files starting with a pluginResultFormat header are tab separated, all others pipe separated.
+def read_plugin_result_file(full_path, plugin, syncHubNodeName = ''):
 
-    # Access the connection from the DB instance
-    conn = db.sql_connection
+    with open(full_path, 'r') as f:
+        firstLine = f.readline()
 
-    pluginPref = plugin["unique_prefix"]
+        header = get_result_file_header(firstLine)
 
-    mylog('debug', ['[Plugins] Processing        : ', pluginPref])
+        if header is None:
+            # pipe separated lines, the default format
+            yield from read_pipe_result_lines(itertools.chain([firstLine], f), plugin, syncHubNodeName)
+
+        elif header.get("version", 0) > pluginResultVersion:
+            mylog('none', [f'[Plugins] ⚠ ERROR: Result file version {header.get("version")} is newer than the supported {pluginResultVersion}, skipping: {full_path}'])
+
+        else:
+            yield from read_tsv_result_lines(f, plugin, syncHubNodeName)
+
+#-------------------------------------------------------------------------------
+# The header of a tab separated result file, e.g. {"format": "netalertx-result", "version": 1}, None for pipe separated files
+def get_result_file_header(line):
+
+    if not line.startswith('{'):
+        return None
 
     try:
-        # Begin a transaction
-        with conn:
+        header = json.loads(line)
+    except ValueError:
+        return None
 
-            pluginObjects = []
-            pluginEvents  = []
+    if not isinstance(header, dict) or header.get("format") != pluginResultFormat:
+        return None
 
-            #  Create plugin objects from existing database entries
-            plugObjectsArr = db.get_sql_array ("SELECT * FROM Plugins_Objects where Plugin = '" + str(pluginPref)+"'") 
+    return header
 
-            for obj in plugObjectsArr: 
-                pluginObjects.append(plugin_object_class(plugin, obj))
+#-------------------------------------------------------------------------------
+def read_pipe_result_lines(lines, plugin, syncHubNodeName):
 
-           
-            # create plugin objects from events - will be processed to find existing objects 
-            for eve in plugEventsArr:                                  
-                pluginEvents.append(plugin_object_class(plugin, eve))
+    for line in lines:
+        line = line.rstrip('\n')
 
+        # if the script produced some output, clean it up to ensure it's the correct format        
+        # cleanup - select only lines containing a separator to filter out unnecessary data
+        if '|' not in line:
+            continue
 
-            mylog('debug', ['[Plugins] Existing objects from Plugins_Objects: ', len(pluginObjects)])
-            mylog('debug', ['[Plugins] Logged events from the plugin run    : ', len(pluginEvents)])
+        columns = line.split("|")
+        # There have to be 9 or 13 columns 
+        if len(columns) not in [9, 13]:
+            mylog('none', [f'[Plugins] Wrong number of input values, must be 9 or 13, got {len(columns)} from: {line}'])
+            continue  # Skip lines with incorrect number of columns
 
-            
-            #  Loop thru all current events and update the status to "exists" if the event matches an existing object
-            index = 0
-            for tmpObjFromEvent in pluginEvents:        
+        yield build_plugin_result_row(columns, plugin, syncHubNodeName)
 
-                #  compare hash of the IDs for uniqueness
-                if any(x.idsHash == tmpObjFromEvent.idsHash for x in pluginObjects):                    
-            
-                    pluginEvents[index].status = "exists"            
-                index += 1
+#-------------------------------------------------------------------------------
+# Tab separated values, tabs, new lines and backslashes in values are escaped with a 
+# backslash (see plugin_helper.Plugin_Object.write_tsv), so values can contain any 
+# character incl. | and lines without a backslash are split as they are
+def read_tsv_result_lines(lines, plugin, syncHubNodeName):
 
+    for line in lines:
+        line = line.rstrip('\n')
 
-            # Loop thru events and check if the ones that exist have changed in the watched columns
-            # if yes update status accordingly
-            index = 0
-            for tmpObjFromEvent in pluginEvents:  
+        if not line:
+            continue
 
-                if tmpObjFromEvent.status == "exists": 
+        columns = line.split('\t')
 
-                    #  compare hash of the changed watched columns for uniqueness
-                    if any(x.watchedHash != tmpObjFromEvent.watchedHash for x in pluginObjects):
-                        pluginEvents[index].status = "watched-changed"                            
-                    else:
-                        pluginEvents[index].status = "watched-not-changed"  
-                index += 1
+        if len(columns) not in [9, 13]:
+            mylog('none', [f'[Plugins] Wrong number of input values, must be 9 or 13, got {len(columns)} from: {line}'])
+            continue
 
-            # Loop thru events and check if previously available objects are missing
-            for tmpObj in pluginObjects:
-                
-                isMissing = True
+        if '\\' in line:
+            columns = [unescape_result_value(value) for value in columns]
+
+        yield build_plugin_result_row(columns, plugin, syncHubNodeName)
 
-                for tmpObjFromEvent in pluginEvents:
-                    if tmpObj.idsHash == tmpObjFromEvent.idsHash:
-                        isMissing = False
+#-------------------------------------------------------------------------------
+resultEscapes      = {'\\': '\\', 't': '\t', 'n': '\n', 'r': '\r'}
+resultEscapesRegex = re.compile(r'\\(.)')
 
-                if isMissing:
-                    # if wasn't missing before, mark as changed
-                    if tmpObj.status != "missing-in-last-scan":
-                        tmpObj.changed = timeNowTZ().strftime('%Y-%m-%d %H:%M:%S')
-                        tmpObj.status = "missing-in-last-scan"                    
-                    # mylog('debug', [f'[Plugins] Missing from last scan (PrimaryID | SecondaryID): {tmpObj.primaryId} | {tmpObj.secondaryId}'])
+def unescape_result_value(value):
 
+    if '\\' not in value:
+        return value
 
-            # Merge existing plugin objects with newly discovered ones and update existing ones with new values
-            for tmpObjFromEvent in pluginEvents:
-                # set "new" status for new objects and append
-                if tmpObjFromEvent.status == 'not-processed':
-                    # This is a new object as it was not discovered as "exists" previously                    
-                    tmpObjFromEvent.status = 'new'
+    return resultEscapesRegex.sub(lambda match: resultEscapes.get(match.group(1), match.group(1)), value)
+
+#-------------------------------------------------------------------------------
+def build_plugin_result_row(columns, plugin, syncHubNodeName):
+
+    # Common part of the SQL parameters
+    base_params = [
+        0,                          # "Index" placeholder
+        plugin["unique_prefix"],    # "Plugin" column value from the plugin dictionary
+        columns[0],                 # "Object_PrimaryID" value from columns list
+        columns[1],                 # "Object_SecondaryID" value from columns list
+        'null',                     # Placeholder for "DateTimeCreated" column
+        columns[2],                 # "DateTimeChanged" value from columns list
+        columns[3],                 # "Watched_Value1" value from columns list
+        columns[4],                 # "Watched_Value2" value from columns list
+        columns[5],                 # "Watched_Value3" value from columns list
+        columns[6],                 # "Watched_Value4" value from columns list
+        'not-processed',            # "Status" column (placeholder)
+        columns[7],                 # "Extra" value from columns list
+        'null',                     # Placeholder for "UserData" column
+        columns[8],                 # "ForeignKey" value from columns list
+        syncHubNodeName             # Sync Hub Node name
+    ]
+    
+    # Extend the common part with the additional values if there are 13 columns
+    if len(columns) == 13:
+        base_params.extend([
+            columns[9],                 # "HelpVal1" value from columns list
+            columns[10],                # "HelpVal2" value from columns list
+            columns[11],                # "HelpVal3" value from columns list
+            columns[12]                 # "HelpVal4" value from columns list
+        ])
+    elif len(columns) == 9:                                        
+        # add padding
+        base_params.extend([
+            'null',   # "HelpVal1"
+            'null',   # "HelpVal2"
+            'null',   # "HelpVal3"
+            'null'    # "HelpVal4"
+        ])
+        
+    # Create a tuple containing values to be inserted into the database.
+    # Each value corresponds to a column in the table in the order of the columns.
+    # must match the Plugins_Objects and Plugins_Events database tables and can be used as input for the plugin_object_class.
+    return tuple(base_params)
+
+#-------------------------------------------------------------------------------
+# All result files of a script plugin, the own last_result.log and the ones received from Sync nodes
+def read_plugin_result_files(plugin):
+
+    # Create the file path
+    file_dir = os.path.join(pluginsPath, plugin["code_name"])
+    file_prefix = 'last_result'
+
+    # Decode files, rename them, and get the list of files, this will return all files starting with the prefix, even if they are not encoded
+    files_to_process = decode_and_rename_files(file_dir, file_prefix)
+
+    for filename in files_to_process:
+
+        full_path = os.path.join(file_dir, filename)
+        
+        mylog('debug', [f'[Plugins] Processing file "{full_path}"'])
+
+        # Store e.g. Node_1 from last_result.encoded.Node_1.1.log
+        tmp_SyncHubNodeName = ''
+        if len(filename.split('.')) > 3:
+            tmp_SyncHubNodeName = filename.split('.')[2]   
+
+        yield from read_plugin_result_file(full_path, plugin, tmp_SyncHubNodeName)
+        
+        # keep current instance log file, delete all from other nodes
+        if filename != 'last_result.log' and os.path.exists(full_path):
+            os.remove(full_path)
+            mylog('verbose', [f'[Plugins] Processed and deleted file: {full_path} '])   
 
-                    pluginObjects.append(tmpObjFromEvent)
-                # update data of existing objects
+
+#-------------------------------------------------------------------------------
+# Reconcile the plugin objects stored in the DB with the events logged by the last plugin run.
+# Objects are keyed by (Object_PrimaryID, Object_SecondaryID) so every event is classified 
+# (new / watched-changed / watched-not-changed) with a single dictionary lookup and objects not 
+# reported anymore are flagged as missing - O(objects + events) instead of O(objects x events).
+# The events are added in batches, nothing is kept per reported object between them: 
+# existing objects move to reportedObjects, objects inserted by an earlier batch of the 
+# same run are found with findStored(newObjects) -> set of IDs already in the DB.
+class plugin_objects_reconciler:
+    def __init__(self, pluginObjects, statuses_to_report_on, findStored = None):
+        self.statuses_to_report_on = statuses_to_report_on
+        self.findStored = findStored
+
+        # Index existing objects by their IDs, the ones left at the end weren't reported
+        self.existingObjects = {}
+        for plugObj in pluginObjects:
+            self.existingObjects[plugObj.idsHash] = plugObj
+
+        # existing objects reported by the batches added so far
+        self.reportedObjects = {}
+        self.statusCounts    = {}
+
+    #-------------------------------------------------------------------------------
+    def add_events(self, pluginEvents):
+        """ Classifies a batch of events, returns the merged objects and the insert / update / events / history batches for the DB """
+
+        # Merged objects reported by the plugin in this batch, keyed by their IDs
+        batchObjects = {}
+
+        for tmpObjFromEvent in pluginEvents:
+
+            plugObj = self.existingObjects.get(tmpObjFromEvent.idsHash) or self.reportedObjects.get(tmpObjFromEvent.idsHash)
+
+            if plugObj is None:
+                # This is a new object as it doesn't exist in the DB yet
+                tmpObjFromEvent.status = 'new'
+            else:
+                #  compare hash of the watched columns with the matching object only
+                if plugObj.watchedHash != tmpObjFromEvent.watchedHash:
+                    tmpObjFromEvent.status = 'watched-changed'
                 else:
-                    index = 0
-                    for plugObj in pluginObjects:
-                        # find corresponding object for the event and merge
-                        if plugObj.idsHash == tmpObjFromEvent.idsHash:               
-                            pluginObjects[index] =  combine_plugin_objects(plugObj, tmpObjFromEvent)                    
-
-                        index += 1
-
-            # Update the DB
-            # ----------------------------
-            # Update the Plugin_Objects    
-            # Create lists to hold the data for bulk insertion
-            objects_to_insert = []
-            events_to_insert = []
-            history_to_insert = []
-            objects_to_update = []
+                    tmpObjFromEvent.status = 'watched-not-changed'
+
+                # keep user data, index and created time of the existing object
+                tmpObjFromEvent = combine_plugin_objects(plugObj, tmpObjFromEvent)
+
+            # if the plugin reported the same IDs multiple times the last entry wins
+            batchObjects[tmpObjFromEvent.idsHash] = tmpObjFromEvent
+
+        # new objects already inserted by an earlier batch
+        newObjects = [plugObj for plugObj in batchObjects.values() if plugObj.status == 'new']
+        storedIds  = self.findStored(newObjects) if self.findStored and newObjects else set()
+
+        mergedObjects   = []
+        repeatedObjects = []
+
+        for idsHash, plugObj in batchObjects.items():
+            if idsHash in self.reportedObjects or idsHash in storedIds:
+                repeatedObjects.append(plugObj)
+            else:
+                mergedObjects.append(plugObj)
+
+            if idsHash in self.existingObjects:
+                self.reportedObjects[idsHash] = self.existingObjects.pop(idsHash)
+
+        batches = self.build_batches(mergedObjects)
+
+        # already written by an earlier batch, the last entry wins without another event
+        for plugObj in repeatedObjects:
+            # objects first reported in this run don't have an index yet, they are updated by their IDs
+            index = plugObj.index if plugObj.status != 'new' else None
+
+            batches[2].append(self.get_values(plugObj) + (index,))
+
+        return batches
+
+    #-------------------------------------------------------------------------------
+    def finish(self):
+        """ Flags the objects not reported by any batch, returns the same batches as add_events """
+
+        missingObjects = []
+        missingTime    = timeNowTZ().strftime('%Y-%m-%d %H:%M:%S')
+
+        for plugObj in self.existingObjects.values():
+            # if wasn't missing before, mark as changed
+            if plugObj.status != "missing-in-last-scan":
+                plugObj.changed = missingTime
+                plugObj.status = "missing-in-last-scan"
+            missingObjects.append(plugObj)
+
+        return self.build_batches(missingObjects)
+
+    #-------------------------------------------------------------------------------
+    def get_values(self, plugObj):
+        #  keep old createdTime time if the plugObj already was created before
+        createdTime = plugObj.changed if plugObj.status == 'new' else plugObj.created
+        #  18 values without Index
+        return (
+            plugObj.pluginPref, plugObj.primaryId, plugObj.secondaryId, createdTime,
+            plugObj.changed, plugObj.watched1, plugObj.watched2, plugObj.watched3,
+            plugObj.watched4, plugObj.status, plugObj.extra, plugObj.userData,
+            plugObj.foreignKey, plugObj.syncHubNodeName,
+            plugObj.helpVal1, plugObj.helpVal2, plugObj.helpVal3, plugObj.helpVal4
+        )
+
+    #-------------------------------------------------------------------------------
+    def build_batches(self, mergedObjects):
+        # Build the DB batches
+        objects_to_insert = []
+        objects_to_update = []
+        events_to_insert  = []
+        history_to_insert = []
+
+        for plugObj in mergedObjects:
+            values = self.get_values(plugObj)
+
+            if plugObj.status == 'new':
+                objects_to_insert.append(values)
+            else:
+                objects_to_update.append(values + (plugObj.index,))  # Include index for UPDATE              
+            
+            if plugObj.status in self.statuses_to_report_on:
+                events_to_insert.append(values)
+
+            # combine all DB insert and update events into one for history
+            history_to_insert.append(values)
+
+            self.statusCounts[plugObj.status] = self.statusCounts.get(plugObj.status, 0) + 1
+
+        return mergedObjects, objects_to_insert, objects_to_update, events_to_insert, history_to_insert
+
+#-------------------------------------------------------------------------------
+# Reconciles all events of a run at once.
+# Returns the merged objects and the insert / update / events / history batches for the DB.
+def reconcile_plugin_objects(pluginObjects, pluginEvents, statuses_to_report_on):
+
+    reconciler = plugin_objects_reconciler(pluginObjects, statuses_to_report_on)
+
+    reported = reconciler.add_events(pluginEvents)
+    missing  = reconciler.finish()
+
+    return tuple(reported[i] + missing[i] for i in range(5))
+
+
+#-------------------------------------------------------------------------------
+# Plugin events are processed in batches of this many rows
+PLUGIN_EVENTS_BATCH_SIZE = 1000
+
+#-------------------------------------------------------------------------------
+# Check if watched values changed for the given plugin
+# plugEventsArr can be any iterable of Plugins_Events rows, e.g. a result file being read
+def process_plugin_events(db, plugin, pluginsState, plugEventsArr):    
+      
+    pluginPref = plugin["unique_prefix"]
+
+    mylog('debug', ['[Plugins] Processing        : ', pluginPref])
+
+    eventsCount = 0
+
+    try:
+        # Begin a transaction
+        with db.transaction('plugin_events'):
+
+            #  Create plugin objects from existing database entries
+            plugObjectsArr = db.get_sql_array ("SELECT * FROM Plugins_Objects where Plugin = '" + str(pluginPref)+"'") 
+
+            pluginObjects = [plugin_object_class(plugin, obj) for obj in plugObjectsArr]
+
+            mylog('debug', ['[Plugins] Existing objects from Plugins_Objects: ', len(pluginObjects)])
 
             # only generate events that we want to be notified on (we only need to do this once as all plugObj have the same prefix)
             statuses_to_report_on = get_setting_value(pluginPref + "_REPORT_ON")  
-            
-            for plugObj in pluginObjects:
-                #  keep old createdTime time if the plugObj already was created before
-                createdTime = plugObj.changed if plugObj.status == 'new' else plugObj.created
-                #  18 values without Index
-                values = (
-                    plugObj.pluginPref, plugObj.primaryId, plugObj.secondaryId, createdTime,
-                    plugObj.changed, plugObj.watched1, plugObj.watched2, plugObj.watched3,
-                    plugObj.watched4, plugObj.status, plugObj.extra, plugObj.userData,
-                    plugObj.foreignKey, plugObj.syncHubNodeName,
-                    plugObj.helpVal1, plugObj.helpVal2, plugObj.helpVal3, plugObj.helpVal4
-                )
-
-                if plugObj.status == 'new':
-                    objects_to_insert.append(values)
-                else:
-                    objects_to_update.append(values + (plugObj.index,))  # Include index for UPDATE              
-                
-                if plugObj.status in statuses_to_report_on:
-                    events_to_insert.append(values)
 
-                # combine all DB insert and update events into one for history
-                history_to_insert.append(values)
+            # Classify events against the existing objects and write the DB batches as the events come in
+            reconciler = plugin_objects_reconciler(pluginObjects, statuses_to_report_on, lambda newObjects: get_stored_plugin_ids(db, pluginPref, newObjects))
 
-            
-            mylog('debug', ['[Plugins] pluginEvents      count: ', len(pluginEvents)])
-            mylog('debug', ['[Plugins] pluginObjects     count: ', len(pluginObjects)])
-
-            mylog('debug', ['[Plugins] events_to_insert  count: ', len(events_to_insert)])
-            mylog('debug', ['[Plugins] history_to_insert count: ', len(history_to_insert)])
-            mylog('debug', ['[Plugins] objects_to_insert count: ', len(objects_to_insert)])
-            mylog('debug', ['[Plugins] objects_to_update count: ', len(objects_to_update)])
-
-            logEventStatusCounts('pluginEvents', pluginEvents)
-            logEventStatusCounts('pluginObjects', pluginObjects)
-
-            # Bulk insert objects
-            if objects_to_insert:
-                sql.executemany(
-                    """
-                    INSERT INTO Plugins_Objects 
-                    ("Plugin", "Object_PrimaryID", "Object_SecondaryID", "DateTimeCreated", 
-                    "DateTimeChanged", "Watched_Value1", "Watched_Value2", "Watched_Value3", 
-                    "Watched_Value4", "Status", "Extra", "UserData", "ForeignKey", "SyncHubNodeName",
-                    "HelpVal1", "HelpVal2", "HelpVal3", "HelpVal4") 
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, objects_to_insert
-                )
-
-            # Bulk update objects
-            if objects_to_update:
-                sql.executemany(
-                    """
-                    UPDATE Plugins_Objects
-                    SET "Plugin" = ?, "Object_PrimaryID" = ?, "Object_SecondaryID" = ?, "DateTimeCreated" = ?, 
-                        "DateTimeChanged" = ?, "Watched_Value1" = ?, "Watched_Value2" = ?, "Watched_Value3" = ?, 
-                        "Watched_Value4" = ?, "Status" = ?, "Extra" = ?, "UserData" = ?, "ForeignKey" = ?, "SyncHubNodeName" = ?, "HelpVal1" = ?, "HelpVal2" = ?, "HelpVal3" = ?, "HelpVal4" = ?
-                    WHERE "Index" = ?
-                    """, objects_to_update
-                )
-
-            # Bulk insert events
-            if events_to_insert:
-
-                sql.executemany(
-                    """
-                    INSERT INTO Plugins_Events 
-                    ("Plugin", "Object_PrimaryID", "Object_SecondaryID", "DateTimeCreated", 
-                    "DateTimeChanged", "Watched_Value1", "Watched_Value2", "Watched_Value3", 
-                    "Watched_Value4", "Status", "Extra", "UserData", "ForeignKey", "SyncHubNodeName",
-                    "HelpVal1", "HelpVal2", "HelpVal3", "HelpVal4")  
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, events_to_insert
-                )
-
-            # Bulk insert history entries
-            if history_to_insert:
-
-                sql.executemany(
-                    """
-                    INSERT INTO Plugins_History 
-                    ("Plugin", "Object_PrimaryID", "Object_SecondaryID", "DateTimeCreated", 
-                    "DateTimeChanged", "Watched_Value1", "Watched_Value2", "Watched_Value3", 
-                    "Watched_Value4", "Status", "Extra", "UserData", "ForeignKey", "SyncHubNodeName",
-                    "HelpVal1", "HelpVal2", "HelpVal3", "HelpVal4")  
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, history_to_insert
-                )
-
-            # Commit changes to the database
-            db.commitDB()
+            batch = []
+
+            for eve in plugEventsArr:
+                batch.append(eve)
+
+                if len(batch) == PLUGIN_EVENTS_BATCH_SIZE:
+                    eventsCount += len(batch)
+                    process_plugin_events_batch(db, plugin, pluginsState, reconciler, batch)
+                    batch = []
 
+            if batch:
+                eventsCount += len(batch)
+                process_plugin_events_batch(db, plugin, pluginsState, reconciler, batch)
 
+            # objects not reported anymore
+            write_plugin_objects(db, *reconciler.finish()[1:])
 
     except Exception as e:
-        # Rollback the transaction in case of an error
-        conn.rollback()
         mylog('none', ['[Plugins] ⚠ ERROR: ', e])
         raise e   
 
+    mylog('verbose', ['[Plugins] SUCCESS, received ', eventsCount, ' entries'])  
+
+    for status, count in reconciler.statusCounts.items():
+        mylog('debug', [f'[Plugins] In pluginObjects there are {count} events with the status "{status}" '])
+
+    return pluginsState
+
+#-------------------------------------------------------------------------------
+# IDs of the given plugin objects already stored in Plugins_Objects
+def get_stored_plugin_ids(db, pluginPref, plugObjs):
+
+    storedIds  = set()
+    primaryIds = list(set([plugObj.primaryId for plugObj in plugObjs]))
+
+    # stay below the 999 variables limit of older SQLite versions
+    for i in range(0, len(primaryIds), 500):
+        chunk = primaryIds[i:i + 500]
+
+        rows = db.sql.execute(f"""SELECT Object_PrimaryID, Object_SecondaryID FROM Plugins_Objects
+                                  WHERE Plugin = ? AND Object_PrimaryID IN ({', '.join(['?'] * len(chunk))})""", [pluginPref] + chunk)
+
+        for row in rows:
+            storedIds.add((str(row[0]), str(row[1])))
+
+    return storedIds
+
+#-------------------------------------------------------------------------------
+def process_plugin_events_batch(db, plugin, pluginsState, reconciler, plugEventsArr):
+
+    mylog('debug', ['[Plugins] sqlParam entries: ', plugEventsArr])
+
+    # create plugin objects from events - will be processed to find existing objects 
+    pluginEvents = [plugin_object_class(plugin, eve) for eve in plugEventsArr]
+
+    pluginObjects, objects_to_insert, objects_to_update, events_to_insert, history_to_insert = reconciler.add_events(pluginEvents)
+
+    mylog('debug', ['[Plugins] Logged events from the plugin run    : ', len(pluginEvents)])
+    mylog('debug', ['[Plugins] events_to_insert  count: ', len(events_to_insert)])
+    mylog('debug', ['[Plugins] history_to_insert count: ', len(history_to_insert)])
+    mylog('debug', ['[Plugins] objects_to_insert count: ', len(objects_to_insert)])
+    mylog('debug', ['[Plugins] objects_to_update count: ', len(objects_to_update)])
+
+    write_plugin_objects(db, objects_to_insert, objects_to_update, events_to_insert, history_to_insert)
+
     # Perform database table mapping if enabled for the plugin
     if len(pluginEvents) > 0 and "mapped_to_table" in plugin:
+        map_plugin_events(db, plugin, pluginsState, pluginEvents)
 
-        # Initialize an empty list to store SQL parameters.
-        sqlParams = []
-
-        # Get the database table name from the 'mapped_to_table' key in the 'plugin' dictionary.
-        dbTable = plugin['mapped_to_table']
-
-        # Log a debug message indicating the mapping of objects to the database table.
-        mylog('debug', ['[Plugins] Mapping objects to database table: ', dbTable])
-
-        # Initialize lists to hold mapped column names, columnsStr, and valuesStr for SQL query.
-        mappedCols = []
-        columnsStr = ''
-        valuesStr = ''
-
-        # Loop through the 'database_column_definitions' in the 'plugin' dictionary to collect mapped columns.
-        # Build the columnsStr and valuesStr for the SQL query.
-        for clmn in plugin['database_column_definitions']:
-            if 'mapped_to_column' in clmn:
-                mappedCols.append(clmn)
-
-                columnsStr = f'{columnsStr}, "{clmn["mapped_to_column"]}"'
-                valuesStr = f'{valuesStr}, ?'
-
-        # Remove the first ',' from columnsStr and valuesStr.
-        if len(columnsStr) > 0:
-            columnsStr = columnsStr[1:]
-            valuesStr = valuesStr[1:]
-
-        # Map the column names to plugin object event values and create a list of tuples 'sqlParams'.
-        for plgEv in pluginEvents:
-            tmpList = []
-
-            for col in mappedCols:
-                if col['column'] == 'Index':
-                    tmpList.append(plgEv.index)
-                elif col['column'] == 'Plugin':
-                    tmpList.append(plgEv.pluginPref)
-                elif col['column'] == 'Object_PrimaryID':
-                    tmpList.append(plgEv.primaryId)
-                elif col['column'] == 'Object_SecondaryID':
-                    tmpList.append(plgEv.secondaryId)
-                elif col['column'] == 'DateTimeCreated':
-                    tmpList.append(plgEv.created)
-                elif col['column'] == 'DateTimeChanged':
-                    tmpList.append(plgEv.changed)
-                elif col['column'] == 'Watched_Value1':
-                    tmpList.append(plgEv.watched1)
-                elif col['column'] == 'Watched_Value2':
-                    tmpList.append(plgEv.watched2)
-                elif col['column'] == 'Watched_Value3':
-                    tmpList.append(plgEv.watched3)
-                elif col['column'] == 'Watched_Value4':
-                    tmpList.append(plgEv.watched4)
-                elif col['column'] == 'UserData':
-                    tmpList.append(plgEv.userData)
-                elif col['column'] == 'Extra':
-                    tmpList.append(plgEv.extra)
-                elif col['column'] == 'Status':
-                    tmpList.append(plgEv.status)
-                elif col['column'] == 'SyncHubNodeName':
-                    tmpList.append(plgEv.syncHubNodeName)
-                elif col['column'] == 'HelpVal1':
-                    tmpList.append(plgEv.helpVal1)
-                elif col['column'] == 'HelpVal2':
-                    tmpList.append(plgEv.helpVal2)
-                elif col['column'] == 'HelpVal3':
-                    tmpList.append(plgEv.helpVal3)
-                elif col['column'] == 'HelpVal4':
-                    tmpList.append(plgEv.helpVal4)
-
-                # Check if there's a default value specified for this column in the JSON.
-                if 'mapped_to_column_data' in col and 'value' in col['mapped_to_column_data']:
-                    tmpList.append(col['mapped_to_column_data']['value'])
-                
-            # Append the mapped values to the list 'sqlParams' as a tuple.
-            sqlParams.append(tuple(tmpList))
+#-------------------------------------------------------------------------------
+def write_plugin_objects(db, objects_to_insert, objects_to_update, events_to_insert, history_to_insert):
+    sql = db.sql
+
+    # Bulk insert objects
+    if objects_to_insert:
+        sql.executemany(
+            """
+            INSERT INTO Plugins_Objects 
+            ("Plugin", "Object_PrimaryID", "Object_SecondaryID", "DateTimeCreated", 
+            "DateTimeChanged", "Watched_Value1", "Watched_Value2", "Watched_Value3", 
+            "Watched_Value4", "Status", "Extra", "UserData", "ForeignKey", "SyncHubNodeName",
+            "HelpVal1", "HelpVal2", "HelpVal3", "HelpVal4") 
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, objects_to_insert
+        )
+
+    # Bulk update objects
+    if objects_to_update:
+        pendingBefore = count_pending_app_events(db, 'Plugins_Objects')
+        updated = 0
+
+        sql.executemany(
+            """
+            UPDATE Plugins_Objects
+            SET "Plugin" = ?, "Object_PrimaryID" = ?, "Object_SecondaryID" = ?, "DateTimeCreated" = ?, 
+                "DateTimeChanged" = ?, "Watched_Value1" = ?, "Watched_Value2" = ?, "Watched_Value3" = ?, 
+                "Watched_Value4" = ?, "Status" = ?, "Extra" = ?, "UserData" = ?, "ForeignKey" = ?, "SyncHubNodeName" = ?, "HelpVal1" = ?, "HelpVal2" = ?, "HelpVal3" = ?, "HelpVal4" = ?
+            WHERE "Index" = ?
+            """, [values for values in objects_to_update if values[-1] is not None]
+        )
+        updated += max(0, sql.rowcount)
+
+        # objects inserted by an earlier batch of the same run
+        sql.executemany(
+            """
+            UPDATE Plugins_Objects
+            SET "Plugin" = ?, "Object_PrimaryID" = ?, "Object_SecondaryID" = ?, "DateTimeCreated" = ?, 
+                "DateTimeChanged" = ?, "Watched_Value1" = ?, "Watched_Value2" = ?, "Watched_Value3" = ?, 
+                "Watched_Value4" = ?, "Status" = ?, "Extra" = ?, "UserData" = ?, "ForeignKey" = ?, "SyncHubNodeName" = ?, "HelpVal1" = ?, "HelpVal2" = ?, "HelpVal3" = ?, "HelpVal4" = ?
+            WHERE "Plugin" = ? AND "Object_PrimaryID" = ? AND "Object_SecondaryID" = ?
+            """, [values[:-1] + values[:3] for values in objects_to_update if values[-1] is None]
+        )
+        updated += max(0, sql.rowcount)
+
+        count_suppressed_app_events(db, 'Plugins_Objects', updated, pendingBefore)
+
+    # Bulk insert events
+    if events_to_insert:
+
+        sql.executemany(
+            """
+            INSERT INTO Plugins_Events 
+            ("Plugin", "Object_PrimaryID", "Object_SecondaryID", "DateTimeCreated", 
+            "DateTimeChanged", "Watched_Value1", "Watched_Value2", "Watched_Value3", 
+            "Watched_Value4", "Status", "Extra", "UserData", "ForeignKey", "SyncHubNodeName",
+            "HelpVal1", "HelpVal2", "HelpVal3", "HelpVal4")  
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, events_to_insert
+        )
+
+    # Bulk insert history entries
+    if history_to_insert:
+
+        sql.executemany(
+            """
+            INSERT INTO Plugins_History 
+            ("Plugin", "Object_PrimaryID", "Object_SecondaryID", "DateTimeCreated", 
+            "DateTimeChanged", "Watched_Value1", "Watched_Value2", "Watched_Value3", 
+            "Watched_Value4", "Status", "Extra", "UserData", "ForeignKey", "SyncHubNodeName",
+            "HelpVal1", "HelpVal2", "HelpVal3", "HelpVal4")  
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, history_to_insert
+        )
+
+#-------------------------------------------------------------------------------
+# Copies the plugin events into the table the plugin is mapped to, e.g. CurrentScan
+def map_plugin_events(db, plugin, pluginsState, pluginEvents):
+    sql = db.sql
 
-        # Generate the SQL INSERT query using the collected information.
-        q = f'INSERT OR IGNORE INTO {dbTable} ({columnsStr}) VALUES ({valuesStr})'
+    # Initialize an empty list to store SQL parameters.
+    sqlParams = []
 
-        # Log a debug message showing the generated SQL query for mapping.
-        mylog('debug', ['[Plugins] SQL query for mapping: ', q])
-        mylog('debug', ['[Plugins] SQL sqlParams for mapping: ', sqlParams])
+    # Get the database table name from the 'mapped_to_table' key in the 'plugin' dictionary.
+    dbTable = plugin['mapped_to_table']
+
+    # Log a debug message indicating the mapping of objects to the database table.
+    mylog('debug', ['[Plugins] Mapping objects to database table: ', dbTable])
+
+    # Initialize lists to hold mapped column names, columnsStr, and valuesStr for SQL query.
+    mappedCols = []
+    columnsStr = ''
+    valuesStr = ''
+
+    # Loop through the 'database_column_definitions' in the 'plugin' dictionary to collect mapped columns.
+    # Build the columnsStr and valuesStr for the SQL query.
+    for clmn in plugin['database_column_definitions']:
+        if 'mapped_to_column' in clmn:
+            mappedCols.append(clmn)
+
+            columnsStr = f'{columnsStr}, "{clmn["mapped_to_column"]}"'
+            valuesStr = f'{valuesStr}, ?'
+
+    # Remove the first ',' from columnsStr and valuesStr.
+    if len(columnsStr) > 0:
+        columnsStr = columnsStr[1:]
+        valuesStr = valuesStr[1:]
+
+    # Map the column names to plugin object event values and create a list of tuples 'sqlParams'.
+    for plgEv in pluginEvents:
+        tmpList = []
+
+        for col in mappedCols:
+            if col['column'] == 'Index':
+                tmpList.append(plgEv.index)
+            elif col['column'] == 'Plugin':
+                tmpList.append(plgEv.pluginPref)
+            elif col['column'] == 'Object_PrimaryID':
+                tmpList.append(plgEv.primaryId)
+            elif col['column'] == 'Object_SecondaryID':
+                tmpList.append(plgEv.secondaryId)
+            elif col['column'] == 'DateTimeCreated':
+                tmpList.append(plgEv.created)
+            elif col['column'] == 'DateTimeChanged':
+                tmpList.append(plgEv.changed)
+            elif col['column'] == 'Watched_Value1':
+                tmpList.append(plgEv.watched1)
+            elif col['column'] == 'Watched_Value2':
+                tmpList.append(plgEv.watched2)
+            elif col['column'] == 'Watched_Value3':
+                tmpList.append(plgEv.watched3)
+            elif col['column'] == 'Watched_Value4':
+                tmpList.append(plgEv.watched4)
+            elif col['column'] == 'UserData':
+                tmpList.append(plgEv.userData)
+            elif col['column'] == 'Extra':
+                tmpList.append(plgEv.extra)
+            elif col['column'] == 'Status':
+                tmpList.append(plgEv.status)
+            elif col['column'] == 'SyncHubNodeName':
+                tmpList.append(plgEv.syncHubNodeName)
+            elif col['column'] == 'HelpVal1':
+                tmpList.append(plgEv.helpVal1)
+            elif col['column'] == 'HelpVal2':
+                tmpList.append(plgEv.helpVal2)
+            elif col['column'] == 'HelpVal3':
+                tmpList.append(plgEv.helpVal3)
+            elif col['column'] == 'HelpVal4':
+                tmpList.append(plgEv.helpVal4)
+
+            # Check if there's a default value specified for this column in the JSON.
+            if 'mapped_to_column_data' in col and 'value' in col['mapped_to_column_data']:
+                tmpList.append(col['mapped_to_column_data']['value'])
+            
+        # Append the mapped values to the list 'sqlParams' as a tuple.
+        sqlParams.append(tuple(tmpList))
 
-        # Execute the SQL query using 'sql.executemany()' and the 'sqlParams' list of tuples.
-        # This will insert multiple rows into the database in one go.
-        sql.executemany(q, sqlParams)
+    # Generate the SQL INSERT query using the collected information.
+    q = f'INSERT OR IGNORE INTO {dbTable} ({columnsStr}) VALUES ({valuesStr})'
 
-        db.commitDB()
+    # Log a debug message showing the generated SQL query for mapping.
+    mylog('debug', ['[Plugins] SQL query for mapping: ', q])
+    mylog('debug', ['[Plugins] SQL sqlParams for mapping: ', sqlParams])
 
-        # perform scan if mapped to CurrentScan table
-        if dbTable == 'CurrentScan':
-            pluginsState.processScan = True
+    # Execute the SQL query using 'sql.executemany()' and the 'sqlParams' list of tuples.
+    # This will insert multiple rows into the database in one go.
+    sql.executemany(q, sqlParams)
 
     db.commitDB()
 
-
-    return pluginsState
+    # perform scan if mapped to CurrentScan table
+    if dbTable == 'CurrentScan':
+        pluginsState.processScan = True
 
 
 #-------------------------------------------------------------------------------
@@ -797,8 +1231,8 @@ class plugin_object_class:
         if self.status not in ["exists", "watched-changed", "watched-not-changed", "new", "not-processed", "missing-in-last-scan"]:
             raise ValueError("Invalid status value for plugin object:", self.status)
 
-        self.idsHash      = str(hash(str(self.primaryId) + str(self.secondaryId)))    
-        # self.idsHash      = str(self.primaryId) + str(self.secondaryId)
+        # IDs tuple used as the dictionary key when matching events to existing objects
+        self.idsHash      = (str(self.primaryId), str(self.secondaryId))
 
         self.watchedClmns = []
         self.watchedIndxs = []          
@@ -814,32 +1248,37 @@ class plugin_object_class:
 
             for clmName in self.watchedClmns:
                 for mapping in indexNameColumnMapping:
-                    if clmName == indexNameColumnMapping[1]:
-                        self.watchedIndxs.append(indexNameColumnMapping[0])
-
-        tmp = ''
-        for indx in self.watchedIndxs:
-            tmp += str(objDbRow[indx])
+                    if clmName == mapping[1]:
+                        self.watchedIndxs.append(mapping[0])
 
-        self.watchedHash  = str(hash(tmp))
+        self.watchedHash  = tuple(str(objDbRow[indx]) for indx in self.watchedIndxs)
 
 
 #===============================================================================
 # Handling of  user initialized front-end events
 #===============================================================================
-def check_and_run_user_event(db, all_plugins, pluginsState):
+def check_and_run_user_event(db, all_plugins, pluginsState, commandSocket = None):
     # Check if the log file exists
-    logFile = os.path.join(logPath, "execution_queue.log")
+    logFile = executionQueuePath
 
     # Track if not an API event and list of executed events
     show_events_completed = False
     executed_events = []
 
-    if not os.path.exists(logFile):
-        return pluginsState
+    # Commands sent over the command socket, the execution queue file is the fallback
+    if commandSocket is not None:
+        for command in commandSocket.pop_commands():
+            pluginsState = run_user_event(command.event, command.param, db, all_plugins, pluginsState)
+            commandSocket.complete(command)
 
-    with open(logFile, "r") as file:
-        lines = file.readlines()
+            show_events_completed = show_events_completed or command.event != 'update_api'
+            executed_events.append(f"{command.event} with param {command.param}")
+
+    lines = []
+
+    if os.path.exists(logFile):
+        with open(logFile, "r") as file:
+            lines = file.readlines()
 
     remaining_lines = []
 
@@ -851,24 +1290,19 @@ def check_and_run_user_event(db, all_plugins, pluginsState):
         if len(columns) == 2:
             event, param = columns
 
-        if event == 'test':
-            show_events_completed = True
-            pluginsState = handle_test(param, db, all_plugins, pluginsState)
-            executed_events.append(f"test with param {param}")
-        elif event == 'run':
-            show_events_completed = True
-            pluginsState = handle_run(param, db, all_plugins, pluginsState)
-            executed_events.append(f"run with param {param}")
-        elif event == 'update_api':
-            # Update API endpoints
-            update_api(db, all_plugins, False, param.split(','))
-            executed_events.append(f"update_api with param {param}")
+        if event in USER_EVENTS:
+            pluginsState = run_user_event(event, param, db, all_plugins, pluginsState)
+
+            show_events_completed = show_events_completed or event != 'update_api'
+            executed_events.append(f"{event} with param {param}")
         else:
             remaining_lines.append(line)
 
-    # Rewrite the log file with remaining lines
-    with open(logFile, "w") as file:
-        file.writelines(remaining_lines)
+    # Rewrite the log file with remaining lines, only if something was executed
+    # (a write wakes up the main loop again)
+    if len(remaining_lines) != len(lines):
+        with open(logFile, "w") as file:
+            file.writelines(remaining_lines)
 
     # Only show pop-up if not an API event
     if show_events_completed:
@@ -877,6 +1311,20 @@ def check_and_run_user_event(db, all_plugins, pluginsState):
 
     return pluginsState
 
+#-------------------------------------------------------------------------------
+def run_user_event(event, param, db, all_plugins, pluginsState):
+    """ Runs one of the USER_EVENTS sent by the front end """
+
+    if event == 'test':
+        pluginsState = handle_test(param, db, all_plugins, pluginsState)
+    elif event == 'run':
+        pluginsState = handle_run(param, db, all_plugins, pluginsState)
+    elif event == 'update_api':
+        # Update API endpoints
+        update_api(db, all_plugins, False, param.split(','))
+
+    return pluginsState
+
 
 #-------------------------------------------------------------------------------
 def handle_run(runType, db, all_plugins, pluginsState):
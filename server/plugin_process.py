@@ -0,0 +1,205 @@
+""" Plugin processes, every run in its own process group with optional resource limits """
+
+import os
+import sys
+import time
+import signal
+import resource
+import subprocess
+
+from logger import mylog
+
+#===============================================================================
+# Plugin processes
+#===============================================================================
+#
+# Every plugin run starts a new session (process group), the tools a plugin starts
+# (nmap, arp-scan, snmpwalk, dig, ...) inherit it and are killed with the plugin:
+# on timeout and anything still running in the background when the plugin ended.
+#
+# The runs and the warm workers (see plugin_worker.py) carry PLUGIN_MARKER in the 
+# environment they were started with, so processes left behind by a server that was 
+# killed itself are found (and killed) when the server starts again, without relying 
+# on pids that may have been reused since. Processes forked by a warm worker share the 
+# worker's environment in /proc/<pid>/environ and are found the same way.
+
+# Environment variable set to the plugin prefix for every run and the tools it starts
+PLUGIN_MARKER = 'NETALERTX_PLUGIN'
+
+# Seconds between the soft (SIGXCPU) and the hard (SIGKILL) CPU time limit
+CPU_LIMIT_GRACE = 5
+
+# Seconds to collect the output of a killed run
+KILL_GRACE = 5
+
+#-------------------------------------------------------------------------------
+class plugin_process_result:
+    def __init__(self, returncode, output, timedOut, duration):
+        self.returncode = returncode
+        self.output     = output
+        self.timedOut   = timedOut
+        self.duration   = duration
+
+#-------------------------------------------------------------------------------
+class plugin_limits:
+    """ Resource limits of a plugin run, 0 means not limited """
+
+    def __init__(self, nice = 0, cpuSeconds = 0, memoryMB = 0):
+        self.nice       = int(nice)
+        self.cpuSeconds = int(cpuSeconds)
+        self.memoryMB   = int(memoryMB)
+
+    #-------------------------------------------------------------------------------
+    def to_dict(self):
+        return {"nice": self.nice, "cpuSeconds": self.cpuSeconds, "memoryMB": self.memoryMB}
+
+    #-------------------------------------------------------------------------------
+    def apply(self):
+        """ Applies the limits to the current process, inherited by its children """
+
+        if self.nice > 0:
+            os.setpriority(os.PRIO_PROCESS, 0, self.nice)
+
+        if self.cpuSeconds > 0:
+            resource.setrlimit(resource.RLIMIT_CPU, (self.cpuSeconds, self.cpuSeconds + CPU_LIMIT_GRACE))
+
+        if self.memoryMB > 0:
+            memory = self.memoryMB * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+
+#-------------------------------------------------------------------------------
+# Applies the limits (nice, cpu seconds, memory MB, cpu grace) and execs the command,
+# so the limits are in place before the command starts any other process
+LIMITS_WRAPPER = """
+import os, sys, resource
+nice, cpuSeconds, memoryMB, grace = map(int, sys.argv[1:5])
+try:
+    if nice > 0:
+        os.setpriority(os.PRIO_PROCESS, 0, nice)
+    if cpuSeconds > 0:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpuSeconds, cpuSeconds + grace))
+    if memoryMB > 0:
+        resource.setrlimit(resource.RLIMIT_AS, (memoryMB * 1048576, memoryMB * 1048576))
+except (OSError, ValueError) as e:
+    print(f'[Plugins] Could not limit the resources: {e}', file = sys.stderr, flush = True)
+os.execvp(sys.argv[5], sys.argv[5:])
+"""
+
+#-------------------------------------------------------------------------------
+def get_limited_command(command, limits):
+    """ The command started through LIMITS_WRAPPER if any limit is set """
+
+    if limits is None or (limits.nice <= 0 and limits.cpuSeconds <= 0 and limits.memoryMB <= 0):
+        return command
+
+    # -S: no site packages, the wrapper only needs the standard library
+    return [sys.executable, '-S', '-c', LIMITS_WRAPPER,
+            str(limits.nice), str(limits.cpuSeconds), str(limits.memoryMB), str(CPU_LIMIT_GRACE)] + list(command)
+
+#-------------------------------------------------------------------------------
+def get_plugin_environment(name):
+    return dict(os.environ, **{PLUGIN_MARKER: name or 'plugin'})
+
+#-------------------------------------------------------------------------------
+def kill_process_group(pgid):
+    """ Kills every process of the group, False if there was none left """
+
+    # never the server's own group
+    if pgid <= 1 or pgid == os.getpgrp():
+        return False
+
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        return False
+
+    return True
+
+#-------------------------------------------------------------------------------
+def run_plugin_process(command, timeout, limits = None, name = ''):
+    """ Runs the command in a new process group, returns a plugin_process_result """
+
+    start = time.monotonic()
+
+    # limits applied by an exec wrapper and not in a preexec_fn, which isn't safe with 
+    # the threads running plugins in parallel
+    process = subprocess.Popen(get_limited_command(command, limits), stdout = subprocess.PIPE, stderr = subprocess.STDOUT, 
+                               universal_newlines = True, start_new_session = True, env = get_plugin_environment(name))
+
+    timedOut = False
+
+    try:
+        output, _ = process.communicate(timeout = timeout)
+    except subprocess.TimeoutExpired:
+        timedOut = True
+        kill_process_group(process.pid)
+
+        try:
+            output, _ = process.communicate(timeout = KILL_GRACE)
+        except subprocess.TimeoutExpired:
+            # a process that left the group still holds the output pipe
+            process.kill()
+            output, _ = process.communicate()
+
+    # tools the plugin left running in the background
+    if kill_process_group(process.pid):
+        mylog('verbose', [f'[Plugins] Killed the processes left behind by {name}'])
+
+    return plugin_process_result(process.returncode, output or '', timedOut, round(time.monotonic() - start, 3))
+
+#-------------------------------------------------------------------------------
+def find_plugin_processes(procPath = '/proc'):
+    """ Pids of the processes started by plugin runs, from their environment """
+
+    pids = []
+
+    try:
+        entries = os.listdir(procPath)
+    except OSError:
+        return pids
+
+    marker = PLUGIN_MARKER.encode() + b'='
+
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+
+        try:
+            with open(os.path.join(procPath, entry, 'environ'), 'rb') as f:
+                environ = f.read()
+        except OSError:
+            continue
+
+        if any(variable.startswith(marker) for variable in environ.split(b'\0')):
+            pids.append(int(entry))
+
+    return pids
+
+#-------------------------------------------------------------------------------
+def reap_orphan_plugin_processes():
+    """ Kills the plugin processes left behind by a previous server, has to run before any plugin """
+
+    reaped = 0
+
+    for pid in find_plugin_processes():
+        if pid == os.getpid():
+            continue
+
+        try:
+            pgid = os.getpgid(pid)
+        except ProcessLookupError:
+            continue
+
+        # the whole plugin group, or the process alone if it isn't in a plugin group (anymore)
+        if not kill_process_group(pgid):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                continue
+
+        reaped += 1
+
+    if reaped:
+        mylog('none', [f'[Plugins] Killed {reaped} orphaned plugin processes'])
+
+    return reaped
@@ -0,0 +1,127 @@
+""" Run history of the script plugins, adaptive timeouts and schedule backoff learned from it """
+
+import math
+
+from logger import mylog
+from helper import timeNowTZ
+
+#===============================================================================
+# Plugin runs
+#===============================================================================
+#
+# The duration and outcome (success / error / timeout) of the last runs of every
+# script plugin are kept in Plugins_Runs, with the units of the run: how many times
+# its RUN_TIMEOUT was multiplied by the params (e.g. the number of devices to scan).
+# Durations are compared per unit, the timeout of the next run is the larger of the
+# TIMEOUT_PERCENTILE and the slowest of the last RECENT_RUNS runs, times its units
+# and TIMEOUT_FACTOR plus TIMEOUT_MARGIN, never more than the RUN_TIMEOUT setting:
+#
+#   - a run cut off by the adaptive timeout is retried with the full RUN_TIMEOUT,
+#     a plugin that became slower gets a longer timeout right after that run, the
+#     recent runs count before they are frequent enough to move the percentile
+#   - timeouts in a row back off the schedule of the plugin, every further
+#     timeout doubles the scheduled runs that are skipped
+
+# Runs kept per plugin
+RUN_HISTORY_SIZE = 50
+
+# Runs needed before the timeout adapts, until then RUN_TIMEOUT is used
+MIN_RUNS = 5
+
+TIMEOUT_PERCENTILE = 95
+RECENT_RUNS        = 5
+TIMEOUT_FACTOR     = 2
+TIMEOUT_MARGIN     = 10    # seconds
+
+# Timeouts in a row before the schedule backs off, and the most scheduled runs skipped
+BACKOFF_AFTER    = 2
+BACKOFF_MAX_SKIP = 31
+
+#-------------------------------------------------------------------------------
+def create_plugin_runs_table(db):
+    """ Plugins_Runs, schema migration """
+
+    db.sql.execute("""CREATE TABLE IF NOT EXISTS "Plugins_Runs" (
+        "Index"     INTEGER PRIMARY KEY,
+        "Plugin"    TEXT NOT NULL,
+        "DateTime"  TEXT,
+        "Duration"  REAL,
+        "Timeout"   REAL,
+        "Outcome"   TEXT
+    )""")
+
+    db.sql.execute('CREATE INDEX IF NOT EXISTS idx_plugins_runs_plugin ON Plugins_Runs (Plugin, "Index")')
+
+#-------------------------------------------------------------------------------
+def add_plugin_runs_units(db):
+    """ Plugins_Runs.Units, schema migration """
+
+    db.sql.execute('ALTER TABLE Plugins_Runs ADD COLUMN "Units" INTEGER NOT NULL DEFAULT 1')
+
+#-------------------------------------------------------------------------------
+def record_plugin_run(db, prefix, duration, timeout, outcome, units = 1):
+
+    with db.transaction('plugin_runs'):
+        db.sql.execute("""INSERT INTO Plugins_Runs ("Plugin", "DateTime", "Duration", "Timeout", "Outcome", "Units")
+                          VALUES (?, ?, ?, ?, ?, ?)""", (prefix, timeNowTZ().strftime('%Y-%m-%d %H:%M:%S'), duration, timeout, outcome, max(1, units)))
+
+        # keep the last RUN_HISTORY_SIZE runs
+        db.sql.execute("""DELETE FROM Plugins_Runs WHERE Plugin = ? AND "Index" <= (
+                              SELECT "Index" FROM Plugins_Runs WHERE Plugin = ? ORDER BY "Index" DESC LIMIT 1 OFFSET ?)""",
+                       (prefix, prefix, RUN_HISTORY_SIZE))
+
+#-------------------------------------------------------------------------------
+def get_plugin_runs(db, prefix):
+    """ (Duration, Outcome, Units) of the last runs, newest first """
+
+    return db.sql.execute("""SELECT Duration, Outcome, Units FROM Plugins_Runs WHERE Plugin = ?
+                             ORDER BY "Index" DESC LIMIT ?""", (prefix, RUN_HISTORY_SIZE)).fetchall()
+
+#-------------------------------------------------------------------------------
+def get_run_outcome(result):
+    if result.timedOut:
+        return 'timeout'
+
+    return 'success' if result.returncode == 0 else 'error'
+
+#-------------------------------------------------------------------------------
+def get_percentile(values, percentile):
+    """ Nearest-rank percentile """
+
+    values = sorted(values)
+
+    return values[max(0, math.ceil(percentile / 100 * len(values)) - 1)]
+
+#-------------------------------------------------------------------------------
+def get_adaptive_timeout(runs, ceiling, units = 1):
+    """ Timeout of the next run with the given units from the last runs (newest first), at most ceiling """
+
+    if len(runs) < MIN_RUNS or runs[0][1] == 'timeout':
+        return ceiling
+
+    perUnit = [duration / max(1, runUnits) for duration, outcome, runUnits in runs]
+
+    learned = max(get_percentile(perUnit, TIMEOUT_PERCENTILE), max(perUnit[:RECENT_RUNS]))
+
+    return min(ceiling, math.ceil(learned * max(1, units) * TIMEOUT_FACTOR + TIMEOUT_MARGIN))
+
+#-------------------------------------------------------------------------------
+def count_timeouts_in_a_row(runs):
+
+    count = 0
+
+    for run in runs:
+        if run[1] != 'timeout':
+            break
+        count += 1
+
+    return count
+
+#-------------------------------------------------------------------------------
+def get_backoff_skip(timeoutsInARow):
+    """ Scheduled runs to skip after the given timeouts in a row: 0, 1, 3, 7, ... """
+
+    if timeoutsInARow < BACKOFF_AFTER:
+        return 0
+
+    return min(BACKOFF_MAX_SKIP, 2 ** (timeoutsInARow - BACKOFF_AFTER + 1) - 1)
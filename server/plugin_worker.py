@@ -0,0 +1,392 @@
+""" Warm worker processes running python plugin scripts without a new interpreter per run """
+
+import os
+import io
+import sys
+import json
+import time
+import queue
+import runpy
+import atexit
+import select
+import traceback
+import threading
+import subprocess
+
+from logger import mylog
+from plugin_process import plugin_process_result, plugin_limits, kill_process_group, get_plugin_environment, PLUGIN_MARKER
+
+#===============================================================================
+# Plugin workers
+#===============================================================================
+#
+# Every worker is a long running "python3 plugin_worker.py" process (a fork server)
+# that imports the modules shared by the plugin scripts once. For each run it forks
+# a child executing the script as __main__ with runpy, so every run still gets its
+# own process (crashes, sys.exit, os._exit and leaked state stay in the child) but
+# skips the interpreter startup and the imports.
+#
+# Server -> worker, one JSON line per run:
+#
+#   {"script": "/app/front/plugins/arp_scan/script.py", "args": ["userSubnets=..."], "timeout": 10,
+#    "name": "ARPSCAN", "limits": {"nice": 0, "cpuSeconds": 0, "memoryMB": 0}}
+#
+# Worker -> server, one JSON line when started and one per run:
+#
+#   {"ready": true, "preloaded": [...], "failed": {...}}
+#   {"returncode": 0, "output": "...", "timedOut": false, "duration": 0.3}
+
+# Imported once by every worker, the same modules a plugin script imports itself
+PRELOAD_MODULES = ['const', 'conf', 'logger', 'helper', 'plugin_helper']
+
+# Seconds the server waits for a worker on top of the plugin timeout
+WORKER_GRACE = 5
+
+#-------------------------------------------------------------------------------
+# Worker process
+#-------------------------------------------------------------------------------
+def preload(pluginsPath):
+    sys.path.append(pluginsPath)
+
+    preloaded = []
+    failed = {}
+
+    for module in PRELOAD_MODULES:
+        try:
+            __import__(module)
+            preloaded.append(module)
+        except BaseException as e:
+            # the script imports it again and fails the same way a cold run would
+            failed[module] = f'{type(e).__name__}: {e}'
+
+    return preloaded, failed
+
+#-------------------------------------------------------------------------------
+def run_script(script, args):
+    """ Runs in the forked child, never returns """
+
+    code = 1
+
+    try:
+        sys.argv = [script] + args
+        sys.path.insert(0, os.path.dirname(script))
+
+        try:
+            runpy.run_path(script, run_name = '__main__')
+            code = 0
+        except SystemExit as e:
+            if e.code is None:
+                code = 0
+            elif isinstance(e.code, int):
+                code = e.code
+            else:
+                print(e.code, file = sys.stderr)
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+
+        # what the interpreter would do on a normal exit, e.g. flush the plugin log lines
+        atexit._run_exitfuncs()
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+    finally:
+        os._exit(code & 0xff)
+
+#-------------------------------------------------------------------------------
+def run_forked(request, replies):
+    readFd, writeFd = os.pipe()
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    start = time.monotonic()
+    pid = os.fork()
+
+    if pid == 0:
+        os.close(readFd)
+        replies.close()
+
+        # own process group and limits like a plugin started by run_plugin_process
+        os.setsid()
+        # the plugin name for the tools the script starts, the worker's own marker identifies this process
+        os.environ[PLUGIN_MARKER] = request.get('name') or 'plugin'
+
+        try:
+            plugin_limits(**request.get('limits', {})).apply()
+        except (OSError, ValueError) as e:
+            print(f'[Plugin worker] Could not limit the resources: {e}', file = sys.stderr)
+
+        # stdin from /dev/null, stdout and stderr to the server like subprocess.STDOUT
+        devNull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devNull, 0)
+        os.dup2(writeFd, 1)
+        os.dup2(writeFd, 2)
+        os.close(devNull)
+        os.close(writeFd)
+
+        run_script(request['script'], request.get('args', []))
+
+    os.close(writeFd)
+
+    deadline = start + float(request.get('timeout', 10))
+    output = []
+    timedOut = False
+
+    while True:
+        remaining = deadline - time.monotonic()
+
+        if remaining <= 0:
+            timedOut = True
+            kill_process_group(pid)
+            break
+
+        ready, _, _ = select.select([readFd], [], [], remaining)
+
+        if ready:
+            chunk = os.read(readFd, 65536)
+            if not chunk:
+                break
+            output.append(chunk)
+
+    os.close(readFd)
+
+    _, status = os.waitpid(pid, 0)
+
+    # tools the script left running in the background
+    kill_process_group(pid)
+
+    return {
+        "returncode": os.waitstatus_to_exitcode(status),
+        "output": b''.join(output).decode('utf-8', errors = 'replace'),
+        "timedOut": timedOut,
+        "duration": round(time.monotonic() - start, 3)
+    }
+
+#-------------------------------------------------------------------------------
+def serve(pluginsPath):
+    # stdout is the reply channel, anything printed while importing goes to stderr
+    replies = io.open(os.dup(1), 'w', encoding = 'utf-8')
+    os.dup2(2, 1)
+
+    preloaded, failed = preload(pluginsPath)
+
+    replies.write(json.dumps({"ready": True, "preloaded": preloaded, "failed": failed}) + '\n')
+    replies.flush()
+
+    # the server closes stdin to stop the worker
+    for line in sys.stdin:
+        try:
+            reply = run_forked(json.loads(line), replies)
+        except Exception as e:
+            reply = {"returncode": 1, "output": f'[Plugin worker] {type(e).__name__}: {e}', "timedOut": False, "duration": 0}
+
+        replies.write(json.dumps(reply) + '\n')
+        replies.flush()
+
+#-------------------------------------------------------------------------------
+# Server side
+#-------------------------------------------------------------------------------
+class plugin_worker_class:
+    """ One warm worker process, runs one script at a time """
+
+    def __init__(self, pluginsPath, watchedFile = None):
+        self.pluginsPath = pluginsPath
+        # plugin_helper reads the config at import, restart the worker when it changes
+        self.watchedFile = watchedFile
+        self.watchedTime = None
+        self.process     = None
+        self.buffer      = b''
+
+    #-------------------------------------------------------------------------------
+    def start(self):
+        self.stop()
+
+        self.watchedTime = self.get_watched_time()
+        self.buffer      = b''
+        # own session and the plugin marker in the environment it starts with, the children it 
+        # forks share that environment, so a worker or run left behind by a killed server is 
+        # found by reap_orphan_plugin_processes (setting os.environ after the fork isn't visible there)
+        self.process     = subprocess.Popen([sys.executable, os.path.abspath(__file__), self.pluginsPath],
+                                            stdin = subprocess.PIPE, stdout = subprocess.PIPE, stderr = subprocess.DEVNULL,
+                                            start_new_session = True, env = get_plugin_environment('plugin_worker'))
+
+        ready = self.read_reply(time.monotonic() + 30)
+
+        if ready is None or not ready.get("ready"):
+            self.stop()
+            raise OSError('Plugin worker did not start')
+
+        mylog('debug', [f'[Plugin worker] Started pid {self.process.pid}, preloaded: {ready["preloaded"]}'])
+
+        for module, error in ready["failed"].items():
+            mylog('verbose', [f'[Plugin worker] Could not preload {module}: {error}'])
+
+        return ready
+
+    #-------------------------------------------------------------------------------
+    def get_watched_time(self):
+        try:
+            return os.path.getmtime(self.watchedFile) if self.watchedFile else None
+        except OSError:
+            return None
+
+    #-------------------------------------------------------------------------------
+    def is_usable(self):
+        return self.process is not None and self.process.poll() is None and self.get_watched_time() == self.watchedTime
+
+    #-------------------------------------------------------------------------------
+    def read_reply(self, deadline):
+        """ Next JSON line from the worker, None if it died or didn't answer in time """
+
+        fd = self.process.stdout.fileno()
+
+        while b'\n' not in self.buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                return None
+
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return None
+
+            self.buffer += chunk
+
+        line, self.buffer = self.buffer.split(b'\n', 1)
+
+        return json.loads(line)
+
+    #-------------------------------------------------------------------------------
+    def send(self, script, args, timeout, limits = None, name = ''):
+        """ False if the worker can't take the request """
+
+        request = json.dumps({"script": script, "args": args, "timeout": timeout, "name": name,
+                              "limits": limits.to_dict() if limits else {}}) + '\n'
+
+        try:
+            self.process.stdin.write(request.encode('utf-8'))
+            self.process.stdin.flush()
+        except (OSError, ValueError):
+            return False
+
+        return True
+
+    #-------------------------------------------------------------------------------
+    def stop(self):
+        if self.process is None:
+            return
+
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout = 1)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+
+        self.process.stdout.close()
+        self.process = None
+
+#-------------------------------------------------------------------------------
+class plugin_worker_pool_class:
+    """ Hands out warm workers to the threads running plugins, one run per worker at a time """
+
+    def __init__(self, size, pluginsPath, watchedFile = None):
+        self.size        = size
+        self.pluginsPath = pluginsPath
+        self.watchedFile = watchedFile
+        self.idle        = queue.Queue()
+        self.workers     = []
+        self.lock        = threading.Lock()
+
+        # metrics
+        self.runs     = 0
+        self.restarts = 0
+        self.crashes  = 0
+
+        for i in range(size):
+            worker = plugin_worker_class(pluginsPath, watchedFile)
+
+            # started before the first run, a worker that fails is retried when it's used
+            try:
+                worker.start()
+            except OSError:
+                pass
+
+            self.workers.append(worker)
+            self.idle.put(worker)
+
+    #-------------------------------------------------------------------------------
+    def run(self, script, args, timeout, limits = None, name = ''):
+        """ Runs the script in a warm worker, returns a plugin_process_result or None if
+            no worker could take it and the caller has to start the script itself """
+
+        worker = self.idle.get()
+
+        try:
+            if not worker.is_usable():
+                if worker.process is not None:
+                    with self.lock:
+                        self.restarts += 1
+                try:
+                    worker.start()
+                except OSError as e:
+                    mylog('none', [f'[Plugin worker] ⚠ ERROR: {e}'])
+                    return None
+
+            if not worker.send(script, args, timeout, limits, name):
+                worker.stop()
+                return None
+
+            reply = worker.read_reply(time.monotonic() + timeout + WORKER_GRACE)
+
+            with self.lock:
+                self.runs += 1
+
+            if reply is None:
+                # the run is lost with the worker, it's restarted for the next one
+                with self.lock:
+                    self.crashes += 1
+                worker.stop()
+                return plugin_process_result(-1, 'Plugin worker stopped responding', False, timeout)
+
+            return plugin_process_result(reply["returncode"], reply["output"], reply["timedOut"], reply["duration"])
+
+        finally:
+            self.idle.put(worker)
+
+    #-------------------------------------------------------------------------------
+    def get_metrics(self):
+        with self.lock:
+            return {
+                "size": self.size,
+                "runs": self.runs,
+                "restarts": self.restarts,
+                "crashes": self.crashes
+            }
+
+    #-------------------------------------------------------------------------------
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+
+#-------------------------------------------------------------------------------
+def get_worker_script(command):
+    """ Script path and arguments if the command runs a python script, otherwise None """
+
+    if len(command) < 2 or not os.path.basename(command[0]).startswith('python') or not command[1].endswith('.py'):
+        return None
+
+    return command[1], command[2:]
+
+
+#===============================================================================
+# BEGIN
+#===============================================================================
+if __name__ == '__main__':
+    serve(sys.argv[1])
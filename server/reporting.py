@@ -107,7 +107,7 @@ def get_notifications (db):
         }
         json_down_devices = json_obj.json["data"]     
 
-        mylog('debug', ['[Notification] json_down_devices: ', json.dumps(json_down_devices) ])
+        mylog('debug', lambda: ['[Notification] json_down_devices: ', json.dumps(json_down_devices) ])
     
     if 'down_reconnected' in sections:
         # Compose Reconnected Down Section 
@@ -129,7 +129,7 @@ def get_notifications (db):
         }
         json_down_reconnected = json_obj.json["data"]     
 
-        mylog('debug', ['[Notification] json_down_reconnected: ', json.dumps(json_down_reconnected) ])
+        mylog('debug', lambda: ['[Notification] json_down_reconnected: ', json.dumps(json_down_reconnected) ])
 
     if 'events' in sections:
         # Compose Events Section (no empty lines in SQL queries!)
@@ -1,4 +1,6 @@
 """ class to manage schedules """
+import zlib
+import heapq
 import datetime
 
 from logger import mylog, print_log
@@ -6,38 +8,129 @@ import conf
 
 #-------------------------------------------------------------------------------
 class schedule_class:
-    def __init__(self, service, scheduleObject, last_next_schedule, was_last_schedule_used, last_run = 0):
+    def __init__(self, service, scheduleObject, last_next_schedule, was_last_schedule_used, last_run = 0, jitter = 0):
         self.service = service
         self.scheduleObject = scheduleObject
         self.last_next_schedule = last_next_schedule
         self.last_run = last_run
-        self.was_last_schedule_used = was_last_schedule_used         
-         
-    def runScheduleCheck(self):
-
-        result = False 
-
-        # Initialize the last run time if never run before
-        if self.last_run == 0:
-            self.last_run =  (datetime.datetime.now(conf.tz) - datetime.timedelta(days=365)).replace(microsecond=0)
-
-        # get the current time with the currently specified timezone
-        nowTime = datetime.datetime.now(conf.tz).replace(microsecond=0)
-
-        # Run the schedule if the current time is past the schedule time we saved last time and 
-        #               (maybe the following check is unnecessary)                
-        if nowTime > self.last_next_schedule:
-            mylog('debug',f'[Scheduler] - Scheduler run for {self.service}: YES')
-            self.was_last_schedule_used = True
-            result = True
-        else:
-            mylog('debug',f'[Scheduler] - Scheduler run for {self.service}: NO')
-            # mylog('debug',f'[Scheduler] - nowTime {nowTime}')
-            # mylog('debug',f'[Scheduler] - self.last_next_schedule {self.last_next_schedule}')
-            # mylog('debug',f'[Scheduler] - self.last_run {self.last_run}')
-        
-        if self.was_last_schedule_used:
-            self.was_last_schedule_used = False
-            self.last_next_schedule = self.scheduleObject.next()            
-
-        return result
+        self.was_last_schedule_used = was_last_schedule_used
+        # fixed offset in seconds added to every fire time
+        self.jitter = jitter
+
+        # scheduled runs still to skip, set after repeated timeouts of the plugin
+        self.backoff = 0
+
+        # metrics
+        self.runs = 0
+        self.backed_off = 0      # fire times skipped because of the backoff
+        self.missed = 0          # fire times skipped because the app was busy or stopped
+        self.last_lateness = 0   # seconds between the due time and the run check
+        self.max_lateness = 0
+
+    def due_time(self):
+        return self.last_next_schedule + datetime.timedelta(seconds = self.jitter)
+
+    def advance(self, nowTime):
+        """ Moves to the next fire time after nowTime, counting the skipped ones """
+
+        self.was_last_schedule_used = False
+        self.last_next_schedule = self.scheduleObject.next()
+
+        while self.due_time() <= nowTime:
+            self.missed += 1
+            self.last_next_schedule = self.scheduleObject.next()
+
+#-------------------------------------------------------------------------------
+def get_schedule_jitter(service, maxJitter):
+    """ Stable offset between 0 and maxJitter seconds, so plugins sharing a
+        cron expression are spread out the same way after every restart """
+
+    if maxJitter <= 0:
+        return 0
+
+    return zlib.crc32(service.encode()) % (int(maxJitter) + 1)
+
+#-------------------------------------------------------------------------------
+class scheduler_class:
+    """ Min-heap of the next due time of each schedule """
+
+    def __init__(self, schedules = None):
+        self.heap = []
+        self.schedules = {}
+
+        for schedule in schedules or []:
+            self.add(schedule)
+
+    def add(self, schedule):
+        self.schedules[schedule.service] = schedule
+        # the service name breaks ties, schedule objects can't be compared
+        heapq.heappush(self.heap, (schedule.due_time(), schedule.service))
+
+    def pop_due(self, nowTime = None):
+        """ Returns the services due at nowTime and schedules their next run """
+
+        if nowTime is None:
+            nowTime = datetime.datetime.now(conf.tz).replace(microsecond=0)
+
+        due = []
+
+        while self.heap and self.heap[0][0] <= nowTime:
+            dueTime, service = heapq.heappop(self.heap)
+            schedule = self.schedules[service]
+
+            lateness = (nowTime - dueTime).total_seconds()
+
+            if schedule.backoff > 0:
+                schedule.backoff -= 1
+                schedule.backed_off += 1
+                schedule.advance(nowTime)
+
+                mylog('verbose', [f'[Scheduler] {service} skipped (backoff, {schedule.backoff} more), next run {schedule.due_time()}'])
+
+                heapq.heappush(self.heap, (schedule.due_time(), service))
+                continue
+
+            schedule.runs += 1
+            schedule.last_lateness = lateness
+            schedule.max_lateness = max(schedule.max_lateness, lateness)
+            schedule.was_last_schedule_used = True
+
+            missedBefore = schedule.missed
+            schedule.advance(nowTime)
+
+            if schedule.missed > missedBefore:
+                mylog('verbose', [f'[Scheduler] {service} missed {schedule.missed - missedBefore} run(s), {lateness:.0f}s late'])
+
+            mylog('debug', [f'[Scheduler] - Scheduler run for {service}: YES, next run {schedule.due_time()}'])
+
+            due.append(service)
+            heapq.heappush(self.heap, (schedule.due_time(), service))
+
+        return due
+
+    def next_due_time(self):
+        return self.heap[0][0] if self.heap else None
+
+    def seconds_until_next(self, nowTime = None):
+        """ Seconds until the next schedule is due (0 if overdue), None without schedules """
+
+        if not self.heap:
+            return None
+
+        if nowTime is None:
+            nowTime = datetime.datetime.now(conf.tz)
+
+        return max(0, (self.heap[0][0] - nowTime).total_seconds())
+
+    def get_metrics(self):
+        return {service: {
+                    "next_run": str(schedule.due_time()),
+                    "last_run": str(schedule.last_run),
+                    "runs": schedule.runs,
+                    "missed": schedule.missed,
+                    "last_lateness": schedule.last_lateness,
+                    "max_lateness": schedule.max_lateness,
+                    "jitter": schedule.jitter,
+                    "backoff": schedule.backoff,
+                    "backed_off": schedule.backed_off
+                } for service, schedule in self.schedules.items()}
@@ -0,0 +1,177 @@
+""" Append-only store of the in-app (frontend) user notifications """
+
+import os
+import json
+import fcntl
+import struct
+import contextlib
+
+from const import apiPath
+from logger import mylog
+
+#===============================================================================
+# User notifications store
+#===============================================================================
+#
+# user_notifications.jsonl : one JSON notification per line, oldest first
+# user_notifications.idx   : uint64 little endian byte offset of every line,
+#                            so the newest entries can be paged without reading the log
+# user_notifications.lock  : flock() held by every writer (also by utilNotification.php)
+#
+# Appends are O(1). The store is compacted to the NOTIFICATIONS_MAX newest entries
+# once it holds twice as many. Marking entries read / removing them is a rewrite
+# of the (bounded) store, these are rare user actions.
+
+NOTIFICATIONS_MAX   = 1000
+
+notificationsLog    = apiPath + 'user_notifications.jsonl'
+notificationsIndex  = apiPath + 'user_notifications.idx'
+notificationsLock   = apiPath + 'user_notifications.lock'
+
+# previous format, a JSON array rewritten on every notification
+notificationsLegacy = apiPath + 'user_notifications.json'
+
+INDEX_ENTRY = struct.Struct('<Q')
+
+#-------------------------------------------------------------------------------
+@contextlib.contextmanager
+def notifications_lock(exclusive = True):
+    with open(notificationsLock, 'a') as lockFile:
+        fcntl.flock(lockFile, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lockFile, fcntl.LOCK_UN)
+
+#-------------------------------------------------------------------------------
+def count_notifications():
+    try:
+        return os.path.getsize(notificationsIndex) // INDEX_ENTRY.size
+    except OSError:
+        return 0
+
+#-------------------------------------------------------------------------------
+def append_entries(entries):
+    """ Appends entries to the log and their offsets to the index, lock has to be held """
+
+    with open(notificationsLog, 'ab') as log, open(notificationsIndex, 'ab') as index:
+        offset = log.seek(0, os.SEEK_END)
+        offsets = bytearray()
+
+        for entry in entries:
+            line = (json.dumps(entry) + '\n').encode('utf-8')
+            log.write(line)
+            offsets += INDEX_ENTRY.pack(offset)
+            offset += len(line)
+
+        log.flush()
+        # the index is written last, readers only see complete lines
+        index.write(offsets)
+
+#-------------------------------------------------------------------------------
+def read_entries(start, stop):
+    """ Returns the entries start..stop-1 (oldest first), lock has to be held """
+
+    if stop <= start:
+        return []
+
+    with open(notificationsIndex, 'rb') as index:
+        index.seek(start * INDEX_ENTRY.size)
+        data = index.read((stop - start) * INDEX_ENTRY.size)
+
+    offsets = [offset for (offset,) in INDEX_ENTRY.iter_unpack(data)]
+    entries = []
+
+    with open(notificationsLog, 'rb') as log:
+        for offset in offsets:
+            log.seek(offset)
+            try:
+                entries.append(json.loads(log.readline()))
+            except ValueError as e:
+                mylog('none', [f'[Notification] ⚠ ERROR: Skipping invalid entry at {offset}: {e}'])
+
+    return entries
+
+#-------------------------------------------------------------------------------
+def replace_entries(entries):
+    """ Rewrites the store with the given entries, lock has to be held """
+
+    # truncated and rewritten in place, readers hold the lock too and the files keep
+    # the owner and mode set up for the web server (utilNotification.php appends to them)
+    for path in (notificationsIndex, notificationsLog):
+        with open(path, 'ab') as file:
+            file.truncate(0)
+
+    append_entries(entries)
+
+#-------------------------------------------------------------------------------
+def migrate_legacy_notifications():
+    """ Moves the notifications of user_notifications.json into the store, lock has to be held """
+
+    if not os.path.exists(notificationsLegacy):
+        return
+
+    try:
+        with open(notificationsLegacy, 'r') as file:
+            contents = file.read()
+        entries = json.loads(contents) if contents.strip() != '' else []
+    except (OSError, ValueError) as e:
+        mylog('none', [f'[Notification] ⚠ ERROR: Could not migrate {notificationsLegacy}: {e}'])
+        entries = []
+
+    if isinstance(entries, list):
+        append_entries(entries[-NOTIFICATIONS_MAX:])
+
+    os.remove(notificationsLegacy)
+
+    mylog('verbose', [f'[Notification] Moved {len(entries)} notifications to {notificationsLog}'])
+
+#-------------------------------------------------------------------------------
+def append_notification(entry):
+
+    with notifications_lock():
+        migrate_legacy_notifications()
+
+        append_entries([entry])
+
+        count = count_notifications()
+
+        if count > NOTIFICATIONS_MAX * 2:
+            replace_entries(read_entries(count - NOTIFICATIONS_MAX, count))
+
+#-------------------------------------------------------------------------------
+def compact_notifications(keep = NOTIFICATIONS_MAX):
+    """ Drops all but the newest keep entries, reclaims the space of the dropped ones """
+
+    with notifications_lock():
+        migrate_legacy_notifications()
+
+        count = count_notifications()
+
+        if count > keep:
+            replace_entries(read_entries(count - keep, count))
+
+#-------------------------------------------------------------------------------
+def get_notifications(offset = 0, limit = None):
+    """ Returns a page of entries, newest first, skipping the offset newest ones """
+
+    with notifications_lock(exclusive = False):
+        count = count_notifications()
+
+        stop  = max(0, count - offset)
+        start = 0 if limit is None else max(0, stop - limit)
+
+        entries = read_entries(start, stop)
+
+    entries.reverse()
+
+    return entries
+
+#-------------------------------------------------------------------------------
+def update_notifications(change):
+    """ Rewrites the store with change(entries), change returns the entries to keep """
+
+    with notifications_lock():
+        migrate_legacy_notifications()
+
+        replace_entries(change(read_entries(0, count_notifications())))
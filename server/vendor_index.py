@@ -0,0 +1,316 @@
+""" Compiled IEEE OUI index used for MAC vendor lookups """
+
+import os
+import sys
+import mmap
+import array
+import struct
+import bisect
+import tempfile
+
+from logger import mylog
+from const import vendorsPath, vendorsPathNewest, vendorsIndexPath
+
+#===============================================================================
+# Vendors index
+#===============================================================================
+#
+# Index file layout (native byte order, checked via the byte order marker):
+#
+#   header  : magic (8s) | byte order marker (Q) | source mtime_ns (Q) | source size (Q) | record count (Q)
+#   keys    : record count x uint64, sorted ascending
+#   offsets : record count x uint32, offset of the vendor name in the string table
+#   strings : uint16 length + utf-8 vendor name, one per record
+#
+# A key is (prefix length in bits << 48) | prefix value, so 24 bit (MA-L),
+# 28 bit (MA-M) and 36 bit (MA-S) assignments can live in one sorted array
+# and a MAC is resolved with at most three binary searches, longest prefix first.
+
+INDEX_MAGIC  = b'NAXOUI01'
+INDEX_BOM    = 0x0102030405060708
+INDEX_HEADER = struct.Struct('=8sQQQQ')
+
+# hex digits in the OUI file -> prefix length in bits
+PREFIX_BITS  = {6: 24, 7: 28, 9: 36}
+
+# longest prefix first
+LOOKUP_BITS  = (36, 28, 24)
+
+#-------------------------------------------------------------------------------
+# Mapped index of the current process, reopened when the source file changes
+INDEX_CACHE = None
+
+#-------------------------------------------------------------------------------
+def get_vendors_source():
+    """ Returns the OUI file the index should be built from """
+
+    if os.path.isfile(vendorsPathNewest):
+        return vendorsPathNewest
+
+    return vendorsPath
+
+#-------------------------------------------------------------------------------
+def make_key(bits, prefix):
+    return (bits << 48) | prefix
+
+#-------------------------------------------------------------------------------
+def parse_vendors_file(sourcePath):
+    """ Returns {key: vendor} from an arp-scan style OUI file, first entry wins """
+
+    entries = {}
+
+    with open(sourcePath, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            parts = line.strip().split(None, 1)
+
+            if len(parts) != 2 or parts[0].startswith('#'):
+                continue
+
+            prefixHex = parts[0].replace(':', '').replace('-', '')
+            bits = PREFIX_BITS.get(len(prefixHex))
+
+            if bits is None:
+                continue
+
+            try:
+                key = make_key(bits, int(prefixHex, 16))
+            except ValueError:
+                continue
+
+            if key not in entries:
+                entries[key] = parts[1].strip()
+
+    return entries
+
+#-------------------------------------------------------------------------------
+def build_vendors_index(sourcePath = None, indexPath = None):
+    """ Compiles the OUI file into a sorted binary index, written atomically """
+
+    if sourcePath is None:
+        sourcePath = get_vendors_source()
+
+    if indexPath is None:
+        indexPath = vendorsIndexPath
+
+    stat    = os.stat(sourcePath)
+    entries = parse_vendors_file(sourcePath)
+
+    keys    = array.array('Q', sorted(entries))
+    offsets = array.array('I')
+    strings = bytearray()
+
+    for key in keys:
+        vendor = entries[key].encode('utf-8')[:0xffff]
+        offsets.append(len(strings))
+        strings += struct.pack('=H', len(vendor)) + vendor
+
+    # unique temporary file, the server and the vendor_update plugin can build the index at the same time
+    fd, tmpPath = tempfile.mkstemp(dir = os.path.dirname(indexPath) or '.', prefix = os.path.basename(indexPath) + '.', suffix = '.tmp')
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_BOM, stat.st_mtime_ns, stat.st_size, len(keys)))
+            keys.tofile(f)
+            offsets.tofile(f)
+            f.write(strings)
+
+        # mkstemp creates the file readable by the owner only
+        os.chmod(tmpPath, 0o644)
+        os.replace(tmpPath, indexPath)
+    except BaseException:
+        os.unlink(tmpPath)
+        raise
+
+    mylog('verbose', [f'[Vendor Index] Built {indexPath} with {len(keys)} prefixes from {sourcePath}'])
+
+    return len(keys)
+
+#-------------------------------------------------------------------------------
+class vendors_index_class:
+    """ Read-only, memory mapped view of a compiled vendors index """
+
+    def __init__(self, indexPath):
+        self.path = indexPath
+
+        with open(indexPath, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, bom, self.sourceMtime, self.sourceSize, self.count = INDEX_HEADER.unpack_from(self.map, 0)
+
+        if magic != INDEX_MAGIC or bom != INDEX_BOM:
+            self.close()
+            raise ValueError(f'Invalid vendors index {indexPath}')
+
+        keysStart    = INDEX_HEADER.size
+        offsetsStart = keysStart + self.count * 8
+
+        self.stringsStart = offsetsStart + self.count * 4
+
+        view = memoryview(self.map)
+        self.keys    = view[keysStart:offsetsStart].cast('Q')
+        self.offsets = view[offsetsStart:self.stringsStart].cast('I')
+
+    #-------------------------------------------------------------------------------
+    def matches_source(self, stat):
+        return self.sourceMtime == stat.st_mtime_ns and self.sourceSize == stat.st_size
+
+    #-------------------------------------------------------------------------------
+    def vendor_at(self, position):
+        start = self.stringsStart + self.offsets[position]
+        (length,) = struct.unpack_from('=H', self.map, start)
+        return self.map[start + 2:start + 2 + length].decode('utf-8', errors='replace')
+
+    #-------------------------------------------------------------------------------
+    def find(self, key):
+        position = bisect.bisect_left(self.keys, key)
+
+        if position < self.count and self.keys[position] == key:
+            return position
+
+        return -1
+
+    #-------------------------------------------------------------------------------
+    def lookup(self, mac48):
+        """ Returns the vendor of a 48 bit MAC value or None """
+
+        for bits in LOOKUP_BITS:
+            position = self.find(make_key(bits, mac48 >> (48 - bits)))
+
+            if position != -1:
+                return self.vendor_at(position)
+
+        return None
+
+    #-------------------------------------------------------------------------------
+    def close(self):
+        # memoryviews have to be released before the map can be closed
+        for name in ('keys', 'offsets'):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+                setattr(self, name, None)
+
+        self.map.close()
+
+#-------------------------------------------------------------------------------
+class memory_vendors_index_class:
+    """ In-memory index of the OUI file, used if the compiled index can't be written """
+
+    def __init__(self, sourcePath, stat):
+        self.path        = sourcePath
+        self.entries     = parse_vendors_file(sourcePath)
+        self.sourceMtime = stat.st_mtime_ns
+        self.sourceSize  = stat.st_size
+
+    #-------------------------------------------------------------------------------
+    def matches_source(self, stat):
+        return self.sourceMtime == stat.st_mtime_ns and self.sourceSize == stat.st_size
+
+    #-------------------------------------------------------------------------------
+    def lookup(self, mac48):
+        """ Returns the vendor of a 48 bit MAC value or None """
+
+        for bits in LOOKUP_BITS:
+            vendor = self.entries.get(make_key(bits, mac48 >> (48 - bits)))
+
+            if vendor is not None:
+                return vendor
+
+        return None
+
+    #-------------------------------------------------------------------------------
+    def close(self):
+        self.entries = {}
+
+#-------------------------------------------------------------------------------
+def get_vendors_index():
+    """ Returns the mapped index, (re)building it if the OUI file changed, or an
+        in-memory index if it can't be written """
+
+    global INDEX_CACHE
+
+    sourcePath = get_vendors_source()
+
+    try:
+        stat = os.stat(sourcePath)
+    except FileNotFoundError:
+        mylog('none', [f"[Vendor Check] ⚠ ERROR: Vendors file {sourcePath} not found."])
+        return None
+
+    if INDEX_CACHE is not None and INDEX_CACHE.matches_source(stat):
+        return INDEX_CACHE
+
+    index = None
+
+    try:
+        index = vendors_index_class(vendorsIndexPath)
+
+        if not index.matches_source(stat):
+            index.close()
+            index = None
+    except (OSError, ValueError):
+        index = None
+
+    if index is None:
+        try:
+            build_vendors_index(sourcePath, vendorsIndexPath)
+            index = vendors_index_class(vendorsIndexPath)
+        except (OSError, ValueError) as e:
+            # e.g. read-only folder or disk full, cached until the OUI file changes so it's logged once
+            mylog('none', [f'[Vendor Index] ⚠ ERROR: Could not build {vendorsIndexPath}, using an in-memory index: {e}'])
+
+            try:
+                index = memory_vendors_index_class(sourcePath, stat)
+            except OSError as e:
+                mylog('none', [f'[Vendor Index] ⚠ ERROR: Could not read {sourcePath}: {e}'])
+                return None
+
+    if INDEX_CACHE is not None:
+        INDEX_CACHE.close()
+
+    INDEX_CACHE = index
+
+    return INDEX_CACHE
+
+#-------------------------------------------------------------------------------
+def mac_to_int(pMAC):
+    """ Returns the 48 bit value of a aa:bb:cc:dd:ee:ff MAC or None if it should be ignored """
+
+    pMACstr = str(pMAC)
+    mac     = pMACstr.replace(':', '')
+
+    if len(pMACstr) != 17 or len(mac) != 12:
+        return None
+
+    try:
+        return int(mac, 16)
+    except ValueError:
+        return None
+
+#-------------------------------------------------------------------------------
+def lookup_vendors(macs):
+    """ Resolves a batch of MACs, returns {mac: vendor | -1 not found | -2 ignored} """
+
+    results = {}
+    index   = get_vendors_index()
+
+    for pMAC in macs:
+        mac48 = mac_to_int(pMAC)
+
+        if mac48 is None:
+            results[pMAC] = -2
+            continue
+
+        vendor = index.lookup(mac48) if index is not None else None
+
+        results[pMAC] = vendor if vendor is not None else -1
+
+    return results
+
+
+#===============================================================================
+# BEGIN
+#===============================================================================
+if __name__ == '__main__':
+    # Called by update_vendors.sh after the OUI files are refreshed
+    build_vendors_index(sys.argv[1] if len(sys.argv) > 1 else None)
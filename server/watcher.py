@@ -0,0 +1,207 @@
+""" Waits for changes of the files the main loop reacts to (config, execution queue, DB) """
+
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+from logger import mylog
+
+#===============================================================================
+# File watcher
+#===============================================================================
+
+# inotify(7) constants
+IN_MODIFY      = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_Q_OVERFLOW  = 0x00004000
+IN_NONBLOCK    = 0o4000
+IN_CLOEXEC     = 0o2000000
+
+IN_WATCH_MASK  = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# struct inotify_event: wd, mask, cookie, len, followed by a 0 padded name of len bytes
+INOTIFY_EVENT  = struct.Struct('iIII')
+
+# Used when inotify isn't available (e.g. non-Linux dev setups or no watches left)
+POLL_INTERVAL  = 1
+
+#-------------------------------------------------------------------------------
+def load_inotify():
+    """ Returns libc if it provides inotify, otherwise None """
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+
+    return libc
+
+#-------------------------------------------------------------------------------
+class file_watcher_class:
+    """ Watches a list of files. The parent folders are watched so files replaced
+        with a rename (atomic writes) or created later are still reported """
+
+    def __init__(self, paths, forcePolling = False):
+        self.paths   = [os.path.abspath(path) for path in paths]
+        self.fd      = None
+        self.folders = {}   # watch descriptor -> folder
+        self.stats   = {}   # path -> (mtime_ns, size), polling only
+        self.readers = {}   # file descriptor -> name, see add_reader
+
+        libc = None if forcePolling else load_inotify()
+
+        if libc is not None:
+            self.start_inotify(libc)
+
+        if self.fd is None:
+            mylog('verbose', ['[Watcher] inotify not available, polling every ', POLL_INTERVAL, 's'])
+            self.stats = {path: self.stat(path) for path in self.paths}
+
+    #-------------------------------------------------------------------------------
+    def start_inotify(self, libc):
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+
+        if fd < 0:
+            mylog('verbose', ['[Watcher] inotify_init1 failed: ', os.strerror(ctypes.get_errno())])
+            return
+
+        for folder in sorted(set(os.path.dirname(path) for path in self.paths)):
+            wd = libc.inotify_add_watch(fd, folder.encode(), IN_WATCH_MASK)
+
+            if wd < 0:
+                mylog('verbose', [f'[Watcher] Could not watch {folder}: ', os.strerror(ctypes.get_errno())])
+                os.close(fd)
+                self.folders = {}
+                return
+
+            self.folders[wd] = folder
+
+        self.fd = fd
+
+    #-------------------------------------------------------------------------------
+    def add_reader(self, fd, name):
+        """ Also wakes up when fd is readable, name is returned as changed.
+            The owner has to drain fd, otherwise wait() returns right away """
+
+        self.readers[fd] = name
+
+    #-------------------------------------------------------------------------------
+    def ready_readers(self, timeout):
+        if not self.readers:
+            if timeout > 0:
+                time.sleep(timeout)
+            return set()
+
+        try:
+            ready, _, _ = select.select(list(self.readers), [], [], timeout)
+        except InterruptedError:
+            ready = []
+
+        return set(self.readers[fd] for fd in ready)
+
+    #-------------------------------------------------------------------------------
+    def stat(self, path):
+        try:
+            stat = os.stat(path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    #-------------------------------------------------------------------------------
+    def read_events(self):
+        """ Returns the watched paths with pending inotify events """
+
+        changed = set()
+
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            except InterruptedError:
+                continue
+
+            if not data:
+                break
+
+            offset = 0
+
+            while offset < len(data):
+                wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+                name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b'\0').decode(errors='replace')
+                offset += INOTIFY_EVENT.size + length
+
+                if mask & IN_Q_OVERFLOW:
+                    # events were dropped, assume everything changed
+                    return set(self.paths)
+
+                folder = self.folders.get(wd)
+
+                if folder is not None:
+                    path = os.path.join(folder, name)
+                    if path in self.paths:
+                        changed.add(path)
+
+        return changed
+
+    #-------------------------------------------------------------------------------
+    def poll_changes(self):
+        changed = set()
+
+        for path in self.paths:
+            stat = self.stat(path)
+            if stat != self.stats.get(path):
+                self.stats[path] = stat
+                changed.add(path)
+
+        return changed
+
+    #-------------------------------------------------------------------------------
+    def wait(self, timeout):
+        """ Blocks until one of the files changes or the timeout (seconds) passes.
+            Returns the set of changed paths, empty on timeout """
+
+        deadline = time.monotonic() + max(0, timeout)
+
+        while True:
+            remaining = max(0, deadline - time.monotonic())
+
+            if self.fd is not None:
+                try:
+                    ready, _, _ = select.select([self.fd] + list(self.readers), [], [], remaining)
+                except InterruptedError:
+                    ready = []
+                except OSError as e:
+                    if e.errno != errno.EINTR:
+                        raise
+                    ready = []
+
+                changed = self.read_events() if self.fd in ready else set()
+                changed |= set(self.readers[fd] for fd in ready if fd in self.readers)
+            else:
+                changed = self.poll_changes() | self.ready_readers(0)
+
+                if not changed and remaining > 0:
+                    changed = self.ready_readers(min(POLL_INTERVAL, remaining))
+                    changed |= self.poll_changes()
+
+            # events for other files in the watched folders (e.g. app.log) don't wake the caller
+            if changed or time.monotonic() >= deadline:
+                return changed
+
+    #-------------------------------------------------------------------------------
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
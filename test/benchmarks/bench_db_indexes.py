@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#
+#-------------------------------------------------------------------------------
+#  Benchmark for the index migrations in database.py
+#
+#  Generates a benchmark DB, then times the hot scan / plugin / reporting
+#  queries with and without the indexes of sql_indexes and prints
+#  their EXPLAIN QUERY PLAN.
+#
+#  Usage: python test/benchmarks/bench_db_indexes.py [devices] [events_per_device]
+#-------------------------------------------------------------------------------
+
+import os
+import re
+import sys
+import time
+import pathlib
+import tempfile
+
+sys.path.append(str(pathlib.Path(__file__).parent.resolve()))
+
+from benchmark_db import generate_benchmark_db
+from database import sql_indexes
+
+QUERIES = {
+    # plugin.py - process_plugin_events / helper.py - load_device_name_sources
+    "plugin objects by plugin": """SELECT * FROM Plugins_Objects WHERE Plugin = 'NSLOOKUP'""",
+    "plugin object by IDs": """SELECT * FROM Plugins_Objects WHERE Plugin = 'NMAP' AND Object_PrimaryID = '00:1a:00:00:00:10' AND Object_SecondaryID = '10.0.0.16'""",
+    # networkscan.py - pair_sessions_events (correlated subquery, per event)
+    "pair sessions": """SELECT (SELECT ROWID FROM Events AS EVE2
+                                WHERE EVE2.eve_EventType IN ('New Device', 'Connected', 'Down Reconnected', 'Device Down', 'Disconnected')
+                                  AND EVE2.eve_MAC = Events.eve_MAC AND EVE2.eve_Datetime > Events.eve_DateTime
+                                ORDER BY EVE2.eve_DateTime ASC LIMIT 1)
+                        FROM Events WHERE eve_EventType IN ('New Device', 'Connected', 'Down Reconnected') LIMIT 2000""",
+    # networkscan.py - insert_events (LatestEventsPerMAC)
+    "latest event per MAC": """SELECT eve_MAC, MAX(eve_DateTime) FROM Events GROUP BY eve_MAC""",
+    # reporting.py - get_notifications
+    "pending alerts": """SELECT * FROM Events_Devices WHERE eve_PendingAlertEmail = 1 AND eve_EventType = 'Disconnected' ORDER BY eve_DateTime""",
+    "pending alerts per device": """SELECT eve_MAC, COUNT(*) FROM Events WHERE eve_PendingAlertEmail = 1 AND eve_MAC IN (SELECT dev_MAC FROM Devices WHERE dev_AlertEvents = 0) GROUP BY eve_MAC""",
+    # db_cleanup - Plugins_History trimming and Plugins_Objects de-duplication
+    "trim plugins history": """SELECT "Index" FROM (SELECT "Index", ROW_NUMBER() OVER(PARTITION BY "Plugin" ORDER BY DateTimeChanged DESC) AS row_num
+                                                  FROM Plugins_History) WHERE row_num <= 250""",
+    "de-duplicate plugin objects": """SELECT COUNT(*) FROM Plugins_Objects WHERE rowid > (
+                                          SELECT MIN(rowid) FROM Plugins_Objects p2
+                                          WHERE Plugins_Objects.Plugin = p2.Plugin
+                                            AND Plugins_Objects.Object_PrimaryID = p2.Object_PrimaryID
+                                            AND Plugins_Objects.Object_SecondaryID = p2.Object_SecondaryID
+                                            AND Plugins_Objects.UserData = p2.UserData)""",
+}
+
+#-------------------------------------------------------------------------------
+def time_queries(db):
+    results = {}
+
+    for name, query in QUERIES.items():
+        start = time.perf_counter()
+        db.sql.execute(query).fetchall()
+        results[name] = time.perf_counter() - start
+
+    return results
+
+#-------------------------------------------------------------------------------
+def query_plans(db):
+    return {name: ' | '.join([row[3] for row in db.sql.execute("EXPLAIN QUERY PLAN " + query)]) for name, query in QUERIES.items()}
+
+#-------------------------------------------------------------------------------
+def drop_indexes(db):
+    for statement in sql_indexes:
+        indexName = re.search(r'INDEX IF NOT EXISTS (\w+)', statement).group(1)
+        db.sql.execute(f"DROP INDEX IF EXISTS {indexName}")
+
+    db.sql.execute("ANALYZE")
+
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    eventsPerDevice = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+    print(f"Generating {devices} devices, {devices * eventsPerDevice} events in {path}")
+    db = generate_benchmark_db(path, devices, eventsPerDevice)
+
+    withIndexes = time_queries(db)
+    plansWith = query_plans(db)
+
+    drop_indexes(db)
+
+    withoutIndexes = time_queries(db)
+    plansWithout = query_plans(db)
+
+    print(f"\n{'query':<30} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name in QUERIES:
+        print(f"{name:<30} {withoutIndexes[name] * 1000:>10.1f} {withIndexes[name] * 1000:>10.1f} {withoutIndexes[name] / max(withIndexes[name], 1e-9):>7.1f}x")
+
+    print("\nQuery plans (before -> after)")
+    for name in QUERIES:
+        print(f"\n{name}\n  before: {plansWithout[name]}\n  after : {plansWith[name]}")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+#
+#-------------------------------------------------------------------------------
+#  Benchmark for merging CurrentScan into Devices
+#
+#  Times one statement per column (correlated subquery + EXISTS, as
+#  update_devices_data_from_scan did before) against the single UPDATE ... FROM
+#  and the row value fallback used on SQLite < 3.33.
+#
+#  Usage: python test/benchmarks/bench_device_merge.py [devices]
+#-------------------------------------------------------------------------------
+
+import os
+import sys
+import time
+import random
+import pathlib
+import tempfile
+
+sys.path.append(str(pathlib.Path(__file__).parent.resolve()))
+
+from benchmark_db import generate_benchmark_db, ip_address
+from device import sql_merge_rules, sql_merge_scan_into_devices
+from appevent import flush_app_events
+
+RUNS      = 5
+START     = '2024-02-01 00:00:00'
+
+#-------------------------------------------------------------------------------
+def fill_current_scan(db, present = 0.8):
+    """ Puts a share of the devices into CurrentScan with partly new values """
+
+    db.sql.execute("DELETE FROM CurrentScan")
+
+    rows = []
+    for index, row in enumerate(db.sql.execute("SELECT dev_MAC FROM Devices").fetchall()):
+        if random.random() < present:
+            rows.append((row['dev_MAC'], ip_address(index + random.randint(0, 1)), random.choice(['', 'null', f'host-{index}']),
+                         random.choice(['', 'Acme']), random.choice(['', str(index % 48)])))
+
+    db.sql.executemany("""INSERT INTO CurrentScan (cur_MAC, cur_IP, cur_Name, cur_Vendor, cur_Port, cur_NetworkSite, cur_SSID, cur_NetworkNodeMAC, cur_Type)
+                          VALUES (?, ?, ?, ?, ?, '', '', '', '')""", rows)
+
+    return len(rows)
+
+#-------------------------------------------------------------------------------
+def merge_per_column(db):
+    for column, value in sql_merge_rules:
+        db.sql.execute(f"""UPDATE Devices
+                            SET {column} = (SELECT {value} FROM CurrentScan WHERE dev_MAC = cur_MAC)
+                            WHERE EXISTS (SELECT 1 FROM CurrentScan WHERE dev_MAC = cur_MAC)""",
+                       (START,) if '?' in value else ())
+
+#-------------------------------------------------------------------------------
+def merge_update_from(db):
+    db.sql.execute(sql_merge_scan_into_devices((3, 33, 0)), (START,))
+
+#-------------------------------------------------------------------------------
+def merge_row_values(db):
+    db.sql.execute(sql_merge_scan_into_devices((3, 32, 0)), (START,))
+
+#-------------------------------------------------------------------------------
+def timed(function, db):
+    total = 0
+
+    for run in range(RUNS):
+        begin = time.perf_counter()
+        with db.transaction('bench'):
+            function(db)
+            # the AppEvents triggers are part of the cost of each statement
+            flush_app_events(db)
+        total += time.perf_counter() - begin
+
+    return total / RUNS
+
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    db = generate_benchmark_db(path, devices, 1)
+
+    scanned = fill_current_scan(db)
+
+    # events left by the generator
+    flush_app_events(db)
+
+    print(f"{devices} devices, {scanned} in CurrentScan, {len(sql_merge_rules)} merged columns\n")
+    print(f"{'method':>16} {'ms':>10}")
+
+    for name, function in [('per column', merge_per_column), ('UPDATE FROM', merge_update_from), ('row values', merge_row_values)]:
+        print(f"{name:>16} {timed(function, db) * 1000:>10.1f}")
+
+    db.sql_connection.close()
+    os.remove(path)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+#
+#-------------------------------------------------------------------------------
+#  Benchmark for the logger
+#
+#  Times mylog calls for a disabled level, an enabled level written by the
+#  log writer thread and the previous thread-per-line append.
+#
+#  Usage: python test/benchmarks/bench_logger.py [lines]
+#-------------------------------------------------------------------------------
+
+import os
+import sys
+import time
+import pathlib
+import tempfile
+import threading
+import contextlib
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent.parent.resolve()) + "/server/")
+
+import conf
+import logger
+from logger import mylog, logWriter, append_to_file
+
+#-------------------------------------------------------------------------------
+def append_with_thread(file_path, data, timeout):
+    # previous implementation: one thread and one open() per line
+    thread = threading.Thread(target=append_to_file, args=(file_path, data))
+    thread.start()
+    thread.join(timeout)
+
+#-------------------------------------------------------------------------------
+def timed(lines, level):
+    params = [(i, f"10.0.{i % 256}.{i % 200}") for i in range(200)]
+
+    start = time.perf_counter()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for i in range(lines):
+            mylog(level, ['[Plugins] sqlParam entries: ', params])
+
+        logWriter.flush(60)
+
+    return (time.perf_counter() - start) / lines * 1000000
+
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    logger.logPath = tempfile.mkdtemp()
+    conf.LOG_LEVEL = 'verbose'
+
+    print(f"disabled level       : {timed(lines, 'debug'):8.2f} us/line")
+    print(f"log writer thread    : {timed(lines, 'verbose'):8.2f} us/line")
+
+    logger.append_to_file_with_timeout = append_with_thread
+    print(f"thread per line      : {timed(lines, 'verbose'):8.2f} us/line")
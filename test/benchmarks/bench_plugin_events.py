@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+#
+#-------------------------------------------------------------------------------
+#  Benchmark for plugin.reconcile_plugin_objects
+#
+#  Reconciles N existing Plugins_Objects rows with N plugin events
+#  (10% new, 10% missing, 10% with changed watched values) and prints the
+#  time per object to show the diff engine scales linearly.
+#
+#  Usage: python test/benchmarks/bench_plugin_events.py [max_objects]
+#-------------------------------------------------------------------------------
+
+import sys
+import time
+import pathlib
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent.parent.resolve()) + "/server/")
+
+from plugin import plugin_object_class, reconcile_plugin_objects
+
+plugin = {
+    "unique_prefix": "BENCH",
+    "settings": [
+        {"function": "WATCH", "value": ["Watched_Value1", "Watched_Value2"]}
+    ]
+}
+
+#-------------------------------------------------------------------------------
+def make_row(index, mac, port, watched1, status):
+    # Same column layout as the Plugins_Objects table / execute_plugin sqlParams
+    return (index, "BENCH", mac, port, "2024-01-01 00:00:00", "2024-01-01 00:00:00",
+            watched1, "svc", "null", "null", status, "", "", mac, "", "null", "null", "null", "null")
+
+#-------------------------------------------------------------------------------
+def run(size):
+    objects_rows = []
+    events_rows  = []
+
+    for i in range(size):
+        mac = f"00:11:22:{(i >> 16) & 0xff:02x}:{(i >> 8) & 0xff:02x}:{i & 0xff:02x}"
+
+        # every 10th object is missing from the events
+        if i % 10 != 0:
+            # every 10th event has a changed watched value
+            watched1 = "closed" if i % 10 == 1 else "open"
+            events_rows.append(make_row(0, mac, str(i), watched1, "not-processed"))
+
+        objects_rows.append(make_row(i + 1, mac, str(i), "open", "watched-not-changed"))
+
+    # 10% new objects
+    for i in range(size // 10):
+        events_rows.append(make_row(0, "aa:bb:cc:dd:ee:ff", f"new-{i}", "open", "not-processed"))
+
+    pluginObjects = [plugin_object_class(plugin, row) for row in objects_rows]
+    pluginEvents  = [plugin_object_class(plugin, row) for row in events_rows]
+
+    start = time.perf_counter()
+    merged, inserts, updates, events, history = reconcile_plugin_objects(pluginObjects, pluginEvents, ["new", "watched-changed"])
+    duration = time.perf_counter() - start
+
+    assert len(inserts) == size // 10
+    assert len(merged) == size + size // 10
+
+    return duration
+
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    max_objects = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    print(f"{'objects':>10} {'total ms':>10} {'us/object':>10}")
+
+    size = 1000
+    while size <= max_objects:
+        duration = run(size)
+        print(f"{size:>10} {duration * 1000:>10.1f} {duration * 1e6 / size:>10.2f}")
+        size *= 10
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+#
+#-------------------------------------------------------------------------------
+#  Benchmark for ingesting a plugin result file
+#
+#  Processes a last_result.log with N new objects once loaded as a whole (the
+#  file read into a list of rows, as execute_plugin did before) and once
+#  streamed in batches of PLUGIN_EVENTS_BATCH_SIZE, and prints the time and the
+#  peak of the memory allocated by python (tracemalloc).
+#
+#  Usage: python test/benchmarks/bench_plugin_results.py [max_rows]
+#-------------------------------------------------------------------------------
+
+import os
+import sys
+import time
+import pathlib
+import tempfile
+import tracemalloc
+
+sys.path.append(str(pathlib.Path(__file__).parent.resolve()))
+
+from benchmark_db import generate_benchmark_db, mac_address, ip_address
+from plugin import read_plugin_result_file, process_plugin_events, plugins_state
+
+plugin = {
+    "unique_prefix": "BENCH",
+    "settings": [
+        {"function": "WATCH", "value": ["Watched_Value1", "Watched_Value2"]}
+    ]
+}
+
+#-------------------------------------------------------------------------------
+def write_result_file(path, rows):
+    with open(path, 'w') as f:
+        for i in range(rows):
+            f.write(f"{mac_address(i)}|{ip_address(i)}|2024-01-01 00:00:00|{ip_address(i)}|host-{i}|null|null|Some vendor name|{mac_address(i)}\n")
+
+#-------------------------------------------------------------------------------
+def run(db, resultPath, stream):
+    db.sql.execute("DELETE FROM Plugins_Objects WHERE Plugin = 'BENCH'")
+
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    rows = read_plugin_result_file(resultPath, plugin)
+
+    if not stream:
+        rows = list(rows)
+
+    process_plugin_events(db, plugin, plugins_state(), rows)
+
+    duration = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return duration, peak
+
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    folder = tempfile.mkdtemp()
+    db = generate_benchmark_db(os.path.join(folder, "bench.db"), 100, 1)
+    resultPath = os.path.join(folder, "last_result.log")
+
+    print(f"{'rows':>8} {'whole ms':>10} {'whole MB':>10} {'stream ms':>10} {'stream MB':>10}")
+
+    rows = 1000
+    while rows <= max_rows:
+        write_result_file(resultPath, rows)
+
+        whole  = run(db, resultPath, False)
+        stream = run(db, resultPath, True)
+
+        print(f"{rows:>8} {whole[0] * 1000:>10.1f} {whole[1] / 1e6:>10.1f} {stream[0] * 1000:>10.1f} {stream[1] / 1e6:>10.1f}")
+        rows *= 10
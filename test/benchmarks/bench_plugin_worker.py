@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+#
+#-------------------------------------------------------------------------------
+#  Benchmark for the warm plugin workers
+#
+#  Times a minimal plugin script importing the shared server modules (like the
+#  plugins do through plugin_helper) started as a new "python3 script.py"
+#  process against the same script forked from a warm worker.
+#
+#  Usage: python test/benchmarks/bench_plugin_worker.py [runs]
+#-------------------------------------------------------------------------------
+
+import os
+import sys
+import time
+import pathlib
+import tempfile
+import statistics
+import subprocess
+
+ROOT_PATH = pathlib.Path(__file__).parent.parent.parent.resolve()
+
+sys.path.append(str(ROOT_PATH) + "/server/")
+
+from plugin_worker import plugin_worker_pool_class
+
+SCRIPT = f"""
+import os
+import sys
+
+sys.path.append('{ROOT_PATH}/server')
+
+from logger import mylog
+from helper import timeNowTZ, get_setting_value
+from const import logPath
+
+def main():
+    with open(os.path.join(os.path.dirname(__file__), 'last_result.log'), 'w') as f:
+        for i in range(100):
+            f.write(f'00:1a:00:00:00:{{i:02x}}|10.0.0.{{i}}|2024-01-01 00:00:00|null|null|null|null|null|null\\n')
+
+if __name__ == '__main__':
+    main()
+"""
+
+#-------------------------------------------------------------------------------
+def timed(function, runs):
+    durations = []
+
+    for run in range(runs):
+        begin = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - begin)
+
+    return statistics.median(durations), max(durations)
+
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    folder = tempfile.mkdtemp()
+    script = os.path.join(folder, 'script.py')
+
+    with open(script, 'w') as f:
+        f.write(SCRIPT)
+
+    begin = time.perf_counter()
+    pool = plugin_worker_pool_class(1, folder)
+    startup = time.perf_counter() - begin
+
+    cold = timed(lambda: subprocess.check_output([sys.executable, script], stderr=subprocess.STDOUT, timeout=30), runs)
+    warm = timed(lambda: pool.run(script, [], 30), runs)
+
+    pool.stop()
+
+    print(f"worker startup (once): {startup * 1000:.1f} ms\n")
+    print(f"{'':>6} {'median ms':>10} {'max ms':>10}")
+    print(f"{'cold':>6} {cold[0] * 1000:>10.1f} {cold[1] * 1000:>10.1f}")
+    print(f"{'warm':>6} {warm[0] * 1000:>10.1f} {warm[1] * 1000:>10.1f}")
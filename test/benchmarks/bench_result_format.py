@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+#
+#-------------------------------------------------------------------------------
+#  Benchmark for parsing plugin result files
+#
+#  Times read_plugin_result_file on the same N objects written once in the pipe
+#  separated format and once in the tab separated format (plugin_helper
+#  "result_format": "tsv"), without and with a value that needs escaping in
+#  every line, and prints the file size and parse time.
+#
+#  Usage: python test/benchmarks/bench_result_format.py [max_rows]
+#-------------------------------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import pathlib
+import tempfile
+
+sys.path.append(str(pathlib.Path(__file__).parent.resolve()))
+
+from benchmark_db import mac_address, ip_address
+from const import pluginResultFormat, pluginResultVersion
+from plugin import read_plugin_result_file
+
+plugin = {"unique_prefix": "BENCH"}
+
+#-------------------------------------------------------------------------------
+def get_values(i, extra):
+    return [mac_address(i), ip_address(i), '2024-01-01 00:00:00', ip_address(i), f'host-{i}', None, None, extra, mac_address(i)]
+
+#-------------------------------------------------------------------------------
+def write_pipe_file(path, rows):
+    with open(path, 'w') as f:
+        for i in range(rows):
+            f.write('|'.join('null' if value is None else str(value) for value in get_values(i, 'Some vendor name')) + '\n')
+
+#-------------------------------------------------------------------------------
+def escape(value):
+    if value is None:
+        return 'null'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+#-------------------------------------------------------------------------------
+def write_tsv_file(path, rows, extra):
+    with open(path, 'w') as f:
+        f.write(json.dumps({"format": pluginResultFormat, "version": pluginResultVersion}) + '\n')
+        for i in range(rows):
+            f.write('\t'.join(escape(value) for value in get_values(i, extra)) + '\n')
+
+#-------------------------------------------------------------------------------
+def parse(path):
+    start = time.perf_counter()
+
+    count = sum(1 for row in read_plugin_result_file(path, plugin))
+
+    return time.perf_counter() - start, count
+
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    folder = tempfile.mkdtemp()
+    pipePath    = os.path.join(folder, "pipe.log")
+    tsvPath     = os.path.join(folder, "tsv.log")
+    escapedPath = os.path.join(folder, "escaped.log")
+
+    print(f"{'rows':>8} {'pipe MB':>8} {'pipe ms':>9} {'tsv MB':>8} {'tsv ms':>9} {'escaped ms':>11}")
+
+    rows = 1000
+    while rows <= max_rows:
+        write_pipe_file(pipePath, rows)
+        write_tsv_file(tsvPath, rows, 'Some vendor name')
+        write_tsv_file(escapedPath, rows, 'Line 1\nLine 2 | with\ttabs')
+
+        pipe    = parse(pipePath)
+        tsv     = parse(tsvPath)
+        escaped = parse(escapedPath)
+
+        assert pipe[1] == tsv[1] == escaped[1] == rows
+
+        print(f"{rows:>8} {os.path.getsize(pipePath) / 1e6:>8.1f} {pipe[0] * 1000:>9.1f} {os.path.getsize(tsvPath) / 1e6:>8.1f} {tsv[0] * 1000:>9.1f} {escaped[0] * 1000:>11.1f}")
+        rows *= 10
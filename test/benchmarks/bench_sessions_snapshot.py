@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+#
+#-------------------------------------------------------------------------------
+#  Benchmark for the incremental Sessions snapshot in networkscan.py
+#
+#  For growing event histories, simulates scans changing a few devices and times
+#  the full rebuild of the snapshot against the incremental update.
+#
+#  Usage: python test/benchmarks/bench_sessions_snapshot.py [devices] [changed_per_scan]
+#-------------------------------------------------------------------------------
+
+import os
+import sys
+import time
+import random
+import pathlib
+import datetime
+import tempfile
+
+sys.path.append(str(pathlib.Path(__file__).parent.resolve()))
+
+from benchmark_db import generate_benchmark_db, mac_address
+import networkscan
+from networkscan import create_sessions_snapshot, rebuild_sessions_snapshot, check_sessions_consistency, pair_sessions_events
+
+HISTORY = [10, 50, 200]
+SCANS   = 5
+
+#-------------------------------------------------------------------------------
+def simulate_scan(db, devices, changed, scanTime):
+    for i in random.sample(range(devices), changed):
+        db.sql.execute("""INSERT INTO Events (eve_MAC, eve_IP, eve_DateTime, eve_EventType, eve_AdditionalInfo, eve_PendingAlertEmail)
+                          VALUES (?, '10.0.0.1', ?, ?, '', 1)""",
+                       (mac_address(i), str(scanTime), random.choice(['Connected', 'Disconnected'])))
+
+    pair_sessions_events(db)
+
+#-------------------------------------------------------------------------------
+def timed(function, db):
+    start = time.perf_counter()
+    function(db)
+    return time.perf_counter() - start
+
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    changed = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    print(f"{'events/device':>14} {'events':>8} {'full rebuild ms':>16} {'incremental ms':>15}")
+
+    for eventsPerDevice in HISTORY:
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        db = generate_benchmark_db(path, devices, eventsPerDevice)
+
+        # pairs the generated disconnections, then a full rebuild as on the first scan after a start
+        pair_sessions_events(db)
+        networkscan.sessionsSnapshotReady = False
+        create_sessions_snapshot(db)
+
+        scanTime = datetime.datetime(2025, 1, 1)
+        full = 0
+        incremental = 0
+
+        for scan in range(SCANS):
+            scanTime += datetime.timedelta(minutes = 5)
+            simulate_scan(db, devices, changed, scanTime)
+
+            incremental += timed(create_sessions_snapshot, db)
+
+            # what the scan used to do, ends up with the same snapshot
+            full += timed(rebuild_sessions_snapshot, db)
+
+        assert check_sessions_consistency(db) == 0
+
+        events = db.sql.execute("SELECT COUNT(*) FROM Events").fetchone()[0]
+
+        print(f"{eventsPerDevice:>14} {events:>8} {full / SCANS * 1000:>16.1f} {incremental / SCANS * 1000:>15.1f}")
+
+        db.sql_connection.close()
+        os.remove(path)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+#
+#-------------------------------------------------------------------------------
+#  Benchmark for DB.upgradeDB at startup
+#
+#  For growing databases, times a start on an up-to-date database (only the
+#  PRAGMA user_version check and the per-start cleanup) against replaying all
+#  schema migrations, which is what upgradeDB did on every start before.
+#
+#  Usage: python test/benchmarks/bench_startup.py [events_per_device]
+#-------------------------------------------------------------------------------
+
+import os
+import sys
+import time
+import pathlib
+import tempfile
+
+sys.path.append(str(pathlib.Path(__file__).parent.resolve()))
+
+from benchmark_db import generate_benchmark_db
+from database import schema_migrations
+
+DEVICES = [100, 1000, 5000]
+STARTS  = 5
+
+#-------------------------------------------------------------------------------
+def replay_migrations(db):
+    for version, steps in schema_migrations:
+        for step in steps:
+            step(db)
+
+#-------------------------------------------------------------------------------
+def timed(function, db):
+    total = 0
+
+    for start in range(STARTS):
+        begin = time.perf_counter()
+        function(db)
+        total += time.perf_counter() - begin
+
+    return total / STARTS
+
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    eventsPerDevice = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    print(f"{'devices':>8} {'events':>8} {'replay all ms':>14} {'warm start ms':>14}")
+
+    for devices in DEVICES:
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        db = generate_benchmark_db(path, devices, eventsPerDevice)
+
+        # statements in autocommit mode, as the old upgradeDB ran them
+        replay = timed(replay_migrations, db)
+
+        # the first start clears the AppEvents and fills the GUIDs left by the generator
+        db.upgradeDB()
+        warm = timed(lambda db: db.upgradeDB(), db)
+
+        events = db.sql.execute("SELECT COUNT(*) FROM Events").fetchone()[0]
+
+        print(f"{devices:>8} {events:>8} {replay * 1000:>14.1f} {warm * 1000:>14.1f}")
+
+        db.sql_connection.close()
+        os.remove(path)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+#
+#-------------------------------------------------------------------------------
+#  Benchmark for vendor_index.lookup_vendors
+#
+#  Builds an index from a synthetic OUI file (MA-L, MA-M and MA-S prefixes)
+#  and resolves batches of random MACs through the memory mapped index.
+#
+#  Usage: python test/benchmarks/bench_vendor_index.py [oui_file]
+#-------------------------------------------------------------------------------
+
+import os
+import sys
+import time
+import random
+import pathlib
+import tempfile
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent.parent.resolve()) + "/server/")
+
+import vendor_index
+
+#-------------------------------------------------------------------------------
+def write_oui_file(path):
+    random.seed(1)
+    with open(path, 'w') as f:
+        for i in range(35000):
+            f.write(f"{random.getrandbits(24):06X}\tVendor {i}\n")
+        for i in range(5000):
+            f.write(f"{random.getrandbits(28):07X}\tMA-M Vendor {i}\n")
+        for i in range(6000):
+            f.write(f"{random.getrandbits(36):09X}\tMA-S Vendor {i}\n")
+
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    tmpDir = tempfile.mkdtemp()
+
+    sourcePath = sys.argv[1] if len(sys.argv) > 1 else os.path.join(tmpDir, "ieee-oui.txt")
+    if len(sys.argv) <= 1:
+        write_oui_file(sourcePath)
+
+    vendor_index.vendorsPath       = sourcePath
+    vendor_index.vendorsPathNewest = os.path.join(tmpDir, "missing.txt")
+    vendor_index.vendorsIndexPath  = os.path.join(tmpDir, "ieee-oui.idx")
+
+    start = time.perf_counter()
+    vendor_index.get_vendors_index()
+    print(f"build + map: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print(f"{'macs':>10} {'total ms':>10} {'us/mac':>10}")
+
+    for size in (1000, 10000, 100000):
+        macs = [':'.join(f"{random.getrandbits(8):02x}" for _ in range(6)) for _ in range(size)]
+
+        start = time.perf_counter()
+        vendor_index.lookup_vendors(macs)
+        duration = time.perf_counter() - start
+
+        print(f"{size:>10} {duration * 1000:>10.1f} {duration * 1e6 / size:>10.2f}")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+#
+#-------------------------------------------------------------------------------
+#  Benchmark DB generator
+#
+#  Creates an app.db with the current schema (back/app.db + DB.upgradeDB) filled
+#  with synthetic devices, events, plugin objects and plugin history.
+#
+#  Usage: python test/benchmarks/benchmark_db.py <output.db> [devices] [events_per_device]
+#-------------------------------------------------------------------------------
+
+import sys
+import random
+import shutil
+import sqlite3
+import pathlib
+import datetime
+
+ROOT_PATH = pathlib.Path(__file__).parent.parent.parent.resolve()
+
+sys.path.append(str(ROOT_PATH) + "/server/")
+
+from database import DB
+
+PLUGINS = ['ARPSCAN', 'NMAPDEV', 'NSLOOKUP', 'AVAHISCAN', 'NBTSCAN', 'DHCPLSS', 'NMAP']
+
+#-------------------------------------------------------------------------------
+def open_db(path):
+    """ Returns a DB instance connected to the given file """
+
+    db = DB()
+    db.sql_connection = sqlite3.connect(path, isolation_level=None)
+    db.sql_connection.execute('pragma journal_mode=wal')
+    db.sql_connection.text_factory = str
+    db.sql_connection.row_factory = sqlite3.Row
+    db.sql = db.sql_connection.cursor()
+
+    return db
+
+#-------------------------------------------------------------------------------
+def mac_address(index):
+    return f"00:1a:{(index >> 24) & 0xff:02x}:{(index >> 16) & 0xff:02x}:{(index >> 8) & 0xff:02x}:{index & 0xff:02x}"
+
+#-------------------------------------------------------------------------------
+def ip_address(index):
+    return f"10.{(index >> 16) & 0xff}.{(index >> 8) & 0xff}.{index & 0xff}"
+
+#-------------------------------------------------------------------------------
+def generate_benchmark_db(path, devices = 1000, eventsPerDevice = 50, seed = 1):
+    """ Creates the benchmark DB and returns an open DB instance """
+
+    random.seed(seed)
+
+    shutil.copyfile(str(ROOT_PATH) + "/back/app.db", path)
+
+    db = open_db(path)
+    db.upgradeDB()
+
+    sql = db.sql
+    start = datetime.datetime(2024, 1, 1)
+
+    sql.execute("BEGIN")
+
+    deviceRows = []
+    eventRows = []
+    objectRows = []
+    historyRows = []
+
+    for i in range(devices):
+        mac = mac_address(i)
+        ip = ip_address(i)
+        present = 1 if random.random() < 0.7 else 0
+
+        deviceRows.append((mac, f"device-{i}" if i % 5 else '(unknown)', '', '(unknown)' if i % 7 == 0 else 'Vendor',
+                           str(start), str(start), ip, present, random.randint(0, 1)))
+
+        for e in range(eventsPerDevice):
+            eventTime = start + datetime.timedelta(minutes = e * 5 + random.randint(0, 4))
+            eventType = 'Connected' if e % 2 == 0 else 'Disconnected'
+            pending = 1 if e == eventsPerDevice - 1 and i % 10 == 0 else 0
+            eventRows.append((mac, ip, str(eventTime), eventType, '', pending))
+
+        for plugin in PLUGINS:
+            objectRows.append((plugin, mac, ip, str(start), str(start), f"name-{i}", f"device-{i}.lan", '', '', 'watched-not-changed', '', '', mac))
+
+            for h in range(3):
+                historyRows.append((plugin, mac, ip, str(start), str(start + datetime.timedelta(days = h)), f"name-{i}", '', '', '', 'watched-not-changed', '', '', mac))
+
+    sql.executemany("""INSERT INTO Devices (dev_MAC, dev_Name, dev_Owner, dev_Vendor, dev_FirstConnection, dev_LastConnection,
+                                            dev_LastIP, dev_PresentLastScan, dev_AlertDeviceDown)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", deviceRows)
+
+    sql.executemany("""INSERT INTO Events (eve_MAC, eve_IP, eve_DateTime, eve_EventType, eve_AdditionalInfo, eve_PendingAlertEmail)
+                       VALUES (?, ?, ?, ?, ?, ?)""", eventRows)
+
+    pluginColumns = """(Plugin, Object_PrimaryID, Object_SecondaryID, DateTimeCreated, DateTimeChanged, Watched_Value1, Watched_Value2,
+                        Watched_Value3, Watched_Value4, Status, Extra, UserData, ForeignKey)"""
+
+    sql.executemany(f"INSERT INTO Plugins_Objects {pluginColumns} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", objectRows)
+    sql.executemany(f"INSERT INTO Plugins_History {pluginColumns} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", historyRows)
+
+    # pair the generated sessions
+    sql.execute("""UPDATE Events SET eve_PairEventRowid = RowID + 1 WHERE eve_EventType = 'Connected'""")
+
+    sql.execute("COMMIT")
+    sql.execute("ANALYZE")
+
+    return db
+
+
+#===============================================================================
+# BEGIN
+#===============================================================================
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python test/benchmarks/benchmark_db.py <output.db> [devices] [events_per_device]")
+        sys.exit(1)
+
+    generate_benchmark_db(sys.argv[1],
+                          int(sys.argv[2]) if len(sys.argv) > 2 else 1000,
+                          int(sys.argv[3]) if len(sys.argv) > 3 else 50)
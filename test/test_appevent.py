@@ -0,0 +1,68 @@
+import sys
+import pathlib
+
+ROOT_PATH = pathlib.Path(__file__).parent.parent.resolve()
+
+sys.path.append(str(ROOT_PATH) + "/server/")
+sys.path.append(str(ROOT_PATH) + "/test/")
+
+from appevent import flush_app_events, get_app_events_stats, count_pending_app_events, count_suppressed_app_events
+from test_database import open_test_db
+
+
+def insert_device(db, mac):
+    db.sql.execute("""INSERT INTO Devices (dev_MAC, dev_Name, dev_Owner, dev_Favorite, dev_FirstConnection, dev_LastConnection, dev_LastIP,
+                                           dev_StaticIP, dev_ScanCycle, dev_LogEvents, dev_AlertEvents, dev_AlertDeviceDown, dev_SkipRepeated,
+                                           dev_PresentLastScan, dev_NewDevice, dev_Archived)
+                      VALUES (?, 'test', '', 0, '2024-01-01 00:00:00', '2024-01-01 00:00:00', '10.0.0.1', 0, 1, 1, 1, 0, 0, 1, 1, 0)""", (mac,))
+
+
+def app_events(db):
+    return [tuple(row) for row in db.sql.execute("SELECT ObjectPrimaryID, ObjectSecondaryID, ObjectStatus, AppEventType FROM AppEvents ORDER BY \"Index\"")]
+
+
+# -------------------------------------------------------------------------------
+def test_app_events(tmp_path):
+    db = open_test_db(str(tmp_path / "app.db"))
+    db.upgradeDB()
+
+    mac = "00:1a:00:00:00:01"
+
+    # created, then changed twice within the same scan: one create event with the latest values
+    insert_device(db, mac)
+    db.sql.execute("UPDATE Devices SET dev_PresentLastScan = 0 WHERE dev_MAC = ?", (mac,))
+    db.sql.execute("UPDATE Devices SET dev_LastIP = '10.0.0.2' WHERE dev_MAC = ?", (mac,))
+
+    assert flush_app_events(db) == 1
+    assert app_events(db) == [(mac, '10.0.0.2', 'offline', 'create')]
+
+    # updates of columns not shown in the events are suppressed, counted once per statement
+    other = "00:1a:00:00:00:02"
+    insert_device(db, other)
+    flush_app_events(db)
+
+    for minute in range(5):
+        pendingBefore = count_pending_app_events(db, 'Devices')
+        db.sql.execute("UPDATE Devices SET dev_LastConnection = ? WHERE dev_MAC IN (?, ?)", (f'2024-01-01 00:0{minute}:00', mac, other))
+        count_suppressed_app_events(db, 'Devices', db.sql.rowcount, pendingBefore)
+
+    assert flush_app_events(db) == 0
+
+    # only the rows that didn't emit an event
+    pendingBefore = count_pending_app_events(db, 'Devices')
+    db.sql.execute("UPDATE Devices SET dev_LastIP = '10.0.0.2' WHERE dev_MAC IN (?, ?)", (mac, other))
+    count_suppressed_app_events(db, 'Devices', db.sql.rowcount, pendingBefore)
+
+    assert flush_app_events(db) == 1
+
+    # anything followed by a delete is a delete
+    db.sql.execute("UPDATE Devices SET dev_PresentLastScan = 1 WHERE dev_MAC = ?", (mac,))
+    db.sql.execute("DELETE FROM Devices WHERE dev_MAC = ?", (mac,))
+
+    assert flush_app_events(db) == 1
+    assert app_events(db)[-1] == (mac, '10.0.0.2', 'online', 'delete')
+
+    stats = get_app_events_stats(db)["Devices"]
+    assert stats["emitted"] == 4
+    assert stats["coalesced"] == 3
+    assert stats["suppressed"] == 11
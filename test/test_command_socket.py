@@ -0,0 +1,70 @@
+import sys
+import json
+import socket
+import pathlib
+
+ROOT_PATH = pathlib.Path(__file__).parent.parent.resolve()
+
+sys.path.append(str(ROOT_PATH) + "/server/")
+
+from command_socket import command_socket_class
+from watcher import file_watcher_class
+
+
+def send(path, line):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(path)
+    client.settimeout(5)
+    client.sendall((line + '\n').encode())
+    return client
+
+
+def read_reply(client):
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = client.recv(1024)
+        if not chunk:
+            break
+        data += chunk
+    return json.loads(data)
+
+
+# -------------------------------------------------------------------------------
+def test_command_socket(tmp_path):
+    path = str(tmp_path / "command.sock")
+    commandSocket = command_socket_class(path)
+
+    watcher = file_watcher_class([str(tmp_path / "execution_queue.log")])
+    watcher.add_reader(commandSocket.fileno(), path)
+
+    # accepted commands wake the main loop
+    client = send(path, "[2024-01-01 00:00:00]|guid|run|ARPSCAN")
+    assert read_reply(client) == {"status": "queued", "depth": 1}
+    assert watcher.wait(5) == {path}
+
+    commands = commandSocket.pop_commands()
+    assert [(command.event, command.param) for command in commands] == [("run", "ARPSCAN")]
+    assert watcher.wait(0.1) == set()
+
+    # the client waiting for the result gets it once executed
+    commandSocket.complete(commands[0])
+    assert read_reply(client)["status"] == "done"
+    client.close()
+
+    # unknown events are left to the execution queue file
+    client = send(path, "[2024-01-01 00:00:00]|guid|cron_restart_backend|")
+    assert read_reply(client)["status"] == "rejected"
+    client.close()
+
+    client = send(path, "status")
+    metrics = read_reply(client)
+    client.close()
+
+    assert metrics["depth"] == 0
+    assert metrics["received"] == 1
+    assert metrics["executed"] == 1
+    assert metrics["rejected"] == 1
+
+    commandSocket.close()
+    watcher.close()
+    assert not pathlib.Path(path).exists()
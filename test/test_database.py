@@ -0,0 +1,115 @@
+import sys
+import shutil
+import sqlite3
+import pathlib
+
+ROOT_PATH = pathlib.Path(__file__).parent.parent.resolve()
+
+sys.path.append(str(ROOT_PATH) + "/server/")
+
+from database import DB, schema_migrations
+
+
+def open_test_db(path):
+    shutil.copyfile(str(ROOT_PATH) + "/back/app.db", path)
+
+    db = DB()
+    db.sql_connection = sqlite3.connect(path, isolation_level=None)
+    db.sql_connection.row_factory = sqlite3.Row
+    db.sql = db.sql_connection.cursor()
+
+    return db
+
+
+def test_upgrade_db(tmp_path):
+    db = open_test_db(str(tmp_path / "app.db"))
+
+    db.upgradeDB()
+
+    latestVersion = schema_migrations[-1][0]
+    indexes = [row[0] for row in db.sql.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+    triggers = [row[0] for row in db.sql.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")]
+
+    assert db.sql.execute("PRAGMA user_version").fetchone()[0] == latestVersion
+    assert "IDX_plo_Plugin_PrimaryID_SecondaryID" in indexes
+    assert "IDX_eve_PendingAlert_MAC_DateTime" in indexes
+    assert "trg_sessions_insert_event" in triggers
+    assert "trg_create_device" in triggers
+
+    # applied migrations are skipped on the next start, only the per-start tables are cleared
+    db.sql.execute("DROP INDEX IDX_plo_Plugin_PrimaryID_SecondaryID")
+    db.sql.execute("INSERT INTO Parameters (par_ID, par_Value) VALUES ('test', '1')")
+    db.sql.execute("UPDATE Devices SET dev_GUID = NULL")
+    db.upgradeDB()
+
+    indexes = [row[0] for row in db.sql.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+    assert "IDX_plo_Plugin_PrimaryID_SecondaryID" not in indexes
+    assert db.sql.execute("SELECT COUNT(*) FROM Parameters").fetchone()[0] == 0
+    assert db.sql.execute("SELECT COUNT(*) FROM Devices WHERE dev_GUID IS NULL").fetchone()[0] == 0
+
+
+def test_failed_migration(tmp_path, monkeypatch):
+    db = open_test_db(str(tmp_path / "app.db"))
+    db.upgradeDB()
+
+    version = schema_migrations[-1][0]
+
+    def failing_step(db):
+        db.sql.execute("CREATE TABLE Migration_Test (id INTEGER)")
+        raise ValueError("failed")
+
+    monkeypatch.setattr("database.schema_migrations", schema_migrations + [(version + 1, [failing_step])])
+
+    try:
+        db.upgradeDB()
+        assert False
+    except ValueError:
+        pass
+
+    # rolled back as a whole, retried on the next start
+    assert db.sql.execute("PRAGMA user_version").fetchone()[0] == version
+    assert db.sql.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'Migration_Test'").fetchone()[0] == 0
+
+
+def test_transaction(tmp_path):
+    db = open_test_db(str(tmp_path / "app.db"))
+    reader = sqlite3.connect(str(tmp_path / "app.db"))
+
+    def count():
+        return db.sql.execute("SELECT COUNT(*) FROM Parameters WHERE par_ID LIKE 'test_%'").fetchone()[0]
+
+    with db.transaction('test'):
+        db.sql.execute("INSERT INTO Parameters (par_ID, par_Value) VALUES ('test_1', '1')")
+        # deferred to the end of the scope
+        db.commitDB()
+
+        # a failing nested scope only rolls back its own changes
+        try:
+            with db.transaction('nested'):
+                db.sql.execute("INSERT INTO Parameters (par_ID, par_Value) VALUES ('test_2', '2')")
+                raise ValueError()
+        except ValueError:
+            pass
+
+        with db.transaction('nested'):
+            db.sql.execute("INSERT INTO Parameters (par_ID, par_Value) VALUES ('test_3', '3')")
+
+        # other connections don't see the unfinished unit of work
+        assert reader.execute("SELECT COUNT(*) FROM Parameters WHERE par_ID LIKE 'test_%'").fetchone()[0] == 0
+
+    assert count() == 2
+    assert reader.execute("SELECT COUNT(*) FROM Parameters WHERE par_ID LIKE 'test_%'").fetchone()[0] == 2
+
+    # a failing outer scope rolls everything back
+    try:
+        with db.transaction('test'):
+            db.sql.execute("DELETE FROM Parameters WHERE par_ID LIKE 'test_%'")
+            raise ValueError()
+    except ValueError:
+        pass
+
+    assert count() == 2
+    assert not db.sql_connection.in_transaction
+    assert db.get_commit_metrics()["commits"] == 1
+    assert db.get_commit_metrics()["deferred_commits"] == 1
+    assert db.get_commit_metrics()["rollbacks"] == 2
@@ -0,0 +1,59 @@
+import sys
+import pathlib
+
+ROOT_PATH = pathlib.Path(__file__).parent.parent.resolve()
+
+sys.path.append(str(ROOT_PATH) + "/server/")
+sys.path.append(str(ROOT_PATH) + "/test/")
+
+import pytest
+
+from device import sql_merge_scan_into_devices
+from test_database import open_test_db
+
+
+def insert_device(db, mac, name, vendor, ssid, present):
+    db.sql.execute("""INSERT INTO Devices (dev_MAC, dev_Name, dev_Owner, dev_Favorite, dev_FirstConnection, dev_LastConnection, dev_LastIP,
+                                           dev_StaticIP, dev_ScanCycle, dev_LogEvents, dev_AlertEvents, dev_AlertDeviceDown, dev_SkipRepeated,
+                                           dev_PresentLastScan, dev_NewDevice, dev_Archived, dev_Vendor, dev_SSID, dev_Network_Node_port)
+                      VALUES (?, ?, '', 0, '2024-01-01 00:00:00', '2024-01-01 00:00:00', '10.0.0.1', 0, 1, 1, 1, 0, 0, ?, 0, 0, ?, ?, 5)""",
+                   (mac, name, present, vendor, ssid))
+
+
+def insert_scan(db, mac, ip, name, vendor, ssid, port):
+    db.sql.execute("""INSERT INTO CurrentScan (cur_MAC, cur_IP, cur_Name, cur_Vendor, cur_SSID, cur_PORT, cur_NetworkSite, cur_NetworkNodeMAC, cur_Type)
+                      VALUES (?, ?, ?, ?, ?, ?, '', 'null', NULL)""", (mac, ip, name, vendor, ssid, port))
+
+
+# -------------------------------------------------------------------------------
+@pytest.mark.parametrize("sqliteVersion", [(3, 40, 1), (3, 31, 0)])
+def test_merge_scan_into_devices(tmp_path, sqliteVersion):
+    db = open_test_db(str(tmp_path / "app.db"))
+    db.upgradeDB()
+
+    # comes back online, unknown name and empty vendor are filled in
+    insert_device(db, "00:1a:00:00:00:01", "(unknown)", "", "", 0)
+    insert_scan(db, "00:1A:00:00:00:01", "10.0.0.2", "phone", "Acme", "wifi", "")
+
+    # already online, user set values are kept, empty scan values don't overwrite
+    insert_device(db, "00:1a:00:00:00:02", "printer", "Printers Inc", "office", 1)
+    insert_scan(db, "00:1a:00:00:00:02", "10.0.0.3", "null", "Acme", "", "7")
+
+    # not in the scan
+    insert_device(db, "00:1a:00:00:00:03", "tv", "", "", 1)
+
+    db.sql.execute(sql_merge_scan_into_devices(sqliteVersion), ('2024-01-02 00:00:00',))
+
+    devices = {row['dev_MAC']: row for row in db.sql.execute("SELECT * FROM Devices WHERE dev_MAC LIKE '00:1a:00:00:00:0%'")}
+
+    first = devices["00:1a:00:00:00:01"]
+    assert (first['dev_LastConnection'], first['dev_PresentLastScan'], first['dev_LastIP']) == ('2024-01-02 00:00:00', 1, '10.0.0.2')
+    assert (first['dev_Name'], first['dev_Vendor'], first['dev_SSID'], first['dev_Network_Node_port']) == ('phone', 'Acme', 'wifi', 5)
+    assert first['dev_Network_Node_MAC_ADDR'] is None
+
+    second = devices["00:1a:00:00:00:02"]
+    assert (second['dev_LastConnection'], second['dev_LastIP']) == ('2024-01-01 00:00:00', '10.0.0.3')
+    assert (second['dev_Name'], second['dev_Vendor'], second['dev_SSID'], second['dev_Network_Node_port']) == ('printer', 'Printers Inc', 'office', 7)
+
+    third = devices["00:1a:00:00:00:03"]
+    assert (third['dev_LastIP'], third['dev_PresentLastScan']) == ('10.0.0.1', 1)
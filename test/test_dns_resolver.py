@@ -0,0 +1,96 @@
+import sys
+import socket
+import pathlib
+import threading
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent.resolve()) + "/server/")
+
+import dns.message
+import dns.rcode
+import dns.rrset
+
+import dns_resolver
+from dns_resolver import resolve_ptr_batch, clear_ptr_cache
+
+
+#-------------------------------------------------------------------------------
+# Minimal UDP DNS server answering PTR queries from a dict, NXDOMAIN otherwise
+class stub_dns_server:
+    def __init__(self, records, rcodes = {}):
+        self.records = records
+        self.rcodes = rcodes
+        self.queries = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(4096)
+            except OSError:
+                return
+
+            self.queries += 1
+            query = dns.message.from_wire(data)
+            response = dns.message.make_response(query)
+            qname = query.question[0].name.to_text()
+
+            if qname in self.rcodes:
+                response.set_rcode(self.rcodes[qname])
+            elif qname in self.records:
+                response.answer.append(dns.rrset.from_text(qname, 60, 'IN', 'PTR', self.records[qname]))
+            else:
+                response.set_rcode(dns.rcode.NXDOMAIN)
+                response.authority.append(dns.rrset.from_text('in-addr.arpa.', 120, 'IN', 'SOA', 'ns. host. 1 2 3 4 30'))
+
+            self.sock.sendto(response.to_wire(), addr)
+
+    def close(self):
+        self.sock.close()
+
+
+def test_resolve_ptr_batch():
+    server = stub_dns_server({"10.1.168.192.in-addr.arpa.": "printer.lan."})
+    clear_ptr_cache()
+
+    try:
+        results = resolve_ptr_batch(["192.168.1.10", "192.168.1.11", "192.168.1.10"], timeout = 2, maxInFlight = 2, nameservers = ["127.0.0.1"], port = server.port)
+
+        assert results == {
+            "192.168.1.10": ("printer.lan.", "127.0.0.1"),
+            "192.168.1.11": ("", "")
+        }
+        assert server.queries == 2
+
+        # positive and negative answers are cached with their TTL (SOA minimum for NXDOMAIN)
+        expires = {ip: entry[2] for ip, entry in dns_resolver.PTR_CACHE.items()}
+        assert expires["192.168.1.11"] - expires["192.168.1.10"] < 0
+
+        resolve_ptr_batch(["192.168.1.10", "192.168.1.11"], timeout = 2, nameservers = ["127.0.0.1"], port = server.port)
+        assert server.queries == 2
+    finally:
+        server.close()
+        clear_ptr_cache()
+
+
+def test_resolve_ptr_batch_errors():
+    server = stub_dns_server({"10.1.168.192.in-addr.arpa.": "printer.lan."}, {"12.1.168.192.in-addr.arpa.": dns.rcode.YXDOMAIN})
+    clear_ptr_cache()
+
+    try:
+        # an unexpected DNS error or a device without IP only fails its own lookup
+        results = resolve_ptr_batch(["192.168.1.12", None, "", "192.168.1.10"], timeout = 2, nameservers = ["127.0.0.1"], port = server.port)
+
+        assert results == {
+            "192.168.1.12": ("", ""),
+            None: ("", ""),
+            "": ("", ""),
+            "192.168.1.10": ("printer.lan.", "127.0.0.1")
+        }
+        assert "192.168.1.12" not in dns_resolver.PTR_CACHE
+    finally:
+        server.close()
+        clear_ptr_cache()
@@ -27,3 +27,109 @@ def test_updateSubnets():
     result = updateSubnets(subnet)
     assert type(result) is list
     assert len(result) == 2
+
+
+# -------------------------------------------------------------------------------
+def test_get_setting_value_cache(tmp_path, monkeypatch):
+    import json
+    import os
+    import helper
+
+    settingsFile = tmp_path / "table_settings.json"
+    stringType = '{"dataType":"string", "elements": [{"elementType" : "input", "elementOptions" : [] ,"transformers": []}]}'
+
+    def write_settings(value, mtime):
+        settingsFile.write_text(json.dumps({"data": [{"Code_Name": "TEST_SETTING", "Type": stringType, "Value": value}]}))
+        os.utime(settingsFile, (mtime, mtime))
+
+    monkeypatch.setattr(helper, "apiPath", str(tmp_path) + "/")
+    helper.invalidate_settings_cache()
+
+    write_settings("first", 1000)
+    assert helper.get_setting_value("TEST_SETTING") == "first"
+
+    # served from the cache while the file is unchanged
+    assert "TEST_SETTING" in helper.SETTINGS_VALUES_CACHE
+
+    # a newer file invalidates the cache
+    write_settings("second", 2000)
+    assert helper.get_setting_value("TEST_SETTING") == "second"
+
+    assert helper.get_setting("MISSING_SETTING") is None
+
+    # cached lists are copied, a caller changing its value doesn't change the setting
+    arrayType = '{"dataType":"array", "elements": [{"elementType" : "select", "elementOptions" : [{"multiple":"true"}] ,"transformers": []}]}'
+    settingsFile.write_text(json.dumps({"data": [{"Code_Name": "TEST_LIST", "Type": arrayType, "Value": '["a", "b"]'}]}))
+    os.utime(settingsFile, (3000, 3000))
+
+    helper.get_setting_value("TEST_LIST").append("c")
+    assert helper.get_setting_value("TEST_LIST") == ["a", "b"]
+
+
+# -------------------------------------------------------------------------------
+def test_device_name_sources():
+    import sqlite3
+    from helper import load_device_name_sources, get_device_name_from_source, index_pholus_results, resolve_device_name_pholus
+
+    class db_stub:
+        def __init__(self):
+            self.sql = sqlite3.connect(":memory:").cursor()
+
+    db = db_stub()
+    db.sql.execute("CREATE TABLE Plugins_Objects (Plugin, Object_PrimaryID, Object_SecondaryID, Watched_Value2)")
+    db.sql.executemany("INSERT INTO Plugins_Objects VALUES (?, ?, ?, ?)", [
+        ("AVAHISCAN", "aa:aa:aa:aa:aa:01", "192.168.1.1", "printer.local."),
+        ("NBTSCAN",   "aa:aa:aa:aa:aa:02", "192.168.1.2", "NAS"),
+        ("ARPSCAN",   "aa:aa:aa:aa:aa:03", "192.168.1.3", "ignored"),
+    ])
+
+    sources = load_device_name_sources(db)
+
+    assert get_device_name_from_source(sources, "AVAHISCAN", "aa:aa:aa:aa:aa:01", "-") == "printerlocal"
+    assert get_device_name_from_source(sources, "NBTSCAN", "ff:ff:ff:ff:ff:ff", "192.168.1.2") == "NAS (IP match)"
+    assert get_device_name_from_source(sources, "NSLOOKUP", "aa:aa:aa:aa:aa:03", "192.168.1.3") == "(name not found)"
+
+    pholusIndex = index_pholus_results([
+        {"MAC": "aa:aa:aa:aa:aa:04", "IP_v4_or_v6": "192.168.1.4", "Record_Type": "Answer", "Value": 'Android.local. A Class:32769 "192.168.1.4"'},
+        {"MAC": "bb:bb:bb:bb:bb:05", "IP_v4_or_v6": "192.168.1.5", "Record_Type": "Answer", "Value": '5.1.168.192.in-addr.arpa. PTR Class:32769 "MyPc.local."'},
+    ])
+
+    assert resolve_device_name_pholus("aa:aa:aa:aa:aa:04", "-", pholusIndex, "(name not found)", False) == "Androidlocal"
+    assert resolve_device_name_pholus("ff:ff:ff:ff:ff:ff", "192.168.1.5", pholusIndex, "(name not found)", False) == "(name not found)"
+    assert resolve_device_name_pholus("ff:ff:ff:ff:ff:ff", "192.168.1.5", pholusIndex, "(name not found)", True) == "MyPclocal (IP match)"
+
+
+# -------------------------------------------------------------------------------
+def test_update_state_debounced(tmp_path, monkeypatch):
+    import json
+    import time
+    import helper
+
+    writes = []
+
+    def write_file(path, text):
+        writes.append(path)
+        pathlib.Path(path).write_text(text)
+
+    monkeypatch.setattr(helper, "apiPath", str(tmp_path))
+    monkeypatch.setattr(helper, "write_file", write_file)
+    monkeypatch.setattr(helper, "checkNewVersion", lambda: True)
+    monkeypatch.setattr(helper, "APP_STATE", None)
+    monkeypatch.setattr(helper, "appStateFlushed", 0)
+    monkeypatch.setattr(helper, "STATE_FLUSH_INTERVAL", 0.2)
+
+    for i in range(50):
+        helper.updateState(f"Check plugin {i} of 50")
+
+    # first update is written right away, the rest once the interval passed
+    assert len(writes) == 1
+
+    time.sleep(0.5)
+    helper.versionCheckThread.join(5)
+    time.sleep(0.5)
+
+    state = json.loads((tmp_path / "app_state.json").read_text())
+
+    assert len(writes) <= 3
+    assert state["currentState"] == "Check plugin 49 of 50"
+    assert state["isNewVersion"] is True
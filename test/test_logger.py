@@ -0,0 +1,71 @@
+import os
+import sys
+import pathlib
+
+ROOT_PATH = pathlib.Path(__file__).parent.parent.resolve()
+
+sys.path.append(str(ROOT_PATH) + "/server/")
+
+import conf
+import logger
+from logger import mylog, logWriter
+
+
+def test_mylog_levels(tmp_path, monkeypatch):
+    monkeypatch.setattr(logger, "logPath", str(tmp_path))
+    monkeypatch.setattr(conf, "LOG_LEVEL", "verbose")
+
+    calls = []
+
+    def message():
+        calls.append(1)
+        return ["[Test] lazy message"]
+
+    # disabled levels don't build the message
+    mylog('debug', message)
+    assert calls == []
+
+    mylog('verbose', message)
+    mylog('none', ['[Test] ', 42])
+    logWriter.flush()
+
+    lines = (tmp_path / "app.log").read_text().splitlines()
+    assert calls == [1]
+    assert [line[9:] for line in lines] == ["[Test] lazy message", "[Test] 42"]
+
+    # level changes are picked up
+    monkeypatch.setattr(conf, "LOG_LEVEL", "debug")
+    mylog('debug', message)
+    assert calls == [1, 1]
+
+
+def test_log_writer_rotation(tmp_path, monkeypatch):
+    monkeypatch.setattr(conf, "LOG_MAX_SIZE", 1)
+
+    logFile = str(tmp_path / "app.log")
+    line = "x" * 1023 + "\n"
+
+    # set up for the web server, which truncates it as well
+    pathlib.Path(logFile).touch()
+    os.chmod(logFile, 0o666)
+    before = os.stat(logFile)
+
+    for i in range(1100):
+        logWriter.write(logFile, line, 5)
+
+    logWriter.flush()
+
+    assert os.path.getsize(logFile + ".1") > 1024 * 1024
+    assert os.path.getsize(logFile) < 1024 * 1024
+    assert os.path.getsize(logFile + ".1") + os.path.getsize(logFile) == 1100 * 1024
+
+    # rotated in place
+    after = os.stat(logFile)
+    assert (after.st_ino, after.st_uid, after.st_gid, after.st_mode) == (before.st_ino, before.st_uid, before.st_gid, before.st_mode)
+
+    # a file replaced by someone else (e.g. the MAINT plugin) is reopened
+    os.replace(logFile, str(tmp_path / "moved.log"))
+    logWriter.write(logFile, "new\n", 5)
+    logWriter.flush()
+
+    assert pathlib.Path(logFile).read_text() == "new\n"
@@ -0,0 +1,68 @@
+import sys
+import random
+import pathlib
+import datetime
+
+ROOT_PATH = pathlib.Path(__file__).parent.parent.resolve()
+
+sys.path.append(str(ROOT_PATH) + "/server/")
+sys.path.append(str(ROOT_PATH) + "/test/")
+
+import networkscan
+from networkscan import create_sessions_snapshot, check_sessions_consistency, pair_sessions_events
+from test_database import open_test_db
+
+
+def insert_event(db, mac, dateTime, eventType):
+    db.sql.execute("""INSERT INTO Events (eve_MAC, eve_IP, eve_DateTime, eve_EventType, eve_AdditionalInfo, eve_PendingAlertEmail)
+                      VALUES (?, '10.0.0.1', ?, ?, '', 1)""", (mac, str(dateTime), eventType))
+
+
+def test_incremental_sessions_snapshot(tmp_path):
+    random.seed(1)
+
+    db = open_test_db(str(tmp_path / "app.db"))
+    db.upgradeDB()
+    db.sql.execute("DELETE FROM Events")
+
+    macs = [f"00:1a:00:00:00:{i:02x}" for i in range(20)]
+    start = datetime.datetime(2024, 1, 1)
+
+    for i, mac in enumerate(macs):
+        insert_event(db, mac, start, 'New Device')
+
+    pair_sessions_events(db)
+
+    # the first snapshot of a process is a full rebuild
+    networkscan.sessionsSnapshotReady = False
+    create_sessions_snapshot(db)
+
+    assert networkscan.sessionsSnapshotReady
+    assert db.sql.execute("SELECT COUNT(*) FROM Sessions_Pending").fetchone()[0] == 0
+
+    connected = {mac: True for mac in macs}
+
+    for scan in range(1, 30):
+        scanTime = start + datetime.timedelta(minutes = scan * 5)
+
+        for mac in random.sample(macs, 5):
+            insert_event(db, mac, scanTime, 'Disconnected' if connected[mac] else 'Connected')
+            connected[mac] = not connected[mac]
+
+        # voided ghost events, cleaned up and alerted events (changes not coming from the scan)
+        if scan % 7 == 0:
+            db.sql.execute("""UPDATE Events SET eve_PairEventRowid = NULL, eve_EventType = 'VOIDED - ' || eve_EventType
+                              WHERE RowID = (SELECT MAX(RowID) FROM Events WHERE eve_EventType = 'Disconnected')""")
+        if scan % 10 == 0:
+            db.sql.execute("DELETE FROM Events WHERE RowID IN (SELECT RowID FROM Events ORDER BY eve_DateTime LIMIT 3)")
+
+        db.sql.execute("UPDATE Events SET eve_PendingAlertEmail = 0")
+
+        pair_sessions_events(db)
+
+        # only the devices with changed events are updated
+        assert db.sql.execute("SELECT COUNT(*) FROM Sessions_Pending").fetchone()[0] <= 10
+
+        create_sessions_snapshot(db)
+
+        assert check_sessions_consistency(db) == 0
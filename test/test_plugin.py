@@ -0,0 +1,141 @@
+import sys
+import pathlib
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent.resolve()) + "/server/")
+sys.path.append(str(pathlib.Path(__file__).parent.parent.resolve()) + "/test/")
+
+
+from plugin import plugin_object_class, reconcile_plugin_objects, group_plugins_by_layer, read_plugin_result_file, process_plugin_events, plugins_state
+from test_database import open_test_db
+
+plugin = {
+    "unique_prefix": "TEST",
+    "settings": [
+        {"function": "WATCH", "value": ["Watched_Value1"]}
+    ]
+}
+
+def row(index, primaryId, secondaryId, watched1, status):
+    return (index, "TEST", primaryId, secondaryId, "2024-01-01 00:00:00", "2024-01-01 00:00:00",
+            watched1, "", "", "", status, "", "user data", primaryId, "", "null", "null", "null", "null")
+
+
+# -------------------------------------------------------------------------------
+def test_reconcile_plugin_objects():
+    pluginObjects = [
+        plugin_object_class(plugin, row(1, "mac1", "80", "open", "watched-not-changed")),
+        plugin_object_class(plugin, row(2, "mac1", "443", "open", "watched-not-changed")),
+        plugin_object_class(plugin, row(3, "mac2", "22", "open", "watched-not-changed")),
+    ]
+    pluginEvents = [
+        plugin_object_class(plugin, row(0, "mac1", "80", "open", "not-processed")),
+        plugin_object_class(plugin, row(0, "mac1", "443", "closed", "not-processed")),
+        plugin_object_class(plugin, row(0, "mac3", "22", "open", "not-processed")),
+    ]
+
+    merged, inserts, updates, events, history = reconcile_plugin_objects(pluginObjects, pluginEvents, ["new", "watched-changed"])
+
+    statuses = {(o.primaryId, o.secondaryId): o.status for o in merged}
+
+    assert statuses == {
+        ("mac1", "80"): "watched-not-changed",
+        ("mac1", "443"): "watched-changed",
+        ("mac2", "22"): "missing-in-last-scan",
+        ("mac3", "22"): "new",
+    }
+
+    assert len(inserts) == 1
+    assert len(updates) == 3
+    assert len(events) == 2
+    assert len(history) == 4
+
+    # existing objects keep their index and user data
+    assert sorted(update[-1] for update in updates) == [1, 2, 3]
+    assert all(update[11] == "user data" for update in updates)
+
+
+def test_group_plugins_by_layer():
+    plugins = [
+        {"unique_prefix": "A", "execution_order": "Layer_0"},
+        {"unique_prefix": "B", "execution_order": "Layer_2"},
+        {"unique_prefix": "C", "execution_order": "Layer_2"},
+        {"unique_prefix": "D", "execution_order": "Layer_3"},
+        {"unique_prefix": "E"},
+        {"unique_prefix": "F"},
+    ]
+
+    layers = group_plugins_by_layer(plugins)
+
+    assert [[p["unique_prefix"] for p in layer] for layer in layers] == [["A"], ["B", "C"], ["D"], ["E", "F"]]
+    assert group_plugins_by_layer([]) == []
+
+    # plugins writing the DB themselves run alone
+    plugins = [
+        {"unique_prefix": "A"},
+        {"unique_prefix": "B", "writes_db": True},
+        {"unique_prefix": "C"},
+        {"unique_prefix": "D"},
+        {"unique_prefix": "E", "writes_db": True},
+        {"unique_prefix": "F", "writes_db": True},
+    ]
+
+    layers = group_plugins_by_layer(plugins)
+
+    assert [[p["unique_prefix"] for p in layer] for layer in layers] == [["A"], ["B"], ["C", "D"], ["E"], ["F"]]
+
+
+# -------------------------------------------------------------------------------
+def test_process_plugin_events_in_batches(tmp_path, monkeypatch):
+    import plugin as plugin_module
+
+    db = open_test_db(str(tmp_path / "app.db"))
+    db.upgradeDB()
+
+    db.sql.execute("""INSERT INTO Plugins_Objects ("Plugin", "Object_PrimaryID", "Object_SecondaryID", "DateTimeCreated", "DateTimeChanged",
+                                                   "Watched_Value1", "Watched_Value2", "Watched_Value3", "Watched_Value4", "Status", "Extra",
+                                                   "UserData", "ForeignKey", "SyncHubNodeName", "HelpVal1", "HelpVal2", "HelpVal3", "HelpVal4")
+                      VALUES ('TEST', 'mac9', 'null', '2024-01-01 00:00:00', '2024-01-01 00:00:00', 'open', 'null', 'null', 'null',
+                              'watched-not-changed', 'null', 'user data', 'mac9', '', 'null', 'null', 'null', 'null')""")
+
+    result = tmp_path / "last_result.log"
+    result.write_text("mac1|null|2024-01-02 00:00:00|open|null|null|null|null|mac1\n"
+                      "not a result line\n"
+                      "mac2|null|2024-01-02 00:00:00|open|null|null|null|null\n"
+                      "mac2|null|2024-01-02 00:00:00|open|null|null|null|null|mac2\n"
+                      "mac3|null|2024-01-02 00:00:00|open|null|null|null|null|mac3|h1|h2|h3|h4\n"
+                      "mac1|null|2024-01-02 00:00:00|closed|null|null|null|null|mac1\n")
+
+    rows = read_plugin_result_file(str(result), plugin)
+
+    # batches of 2, the second mac1 is only seen after the first one was written
+    monkeypatch.setattr(plugin_module, "PLUGIN_EVENTS_BATCH_SIZE", 2)
+    process_plugin_events(db, plugin, plugins_state(), rows)
+
+    objects = {row["Object_PrimaryID"]: row for row in db.sql.execute("SELECT * FROM Plugins_Objects WHERE Plugin = 'TEST'")}
+
+    assert sorted(objects) == ["mac1", "mac2", "mac3", "mac9"]
+    assert db.sql.execute("SELECT COUNT(*) FROM Plugins_Objects WHERE Plugin = 'TEST'").fetchone()[0] == 4
+    assert (objects["mac1"]["Watched_Value1"], objects["mac1"]["Status"]) == ("closed", "new")
+    assert objects["mac3"]["HelpVal4"] == "h4"
+    assert (objects["mac9"]["Status"], objects["mac9"]["UserData"]) == ("missing-in-last-scan", "user data")
+
+
+# -------------------------------------------------------------------------------
+def test_read_tsv_result_file(tmp_path):
+    result = tmp_path / "last_result.log"
+    result.write_text('{"format": "netalertx-result", "version": 1}\n'
+                      'mac1\tnull\t2024-01-02 00:00:00\ta|b\tline 1\\nline 2\t200\ttab\\there\tC:\\\\temp\tmac1\n'
+                      '\n'
+                      'too\tshort\n'
+                      'mac2\tnull\t2024-01-02 00:00:00\t0.5\tnull\tnull\tnull\tnull\tmac2\th1\th2\th3\th4\n')
+
+    rows = list(read_plugin_result_file(str(result), plugin))
+
+    assert len(rows) == 2
+    assert rows[0][2:10] == ("mac1", "null", "null", "2024-01-02 00:00:00", "a|b", "line 1\nline 2", "200", "tab\there")
+    assert rows[0][11] == "C:\\temp"
+    assert rows[1][-4:] == ("h1", "h2", "h3", "h4")
+
+    # newer versions than the server knows are skipped
+    result.write_text('{"format": "netalertx-result", "version": 99}\nmac1\tnull\tnull\tnull\tnull\tnull\tnull\tnull\tnull\n')
+    assert list(read_plugin_result_file(str(result), plugin)) == []
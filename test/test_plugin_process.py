@@ -0,0 +1,109 @@
+import os
+import sys
+import time
+import pathlib
+import threading
+import subprocess
+
+ROOT_PATH = pathlib.Path(__file__).parent.parent.resolve()
+
+sys.path.append(str(ROOT_PATH) + "/server/")
+
+from plugin_process import run_plugin_process, plugin_limits, reap_orphan_plugin_processes, get_plugin_environment, find_plugin_processes
+from plugin_worker import plugin_worker_pool_class
+
+
+def is_running(pid):
+    # killed processes reparented to a non reaping init stay as zombies
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        return False
+
+
+def wait_stopped(pid):
+    for i in range(50):
+        if not is_running(pid):
+            return True
+        time.sleep(0.1)
+    return False
+
+
+# -------------------------------------------------------------------------------
+def test_run_plugin_process_kills_the_group(tmp_path):
+    pidFile = tmp_path / "pid"
+
+    # the tool started by the plugin is killed with it on timeout
+    result = run_plugin_process(["sh", "-c", f"sleep 30 & echo $! > {pidFile}; sleep 30"], 0.5, name="TEST")
+    assert result.timedOut
+    assert wait_stopped(int(pidFile.read_text()))
+
+    # and when the plugin ended without it
+    result = run_plugin_process(["sh", "-c", f"sleep 30 > /dev/null 2>&1 & echo $! > {pidFile}; echo done"], 10, name="TEST")
+    assert (result.returncode, result.output.strip(), result.timedOut) == (0, "done", False)
+    assert wait_stopped(int(pidFile.read_text()))
+
+
+# -------------------------------------------------------------------------------
+def test_run_plugin_process_limits():
+    script = "import os, resource; print(os.getpriority(os.PRIO_PROCESS, 0), resource.getrlimit(resource.RLIMIT_CPU)[0], os.environ['NETALERTX_PLUGIN'])"
+
+    result = run_plugin_process([sys.executable, "-c", script], 10, plugin_limits(nice=os.getpriority(os.PRIO_PROCESS, 0) + 5, cpuSeconds=30), "TEST")
+
+    assert result.output.split() == [str(os.getpriority(os.PRIO_PROCESS, 0) + 5), "30", "TEST"]
+
+    # the limits are in place before the command starts, a tool forked right away is limited as well
+    result = run_plugin_process(["sh", "-c", "ulimit -t & wait"], 10, plugin_limits(cpuSeconds=30), "TEST")
+    assert result.output.strip() == "30"
+
+
+# -------------------------------------------------------------------------------
+def test_plugin_worker_kills_the_group(tmp_path):
+    pidFile = tmp_path / "pid"
+    script = tmp_path / "hang.py"
+    script.write_text(f"import subprocess, time\nopen('{pidFile}', 'w').write(str(subprocess.Popen(['sleep', '30']).pid))\ntime.sleep(30)\n")
+
+    pool = plugin_worker_pool_class(1, str(tmp_path))
+
+    assert pool.run(str(script), [], 1, plugin_limits(), "TEST").timedOut
+    assert wait_stopped(int(pidFile.read_text()))
+
+    pool.stop()
+
+
+# -------------------------------------------------------------------------------
+def test_reap_orphan_plugin_processes():
+    orphan = subprocess.Popen(["sleep", "30"], start_new_session=True, env=get_plugin_environment("TEST"))
+    other  = subprocess.Popen(["sleep", "30"], start_new_session=True)
+
+    assert reap_orphan_plugin_processes() >= 1
+
+    assert orphan.wait(timeout=5) == -9
+    assert other.poll() is None
+
+    other.kill()
+    other.wait()
+
+
+# -------------------------------------------------------------------------------
+def test_find_warm_worker_runs(tmp_path):
+    pidFile = tmp_path / "pid"
+    script = tmp_path / "hang.py"
+    script.write_text(f"import os, time\nopen('{pidFile}', 'w').write(str(os.getpid()))\ntime.sleep(30)\n")
+
+    pool = plugin_worker_pool_class(1, str(tmp_path))
+    thread = threading.Thread(target=pool.run, args=(str(script), [], 30))
+    thread.start()
+
+    for i in range(50):
+        if pidFile.exists() and pidFile.read_text():
+            break
+        time.sleep(0.1)
+
+    # the forked run is found from the environment of the worker, as is the worker itself
+    assert {int(pidFile.read_text()), pool.workers[0].process.pid} <= set(find_plugin_processes())
+
+    os.kill(int(pidFile.read_text()), 9)
+    thread.join()
+    pool.stop()
@@ -0,0 +1,81 @@
+import sys
+import pathlib
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent.resolve()) + "/server/")
+sys.path.append(str(pathlib.Path(__file__).parent.parent.resolve()) + "/test/")
+
+from plugin_runs import record_plugin_run, get_plugin_runs, get_adaptive_timeout, count_timeouts_in_a_row, get_backoff_skip, RUN_HISTORY_SIZE
+from test_database import open_test_db
+
+
+# -------------------------------------------------------------------------------
+def test_adaptive_timeout():
+    runs = [(duration, 'success', 1) for duration in [4, 5, 5, 6, 30, 5, 4, 5, 6, 5]]
+
+    # not enough runs yet
+    assert get_adaptive_timeout(runs[:4], 300) == 300
+
+    # 95th percentile (30s) x 2 + 10s, capped by RUN_TIMEOUT
+    assert get_adaptive_timeout(runs, 300) == 70
+    assert get_adaptive_timeout(runs, 60) == 60
+
+    # a run cut off is retried with the full RUN_TIMEOUT
+    assert get_adaptive_timeout([(70, 'timeout', 1)] + runs, 300) == 300
+    assert get_adaptive_timeout([(300, 'success', 1), (70, 'timeout', 1)] + runs, 1000) == 610
+
+
+# -------------------------------------------------------------------------------
+def test_adaptive_timeout_units():
+    # e.g. NMAP scanning 1 or 2 new devices per run, 10s per device
+    runs = [(10 * units, 'success', units) for units in [1, 2, 1, 1, 2, 1]]
+
+    # learned per device, a run on 50 devices gets 50 x 10s x 2 + 10s
+    assert get_adaptive_timeout(runs, 50 * 60, 1) == 30
+    assert get_adaptive_timeout(runs, 50 * 60, 50) == 1010
+
+
+# -------------------------------------------------------------------------------
+def test_adaptive_timeout_slower_plugin():
+    # a plugin taking 5s for 50 runs now takes 100s, RUN_TIMEOUT 300s
+    runs = [(5, 'success', 1)] * 50
+    outcomes = []
+
+    for i in range(6):
+        timeout = get_adaptive_timeout(runs, 300)
+        run = (timeout, 'timeout', 1) if timeout < 100 else (100, 'success', 1)
+        outcomes.append(run[1])
+        runs = [run] + runs[:49]
+
+    # only the first slow run is cut off, the runs after it keep the full duration
+    assert outcomes == ['timeout'] + ['success'] * 5
+    assert get_adaptive_timeout(runs, 300) == 210
+
+
+# -------------------------------------------------------------------------------
+def test_timeout_backoff():
+    runs = [(10, 'timeout', 1), (10, 'timeout', 1), (10, 'timeout', 1), (5, 'success', 1), (10, 'timeout', 1)]
+
+    assert count_timeouts_in_a_row(runs) == 3
+    assert count_timeouts_in_a_row(runs[3:]) == 0
+
+    assert [get_backoff_skip(count) for count in range(7)] == [0, 0, 1, 3, 7, 15, 31]
+    assert get_backoff_skip(20) == 31
+
+
+# -------------------------------------------------------------------------------
+def test_plugin_runs_history(tmp_path):
+    db = open_test_db(str(tmp_path / "app.db"))
+    db.upgradeDB()
+
+    for i in range(RUN_HISTORY_SIZE + 10):
+        record_plugin_run(db, "TEST", i, 60, "success")
+
+    record_plugin_run(db, "TEST", 60, 60, "timeout")
+    record_plugin_run(db, "OTHER", 1, 10, "error", 3)
+
+    runs = get_plugin_runs(db, "TEST")
+
+    assert len(runs) == RUN_HISTORY_SIZE
+    assert tuple(runs[0]) == (60, "timeout", 1)
+    assert db.sql.execute("SELECT COUNT(*) FROM Plugins_Runs WHERE Plugin = 'TEST'").fetchone()[0] == RUN_HISTORY_SIZE
+    assert [tuple(run) for run in get_plugin_runs(db, "OTHER")] == [(1, "error", 3)]
@@ -0,0 +1,60 @@
+import sys
+import pathlib
+
+ROOT_PATH = pathlib.Path(__file__).parent.parent.resolve()
+
+sys.path.append(str(ROOT_PATH) + "/server/")
+
+from plugin_worker import plugin_worker_pool_class, get_worker_script
+
+
+def write_script(tmp_path, name, code):
+    script = tmp_path / name
+    script.write_text(code)
+    return str(script)
+
+
+# -------------------------------------------------------------------------------
+def test_plugin_worker_pool(tmp_path):
+    conf = tmp_path / "app.conf"
+    conf.write_text("")
+
+    pool = plugin_worker_pool_class(1, str(tmp_path), str(conf))
+
+    # modules imported by the worker are already loaded, the script runs as __main__ with its args
+    script = write_script(tmp_path, "ok.py", "import sys\nif __name__ == '__main__':\n    print('helper' in sys.modules, sys.argv[1:])\n")
+    result = pool.run(script, ["a=1"], 10)
+    assert (result.returncode, result.output.strip(), result.timedOut) == (0, "True ['a=1']", False)
+
+    result = pool.run(write_script(tmp_path, "fail.py", "import sys\nprint('failed')\nsys.exit(3)\n"), [], 10)
+    assert (result.returncode, result.output.strip()) == (3, "failed")
+
+    result = pool.run(write_script(tmp_path, "hang.py", "import time\ntime.sleep(30)\n"), [], 0.5)
+    assert result.timedOut
+
+    # a crashing run doesn't take the worker down
+    result = pool.run(write_script(tmp_path, "crash.py", "import os, signal\nos.kill(os.getpid(), signal.SIGSEGV)\n"), [], 10)
+    assert result.returncode == -11
+    assert pool.run(script, [], 10).returncode == 0
+
+    # a dead worker is replaced
+    pool.workers[0].process.kill()
+    pool.workers[0].process.wait()
+    assert pool.run(script, [], 10).returncode == 0
+
+    # and so is a worker with an outdated config
+    conf.write_text("TIMEZONE='UTC'\n")
+    pid = pool.workers[0].process.pid
+    assert pool.run(script, [], 10).returncode == 0
+    assert pool.workers[0].process.pid != pid
+
+    assert pool.get_metrics()["restarts"] == 2
+
+    pool.stop()
+
+
+# -------------------------------------------------------------------------------
+def test_get_worker_script():
+    assert get_worker_script(["python3", "/app/front/plugins/arp_scan/script.py", "userSubnets=a"]) == ("/app/front/plugins/arp_scan/script.py", ["userSubnets=a"])
+    assert get_worker_script(["/usr/bin/arp-scan", "--localnet"]) is None
+    assert get_worker_script(["python3", "-u", "script.py"]) is None
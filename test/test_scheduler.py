@@ -0,0 +1,75 @@
+import sys
+import pathlib
+import datetime
+
+import pytz
+from cron_converter import Cron
+
+ROOT_PATH = pathlib.Path(__file__).parent.parent.resolve()
+
+sys.path.append(str(ROOT_PATH) + "/server/")
+
+from scheduler import schedule_class, scheduler_class, get_schedule_jitter
+
+TZ = pytz.timezone('Europe/Berlin')
+START = TZ.localize(datetime.datetime(2024, 1, 1, 12, 0, 30))
+
+
+def make_schedule(service, cron, jitter = 0):
+    seeker = Cron(cron).schedule(start_date=START)
+    return schedule_class(service, seeker, seeker.next(), False, jitter = jitter)
+
+
+def test_scheduler_order_and_metrics():
+    scheduler = scheduler_class([make_schedule("ARPSCAN", "*/5 * * * *"),
+                                 make_schedule("NSLOOKUP", "*/2 * * * *"),
+                                 make_schedule("DBCLNP", "0 * * * *")])
+
+    # next due job is NSLOOKUP at 12:02
+    assert scheduler.next_due_time() == TZ.localize(datetime.datetime(2024, 1, 1, 12, 2))
+    assert scheduler.seconds_until_next(START) == 90
+    assert scheduler.pop_due(START) == []
+
+    assert scheduler.pop_due(TZ.localize(datetime.datetime(2024, 1, 1, 12, 2, 3))) == ["NSLOOKUP"]
+    assert scheduler.schedules["NSLOOKUP"].last_lateness == 3
+
+    # the 12:04 NSLOOKUP run is taken late and the 12:06 one is counted as missed
+    due = scheduler.pop_due(TZ.localize(datetime.datetime(2024, 1, 1, 12, 7)))
+
+    assert sorted(due) == ["ARPSCAN", "NSLOOKUP"]
+    assert scheduler.schedules["NSLOOKUP"].missed == 1
+    assert scheduler.schedules["ARPSCAN"].missed == 0
+    assert scheduler.schedules["NSLOOKUP"].due_time() == TZ.localize(datetime.datetime(2024, 1, 1, 12, 8))
+
+    metrics = scheduler.get_metrics()
+    assert metrics["NSLOOKUP"]["runs"] == 2
+    assert metrics["NSLOOKUP"]["max_lateness"] == 180
+    assert scheduler_class().seconds_until_next(START) is None
+
+
+def test_scheduler_jitter():
+    jitters = [get_schedule_jitter(service, 30) for service in ["ARPSCAN", "NMAPDEV", "PIHOLE", "DHCPLSS"]]
+
+    assert all(0 <= jitter <= 30 for jitter in jitters)
+    assert len(set(jitters)) > 1
+    assert get_schedule_jitter("ARPSCAN", 30) == jitters[0]
+    assert get_schedule_jitter("ARPSCAN", 0) == 0
+
+    scheduler = scheduler_class([make_schedule("ARPSCAN", "*/5 * * * *", jitter = 20)])
+    fireTime = TZ.localize(datetime.datetime(2024, 1, 1, 12, 5))
+
+    assert scheduler.pop_due(fireTime) == []
+    assert scheduler.pop_due(fireTime + datetime.timedelta(seconds = 20)) == ["ARPSCAN"]
+
+
+def test_scheduler_backoff():
+    scheduler = scheduler_class([make_schedule("NMAP", "*/5 * * * *")])
+    scheduler.schedules["NMAP"].backoff = 2
+
+    # 12:05 and 12:10 are skipped, 12:15 runs
+    assert scheduler.pop_due(TZ.localize(datetime.datetime(2024, 1, 1, 12, 5))) == []
+    assert scheduler.pop_due(TZ.localize(datetime.datetime(2024, 1, 1, 12, 10))) == []
+    assert scheduler.pop_due(TZ.localize(datetime.datetime(2024, 1, 1, 12, 15))) == ["NMAP"]
+
+    metrics = scheduler.get_metrics()["NMAP"]
+    assert (metrics["runs"], metrics["backed_off"], metrics["backoff"]) == (1, 2, 0)
@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import pathlib
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent.resolve()) + "/server/")
+
+import pytest
+
+import user_notifications
+
+
+# -------------------------------------------------------------------------------
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(user_notifications, 'notificationsLog',    str(tmp_path / 'user_notifications.jsonl'))
+    monkeypatch.setattr(user_notifications, 'notificationsIndex',  str(tmp_path / 'user_notifications.idx'))
+    monkeypatch.setattr(user_notifications, 'notificationsLock',   str(tmp_path / 'user_notifications.lock'))
+    monkeypatch.setattr(user_notifications, 'notificationsLegacy', str(tmp_path / 'user_notifications.json'))
+    return tmp_path
+
+
+def notification(number):
+    return {'timestamp': f'2024-01-01 00:00:{number:02}', 'guid': f'guid-{number}', 'read': 0, 'level': 'alert', 'content': f'message {number}'}
+
+
+# -------------------------------------------------------------------------------
+def test_append_and_page(store):
+    for number in range(10):
+        user_notifications.append_notification(notification(number))
+
+    assert user_notifications.count_notifications() == 10
+
+    # newest first
+    assert [entry['guid'] for entry in user_notifications.get_notifications(limit = 3)] == ['guid-9', 'guid-8', 'guid-7']
+    assert [entry['guid'] for entry in user_notifications.get_notifications(offset = 8, limit = 5)] == ['guid-1', 'guid-0']
+    assert len(user_notifications.get_notifications()) == 10
+    assert user_notifications.get_notifications(offset = 20) == []
+
+
+# -------------------------------------------------------------------------------
+def test_compaction(store, monkeypatch):
+    monkeypatch.setattr(user_notifications, 'NOTIFICATIONS_MAX', 5)
+
+    for number in range(11):
+        user_notifications.append_notification(notification(number))
+
+    # compacted to the newest 5 once the store held more than 10
+    assert user_notifications.count_notifications() == 5
+    assert [entry['guid'] for entry in user_notifications.get_notifications()] == [f'guid-{number}' for number in range(10, 5, -1)]
+
+    lines = (store / 'user_notifications.jsonl').read_text().splitlines()
+    assert len(lines) == 5
+
+    user_notifications.compact_notifications(keep = 2)
+    assert [entry['guid'] for entry in user_notifications.get_notifications()] == ['guid-10', 'guid-9']
+
+
+# -------------------------------------------------------------------------------
+def test_update_notifications(store):
+    for number in range(3):
+        user_notifications.append_notification(notification(number))
+
+    def mark_read(entries):
+        for entry in entries:
+            entry['read'] = 1
+        return entries
+
+    user_notifications.update_notifications(mark_read)
+    user_notifications.update_notifications(lambda entries: [entry for entry in entries if entry['guid'] != 'guid-1'])
+
+    entries = user_notifications.get_notifications()
+    assert [entry['guid'] for entry in entries] == ['guid-2', 'guid-0']
+    assert all(entry['read'] == 1 for entry in entries)
+
+    # appends after a rewrite use the new offsets
+    user_notifications.append_notification(notification(3))
+    assert user_notifications.get_notifications(limit = 1)[0]['guid'] == 'guid-3'
+
+
+# -------------------------------------------------------------------------------
+def test_migrate_legacy(store):
+    (store / 'user_notifications.json').write_text(json.dumps([notification(0), notification(1)], indent=4))
+
+    user_notifications.append_notification(notification(2))
+
+    assert not (store / 'user_notifications.json').exists()
+    assert [entry['guid'] for entry in user_notifications.get_notifications()] == ['guid-2', 'guid-1', 'guid-0']
+
+    # empty file left by the installer
+    (store / 'user_notifications.json').write_text('')
+    user_notifications.compact_notifications()
+
+    assert not (store / 'user_notifications.json').exists()
+    assert user_notifications.count_notifications() == 3
+
+
+# -------------------------------------------------------------------------------
+def test_compaction_keeps_owner_and_mode(store):
+    for number in range(3):
+        user_notifications.append_notification(notification(number))
+
+    # set up for the web server by setup.sh, the server itself runs as root
+    for name in ('user_notifications.jsonl', 'user_notifications.idx'):
+        os.chmod(store / name, 0o664)
+        if os.geteuid() == 0:
+            os.chown(store / name, 1234, 1235)
+
+    before = {name: os.stat(store / name) for name in ('user_notifications.jsonl', 'user_notifications.idx')}
+
+    user_notifications.compact_notifications(keep = 1)
+    user_notifications.update_notifications(lambda entries: entries)
+
+    for name, stat in before.items():
+        after = os.stat(store / name)
+        assert (after.st_ino, after.st_uid, after.st_gid, after.st_mode) == (stat.st_ino, stat.st_uid, stat.st_gid, stat.st_mode)
+
+    assert [entry['guid'] for entry in user_notifications.get_notifications()] == ['guid-2']
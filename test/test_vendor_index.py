@@ -0,0 +1,66 @@
+import sys
+import pathlib
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent.resolve()) + "/server/")
+
+
+import vendor_index
+from vendor_index import build_vendors_index, vendors_index_class, mac_to_int, lookup_vendors
+
+
+ouiFile = """000000\tXEROX CORPORATION
+00005E\tICANN, IANA Department
+0055DA0\tShinko Technos co.,ltd.
+0055DA\tIEEE Registration Authority
+70B3D5000\tOxford Instruments
+70B3D5 IEEE Registration Authority
+000000 Duplicate entry, first one wins
+"""
+
+def test_vendors_index(tmp_path, monkeypatch):
+    sourcePath = tmp_path / "ieee-oui.txt"
+    indexPath  = str(tmp_path / "ieee-oui.idx")
+    sourcePath.write_text(ouiFile)
+
+    assert build_vendors_index(str(sourcePath), indexPath) == 6
+
+    index = vendors_index_class(indexPath)
+
+    # 24, 28 and 36 bit prefixes, longest match wins
+    assert index.lookup(mac_to_int("00:00:00:11:22:33")) == "XEROX CORPORATION"
+    assert index.lookup(mac_to_int("00:55:da:01:22:33")) == "Shinko Technos co.,ltd."
+    assert index.lookup(mac_to_int("00:55:DA:11:22:33")) == "IEEE Registration Authority"
+    assert index.lookup(mac_to_int("70:b3:d5:00:02:33")) == "Oxford Instruments"
+    assert index.lookup(mac_to_int("70:b3:d5:00:12:33")) == "IEEE Registration Authority"
+    assert index.lookup(mac_to_int("ff:ff:ff:00:00:00")) is None
+
+    index.close()
+
+    # batched lookups rebuild the index on first use
+    monkeypatch.setattr(vendor_index, "vendorsIndexPath", str(tmp_path / "auto.idx"))
+    monkeypatch.setattr(vendor_index, "vendorsPathNewest", str(tmp_path / "missing.txt"))
+    monkeypatch.setattr(vendor_index, "vendorsPath", str(sourcePath))
+    monkeypatch.setattr(vendor_index, "INDEX_CACHE", None)
+
+    assert lookup_vendors(["00:00:5e:00:00:01", "ff:ff:ff:00:00:00", "Internet"]) == {
+        "00:00:5e:00:00:01": "ICANN, IANA Department",
+        "ff:ff:ff:00:00:00": -1,
+        "Internet": -2
+    }
+
+
+def test_vendors_index_not_writable(tmp_path, monkeypatch):
+    sourcePath = tmp_path / "ieee-oui.txt"
+    sourcePath.write_text(ouiFile)
+
+    # the index can't be written, lookups fall back to an in-memory index
+    monkeypatch.setattr(vendor_index, "vendorsIndexPath", str(tmp_path / "missing" / "auto.idx"))
+    monkeypatch.setattr(vendor_index, "vendorsPathNewest", str(tmp_path / "missing.txt"))
+    monkeypatch.setattr(vendor_index, "vendorsPath", str(sourcePath))
+    monkeypatch.setattr(vendor_index, "INDEX_CACHE", None)
+
+    assert lookup_vendors(["00:55:da:01:22:33", "ff:ff:ff:00:00:00"]) == {
+        "00:55:da:01:22:33": "Shinko Technos co.,ltd.",
+        "ff:ff:ff:00:00:00": -1
+    }
+    assert list(tmp_path.iterdir()) == [sourcePath]
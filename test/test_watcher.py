@@ -0,0 +1,50 @@
+import sys
+import time
+import pathlib
+import threading
+
+import pytest
+
+ROOT_PATH = pathlib.Path(__file__).parent.parent.resolve()
+
+sys.path.append(str(ROOT_PATH) + "/server/")
+
+from watcher import file_watcher_class
+
+
+def write_later(path, text, delay = 0.2):
+    def write():
+        time.sleep(delay)
+        path.write_text(text)
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    return thread
+
+
+@pytest.mark.parametrize("forcePolling", [False, True])
+def test_file_watcher(tmp_path, forcePolling):
+    config = tmp_path / "app.conf"
+    queue  = tmp_path / "execution_queue.log"
+    other  = tmp_path / "app.log"
+    config.write_text("LOG_LEVEL='verbose'")
+
+    watcher = file_watcher_class([str(config), str(queue)], forcePolling)
+
+    # nothing changed
+    start = time.monotonic()
+    assert watcher.wait(0.3) == set()
+    assert time.monotonic() - start >= 0.3
+
+    # other files in the same folder are ignored
+    write_later(other, "log line").join()
+    assert watcher.wait(0.3) == set()
+
+    # a new watched file wakes the caller before the timeout
+    thread = write_later(queue, "1|2|run|ARPSCAN")
+    start = time.monotonic()
+    assert watcher.wait(10) == {str(queue)}
+    assert time.monotonic() - start < 5
+    thread.join()
+
+    watcher.close()